@@ -0,0 +1,102 @@
+"""
+Script measuring the per-event cost of the charge extraction in ChargesComponent,
+with the charge extractor rebuilt for each event (former behaviour) and with the
+extractor cached once per component.
+
+Usage:
+    python charges_extractor_benchmark.py [-f run_file] [-n max_events]
+        [-m method1 method2 ...]
+
+By default the NectarCAM.Run3938.30events.fits.fz test file is used.
+"""
+
+import argparse
+import copy
+import time
+
+import numpy as np
+from ctapipe.io import EventSource
+from ctapipe.utils import get_dataset_path
+
+from nectarchain.makers.component import ChargesComponent
+from nectarchain.makers.core import BaseNectarCAMCalibrationTool
+
+parser = argparse.ArgumentParser(
+    prog="charges_extractor_benchmark.py",
+    description="Per-event cost of the charge extraction in ChargesComponent",
+)
+parser.add_argument(
+    "-f",
+    "--run_file",
+    default=None,
+    help="the run file, the NectarCAM test file by default",
+    type=str,
+)
+parser.add_argument(
+    "-n", "--max_events", default=30, help="the number of events", type=int
+)
+parser.add_argument(
+    "-m",
+    "--methods",
+    nargs="+",
+    default=[
+        "FullWaveformSum",
+        "FixedWindowSum",
+        "GlobalPeakWindowSum",
+        "LocalPeakWindowSum",
+        "SlidingWindowMaxSum",
+    ],
+    help="the charge extraction methods to benchmark",
+    type=str,
+)
+parser.add_argument(
+    "-r", "--repeat", default=5, help="the number of passes on the events", type=int
+)
+
+
+def time_events(component, events, rebuild, repeat):
+    """Return the mean time per event spent in ``component(event)``, rebuilding the
+    charge extractor before each event if ``rebuild`` is True."""
+    times = []
+    for _ in range(repeat):
+        for event in events:
+            t0 = time.perf_counter()
+            if rebuild:
+                component._reset_imageExtractor(None)
+            component(event)
+            times.append(time.perf_counter() - t0)
+    return np.mean(times), np.std(times)
+
+
+def main(run_file, max_events, methods, repeat):
+    if run_file is None:
+        run_file = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+    source = EventSource(input_url=run_file, max_events=max_events)
+    events = [copy.deepcopy(event) for event in source]
+
+    parent = BaseNectarCAMCalibrationTool()
+    parent._event_source = source
+    parent.run_number = events[0].index.obs_id
+    parent.npixels = len(source.nectarcam_service.pixel_ids)
+
+    print(f"{len(events)} events, {repeat} passes")
+    print(f"{'method':<22}{'rebuilt (ms)':>16}{'cached (ms)':>16}{'speed-up':>10}")
+    for method in methods:
+        results = []
+        for rebuild in [True, False]:
+            component = ChargesComponent(
+                subarray=source.subarray, parent=parent, method=method
+            )
+            # the first call initialises the trigger type and the jitted functions
+            component(events[0])
+            results.append(time_events(component, events, rebuild, repeat))
+        (t_rebuilt, _), (t_cached, _) = results
+        print(
+            f"{method:<22}{1e3 * t_rebuilt:>16.3f}{1e3 * t_cached:>16.3f}"
+            f"{t_rebuilt / t_cached:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    main(**vars(args))
@@ -1,6 +1,7 @@
 """Description: This file is used to import all the classes and functions
 from the data module."""
 
+from .catalogue import RunCatalogue
 from .container import (
     ArrayDataContainer,
     ChargesContainer,
@@ -31,4 +32,5 @@ __all__ = [
     "SPEfitContainer",
     "NectarCAMPedestalContainer",
     "DataManagement",
+    "RunCatalogue",
 ]
@@ -0,0 +1,296 @@
+import fnmatch
+import glob
+import logging
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import List
+
+logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+log = logging.getLogger(__name__)
+log.handlers = logging.getLogger("__main__").handlers
+
+__all__ = ["RunCatalogue"]
+
+
+class RunCatalogue:
+    """On-disk SQLite catalogue of the files of the NectarCAM data tree.
+
+    The catalogue stores, for each directory, its modification time and, for each
+    file, its run number, its index within the run, its size and its modification
+    time. At each query, the directories below the searched one are checked with a
+    single ``stat``: only the ones which have been modified since the last query are
+    listed again, so that the files of a run are found without walking the whole
+    tree.
+
+    The run number of a file is parsed from its name, ``NectarCAM.Run<run>.<index>
+    .fits.fz`` for the raw data and ``<...>_run<run>[_...].h5`` for the computed
+    data, so that run 123 does not match the files of run 1234.
+
+    The catalogue is written to the ``NECTARCHAIN_CATALOGUE`` path, by default
+    ``~/.cache/nectarchain/run_catalogue.sqlite``. If it can't be used, the
+    queries fall back to a plain scan of the file system.
+
+    Example:
+        >>> catalogue = RunCatalogue()
+        >>> catalogue.find(f"{os.environ['NECTARCAMDATA']}/runs", "*.fits.fz",
+        ...                run_number=3938, recursive=True)
+    """
+
+    SCHEMA_VERSION = 1
+    # directories modified more recently are listed again at the next query, their
+    # modification time may not have been updated yet by a concurrent writing
+    MTIME_RESOLUTION = 2.0
+
+    _RUN_NUMBER_PATTERN = re.compile(r"(?:\.Run|_run)(\d+)(?=[._]|$)")
+    _FILE_INDEX_PATTERN = re.compile(r"\.Run\d+\.(\d+)\.fits\.fz$")
+
+    def __init__(self, db_path=None):
+        """
+        Parameters:
+        db_path (str or Path, optional): The path of the SQLite database. Default to
+        the ``NECTARCHAIN_CATALOGUE`` environment variable, or
+        ``~/.cache/nectarchain/run_catalogue.sqlite``.
+        """
+        if db_path is None:
+            db_path = os.environ.get(
+                "NECTARCHAIN_CATALOGUE",
+                f"{Path.home()}/.cache/nectarchain/run_catalogue.sqlite",
+            )
+        self.db_path = Path(db_path)
+
+    @staticmethod
+    def parse_run_number(name: str):
+        """Parse the run number from a file name.
+
+        Parameters:
+        name (str): The file name.
+
+        Returns:
+        int: The run number, None if the name does not contain any.
+        """
+        match = __class__._RUN_NUMBER_PATTERN.search(name)
+        return None if match is None else int(match.group(1))
+
+    @staticmethod
+    def parse_file_index(name: str):
+        """Parse the index of a raw data file within its run.
+
+        Parameters:
+        name (str): The file name, as ``NectarCAM.Run3938.0001.fits.fz``.
+
+        Returns:
+        int: The file index, None if the name is not the one of a raw data file.
+        """
+        match = __class__._FILE_INDEX_PATTERN.search(name)
+        return None if match is None else int(match.group(1))
+
+    def _connect(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.db_path, timeout=60)
+        if connection.execute("PRAGMA user_version").fetchone()[0] != (
+            self.SCHEMA_VERSION
+        ):
+            with connection:
+                connection.executescript(
+                    f"""
+                    DROP TABLE IF EXISTS directories;
+                    DROP TABLE IF EXISTS files;
+                    CREATE TABLE directories (
+                        path TEXT PRIMARY KEY,
+                        parent TEXT,
+                        mtime_ns INTEGER
+                    );
+                    CREATE INDEX directories_parent ON directories (parent);
+                    CREATE TABLE files (
+                        path TEXT PRIMARY KEY,
+                        directory TEXT,
+                        name TEXT,
+                        run_number INTEGER,
+                        file_index INTEGER,
+                        size INTEGER,
+                        mtime_ns INTEGER
+                    );
+                    CREATE INDEX files_directory ON files (directory);
+                    CREATE INDEX files_run_number ON files (run_number);
+                    PRAGMA user_version = {self.SCHEMA_VERSION};
+                    """
+                )
+        return connection
+
+    def update(self, root) -> None:
+        """Update the catalogue of the tree below ``root``, listing only the
+        directories modified since the last update.
+
+        Parameters:
+        root (str or Path): The root directory.
+        """
+        with closing(self._connect()) as connection:
+            with connection:
+                self._update(connection, os.path.abspath(root))
+
+    def _update(self, connection, root):
+        visited = set()
+        stack = [(root, os.path.dirname(root))]
+        while len(stack) > 0:
+            path, parent = stack.pop()
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self._remove_directory(connection, path)
+                continue
+            realpath = os.path.realpath(path)
+            if realpath in visited:
+                continue
+            visited.add(realpath)
+            row = connection.execute(
+                "SELECT mtime_ns FROM directories WHERE path = ?", (path,)
+            ).fetchone()
+            if row is not None and row[0] == stat.st_mtime_ns:
+                subdirectories = [
+                    _row[0]
+                    for _row in connection.execute(
+                        "SELECT path FROM directories WHERE parent = ?", (path,)
+                    )
+                ]
+            else:
+                log.debug(f"listing {path}")
+                subdirectories = self._list_directory(connection, path)
+                mtime_ns = stat.st_mtime_ns
+                if time.time() - stat.st_mtime < self.MTIME_RESOLUTION:
+                    mtime_ns = -1
+                connection.execute(
+                    "INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                    (path, parent, mtime_ns),
+                )
+            stack.extend((subdirectory, path) for subdirectory in subdirectories)
+
+    def _list_directory(self, connection, path):
+        subdirectories = []
+        files = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        subdirectories.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        files.append(
+                            (
+                                entry.path,
+                                path,
+                                entry.name,
+                                self.parse_run_number(entry.name),
+                                self.parse_file_index(entry.name),
+                                stat.st_size,
+                                stat.st_mtime_ns,
+                            )
+                        )
+                except OSError as err:
+                    log.warning(err)
+        connection.execute("DELETE FROM files WHERE directory = ?", (path,))
+        connection.executemany(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", files
+        )
+        for (removed,) in connection.execute(
+            "SELECT path FROM directories WHERE parent = ?", (path,)
+        ).fetchall():
+            if removed not in subdirectories:
+                self._remove_directory(connection, removed)
+        return subdirectories
+
+    @staticmethod
+    def _remove_directory(connection, path):
+        prefix = f"{path}{os.sep}"
+        connection.execute(
+            "DELETE FROM directories WHERE path = ? OR substr(path, 1, ?) = ?",
+            (path, len(prefix), prefix),
+        )
+        connection.execute(
+            "DELETE FROM files WHERE directory = ? OR substr(directory, 1, ?) = ?",
+            (path, len(prefix), prefix),
+        )
+
+    def find(
+        self, root, pattern="*", run_number: int = None, recursive=False
+    ) -> List[Path]:
+        """Find the files of a directory, updating the catalogue before.
+
+        Parameters:
+        root (str or Path): The directory to search in.
+        pattern (str, optional): The shell-style pattern the file names must match.
+        run_number (int, optional): The run number of the files, all the files if
+        None.
+        recursive (bool, optional): Whether to search in the subdirectories.
+
+        Returns:
+        list: The paths of the files, sorted by file index within the run, then by
+        path.
+        """
+        root = os.path.abspath(root)
+        try:
+            with closing(self._connect()) as connection:
+                with connection:
+                    self._update(connection, root)
+                query = "SELECT path, name, file_index FROM files WHERE "
+                if recursive:
+                    prefix = f"{root}{os.sep}"
+                    query += "(directory = ? OR substr(directory, 1, ?) = ?)"
+                    parameters = [root, len(prefix), prefix]
+                else:
+                    query += "directory = ?"
+                    parameters = [root]
+                if run_number is not None:
+                    query += " AND run_number = ?"
+                    parameters.append(int(run_number))
+                rows = [
+                    (path, file_index)
+                    for path, name, file_index in connection.execute(query, parameters)
+                    if fnmatch.fnmatchcase(name, pattern)
+                ]
+        except (sqlite3.Error, OSError) as err:
+            log.warning(
+                f"the run catalogue {self.db_path} can't be used ({err}), "
+                f"scanning {root}"
+            )
+            rows = self._scan(root, pattern, run_number, recursive)
+        rows.sort(key=lambda row: (row[1] is None, row[1] or 0, row[0]))
+        return [Path(path) for path, _ in rows]
+
+    @staticmethod
+    def _scan(root, pattern, run_number, recursive):
+        if recursive:
+            paths = glob.glob(
+                os.path.join(glob.escape(root), "**", pattern), recursive=True
+            )
+        else:
+            paths = glob.glob(os.path.join(glob.escape(root), pattern))
+        return [
+            (path, __class__.parse_file_index(os.path.basename(path)))
+            for path in paths
+            if os.path.isfile(path)
+            and (
+                run_number is None
+                or __class__.parse_run_number(os.path.basename(path)) == run_number
+            )
+        ]
+
+    def glob(self, pathname, run_number: int = None) -> List[str]:
+        """Replacement of ``glob.glob`` for a pattern on the file names of a
+        directory.
+
+        Parameters:
+        pathname (str or Path): The path of the directory joined with the pattern of
+        the file names, as ``/data/runs/charges/*_run3938_*.h5``.
+        run_number (int, optional): The run number of the files.
+
+        Returns:
+        list: The paths of the matching files, as strings.
+        """
+        directory, pattern = os.path.split(str(pathname))
+        return [
+            str(path) for path in self.find(directory, pattern, run_number=run_number)
+        ]
@@ -2,6 +2,14 @@
 folder."""
 
 from .charges_container import ChargesContainer, ChargesContainers
+from .columnar import (
+    COLUMNAR_LAYOUT,
+    LazyArray,
+    is_columnar_node,
+    read_columnar,
+    read_columnar_node,
+    write_columnar,
+)
 from .core import (
     ArrayDataContainer,
     NectarCAMContainer,
@@ -34,4 +42,10 @@ __all__ = [
     "NectarCAMPedestalContainers",
     "PedestalFlagBits",
     "FlatFieldContainer",
+    "COLUMNAR_LAYOUT",
+    "LazyArray",
+    "is_columnar_node",
+    "read_columnar",
+    "read_columnar_node",
+    "write_columnar",
 ]
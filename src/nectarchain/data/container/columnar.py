@@ -0,0 +1,354 @@
+"""Column-oriented HDF5 layout for the ArrayDataContainer subclasses.
+
+With the ``HDF5TableWriter`` of ctapipe, a container is stored as a single row of a
+table, each array field being one cell: reading any part of ``wfs_hg`` means loading
+the whole array. In the columnar layout, a container is stored as an HDF5 group in
+which:
+
+- each array field is a chunked and compressed (blosc:lz4 by default) dataset, the
+  chunks being taken along the first axis, i.e. the event axis,
+- each scalar field (run number, number of events, camera name, ...) is an attribute
+  of the group.
+
+All the array fields of an ArrayDataContainer are indexed by event first, and by
+pixel second when they have more than one dimension, except ``pixels_id`` which is
+only indexed by pixel. A range of events or a subset of pixels can thus be read
+without loading the other chunks.
+
+The array fields can also be read lazily: the compressed datasets are then wrapped
+into ``LazyArray`` proxies, reading only the slices which are indexed, and the
+uncompressed ones (written with ``complevel=0``) are memory-mapped.
+"""
+
+import logging
+
+import h5py
+import numpy as np
+import tables
+from ctapipe.containers import Container
+
+logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+log = logging.getLogger(__name__)
+log.handlers = logging.getLogger("__main__").handlers
+
+
+__all__ = [
+    "COLUMNAR_LAYOUT",
+    "LazyArray",
+    "is_columnar_node",
+    "read_columnar",
+    "read_columnar_node",
+    "write_columnar",
+]
+
+COLUMNAR_LAYOUT = "columnar"
+LAYOUT_ATTR = "nectarchain_layout"
+CHUNK_BYTES = 1 << 20
+PIXEL_FIELDS = ("pixels_id",)
+
+
+def is_columnar_node(node: tables.Node) -> bool:
+    """Check if an HDF5 node is a container written with the columnar layout.
+
+    Parameters:
+        node (tables.Node): The node of the HDF5 file.
+
+    Returns:
+        bool: True if the node is a group written by ``write_columnar``.
+    """
+    return (
+        isinstance(node, tables.Group)
+        and getattr(node._v_attrs, LAYOUT_ATTR, None) == COLUMNAR_LAYOUT
+    )
+
+
+def write_columnar(
+    h5file: tables.File,
+    where: str,
+    container: Container,
+    complib: str = "blosc:lz4",
+    complevel: int = 5,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> tables.Group:
+    """Write a container in the columnar layout.
+
+    Parameters:
+        h5file (tables.File): The HDF5 file, opened in write or append mode.
+        where (str): The path of the group to create, the parent groups are created
+        if needed.
+        container (Container): The container to write.
+        complib (str): The compression library, see ``tables.Filters``.
+        complevel (int): The compression level, 0 to disable the compression, the
+        arrays are then written as contiguous datasets which can be memory-mapped.
+        chunk_bytes (int): The targeted size of the chunks, in bytes.
+
+    Returns:
+        tables.Group: The group in which the container is written.
+
+    Example:
+        >>> with tables.open_file("charges.h5", mode="w") as h5file:
+        ...     write_columnar(h5file, "/data/ChargesContainer_0", chargesContainer)
+    """
+    parent, name = where.rstrip("/").rsplit("/", 1)
+    group = h5file.create_group(parent or "/", name, createparents=True)
+    group._v_attrs[LAYOUT_ATTR] = COLUMNAR_LAYOUT
+    group._v_attrs["container_class"] = container.__class__.__name__
+    filters = tables.Filters(complevel=complevel, complib=complib, shuffle=True)
+    for key, value in container.items():
+        if value is None:
+            continue
+        if isinstance(value, np.ndarray):
+            _write_array(h5file, group, key, value, filters, chunk_bytes)
+        else:
+            group._v_attrs[key] = value
+    return group
+
+
+def _write_array(h5file, group, key, array, filters, chunk_bytes):
+    array = np.ascontiguousarray(array)
+    if array.ndim == 0 or 0 in array.shape[1:] or filters.complevel == 0:
+        # nothing to chunk or to compress
+        h5file.create_array(group, key, obj=array)
+        return
+    row_bytes = array.itemsize * int(np.prod(array.shape[1:]))
+    events_per_chunk = int(np.clip(chunk_bytes // row_bytes, 1, max(1, array.shape[0])))
+    dataset = h5file.create_earray(
+        group,
+        key,
+        atom=tables.Atom.from_dtype(array.dtype),
+        shape=(0,) + array.shape[1:],
+        filters=filters,
+        chunkshape=(events_per_chunk,) + array.shape[1:],
+        expectedrows=array.shape[0],
+    )
+    dataset.append(array)
+
+
+def read_columnar_node(
+    node: tables.Group,
+    container_class: type,
+    events: slice = None,
+    pixels_id: np.ndarray = None,
+    fields: list = None,
+    lazy: bool = False,
+) -> Container:
+    """Read a container written with the columnar layout from an opened HDF5 file.
+
+    Only the chunks holding the selected events are read from the disk.
+
+    Parameters:
+        node (tables.Group): The group in which the container is written.
+        container_class (type): The class of the container to fill.
+        events (slice, optional): The range of events to read, all the events if
+        None.
+        pixels_id (np.ndarray, optional): The ids of the pixels to read, in the
+        order of the output arrays, all the pixels if None.
+        fields (list, optional): The names of the array fields to read, the other
+        ones are left to None. ``pixels_id`` and the scalar fields are always read.
+        All the array fields if None.
+        lazy (bool, optional): If True, the array fields are not read but proxied
+        by ``LazyArray`` or memory-mapped arrays, the file must then stay on the
+        disk while they are used. Cannot be combined with a selection of events or
+        pixels.
+
+    Returns:
+        Container: The container of class ``container_class``.
+    """
+    if not is_columnar_node(node):
+        raise TypeError(f"{node._v_pathname} is not written in the columnar layout")
+    if lazy and not (events is None and pixels_id is None):
+        raise ValueError("a lazy container can't be read with a selection")
+    attrs = node._v_attrs
+    pixel_index = None
+    if pixels_id is not None:
+        pixel_index = _get_pixel_index(node.pixels_id.read(), pixels_id)
+    container = container_class()
+    for key, field in container.fields.items():
+        if key in node._v_children:
+            if not (fields is None or key in fields or key in PIXEL_FIELDS):
+                continue
+            dataset = node._v_children[key]
+            if lazy:
+                container[key] = _lazy_array(node._v_file.filename, dataset)
+            elif key in PIXEL_FIELDS:
+                container[key] = _read_array(dataset, None, pixel_index, pixel_axis=0)
+            else:
+                container[key] = _read_array(dataset, events, pixel_index, pixel_axis=1)
+        elif key in attrs._v_attrnamesuser:
+            value = attrs[key]
+            if isinstance(field.type, type):
+                value = field.type(value)
+            container[key] = value
+    if events is not None and "nevents" in container.fields:
+        container.nevents = container.fields["nevents"].type(
+            len(range(*events.indices(int(attrs["nevents"]))))
+        )
+    if pixel_index is not None and "npixels" in container.fields:
+        container.npixels = container.fields["npixels"].type(len(pixel_index))
+    return container
+
+
+def _get_pixel_index(stored_pixels_id, pixels_id):
+    mask_contain_pixels_id = np.isin(pixels_id, stored_pixels_id)
+    for pixel in np.asarray(pixels_id)[~mask_contain_pixels_id]:
+        log.warning(
+            f"You asked for pixel_id {pixel} but it is not present in this "
+            f"container, skip this one"
+        )
+    return np.array(
+        [
+            np.where(stored_pixels_id == pixel)[0][0]
+            for pixel in np.asarray(pixels_id)[mask_contain_pixels_id]
+        ],
+        dtype=np.int64,
+    )
+
+
+def _read_array(dataset, events, pixel_index, pixel_axis):
+    if dataset.ndim == 0:
+        return dataset.read()
+    if events is None:
+        events = slice(None)
+    if pixel_index is None or dataset.ndim <= pixel_axis:
+        return dataset[events]
+    if len(pixel_index) == 0:
+        shape = list(dataset.shape)
+        shape[0] = len(range(*events.indices(shape[0])))
+        shape[pixel_axis] = 0
+        return np.empty(shape, dtype=dataset.dtype)
+    # the point selection is done with sorted indices, then put back in the asked
+    # order
+    order = np.argsort(pixel_index)
+    if pixel_axis == 1:
+        data = dataset[events, pixel_index[order]]
+    else:
+        data = dataset[pixel_index[order]]
+    output = np.empty_like(data)
+    if pixel_axis == 1:
+        output[:, order] = data
+    else:
+        output[order] = data
+    return output
+
+
+def read_columnar(
+    path,
+    where: str,
+    container_class: type,
+    events: slice = None,
+    pixels_id: np.ndarray = None,
+    fields: list = None,
+    lazy: bool = False,
+) -> Container:
+    """Read a container written with the columnar layout.
+
+    Parameters:
+        path (str or Path): The path to the HDF5 file.
+        where (str): The path of the group of the container in the HDF5 file.
+        container_class (type): The class of the container to fill.
+        events (slice, optional): The range of events to read, all the events if
+        None.
+        pixels_id (np.ndarray, optional): The ids of the pixels to read, all the
+        pixels if None.
+        fields (list, optional): The names of the array fields to read, all of them
+        if None.
+        lazy (bool, optional): If True, the array fields are read on demand.
+
+    Returns:
+        Container: The container of class ``container_class``.
+
+    Example:
+        >>> charges = read_columnar(
+        ...     "charges.h5",
+        ...     "/data/ChargesContainer_0/FLATFIELD",
+        ...     ChargesContainer,
+        ...     pixels_id=np.array([10, 11]),
+        ...     fields=["charges_hg"],
+        ... )
+    """
+    with tables.open_file(path, mode="r") as h5file:
+        return read_columnar_node(
+            h5file.get_node(where),
+            container_class,
+            events=events,
+            pixels_id=pixels_id,
+            fields=fields,
+            lazy=lazy,
+        )
+
+
+class LazyArray:
+    """Proxy of an array field of a container written in the columnar layout.
+
+    The HDF5 file is opened at each indexing, to read only the requested slice.
+    ``np.asarray`` reads the whole array.
+
+    Example:
+        >>> charges = next(ChargesContainer.from_hdf5("charges.h5", lazy=True))
+        >>> charges.charges_hg[:, 10:20]  # only reads the chunks of this slice
+    """
+
+    def __init__(self, path, where: str, shape: tuple, dtype: np.dtype):
+        """
+        Parameters:
+            path (str or Path): The path to the HDF5 file.
+            where (str): The path of the dataset in the HDF5 file.
+            shape (tuple): The shape of the dataset.
+            dtype (np.dtype): The data type of the dataset.
+        """
+        self.path = path
+        self.where = where
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, item):
+        with tables.open_file(self.path, mode="r") as h5file:
+            return h5file.get_node(self.where)[item]
+
+    def __array__(self, dtype=None):
+        return np.asarray(self.read(), dtype=dtype)
+
+    def read(self):
+        """Read the whole array.
+
+        Returns:
+            np.ndarray: The array.
+        """
+        with tables.open_file(self.path, mode="r") as h5file:
+            return h5file.get_node(self.where).read()
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(path={self.path}, where={self.where}, "
+            f"shape={self.shape}, dtype={self.dtype})"
+        )
+
+
+def _lazy_array(path, dataset):
+    if dataset.ndim == 0 or 0 in dataset.shape:
+        return dataset.read()
+    if dataset.chunkshape is None:
+        # contiguous and uncompressed, the data can be mapped from the file
+        with h5py.File(path, mode="r") as h5file:
+            offset = h5file[dataset._v_pathname].id.get_offset()
+        if offset is not None:
+            dtype = dataset.atom.dtype
+            if dataset.byteorder in ("little", "big"):
+                dtype = dtype.newbyteorder(
+                    "<" if dataset.byteorder == "little" else ">"
+                )
+            return np.memmap(
+                path, dtype=dtype, mode="r", offset=offset, shape=dataset.shape
+            )
+    return LazyArray(path, dataset._v_pathname, dataset.shape, dataset.atom.dtype)
@@ -9,6 +9,8 @@ from ctapipe.core.container import FieldValidationError
 from ctapipe.io import HDF5TableReader
 from tables.exceptions import NoSuchNodeError
 
+from .columnar import PIXEL_FIELDS, is_columnar_node, read_columnar_node
+
 logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
 log.handlers = logging.getLogger("__main__").handlers
@@ -47,6 +49,55 @@ def get_array_keys(container: Container):
     return keys
 
 
+def _read_container(
+    reader: HDF5TableReader,
+    table_name: str,
+    container_class,
+    fields: list = None,
+    lazy: bool = False,
+):
+    """Read a container from an opened HDF5 file, whether it has been written as a
+    table row by a HDF5TableWriter or with the columnar layout.
+
+    Parameters:
+        reader (HDF5TableReader): The reader of the HDF5 file.
+        table_name (str): The path of the node of the container.
+        container_class (Container): The class of the container to be filled.
+        fields (list, optional): The names of the array fields to read, the other
+        ones are left to None. ``pixels_id`` and the scalar fields are always read.
+        lazy (bool, optional): If True, the array fields written with the columnar
+        layout are read on demand. A table row is always read in memory.
+
+    Returns:
+        Container: The container read from the HDF5 file.
+
+    Raises:
+        NoSuchNodeError: If the node does not exist in the HDF5 file.
+    """
+    node = reader._h5file.get_node(table_name)
+    if is_columnar_node(node):
+        return read_columnar_node(node, container_class, fields=fields, lazy=lazy)
+    if lazy:
+        log.warning(
+            f"{table_name} is written as a table row, it can't be read lazily, "
+            f"it is loaded in memory"
+        )
+    ignore_columns = None
+    if fields is not None:
+        ignore_columns = [
+            key
+            for key in get_array_keys(container_class)
+            if not (key in fields or key in PIXEL_FIELDS)
+        ]
+    return next(
+        reader.read(
+            table_name=table_name,
+            containers=container_class,
+            ignore_columns=ignore_columns,
+        )
+    )
+
+
 class NectarCAMContainer(Container):
     """Base class for the NectarCAM containers.
 
@@ -54,12 +105,18 @@ class NectarCAMContainer(Container):
     """
 
     @staticmethod
-    def _container_from_hdf5(path, container_class, index_component=0):
+    def _container_from_hdf5(
+        path, container_class, index_component=0, fields=None, lazy=False
+    ):
         """Static method to read a container from an HDF5 file.
 
         Parameters:
         path (str or Path): The path to the HDF5 file.
         container_class (Container): The class of the container to be filled with data.
+        fields (list, optional): The names of the array fields to read, all of them
+        if None.
+        lazy (bool, optional): If True, the array fields written with the columnar
+        layout are read on demand.
 
         Yields:
         Container: The container from the data in the HDF5 file.
@@ -73,20 +130,27 @@ class NectarCAMContainer(Container):
 
         container = container_class()
         with HDF5TableReader(path) as reader:
-            tableReader = reader.read(
-                table_name=f"/data/{container_class.__name__}_{index_component}",
-                containers=container_class,
+            container = _read_container(
+                reader,
+                f"/data/{container_class.__name__}_{index_component}",
+                container_class,
+                fields=fields,
+                lazy=lazy,
             )
-            container = next(tableReader)
 
         yield container
 
     @classmethod
-    def from_hdf5(cls, path, index_component=0):
+    def from_hdf5(cls, path, index_component=0, fields=None, lazy=False):
         """Reads a container from an HDF5 file.
 
         Parameters:
         path (str or Path): The path to the HDF5 file.
+        fields (list, optional): The names of the array fields to read, the other
+        ones are left to None. ``pixels_id`` and the scalar fields are always read.
+        All the array fields if None.
+        lazy (bool, optional): If True, the array fields written with the columnar
+        layout are proxies reading only the slices which are indexed.
 
         This method will call the _container_from_hdf5 method with the container
           argument associated to its own class (ArrayDataContainer)
@@ -99,7 +163,11 @@ class NectarCAMContainer(Container):
         """
 
         return cls._container_from_hdf5(
-            path, container_class=cls, index_component=index_component
+            path,
+            container_class=cls,
+            index_component=index_component,
+            fields=fields,
+            lazy=lazy,
         )
 
 
@@ -199,7 +267,9 @@ class TriggerMapContainer(Container):
     )
 
     @classmethod
-    def from_hdf5(cls, path, slice_index=None, index_component=0):
+    def from_hdf5(
+        cls, path, slice_index=None, index_component=0, fields=None, lazy=False
+    ):
         """Reads a container from an HDF5 file.
 
         Parameters:
@@ -207,6 +277,11 @@ class TriggerMapContainer(Container):
         slice_index (int, optional): The index of the slice of data within the hdf5 file
         to read. Default is None.This method will call the _container_from_hdf5 method
         with the container argument associated to its own class (ArrayDataContainer)
+        fields (list, optional): The names of the array fields to read, the other
+        ones are left to None. ``pixels_id`` and the scalar fields are always read.
+        All the array fields if None.
+        lazy (bool, optional): If True, the array fields written with the columnar
+        layout are proxies reading only the slices which are indexed.
 
         Yields:
         Container: The container generator linked to the HDF5 file.
@@ -220,11 +295,18 @@ class TriggerMapContainer(Container):
             slice_index=slice_index,
             container_class=cls,
             index_component=index_component,
+            fields=fields,
+            lazy=lazy,
         )
 
     @staticmethod
     def _container_from_hdf5(
-        path, container_class, slice_index=None, index_component=0
+        path,
+        container_class,
+        slice_index=None,
+        index_component=0,
+        fields=None,
+        lazy=False,
     ):
         # The way this method is coded is bad, there are confliuct behavior bettween
         # containers inherited from TriggerMapContainer to truly be mapped with trigger,
@@ -236,6 +318,10 @@ class TriggerMapContainer(Container):
         container_class (Container): The class of the container to be read.
         slice_index (int, optional): The index of the slice of data within the hdf5 file
         to read. Default is None.
+        fields (list, optional): The names of the array fields to read, all of them
+        if None.
+        lazy (bool, optional): If True, the array fields written with the columnar
+        layout are read on demand.
 
         This method first checks if the path is a string and converts it to a Path
         object
@@ -288,23 +374,27 @@ class TriggerMapContainer(Container):
                         ):
                             for key, trigger in EventType.__members__.items():
                                 try:
-                                    tableReader = reader.read(
-                                        table_name=f"/{data}/{_waveforms_data[0]}"
+                                    container.containers[trigger] = _read_container(
+                                        reader,
+                                        f"/{data}/{_waveforms_data[0]}"
                                         f"/{trigger.name}",
-                                        containers=_container,
+                                        _container,
+                                        fields=fields,
+                                        lazy=lazy,
                                     )
-                                    container.containers[trigger] = next(tableReader)
                                 except NoSuchNodeError as err:
                                     log.warning(err)
                                 except Exception as err:
                                     log.error(err, exc_info=True)
                                     raise err
                         else:
-                            tableReader = reader.read(
-                                table_name=f"/{data}/{_waveforms_data[0]}",
-                                containers=_container,
+                            container.containers[data] = _read_container(
+                                reader,
+                                f"/{data}/{_waveforms_data[0]}",
+                                _container,
+                                fields=fields,
+                                lazy=lazy,
                             )
-                            container.containers[data] = next(tableReader)
                     else:
                         log.info(
                             f"there is {len(_waveforms_data)} entry"
@@ -335,24 +425,27 @@ class TriggerMapContainer(Container):
                 ):
                     for key, trigger in EventType.__members__.items():
                         try:
-                            tableReader = reader.read(
-                                table_name=f"/{data}/{_container.__name__}_"
+                            container.containers[trigger] = _read_container(
+                                reader,
+                                f"/{data}/{_container.__name__}_"
                                 f"{index_component}/{trigger.name}",
-                                containers=_container,
+                                _container,
+                                fields=fields,
+                                lazy=lazy,
                             )
-                            container.containers[trigger] = next(tableReader)
                         except NoSuchNodeError as err:
                             log.warning(err)
                         except Exception as err:
                             log.error(err, exc_info=True)
                             raise err
                 else:
-                    tableReader = reader.read(
-                        table_name=f"/{data}/{_container.__name__}_"
-                        f"{index_component}",
-                        containers=_container,
+                    container.containers[data] = _read_container(
+                        reader,
+                        f"/{data}/{_container.__name__}_{index_component}",
+                        _container,
+                        fields=fields,
+                        lazy=lazy,
                     )
-                    container.containers[data] = next(tableReader)
                 yield container
 
     def is_empty(self):
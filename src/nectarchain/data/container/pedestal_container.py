@@ -51,6 +51,15 @@ class NectarCAMPedestalContainer(NectarCAMContainer):
         pedestals.
         pedestal_std_lg (np.ndarray): An array of standard deviations of low gain
         pedestals.
+        pedestal_m2_hg (np.ndarray): An array of sums of the squared deviations from
+        the high gain mean pedestals.
+        pedestal_m2_lg (np.ndarray): An array of sums of the squared deviations from
+        the low gain mean pedestals.
+        pedestal_min_hg (np.ndarray): An array of high gain minimum pedestals.
+        pedestal_min_lg (np.ndarray): An array of low gain minimum pedestals.
+        pedestal_max_hg (np.ndarray): An array of high gain maximum pedestals.
+        pedestal_max_lg (np.ndarray): An array of low gain maximum pedestals.
+        pixel_mask (np.ndarray): The flags of the bad pixels.
     """
 
     nsamples = Field(
@@ -101,6 +110,45 @@ class NectarCAMPedestalContainer(NectarCAMContainer):
         description="low gain pedestals standard deviations",
     )
 
+    pedestal_m2_hg = Field(
+        type=np.ndarray,
+        dtype=np.float64,
+        ndim=2,
+        description="high gain sums of the squared deviations from the mean pedestals",
+    )
+    pedestal_m2_lg = Field(
+        type=np.ndarray,
+        dtype=np.float64,
+        ndim=2,
+        description="low gain sums of the squared deviations from the mean pedestals",
+    )
+
+    pedestal_min_hg = Field(
+        type=np.ndarray,
+        dtype=np.float64,
+        ndim=2,
+        description="high gain minimum pedestals",
+    )
+    pedestal_min_lg = Field(
+        type=np.ndarray,
+        dtype=np.float64,
+        ndim=2,
+        description="low gain minimum pedestals",
+    )
+
+    pedestal_max_hg = Field(
+        type=np.ndarray,
+        dtype=np.float64,
+        ndim=2,
+        description="high gain maximum pedestals",
+    )
+    pedestal_max_lg = Field(
+        type=np.ndarray,
+        dtype=np.float64,
+        ndim=2,
+        description="low gain maximum pedestals",
+    )
+
     pixel_mask = Field(
         type=np.ndarray,
         dtype=np.int8,
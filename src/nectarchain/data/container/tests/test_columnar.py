@@ -0,0 +1,188 @@
+import numpy as np
+import pytest
+import tables
+from ctapipe.containers import EventType
+from ctapipe.io import HDF5TableWriter
+
+from nectarchain.data.container import (
+    ChargesContainer,
+    ChargesContainers,
+    LazyArray,
+    WaveformsContainer,
+    is_columnar_node,
+    read_columnar,
+    write_columnar,
+)
+from nectarchain.data.container.tests.test_charge import (
+    create_fake_chargeContainer,
+    create_fake_chargeContainers,
+)
+from nectarchain.data.container.tests.test_waveform import create_fake_waveformContainer
+
+
+def assert_containers_equal(container, reference):
+    assert isinstance(container, type(reference))
+    for key, value in reference.items():
+        if isinstance(value, np.ndarray):
+            assert container[key].dtype == value.dtype
+            assert np.array_equal(container[key], value)
+        else:
+            assert container[key] == value
+            assert type(container[key]) is type(value)
+
+
+class TestColumnar:
+    def test_write_columnar(self, tmp_path):
+        charges = create_fake_chargeContainer()
+        with tables.open_file(tmp_path / "charges.h5", mode="w") as h5file:
+            group = write_columnar(
+                h5file, "/data/ChargesContainer_0", charges, chunk_bytes=100
+            )
+            assert is_columnar_node(group)
+            assert group._v_attrs.run_number == charges.run_number
+            assert group._v_attrs.camera == charges.camera
+            # 100 bytes per chunk of uint16 rows of 10 pixels
+            assert group.charges_hg.chunkshape == (5, charges.npixels)
+            assert group.charges_hg.filters.complib == "blosc:lz4"
+            assert group.pixels_id.shape == charges.pixels_id.shape
+
+    def test_is_columnar_node(self, tmp_path):
+        charges = create_fake_chargeContainer()
+        with HDF5TableWriter(tmp_path / "charges.h5", mode="w", group_name="data") as (
+            writer
+        ):
+            writer.write(table_name="ChargesContainer_0", containers=charges)
+        with tables.open_file(tmp_path / "charges.h5") as h5file:
+            assert not is_columnar_node(h5file.root.data)
+            assert not is_columnar_node(h5file.root.data.ChargesContainer_0)
+
+    def test_read_columnar(self, tmp_path):
+        waveforms = create_fake_waveformContainer()
+        with tables.open_file(tmp_path / "waveforms.h5", mode="w") as h5file:
+            write_columnar(h5file, "/data/WaveformsContainer_0", waveforms)
+        loaded = read_columnar(
+            tmp_path / "waveforms.h5", "/data/WaveformsContainer_0", WaveformsContainer
+        )
+        assert_containers_equal(loaded, waveforms)
+        loaded = next(WaveformsContainer.from_hdf5(tmp_path / "waveforms.h5"))
+        assert_containers_equal(loaded, waveforms)
+
+    def test_read_columnar_selection(self, tmp_path):
+        charges = create_fake_chargeContainer()
+        with tables.open_file(tmp_path / "charges.h5", mode="w") as h5file:
+            write_columnar(h5file, "/data/ChargesContainer_0", charges, chunk_bytes=100)
+        pixels_id = np.array([9, 2, 1000, 5])
+        loaded = read_columnar(
+            tmp_path / "charges.h5",
+            "/data/ChargesContainer_0",
+            ChargesContainer,
+            events=slice(20, 80),
+            pixels_id=pixels_id,
+        )
+        index = [np.where(charges.pixels_id == pixel)[0][0] for pixel in [9, 2, 5]]
+        assert loaded.nevents == 60
+        assert loaded.npixels == 3
+        assert np.array_equal(loaded.pixels_id, [9, 2, 5])
+        assert np.array_equal(loaded.charges_hg, charges.charges_hg[20:80, index])
+        assert np.array_equal(
+            loaded.trig_pattern_all, charges.trig_pattern_all[20:80, index]
+        )
+        assert np.array_equal(loaded.event_id, charges.event_id[20:80])
+
+    def test_read_columnar_error(self, tmp_path):
+        charges = create_fake_chargeContainer()
+        with HDF5TableWriter(tmp_path / "charges.h5", mode="w", group_name="data") as (
+            writer
+        ):
+            writer.write(table_name="ChargesContainer_0", containers=charges)
+        with pytest.raises(TypeError):
+            read_columnar(tmp_path / "charges.h5", "/data", ChargesContainer)
+
+    def test_from_hdf5_trigger_map(self, tmp_path):
+        chargesContainers = create_fake_chargeContainers()
+        with tables.open_file(tmp_path / "charges.h5", mode="w") as h5file:
+            for key, container in chargesContainers.containers.items():
+                write_columnar(
+                    h5file, f"/data/ChargesContainer_0/{key.name}", container
+                )
+        loaded = next(ChargesContainers.from_hdf5(tmp_path / "charges.h5"))
+        assert isinstance(loaded, ChargesContainers)
+        assert set(loaded.containers.keys()) == {
+            EventType.FLATFIELD,
+            EventType.SKY_PEDESTAL,
+        }
+        for key, container in chargesContainers.containers.items():
+            assert_containers_equal(loaded.containers[key], container)
+
+    def test_read_columnar_fields(self, tmp_path):
+        chargesContainers = create_fake_chargeContainers()
+        with tables.open_file(tmp_path / "charges.h5", mode="w") as h5file:
+            for key, container in chargesContainers.containers.items():
+                write_columnar(
+                    h5file, f"/data/ChargesContainer_0/{key.name}", container
+                )
+        loaded = next(
+            ChargesContainers.from_hdf5(tmp_path / "charges.h5", fields=["charges_hg"])
+        )
+        for key, container in chargesContainers.containers.items():
+            assert np.array_equal(
+                loaded.containers[key].charges_hg, container.charges_hg
+            )
+            assert np.array_equal(loaded.containers[key].pixels_id, container.pixels_id)
+            assert loaded.containers[key].nevents == container.nevents
+            assert loaded.containers[key].charges_lg is None
+            assert loaded.containers[key].trig_pattern_all is None
+
+    def test_table_fields(self, tmp_path):
+        charges = create_fake_chargeContainer()
+        with HDF5TableWriter(tmp_path / "charges.h5", mode="w", group_name="data") as (
+            writer
+        ):
+            writer.write(table_name="ChargesContainer_0", containers=charges)
+        loaded = next(
+            ChargesContainer.from_hdf5(
+                tmp_path / "charges.h5", fields=["charges_hg"], lazy=True
+            )
+        )
+        assert np.array_equal(loaded.charges_hg, charges.charges_hg)
+        assert np.array_equal(loaded.pixels_id, charges.pixels_id)
+        assert loaded.run_number == charges.run_number
+        assert loaded.charges_lg is None
+        assert loaded.trig_pattern_all is None
+
+    def test_read_columnar_lazy(self, tmp_path):
+        charges = create_fake_chargeContainer()
+        with tables.open_file(tmp_path / "charges.h5", mode="w") as h5file:
+            write_columnar(h5file, "/data/ChargesContainer_0", charges)
+        loaded = next(ChargesContainer.from_hdf5(tmp_path / "charges.h5", lazy=True))
+        assert isinstance(loaded.charges_hg, LazyArray)
+        assert loaded.charges_hg.shape == charges.charges_hg.shape
+        assert loaded.charges_hg.dtype == charges.charges_hg.dtype
+        assert np.array_equal(loaded.charges_hg[10:20, 3], charges.charges_hg[10:20, 3])
+        assert np.array_equal(
+            np.asarray(loaded.trig_pattern_all), charges.trig_pattern_all
+        )
+        assert loaded.camera == charges.camera
+        with pytest.raises(ValueError):
+            read_columnar(
+                tmp_path / "charges.h5",
+                "/data/ChargesContainer_0",
+                ChargesContainer,
+                events=slice(0, 10),
+                lazy=True,
+            )
+
+    def test_read_columnar_memmap(self, tmp_path):
+        charges = create_fake_chargeContainer()
+        with tables.open_file(tmp_path / "charges.h5", mode="w") as h5file:
+            write_columnar(h5file, "/data/ChargesContainer_0", charges, complevel=0)
+        loaded = read_columnar(
+            tmp_path / "charges.h5",
+            "/data/ChargesContainer_0",
+            ChargesContainer,
+            lazy=True,
+        )
+        assert isinstance(loaded.charges_hg, np.memmap)
+        assert np.array_equal(loaded.charges_hg, charges.charges_hg)
+        assert np.array_equal(loaded.broken_pixels_lg, charges.broken_pixels_lg)
+        loaded.validate()
@@ -1,4 +1,3 @@
-import glob
 import logging
 import os
 import pathlib
@@ -9,6 +8,7 @@ from typing import List, Tuple
 import numpy as np
 
 from ..utils import KeepLoggingUnchanged
+from .catalogue import RunCatalogue
 
 logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
@@ -45,10 +45,9 @@ class DataManagement:
             the path list of ``*.fits.fz`` files
         """
         basepath = f"{os.environ['NECTARCAMDATA']}/runs/"
-        list = glob.glob(
-            basepath + "**/*" + str(run_number) + "*.fits.fz", recursive=True
+        list_path = RunCatalogue().find(
+            basepath, "*.fits.fz", run_number=run_number, recursive=True
         )
-        list_path = [Path(chemin) for chemin in list]
         if len(list_path) == 0:
             e = FileNotFoundError(f"run {run_number} is not present in {basepath}")
             if search_on_GRID:
@@ -56,10 +55,9 @@ class DataManagement:
                 log.info("will search files on GRID and fetch them")
                 lfns = DataManagement.get_GRID_location(run_number)
                 DataManagement.getRunFromDIRAC(lfns)
-                list = glob.glob(
-                    basepath + "**/*" + str(run_number) + "*.fits.fz", recursive=True
+                list_path = RunCatalogue().find(
+                    basepath, "*.fits.fz", run_number=run_number, recursive=True
                 )
-                list_path = [Path(chemin) for chemin in list]
             else:
                 log.error(e, exc_info=True)
                 raise e
@@ -71,10 +69,6 @@ class DataManagement:
         )
         log.info(f"Found {len(list_path)} files matching {name}")
 
-        # to sort list path
-        _sorted = sorted([[file, int(file.suffixes[1][1:])] for file in list_path])
-        list_path = [_sorted[i][0] for i in range(len(_sorted))]
-
         return name, list_path
 
     @staticmethod
@@ -288,7 +282,7 @@ class DataManagement:
             f"PhotoStatisticNectarCAM_FFrun{FF_run_number}_{FF_method}"
             f"_{str_extractor_kwargs}_Pedrun{ped_run_number}_{ped_method}.h5"
         )
-        full_file = glob.glob(str(path))
+        full_file = RunCatalogue().glob(path)
         log.debug("for now it does not check if there are files with max events")
         if len(full_file) != 1:
             raise FileNotFoundError(
@@ -334,7 +328,7 @@ class DataManagement:
             f"{keyword}{std_key}NectarCAM_run{run_number}*_{method}"
             f"_{str_extractor_kwargs}.h5"
         )
-        full_file = glob.glob(str(path))
+        full_file = RunCatalogue().glob(path, run_number=run_number)
         if len(full_file) == 0:
             raise FileNotFoundError(f"No file found looking for {str(path)}")
         elif len(full_file) > 1:
@@ -351,7 +345,7 @@ class DataManagement:
                 f"{keyword}{std_key}NectarCAM_run{run_number}_maxevents*_"
                 f"{method}_{str_extractor_kwargs}.h5"
             )
-            all_files = glob.glob(str(path))
+            all_files = RunCatalogue().glob(path, run_number=run_number)
             if len(all_files) == 0:
                 raise FileNotFoundError(f"No file found looking for {str(path)}")
             else:
@@ -372,6 +366,66 @@ class DataManagement:
             log.debug(f"File found for {str(path)} : {full_file}")
             return full_file
 
+    @staticmethod
+    def find_SPE_previous(
+        run_number,
+        method="FullWaveformSum",
+        str_extractor_kwargs="",
+        free_pp_n=False,
+        keyword="FlatFieldSPEHHV",
+        n_runs=10,
+    ):
+        """Find the SPE fit results of the runs preceding a run, as ``find_SPE_HHV``
+        for each of them.
+
+        Parameters
+        ----------
+        run_number : int
+            The run number, only the results of the runs before it are returned.
+        method : str, optional
+            The charge extraction method.
+        str_extractor_kwargs : str, optional
+            The string of the charge extractor kwargs.
+        free_pp_n : bool, optional
+            Whether ``pp`` and ``n`` were fitted.
+        keyword : str, optional
+            The prefix of the SPE result files, as in ``find_SPE_HHV``.
+        n_runs : int, optional
+            The maximum number of runs.
+
+        Returns
+        -------
+        list
+            The paths of the SPE result files, one per run, the most recent run
+            first.
+        """
+        std_key = "" if free_pp_n else "Std"
+        path = pathlib.Path(
+            f"{os.environ.get('NECTARCAMDATA','/tmp')}/SPEfit/"
+            f"{keyword}{std_key}NectarCAM_run*_{method}"
+            f"_{str_extractor_kwargs}.h5"
+        )
+        runs = {
+            RunCatalogue.parse_run_number(os.path.basename(file))
+            for file in RunCatalogue().glob(path)
+        }
+        runs = sorted(
+            (run for run in runs if run is not None and run < run_number),
+            reverse=True,
+        )
+        files = []
+        for run in runs[:n_runs]:
+            file = __class__.find_SPE_HHV(
+                run_number=run,
+                method=method,
+                str_extractor_kwargs=str_extractor_kwargs,
+                free_pp_n=free_pp_n,
+                keyword=keyword,
+            )
+            files.append(file if isinstance(file, str) else file[0])
+        log.debug(f"SPE results found before run {run_number} : {files}")
+        return files
+
     @staticmethod
     def __find_computed_data(
         run_number, max_events=None, ext=".h5", data_type="waveforms"
@@ -386,7 +440,7 @@ class DataManagement:
                 f"{os.environ.get('NECTARCAMDATA','/tmp')}/runs/"
                 f"{data_type}/*_run{run_number}{ext}"
             )
-        out = glob.glob(str(path))
+        out = RunCatalogue().glob(path, run_number=run_number)
         if len(out) == 0:
             raise FileNotFoundError(f"No file found looking for {str(path)}")
         elif len(out) > 1:
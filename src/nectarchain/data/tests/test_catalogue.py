@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+
+from nectarchain.data import RunCatalogue
+
+
+def touch(path, size=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"0" * size)
+
+
+class TestRunCatalogue:
+    @pytest.fixture
+    def catalogue(self, tmp_path):
+        return RunCatalogue(db_path=tmp_path / "catalogue.sqlite")
+
+    @pytest.fixture
+    def runs(self, tmp_path):
+        runs = tmp_path / "runs"
+        for index in [2, 0, 1]:
+            touch(runs / "2024" / f"NectarCAM.Run0123.{index:04d}.fits.fz")
+        touch(runs / "2024" / "NectarCAM.Run1234.0000.fits.fz")
+        touch(runs / "NectarCAM.Run0123.0003.fits.fz", size=10)
+        touch(runs / "charges" / "ChargesNectarCAMCalibration_run123.h5")
+        touch(runs / "charges" / "ChargesNectarCAMCalibration_run1234.h5")
+        return runs
+
+    def test_parse_run_number(self):
+        assert RunCatalogue.parse_run_number("NectarCAM.Run3938.0000.fits.fz") == 3938
+        assert RunCatalogue.parse_run_number("NectarCAM.Run3938.30events.fits.fz") == (
+            3938
+        )
+        assert RunCatalogue.parse_run_number("Charges_run3938_maxevents10.h5") == 3938
+        assert RunCatalogue.parse_run_number("Charges_run3938.h5") == 3938
+        assert RunCatalogue.parse_run_number("PhotoStat_FFrun3938.h5") is None
+
+    def test_parse_file_index(self):
+        assert RunCatalogue.parse_file_index("NectarCAM.Run3938.0012.fits.fz") == 12
+        assert RunCatalogue.parse_file_index("NectarCAM.Run3938.30events.fits.fz") is (
+            None
+        )
+
+    def test_find(self, catalogue, runs):
+        files = catalogue.find(runs, "*.fits.fz", run_number=123, recursive=True)
+        assert [file.name for file in files] == [
+            f"NectarCAM.Run0123.{index:04d}.fits.fz" for index in range(4)
+        ]
+        files = catalogue.find(runs, "*.fits.fz", run_number=123)
+        assert [file.name for file in files] == ["NectarCAM.Run0123.0003.fits.fz"]
+        assert catalogue.glob(runs / "charges" / "*_run123*.h5", run_number=123) == [
+            str(runs / "charges" / "ChargesNectarCAMCalibration_run123.h5")
+        ]
+        assert len(catalogue.glob(runs / "charges" / "*.h5")) == 2
+        assert catalogue.find(runs / "unknown", run_number=123) == []
+
+    def test_update(self, catalogue, runs):
+        assert (
+            len(catalogue.find(runs, "*.fits.fz", run_number=123, recursive=True)) == 4
+        )
+        touch(runs / "2025" / "NectarCAM.Run0123.0004.fits.fz")
+        assert (
+            len(catalogue.find(runs, "*.fits.fz", run_number=123, recursive=True)) == 5
+        )
+        for file in (runs / "2024").iterdir():
+            file.unlink()
+        (runs / "2024").rmdir()
+        files = catalogue.find(runs, "*.fits.fz", run_number=123, recursive=True)
+        assert [file.name for file in files] == [
+            "NectarCAM.Run0123.0003.fits.fz",
+            "NectarCAM.Run0123.0004.fits.fz",
+        ]
+
+    def test_update_unchanged_directories(self, catalogue, runs):
+        past = time.time() - 10
+        for directory in [runs, runs / "2024", runs / "charges"]:
+            os.utime(directory, (past, past))
+        catalogue.update(runs)
+        # files added without any change of the directories mtime are not listed
+        touch(runs / "2024" / "NectarCAM.Run0123.0005.fits.fz")
+        os.utime(runs / "2024", (past, past))
+        assert (
+            len(catalogue.find(runs, "*.fits.fz", run_number=123, recursive=True)) == 4
+        )
+
+    def test_find_without_catalogue(self, tmp_path, runs):
+        catalogue = RunCatalogue(db_path=tmp_path / "catalogue.sqlite" / "db.sqlite")
+        (tmp_path / "catalogue.sqlite").write_text("not a directory")
+        files = catalogue.find(runs, "*.fits.fz", run_number=123, recursive=True)
+        assert len(files) == 4
@@ -1 +1,69 @@
-# To DO
+import pytest
+
+from nectarchain.data import DataManagement
+from nectarchain.data.tests.test_catalogue import touch
+
+
+class TestDataManagement:
+    @pytest.fixture(autouse=True)
+    def nectarcamdata(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("NECTARCAMDATA", str(tmp_path))
+        monkeypatch.setenv("NECTARCHAIN_CATALOGUE", str(tmp_path / "catalogue.sqlite"))
+        for index in [1, 0]:
+            touch(tmp_path / "runs" / "2024" / f"NectarCAM.Run0123.{index:04d}.fits.fz")
+        touch(tmp_path / "runs" / "NectarCAM.Run1234.0000.fits.fz")
+        touch(tmp_path / "runs" / "charges" / "Charges_run123_FullWaveformSum_.h5")
+        touch(tmp_path / "runs" / "charges" / "Charges_run1234_FullWaveformSum_.h5")
+        return tmp_path
+
+    def test_findrun(self, nectarcamdata):
+        name, files = DataManagement.findrun(123, search_on_GRID=False)
+        assert [file.name for file in files] == [
+            "NectarCAM.Run0123.0000.fits.fz",
+            "NectarCAM.Run0123.0001.fits.fz",
+        ]
+        assert name.name == "NectarCAM.Run0123.*.fits.fz"
+        with pytest.raises(FileNotFoundError):
+            DataManagement.findrun(12, search_on_GRID=False)
+
+    def test_find_charges(self, nectarcamdata):
+        files = DataManagement.find_charges(123)
+        assert files == [
+            str(
+                nectarcamdata
+                / "runs"
+                / "charges"
+                / "Charges_run123_FullWaveformSum_.h5"
+            )
+        ]
+        with pytest.raises(FileNotFoundError):
+            DataManagement.find_charges(12)
+
+    def test_find_SPE_previous(self, nectarcamdata):
+        for run in [100, 110, 123, 1234]:
+            touch(
+                nectarcamdata
+                / "SPEfit"
+                / f"FlatFieldSPENominalStdNectarCAM_run{run}_FullWaveformSum_.h5"
+            )
+        touch(
+            nectarcamdata
+            / "SPEfit"
+            / "FlatFieldSPENominalNectarCAM_run120_FullWaveformSum_.h5"
+        )
+        files = DataManagement.find_SPE_previous(123, keyword="FlatFieldSPENominal")
+        assert [file.split("/")[-1].split("_")[1] for file in files] == [
+            "run110",
+            "run100",
+        ]
+        assert (
+            len(
+                DataManagement.find_SPE_previous(
+                    123, keyword="FlatFieldSPENominal", n_runs=1
+                )
+            )
+            == 1
+        )
+        assert (
+            DataManagement.find_SPE_previous(100, keyword="FlatFieldSPENominal") == []
+        )
@@ -5,6 +5,7 @@ Module for Data Quality Monitoring
 from .camera_monitoring import CameraMonitoring
 from .charge_integration import ChargeIntegrationHighLowGain
 from .dqm_summary_processor import DQMSummary
+from .event_features import DQMEventFeatures
 from .mean_camera_display import MeanCameraDisplayHighLowGain
 from .mean_waveforms import MeanWaveFormsHighLowGain
 from .pixel_participation import PixelParticipationHighLowGain
@@ -14,6 +15,7 @@ from .trigger_statistics import TriggerStatistics
 __all__ = [
     "CameraMonitoring",
     "ChargeIntegrationHighLowGain",
+    "DQMEventFeatures",
     "DQMSummary",
     "MeanCameraDisplayHighLowGain",
     "MeanWaveFormsHighLowGain",
@@ -7,7 +7,6 @@ from ctapipe.instrument import CameraGeometry
 
 # ctapipe imports
 from ctapipe.visualization.bokeh import CameraDisplay
-from ctapipe_io_nectarcam import constants
 
 NOTINDISPLAY = [
     "TRIGGER-.*",
@@ -27,31 +26,144 @@ def get_rundata(src, runid):
     return run_data
 
 
-def make_camera_displays(db, source, runid):
+def get_display_keys(source):
+    """Get the keys of the results of a run which are displayed on the camera.
+
+    Parameters:
+    source (mapping): The result dictionaries of the run.
+
+    Returns:
+    dict: The list of the displayed result keys, by result dictionary.
+    """
+    return {
+        parentkey: list(source[parentkey].keys())
+        for parentkey in source.keys()
+        if not re.match(TEST_PATTERN, parentkey)
+    }
+
+
+def get_image(source, parent_key, child_key):
+    """Get a result of a run as a camera image, filled with zeros if it is missing
+    or if it does not have one value per pixel.
+
+    Parameters:
+    source (mapping): The result dictionaries of the run.
+    parent_key (str): The key of the result dictionary.
+    child_key (str): The key of the result in the dictionary.
+
+    Returns:
+    np.ndarray: The image, without NaN.
+    """
+    try:
+        image = np.asarray(source[parent_key][child_key], dtype=float)
+    except (KeyError, TypeError, ValueError) as e:
+        print(
+            f"Caught {type(e).__name__} for {child_key}, filling display with zeros. "
+            f"Details: {e}"
+        )
+        return np.zeros(shape=geom.n_pixels)
+    if image.shape != (geom.n_pixels,):
+        print(
+            f"Image of shape {image.shape} for {child_key}, filling display with "
+            "zeros."
+        )
+        return np.zeros(shape=geom.n_pixels)
+    return np.nan_to_num(image, nan=0.0)
+
+
+class RunImageCache:
+    """Bounded LRU cache of the camera images of the runs of the database.
+
+    The results of a run are read from the database only when one of its images is
+    requested, and at most ``maxsize`` images are kept in memory, the least
+    recently used ones being dropped first.
+
+    Example:
+        >>> images = RunImageCache(db, maxsize=1024)
+        >>> image = images.get("NectarCAM_Run0008", parentkey, childkey)
+    """
+
+    def __init__(self, db, maxsize=1024):
+        """
+        Parameters:
+        db (mapping): The root of the database, the results of the runs by run id.
+        maxsize (int, optional): The maximum number of images kept in memory.
+        """
+        self.db = db
+        self.maxsize = maxsize
+        self._images = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._images)
+
+    def get(self, runid, parent_key, child_key):
+        """Get an image, reading it from the database if it is not cached.
+
+        Parameters:
+        runid (str): The run id.
+        parent_key (str): The key of the result dictionary.
+        child_key (str): The key of the result in the dictionary.
+
+        Returns:
+        np.ndarray: The image, see ``get_image``.
+        """
+        key = (runid, parent_key, child_key)
+        if key in self._images:
+            self._images.move_to_end(key)
+            return self._images[key]
+        image = get_image(get_rundata(self.db, runid), parent_key, child_key)
+        self._images[key] = image
+        while len(self._images) > self.maxsize:
+            self._images.popitem(last=False)
+        return image
+
+
+def make_camera_displays(db, source, runid, images=None):
+    """Make a camera display for each displayed result of a run.
+
+    Parameters:
+    db (mapping): The root of the database.
+    source (mapping): The result dictionaries of the run.
+    runid (str): The run id.
+    images (RunImageCache, optional): The cache of the images, the images are read
+    from ``source`` if None.
+
+    Returns:
+    dict: The displays, by result dictionary and result key.
+    """
     displays = collections.defaultdict(dict)
-    for parentkey in db[runid].keys():
-        if not re.match(TEST_PATTERN, parentkey):
-            for childkey in db[runid][parentkey].keys():
-                print(f"Run id {runid} Preparing plot for {parentkey}, {childkey}")
-                displays[parentkey][childkey] = make_camera_display(
-                    source, parent_key=parentkey, child_key=childkey
-                )
+    for parentkey, childkeys in get_display_keys(source).items():
+        for childkey in childkeys:
+            print(f"Run id {runid} Preparing plot for {parentkey}, {childkey}")
+            image = None
+            if images is not None:
+                image = images.get(runid, parentkey, childkey)
+            displays[parentkey][childkey] = make_camera_display(
+                source, parent_key=parentkey, child_key=childkey, image=image
+            )
     return dict(displays)
 
 
-def make_camera_display(source, parent_key, child_key):
+def make_camera_display(source, parent_key, child_key, image=None):
     # Example camera display
-    image = source[parent_key][child_key]
-    image = np.nan_to_num(image, nan=0.0)
-    display = CameraDisplay(geometry=geom)
-    try:
-        display.image = image
-    except ValueError:
-        image = np.zeros(shape=display.image.shape)
-        display.image = image
-    except KeyError:
-        image = np.zeros(shape=constants.N_PIXELS)
-        display.image = image
+    if image is None:
+        image = get_image(source, parent_key, child_key)
+    display = CameraDisplay(geometry=geom, image=image)
     display.add_colorbar()
     display.figure.title = child_key
     return display
+
+
+def update_camera_displays(displays, runid, images):
+    """Show the results of another run on the camera displays. The data source of
+    each display is patched in place, the displays are not rebuilt.
+
+    Parameters:
+    displays (dict): The displays, by result dictionary and result key.
+    runid (str): The run id.
+    images (RunImageCache): The cache of the images.
+    """
+    for parentkey, childdisplays in displays.items():
+        for childkey, display in childdisplays.items():
+            print(f"Run id {runid} Updating plot for {parentkey}, {childkey}")
+            display.image = images.get(runid, parentkey, childkey)
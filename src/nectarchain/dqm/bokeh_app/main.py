@@ -1,7 +1,9 @@
-import re
-
-import numpy as np
-from app_hooks import TEST_PATTERN, get_rundata, make_camera_displays
+from app_hooks import (
+    RunImageCache,
+    get_rundata,
+    make_camera_displays,
+    update_camera_displays,
+)
 
 # bokeh imports
 from bokeh.layouts import layout, row
@@ -11,62 +13,32 @@ from bokeh.plotting import curdoc
 # ctapipe imports
 from ctapipe.coordinates import EngineeringCameraFrame
 from ctapipe.instrument import CameraGeometry
-from ctapipe_io_nectarcam import constants
 
-from nectarchain.dqm.db_utils import DQMDB
+from nectarchain.dqm.db_utils import DQMDB, get_run_index, get_runids
 
 geom = CameraGeometry.from_name("NectarCam-003")
 geom = geom.transform_to(EngineeringCameraFrame())
 
 
-def update_camera_displays(attr, old, new):
-    runid = run_select.value
-    new_rundata = get_rundata(db, runid)
-
-    # Reset each display
-    for k in displays.keys():
-        for kk in displays[k].keys():
-            displays[k][kk].image = np.zeros(shape=constants.N_PIXELS)
-
-    for parentkey in db[runid].keys():
-        if not re.match(TEST_PATTERN, parentkey):
-            for childkey in db[runid][parentkey].keys():
-                print(f"Run id {runid} Updating plot for {parentkey}, {childkey}")
-
-                image = new_rundata[parentkey][childkey]
-                image = np.nan_to_num(image, nan=0.0)
-                try:
-                    displays[parentkey][childkey].image = image
-                except ValueError as e:
-                    print(
-                        f"Caught {type(e).__name__} for {childkey}, filling display"
-                        f"with zeros. Details: {e}"
-                    )
-                    image = np.zeros(shape=displays[parentkey][childkey].image.shape)
-                    displays[parentkey][childkey].image = image
-                except KeyError as e:
-                    print(
-                        f"Caught {type(e).__name__} for {childkey}, filling display"
-                        f"with zeros. Details: {e}"
-                    )
-                    image = np.zeros(shape=constants.N_PIXELS)
-                    displays[parentkey][childkey].image = image
-                # TODO: TRY TO USE `stream` INSTEAD, ON UPDATES:
-                # display.datasource.stream(new_data)
-                # displays[parentkey][childkey].datasource.stream(image)
+def update_run(attr, old, new):
+    update_camera_displays(displays, new, images)
 
 
 print("Opening connection to ZODB")
 db = DQMDB(read_only=True).root
 print("Getting list of run numbers")
-runids = sorted(list(db.keys()), reverse=True)
-
-# First, get the run id with the most populated result dictionary
-# On the full DB, this takes an awful lot of time, and saturates the RAM on the host
-# VM (gets OoM killed)
-# run_dict_lengths = [len(db[r]) for r in runids]
-# runid = runids[np.argmax(run_dict_lengths)]
-runid = "NectarCAM_Run0008"
+# the run ids are read from the index of the runs, the results of a run are only
+# loaded when it is selected
+runids = sorted(get_runids(db), reverse=True)
+images = RunImageCache(db)
+
+# Start with the run id with the most populated result dictionary, known from the
+# summaries of the index, without loading the results of all the runs
+run_index = get_run_index(db)
+if run_index is not None and len(run_index) > 0:
+    runid = max(run_index.items(), key=lambda item: item[1]["n_results"])[0]
+else:
+    runid = runids[0]
 print(f"We will start with run {runid}")
 
 print("Defining Select")
@@ -75,9 +47,9 @@ run_select = Select(value=runid, title="NectarCAM run number", options=runids)
 
 print(f"Getting data for run {run_select.value}")
 source = get_rundata(db, run_select.value)
-displays = make_camera_displays(db, source, runid)
+displays = make_camera_displays(db, source, runid, images=images)
 
-run_select.on_change("value", update_camera_displays)
+run_select.on_change("value", update_run)
 
 controls = row(run_select)
 
@@ -85,7 +57,7 @@ controls = row(run_select)
 # attr = 'value'
 # old = runid
 # new = runids[1]
-# update_camera_displays(attr, old, new)
+# update_run(attr, old, new)
 
 ncols = 3
 plots = [
@@ -70,3 +70,46 @@ def test_bokeh(tmp_path):
     output_path = tmp_path / "test.html"
     output_file(output_path)
     save(curdoc(), filename=output_path)
+
+
+def test_run_image_cache():
+    from nectarchain.dqm.bokeh_app.app_hooks import RunImageCache
+
+    images = RunImageCache(test_dict, maxsize=2)
+    image = images.get("run1", "mykey2", "mysubkey2")
+    assert np.all(image[10:20] == 0.0)
+    assert np.array_equal(image[:10], test_dict["run1"]["mykey2"]["mysubkey2"][:10])
+    assert images.get("run1", "mykey2", "mysubkey2") is image
+
+    images.get("run1", "mykey1", "mysubkey1")
+    images.get("run1", "mykey1", "mysubkey2")
+    assert len(images) == 2
+    # the least recently used image has been dropped
+    assert images.get("run1", "mykey2", "mysubkey2") is not image
+
+    # missing result
+    assert np.all(images.get("run1", "mykey1", "mysubkey3") == 0.0)
+
+
+def test_update_camera_displays():
+    from nectarchain.dqm.bokeh_app.app_hooks import (
+        RunImageCache,
+        make_camera_displays,
+        update_camera_displays,
+    )
+
+    db = dict(test_dict)
+    db["run2"] = {
+        "mykey1": {"mysubkey1": np.ones(geom.n_pixels)},
+        "mykey2": {"mysubkey2": np.ones(5)},
+    }
+    images = RunImageCache(db)
+    displays = make_camera_displays(db, db["run1"], "run1", images=images)
+    display = displays["mykey1"]["mysubkey1"]
+
+    update_camera_displays(displays, "run2", images)
+
+    assert displays["mykey1"]["mysubkey1"] is display
+    assert np.all(display.image == 1.0)
+    assert np.all(displays["mykey1"]["mysubkey2"].image == 0.0)
+    assert np.all(displays["mykey2"]["mysubkey2"].image == 0.0)
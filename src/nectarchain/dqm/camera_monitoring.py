@@ -13,6 +13,8 @@ __all__ = ["CameraMonitoring"]
 
 
 class CameraMonitoring(DQMSummary):
+    _state_attributes = ("event_id", "event_times")
+
     def __init__(self, gaink):
         self.k = gaink
         self.Pix = None
@@ -76,7 +78,7 @@ class CameraMonitoring(DQMSummary):
             print("Error Code: ", err)
             print("DRAWER TEMPERATURE COULD NOT BE RETRIEVED!")
 
-    def ProcessEvent(self, evt, noped):
+    def ProcessEvent(self, evt, noped, features=None):
         trigger_time = evt.trigger.time.value
         trigger_id = evt.index.event_id
 
@@ -1,45 +1,57 @@
-import ctapipe.instrument.camera.readout
 import numpy as np
 from ctapipe.coordinates import EngineeringCameraFrame
-from ctapipe.image.extractor import FixedWindowSum  # noqa: F401
-from ctapipe.image.extractor import FullWaveformSum  # noqa: F401
-from ctapipe.image.extractor import GlobalPeakWindowSum  # noqa: F401
-from ctapipe.image.extractor import LocalPeakWindowSum  # noqa: F401
-from ctapipe.image.extractor import NeighborPeakWindowSum  # noqa: F401
-from ctapipe.image.extractor import SlidingWindowMaxSum  # noqa: F401
-from ctapipe.image.extractor import TwoPassWindowSum  # noqa: F401
 from ctapipe.visualization import CameraDisplay
-from ctapipe_io_nectarcam import constants
 from matplotlib import pyplot as plt
-from traitlets.config.loader import Config
 
-from ..makers.component import ChargesComponent
-from ..makers.component.core import ArrayDataComponent
-from ..makers.extractor.utils import CtapipeExtractor
+from ..utils.stats import HistogramSketch, Stats
 from .dqm_summary_processor import DQMSummary
+from .event_features import DQMEventFeatures
 
 __all__ = ["ChargeIntegrationHighLowGain"]
 
 
 class ChargeIntegrationHighLowGain(DQMSummary):
+    _state_attributes = (
+        "counter_evt",
+        "counter_ped",
+        "image_all_stats",
+        "image_all_sketch",
+        "image_all_mean_sketch",
+        "ped_all_stats",
+        "ped_all_sketch",
+        "image_ped_stats",
+        "image_ped_sketch",
+        "image_ped_mean_sketch",
+        "ped_ped_stats",
+        "ped_ped_sketch",
+    )
+    _last_event_attributes = ("pixelBAD", "pixelBADplot", "pixels")
+    # maximum number of bins of the histograms from which the medians are estimated
+    MAX_BINS = 4096
+
     def __init__(self, gaink):
         self.k = gaink
         self.Pix = None
         self.Samp = None
         self.counter_evt = None
         self.counter_ped = None
-        self.image_all = []
-        self.peakpos_all = []
-        self.image_ped = []
-        self.peakpos_ped = []
-        self.ped_all = []
-        self.ped_ped = []
+        self.image_all_stats = None
+        self.image_all_sketch = None
+        self.image_all_mean_sketch = None
+        self.ped_all_stats = None
+        self.ped_all_sketch = None
+        self.image_ped_stats = None
+        self.image_ped_sketch = None
+        self.image_ped_mean_sketch = None
+        self.ped_ped_stats = None
+        self.ped_ped_sketch = None
         self.camera = None
         self.cmap = None
         self.subarray = None
         self.integrator = None
         self.pixelBAD = None
-        self.image_all = []
+        self.pixelBADplot = None
+        self.pixels = None
         self.image_all_median = None
         self.image_all_average = None
         self.image_all_std = None
@@ -48,7 +60,6 @@ class ChargeIntegrationHighLowGain(DQMSummary):
         self.ped_all_average = None
         self.ped_all_std = None
         self.ped_all_rms = None
-        self.image_ped = []
         self.image_ped_median = None
         self.image_ped_average = None
         self.image_ped_std = None
@@ -68,6 +79,14 @@ class ChargeIntegrationHighLowGain(DQMSummary):
 
         self.counter_evt = 0
         self.counter_ped = 0
+        # streaming statistics, the ones of the charges of each pixel are created at
+        # the first event, once the number of pixels read out is known
+        self.image_all_mean_sketch = HistogramSketch(max_bins=self.MAX_BINS)
+        self.ped_all_stats = Stats()
+        self.ped_all_sketch = HistogramSketch(max_bins=self.MAX_BINS)
+        self.image_ped_mean_sketch = HistogramSketch(max_bins=self.MAX_BINS)
+        self.ped_ped_stats = Stats()
+        self.ped_ped_sketch = HistogramSketch(max_bins=self.MAX_BINS)
 
         self.camera = Reader1.subarray.tel[0].camera.geometry.transform_to(
             EngineeringCameraFrame()
@@ -76,108 +95,98 @@ class ChargeIntegrationHighLowGain(DQMSummary):
         self.cmap = "gnuplot2"
 
         self.subarray = Reader1.subarray
-        subarray = Reader1.subarray
-        subarray.tel[
-            0
-        ].camera.readout = ctapipe.instrument.camera.readout.CameraReadout.from_name(
-            "NectarCam"
+        self.integrator = DQMEventFeatures.get_integrator(
+            self.subarray, **charges_kwargs
         )
-        if charges_kwargs:
-            extractor_kwargs = (
-                ChargesComponent._get_extractor_kwargs_from_method_and_kwargs(
-                    method=charges_kwargs["method"],
-                    kwargs=charges_kwargs["extractor_kwargs"],
-                )
-            )
-            self.integrator = eval(charges_kwargs["method"])(
-                subarray, **extractor_kwargs
-            )
-        else:
-            config = Config(
-                {"GlobalPeakWindowSum": {"window_shift": 4, "window_width": 12}}
-            )
-            self.integrator = GlobalPeakWindowSum(subarray, config=config)
-
-    def ProcessEvent(self, evt, noped):
-        pixel = evt.nectarcam.tel[0].svc.pixel_ids
-        self.pixelBADplot = evt.mon.tel[0].pixel_status.hardware_failing_pixels
-        pixels = pixel
-        self.pixels = pixels
-
-        (
-            broken_pixels_hg,
-            broken_pixels_lg,
-        ) = ArrayDataComponent._compute_broken_pixels_event(evt, pixels)
-
-        if self.k == 0:
-            self.pixelBAD = broken_pixels_hg
-            channel = constants.HIGH_GAIN
-        if self.k == 1:
-            self.pixelBAD = broken_pixels_lg
-            channel = constants.LOW_GAIN
-
-        waveform = evt.r0.tel[0].waveform[self.k]
-        waveform = waveform[pixels]
-        ped = np.mean(waveform[:, 20])
 
-        if noped:
-            w_noped = waveform - ped
-            output = CtapipeExtractor.get_image_peak_time(
-                self.integrator(w_noped, 0, channel, self.pixelBAD)
+    def ProcessEvent(self, evt, noped, features=None):
+        if features is None:
+            features = DQMEventFeatures(evt, self.Pix, self.integrator, noped)
+        self.pixelBADplot = features.hardware_failing_pixels
+        self.pixels = features.pixel_ids
+        self.pixelBAD = features.broken_pixels[self.k]
+
+        # charges of both gains, extracted once for all the processors
+        image = features.charges[0][self.k]
+        ped = features.pedestals[self.k]
+
+        if self.image_all_stats is None:
+            self.image_all_stats = Stats(shape=image.shape)
+            self.image_all_sketch = HistogramSketch(
+                shape=image.shape, max_bins=self.MAX_BINS
             )
-
-            image = output[0]
-            peakpos = output[1]
-
-        else:
-            output = CtapipeExtractor.get_image_peak_time(
-                self.integrator(waveform, 0, channel, self.pixelBAD)
+            self.image_ped_stats = Stats(shape=image.shape)
+            self.image_ped_sketch = HistogramSketch(
+                shape=image.shape, max_bins=self.MAX_BINS
             )
 
-            image = output[0]
-            peakpos = output[1]
-
-        if evt.trigger.event_type.value == 32:  # count peds
+        if features.is_pedestal:  # count peds
             self.counter_ped += 1
-            self.image_ped.append(image)
-            self.peakpos_ped.append(peakpos)
-            self.ped_ped.append(ped)
+            self.image_ped_stats.add(image)
+            self.image_ped_sketch.add(image)
+            self.image_ped_mean_sketch.add(np.mean(image))
+            self.ped_ped_stats.add(ped)
+            self.ped_ped_sketch.add(ped)
         else:
             self.counter_evt += 1
-            self.image_all.append(image)
-            self.peakpos_all.append(peakpos)
-            self.ped_all.append(ped)
+            self.image_all_stats.add(image)
+            self.image_all_sketch.add(image)
+            self.image_all_mean_sketch.add(np.mean(image))
+            self.ped_all_stats.add(ped)
+            self.ped_all_sketch.add(ped)
+
+    @staticmethod
+    def _get_summary(stats, sketch):
+        # median, average, standard deviation and square root of the sum of the
+        # squares of the accumulated values, the median being estimated from the
+        # histograms
+        if stats is None:
+            return np.nan, np.nan, np.nan, np.nan
+        count = stats.count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            average = np.where(count > 0, stats.mean, np.nan)
+            std = np.sqrt(stats.m2 / count)
+        rms = np.sqrt(stats.m2 + count * stats.mean**2)
+        return sketch.median, average, std, rms
 
     def FinishRun(self):
-        self.peakpos_all = np.array(self.peakpos_all, dtype=float)
-        if self.counter_ped > 0:
-            self.peakpos_ped = np.array(self.peakpos_ped, dtype=float)
-
         # rms, percentile, mean deviation, median, mean,
-        self.image_all = np.array(self.image_all, dtype=float)
-        self.image_all_median = np.median(self.image_all, axis=0)
-        self.image_all_average = np.mean(self.image_all, axis=0)
-        self.image_all_std = np.std(self.image_all, axis=0)
-        self.image_all_rms = np.sqrt(np.sum(self.image_all**2, axis=0))
-
-        self.ped_all = np.array(self.ped_all, dtype=float)
-        self.ped_all_average = np.mean(self.ped_all, axis=0)
-        self.ped_all_median = np.median(self.ped_all, axis=0)
-        self.ped_all_std = np.std(self.ped_all, axis=0)
-        self.ped_all_rms = np.sqrt(np.sum(self.ped_all**2, axis=0))
+        (
+            self.image_all_median,
+            self.image_all_average,
+            self.image_all_std,
+            self.image_all_rms,
+        ) = __class__._get_summary(self.image_all_stats, self.image_all_sketch)
+
+        (
+            self.ped_all_median,
+            self.ped_all_average,
+            self.ped_all_std,
+            self.ped_all_rms,
+        ) = (
+            value[0]
+            for value in __class__._get_summary(self.ped_all_stats, self.ped_all_sketch)
+        )
 
         if self.counter_ped > 0:
-            self.image_ped = np.array(self.image_ped, dtype=float)
-            self.image_ped_median = np.median(self.image_ped, axis=0)
-            self.image_ped_average = np.mean(self.image_ped, axis=0)
-            self.image_ped_std = np.std(self.image_ped, axis=0)
-            self.image_ped_rms = np.sqrt(np.sum(self.image_ped**2, axis=0))
-
-            self.ped_ped = np.array(self.ped_ped, dtype=float)
-            self.ped_ped_average = np.mean(self.ped_ped, axis=0)
-            self.ped_ped_median = np.median(self.ped_ped, axis=0)
-            self.ped_ped_std = np.std(self.ped_ped, axis=0)
-            self.ped_ped_rms = np.sqrt(np.sum(self.ped_ped**2, axis=0))
+            (
+                self.image_ped_median,
+                self.image_ped_average,
+                self.image_ped_std,
+                self.image_ped_rms,
+            ) = __class__._get_summary(self.image_ped_stats, self.image_ped_sketch)
+
+            (
+                self.ped_ped_median,
+                self.ped_ped_average,
+                self.ped_ped_std,
+                self.ped_ped_rms,
+            ) = (
+                value[0]
+                for value in __class__._get_summary(
+                    self.ped_ped_stats, self.ped_ped_sketch
+                )
+            )
 
     def GetResults(self):
         if self.k == 0:
@@ -521,10 +530,12 @@ class ChargeIntegrationHighLowGain(DQMSummary):
         # Charge integration SPECTRUM
         if self.counter_evt > 0:
             fig9, disp = plt.subplots()
+            counts, edges = self.image_all_sketch.histogram(max_bins=100)
             for i in range(len(self.pixels)):
                 plt.hist(
-                    self.image_all[:, i],
-                    100,
+                    edges[:-1],
+                    edges,
+                    weights=counts[i],
                     fill=False,
                     density=True,
                     stacked=True,
@@ -532,9 +543,11 @@ class ChargeIntegrationHighLowGain(DQMSummary):
                     log=True,
                     alpha=0.01,
                 )
+            counts, edges = self.image_all_mean_sketch.histogram(max_bins=100)
             plt.hist(
-                np.mean(self.image_all, axis=1),
-                100,
+                edges[:-1],
+                edges,
+                weights=counts[0],
                 color="r",
                 linewidth=1,
                 log=True,
@@ -558,10 +571,12 @@ class ChargeIntegrationHighLowGain(DQMSummary):
 
         if self.counter_ped > 0:
             fig10, disp = plt.subplots()
+            counts, edges = self.image_ped_sketch.histogram(max_bins=100)
             for i in range(len(self.pixels)):
                 plt.hist(
-                    self.image_ped[:, i],
-                    100,
+                    edges[:-1],
+                    edges,
+                    weights=counts[i],
                     fill=False,
                     density=True,
                     stacked=True,
@@ -569,9 +584,11 @@ class ChargeIntegrationHighLowGain(DQMSummary):
                     log=True,
                     alpha=0.01,
                 )
+            counts, edges = self.image_ped_mean_sketch.histogram(max_bins=100)
             plt.hist(
-                np.mean(self.image_ped, axis=1),
-                100,
+                edges[:-1],
+                edges,
+                weights=counts[0],
                 color="r",
                 linewidth=1,
                 log=True,
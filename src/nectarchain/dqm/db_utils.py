@@ -1,9 +1,22 @@
+import time
+
 import transaction
 from BTrees.OOBTree import OOBTree
 from ZEO import ClientStorage
 from ZODB import DB
 
-__all__ = ["DQMDB"]
+__all__ = [
+    "DQMDB",
+    "RUN_INDEX_KEY",
+    "get_run_index",
+    "get_run_summary",
+    "get_runids",
+    "update_run_index",
+]
+
+# key of the index of the runs in the root of the database, which maps each run id
+# to a small summary, so that the runs can be listed without loading their results
+RUN_INDEX_KEY = "_run_index"
 
 
 class DQMDB:
@@ -18,7 +31,18 @@ class DQMDB:
     def insert(self, key=None, value=None):
         if key is not None and value is not None:
             try:
-                self.root[key] = OOBTree(value)
+                run = OOBTree(value)
+                # each result dictionary is stored as its own persistent object, to
+                # be loaded only when it is read
+                for parentkey, results in list(run.items()):
+                    if isinstance(results, dict):
+                        run[parentkey] = OOBTree(results)
+                self.root[key] = run
+                if RUN_INDEX_KEY not in self.root:
+                    # the runs of a database written before the index are indexed
+                    # first, so that they are still listed
+                    update_run_index(self.root)
+                self.root[RUN_INDEX_KEY][key] = get_run_summary(run)
                 return True
             except AttributeError:
                 return False
@@ -30,3 +54,73 @@ class DQMDB:
     def abort_and_close(self):
         transaction.abort()
         self.db.close()
+
+
+def get_run_summary(run):
+    """Summarize the results of a run for the index of the runs.
+
+    Parameters:
+    run (mapping): The result dictionaries of the run, by name.
+
+    Returns:
+    dict: The numbers of result dictionaries and of results of the run, and the
+    time at which the summary is made.
+    """
+    dicts = []
+    if hasattr(run, "keys"):
+        dicts = [results for results in run.values() if hasattr(results, "keys")]
+    return {
+        "n_dicts": len(dicts),
+        "n_results": sum(len(results) for results in dicts),
+        "inserted": time.time(),
+    }
+
+
+def get_run_index(root):
+    """Get the index of the runs of the database.
+
+    Parameters:
+    root (mapping): The root of the database.
+
+    Returns:
+    OOBTree: The summaries of the runs by run id, None if the database has no
+    index, see ``update_run_index``.
+    """
+    return root.get(RUN_INDEX_KEY)
+
+
+def get_runids(root):
+    """List the run ids of the database, from its index if it has one.
+
+    Parameters:
+    root (mapping): The root of the database.
+
+    Returns:
+    list: The run ids, sorted.
+    """
+    index = get_run_index(root)
+    if index is not None:
+        return list(index.keys())
+    return sorted(key for key in root.keys() if key != RUN_INDEX_KEY)
+
+
+def update_run_index(root):
+    """Add the runs which are missing from the index of the database, creating it
+    if needed. The results of these runs are loaded once, the transaction has to be
+    committed afterwards.
+
+    Parameters:
+    root (mapping): The root of the database, opened in write mode.
+
+    Returns:
+    int: The number of runs added to the index.
+    """
+    if RUN_INDEX_KEY not in root:
+        root[RUN_INDEX_KEY] = OOBTree()
+    index = root[RUN_INDEX_KEY]
+    n_added = 0
+    for key in root.keys():
+        if key != RUN_INDEX_KEY and key not in index:
+            index[key] = get_run_summary(root[key])
+            n_added += 1
+    return n_added
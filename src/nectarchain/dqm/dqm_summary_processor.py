@@ -1,3 +1,5 @@
+import copy
+
 import numpy as np
 from astropy.io import fits
 from astropy.table import Table
@@ -6,6 +8,13 @@ __all__ = ["DQMSummary"]
 
 
 class DQMSummary:
+    # attributes accumulated by ProcessEvent, the partial results of the events of a
+    # run slice, which can be merged from one processor to another
+    _state_attributes = ()
+    # attributes set by ProcessEvent from the last event processed, which the
+    # results of the next run slices replace instead of being accumulated
+    _last_event_attributes = ()
+
     def __init__(self):
         print("Processor 0")
 
@@ -19,9 +28,44 @@ class DQMSummary:
     def ConfigureForRun(self):
         print("Processor 1")
 
-    def ProcessEvent(self, evt, noped):
+    def ProcessEvent(self, evt, noped, features=None):
         print("Processor 2")
 
+    def GetState(self):
+        """Get the partial results accumulated by the processor since its
+        configuration, to be merged into another processor of the same type.
+
+        Returns:
+        dict: The accumulated attributes and the ones of the last event, by name.
+        """
+        return {
+            name: getattr(self, name)
+            for name in self._state_attributes + self._last_event_attributes
+        }
+
+    def MergeState(self, state):
+        """Merge the partial results of another processor of the same type, obtained
+        with ``GetState``, before ``FinishRun``. The lists of values per event are
+        concatenated after the ones of this processor, the counters and sums are
+        added and the statistics accumulators merged. The accumulators which are
+        created at the first event are None as long as no event has been processed.
+        The attributes of the last event are replaced by the ones of the other
+        processor, whose events are the next ones of the run.
+
+        Parameters:
+        state (dict): The accumulated attributes of the other processor, by name.
+        """
+        for name in self._state_attributes:
+            if state[name] is None:
+                continue
+            if getattr(self, name) is None:
+                setattr(self, name, copy.deepcopy(state[name]))
+            else:
+                setattr(self, name, getattr(self, name) + state[name])
+        for name in self._last_event_attributes:
+            if state[name] is not None:
+                setattr(self, name, copy.deepcopy(state[name]))
+
     def FinishRun(self, M, M_ped, counter_evt, counter_ped):
         print("Processor 3")
 
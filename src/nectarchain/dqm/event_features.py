@@ -0,0 +1,169 @@
+from functools import cached_property
+
+import ctapipe.instrument.camera.readout
+import numpy as np
+from ctapipe.image.extractor import GlobalPeakWindowSum
+from ctapipe_io_nectarcam import constants
+from traitlets.config.loader import Config
+
+from ..makers.component import ChargesComponent
+from ..makers.component.core import ArrayDataComponent
+from ..makers.extractor.batch_extractor import BatchExtractor
+from ..makers.extractor.utils import CtapipeExtractor
+
+__all__ = ["DQMEventFeatures"]
+
+
+class DQMEventFeatures:
+    """Quantities of an event shared by the DQM processors.
+
+    Each quantity is computed at its first access and then cached, so that it is
+    derived only once per event whatever the number of processors using it. The
+    arrays are indexed by gain first (``HIGH_GAIN``, ``LOW_GAIN``).
+
+    Example:
+        >>> integrator = DQMEventFeatures.get_integrator(reader.subarray)
+        >>> for evt in reader:
+        ...     features = DQMEventFeatures(evt, Pix, integrator, noped=False)
+        ...     for p in processors:
+        ...         p.ProcessEvent(evt, noped, features=features)
+    """
+
+    GAINS = np.array([constants.HIGH_GAIN, constants.LOW_GAIN])
+
+    def __init__(self, evt, Pix, integrator=None, noped=False):
+        """
+        Parameters:
+        evt (NectarCAMDataContainer): The event.
+        Pix (int): The number of pixels of the camera.
+        integrator (ImageExtractor, optional): The charge extractor, required for the
+        charges only.
+        noped (bool, optional): Whether the pedestal is subtracted from the waveforms
+        before the charge extraction.
+        """
+        self.evt = evt
+        self.Pix = Pix
+        self.integrator = integrator
+        self.noped = noped
+
+    @staticmethod
+    def get_integrator(subarray, **charges_kwargs):
+        """Build the charge extractor of the DQM.
+
+        Parameters:
+        subarray (SubarrayDescription): The subarray of the run, its camera readout
+        is set to the NectarCAM one.
+        charges_kwargs: The ``method`` and ``extractor_kwargs`` of the extractor,
+        ``GlobalPeakWindowSum`` with a window of 12 samples shifted by 4 if empty.
+
+        Returns:
+        ImageExtractor: The charge extractor.
+        """
+        subarray.tel[
+            0
+        ].camera.readout = ctapipe.instrument.camera.readout.CameraReadout.from_name(
+            "NectarCam"
+        )
+        if charges_kwargs:
+            return ChargesComponent._get_imageExtractor(
+                charges_kwargs["method"],
+                subarray,
+                **charges_kwargs["extractor_kwargs"],
+            )
+        config = Config(
+            {"GlobalPeakWindowSum": {"window_shift": 4, "window_width": 12}}
+        )
+        return GlobalPeakWindowSum(subarray, config=config)
+
+    @cached_property
+    def is_pedestal(self):
+        """Whether the event is a pedestal one."""
+        return self.evt.trigger.event_type.value == 32
+
+    @cached_property
+    def pixel_ids(self):
+        """The ids of the pixels read out in the event."""
+        return self.evt.nectarcam.tel[0].svc.pixel_ids
+
+    @cached_property
+    def pixels(self):
+        """The ids of the pixels, completed at the beginning by the first indices of
+        the camera when fewer than ``Pix`` pixels are read out."""
+        pixel = self.pixel_ids
+        if len(pixel) < self.Pix:
+            pixel21 = np.arange(0, self.Pix - len(pixel), 1, dtype=int)
+            return np.concatenate([pixel21, pixel])
+        return pixel
+
+    @cached_property
+    def hardware_failing_pixels(self):
+        """The hardware failing pixels mask of the camera, of shape (2, Pix)."""
+        return self.evt.mon.tel[0].pixel_status.hardware_failing_pixels
+
+    @cached_property
+    def failing_pixels(self):
+        """The hardware failing pixels mask in the order of ``pixels``."""
+        return self.hardware_failing_pixels[:, self.pixels]
+
+    @cached_property
+    def n_failing_pixels(self):
+        """The number of hardware failing pixels of each gain."""
+        return np.count_nonzero(self.failing_pixels, axis=1)
+
+    @cached_property
+    def waveform_sums(self):
+        """The sums over the samples of the waveforms of the camera, of shape (2,
+        Pix)."""
+        return self.evt.r0.tel[0].waveform.sum(axis=2)
+
+    @cached_property
+    def broken_pixels(self):
+        """The broken pixels masks of the pixels of ``pixel_ids``, of shape (2,
+        npixels)."""
+        return np.stack(
+            ArrayDataComponent._compute_broken_pixels_event(self.evt, self.pixel_ids)
+        )
+
+    @cached_property
+    def waveforms(self):
+        """The waveforms of the pixels of ``pixel_ids``, of shape (2, npixels,
+        nsamples)."""
+        return self.evt.r0.tel[0].waveform[:, self.pixel_ids]
+
+    @cached_property
+    def pedestals(self):
+        """The mean over the pixels of the 21st sample of the waveforms of each
+        gain."""
+        return np.mean(self.waveforms[:, :, 20], axis=1)
+
+    @cached_property
+    def charges(self):
+        """The charges and peak times of the pixels of ``pixel_ids``, extracted for
+        both gains at once.
+
+        Returns:
+        tuple: The charges and the peak times, of shape (2, npixels).
+        """
+        waveforms = self.waveforms
+        if self.noped:
+            waveforms = waveforms - self.pedestals[:, np.newaxis, np.newaxis]
+        batchExtractor = BatchExtractor(self.integrator)
+        if batchExtractor.is_batched:
+            # each gain is one row of the block
+            return batchExtractor(
+                waveforms,
+                0,
+                self.GAINS[:, np.newaxis],
+                self.broken_pixels,
+            )
+        image = []
+        peak_time = []
+        for channel in self.GAINS:
+            output = CtapipeExtractor.get_image_peak_time(
+                self.integrator(
+                    waveforms[channel], 0, channel, self.broken_pixels[channel]
+                )
+            )
+            image.append(output[0])
+            peak_time.append(output[1])
+        return np.array(image), np.array(peak_time)
@@ -4,11 +4,20 @@ from ctapipe.visualization import CameraDisplay
 from matplotlib import pyplot as plt
 
 from .dqm_summary_processor import DQMSummary
+from .event_features import DQMEventFeatures
 
 __all__ = ["MeanCameraDisplayHighLowGain"]
 
 
 class MeanCameraDisplayHighLowGain(DQMSummary):
+    _state_attributes = (
+        "counter_evt",
+        "counter_ped",
+        "CameraAverage",
+        "CameraAverage_ped",
+    )
+    _last_event_attributes = ("pixelBAD",)
+
     def __init__(self, gaink):
         self.k = gaink
         self.Pix = None
@@ -19,6 +28,7 @@ class MeanCameraDisplayHighLowGain(DQMSummary):
         self.counter_ped = None
         self.camera = None
         self.cmap = None
+        self.pixelBAD = None
         self.CameraAverage = []
         self.CameraAverage1 = []
         self.CameraAverage_ped = []
@@ -38,6 +48,9 @@ class MeanCameraDisplayHighLowGain(DQMSummary):
 
         self.counter_evt = 0
         self.counter_ped = 0
+        # sums over the events of the summed waveforms of each pixel
+        self.CameraAverage = np.zeros(self.Pix)
+        self.CameraAverage_ped = np.zeros(self.Pix)
 
         self.camera = Reader1.subarray.tel[0].camera.geometry.transform_to(
             EngineeringCameraFrame()
@@ -45,32 +58,26 @@ class MeanCameraDisplayHighLowGain(DQMSummary):
 
         self.cmap = "gnuplot2"
 
-    def ProcessEvent(self, evt, noped):
-        self.pixelBAD = evt.mon.tel[0].pixel_status.hardware_failing_pixels
-        pixel = evt.nectarcam.tel[0].svc.pixel_ids
-        if len(pixel) < self.Pix:
-            pixel21 = list(np.arange(0, self.Pix - len(pixel), 1, dtype=int))
-            pixel = list(pixel)
-            pixels = np.concatenate([pixel21, pixel])
-        else:
-            pixels = pixel
+    def ProcessEvent(self, evt, noped, features=None):
+        if features is None:
+            features = DQMEventFeatures(evt, self.Pix)
+        self.pixelBAD = features.hardware_failing_pixels
+        pixels = features.pixels
 
-        if evt.trigger.event_type.value == 32:  # count peds
+        if features.is_pedestal:  # count peds
             self.counter_ped += 1
-            self.CameraAverage_ped1 = evt.r0.tel[0].waveform[self.k].sum(axis=1)
-            self.CameraAverage_ped.append(self.CameraAverage_ped1[pixels])
+            self.CameraAverage_ped1 = features.waveform_sums[self.k]
+            self.CameraAverage_ped += self.CameraAverage_ped1[pixels]
 
         else:
             self.counter_evt += 1
-            self.CameraAverage1 = evt.r0.tel[0].waveform[self.k].sum(axis=1)
-            self.CameraAverage.append(self.CameraAverage1[pixels])
+            self.CameraAverage1 = features.waveform_sums[self.k]
+            self.CameraAverage += self.CameraAverage1[pixels]
 
         return None
 
     def FinishRun(self):
         if self.counter_evt > 0:
-            self.CameraAverage = np.array(self.CameraAverage)
-            self.CameraAverage = self.CameraAverage.sum(axis=0)
             self.CameraAverage_overEvents = self.CameraAverage / self.counter_evt
 
             self.CameraAverage_overEvents_overSamp = (
@@ -78,8 +85,6 @@ class MeanCameraDisplayHighLowGain(DQMSummary):
             )
 
         if self.counter_ped > 0:
-            self.CameraAverage_ped = np.array(self.CameraAverage_ped)
-            self.CameraAverage_ped = self.CameraAverage_ped.sum(axis=0)
             self.CameraAverage_ped_overEvents = (
                 self.CameraAverage_ped / self.counter_ped
             )
@@ -1,18 +1,21 @@
 import numpy as np
 from matplotlib import pyplot as plt
 
+from ..utils.stats import CameraSampleStats
 from .dqm_summary_processor import DQMSummary
 
 __all__ = ["MeanWaveFormsHighLowGain"]
 
 
 class MeanWaveFormsHighLowGain(DQMSummary):
+    _state_attributes = ("counter_evt", "counter_ped", "Mwf_stats", "Mwf_ped_stats")
+
     def __init__(self, gaink):
         self.k = gaink
         self.Pix = None
         self.Samp = None
-        self.Mwf = None
-        self.Mwf_ped = None
+        self.Mwf_stats = None
+        self.Mwf_ped_stats = None
         self.counter_evt = None
         self.counter_ped = None
         self.Mwf_average = None
@@ -27,8 +30,9 @@ class MeanWaveFormsHighLowGain(DQMSummary):
         # define number of pixels and samples
         self.Pix = Pix
         self.Samp = Samp
-        self.Mwf = np.zeros((self.Pix, self.Samp))
-        self.Mwf_ped = np.zeros((self.Pix, self.Samp))
+        # mean, std, min and max of the waveforms of each pixel and sample
+        self.Mwf_stats = CameraSampleStats(shape=(self.Pix, self.Samp))
+        self.Mwf_ped_stats = CameraSampleStats(shape=(self.Pix, self.Samp))
         self.counter_evt = 0
         self.counter_ped = 0
         self.Mwf_average = np.zeros((self.Pix, self.Samp))
@@ -37,22 +41,15 @@ class MeanWaveFormsHighLowGain(DQMSummary):
 
         return None
 
-    def ProcessEvent(self, evt, noped):
+    def ProcessEvent(self, evt, noped, features=None):
+        # whole camera waveforms of the gain
+        waveform = evt.r0.tel[0].waveform[self.k][: self.Pix]
         if evt.trigger.event_type.value == 32:  # count peds
             self.counter_ped += 1
+            self.Mwf_ped_stats.add(waveform)
         else:
             self.counter_evt += 1
-
-        for ipix in range(self.Pix):
-            # loop over pixels, 1855 should be redefined as a variable
-            if evt.trigger.event_type.value == 32:  # only peds now
-                self.Mwf_ped[ipix, :] += evt.r0.tel[0].waveform[self.k][
-                    ipix
-                ]  # fill pixels one by one and sum them for peds only
-            else:
-                self.Mwf[ipix, :] += evt.r0.tel[0].waveform[self.k][
-                    ipix
-                ]  # fill pixels one by one and sum them
+            self.Mwf_stats.add(waveform)
         return None
 
     def FinishRun(self):
@@ -61,19 +58,48 @@ class MeanWaveFormsHighLowGain(DQMSummary):
         # if (self.k == 1):
         #    gain_c = 'Low'
 
-        self.Mwf_average = self.Mwf / self.counter_evt  # get average
+        if self.counter_evt > 0:
+            self.Mwf_average = self.Mwf_stats.mean  # get average
+        else:
+            self.Mwf_average = np.full((self.Pix, self.Samp), np.nan)
         # get average over pixels
         self.Mwf_Mean_overPix = np.mean(self.Mwf_average, axis=0)
 
         if self.counter_ped > 0:
             # get average pedestals
-            self.Mwf_ped_average = self.Mwf_ped / self.counter_ped
+            self.Mwf_ped_average = self.Mwf_ped_stats.mean
             self.Mwf_ped_Mean_overPix = np.mean(self.Mwf_ped_average, axis=0)
 
         return None
 
+    @staticmethod
+    def _spread_overPix(stats):
+        # average over pixels of the std, extrema over pixels of the waveforms
+        return (
+            np.nanmean(stats.std, axis=0),
+            np.min(stats.min, axis=0),
+            np.max(stats.max, axis=0),
+        )
+
     def GetResults(self):
         # ASSIGN RESUTLS TO DICT
+        gain_c = "HIGH" if self.k == 0 else "LOW"
+        spreads = {"PHY": (self.counter_evt, self.Mwf_stats)}
+        if self.counter_ped > 0:
+            spreads["PED"] = (self.counter_ped, self.Mwf_ped_stats)
+        for kind, (counter, stats) in spreads.items():
+            if counter > 1:
+                std, wf_min, wf_max = self._spread_overPix(stats)
+                self.MeanWaveForms_Results_Dict[
+                    f"WF-{kind}-STD-PIX-{gain_c}-GAIN"
+                ] = std
+                self.MeanWaveForms_Results_Dict[
+                    f"WF-{kind}-MIN-PIX-{gain_c}-GAIN"
+                ] = wf_min
+                self.MeanWaveForms_Results_Dict[
+                    f"WF-{kind}-MAX-PIX-{gain_c}-GAIN"
+                ] = wf_max
+
         if self.k == 0:
             self.MeanWaveForms_Results_Dict[
                 "WF-PHY-AVERAGE-PIX-HIGH-GAIN"
@@ -4,11 +4,14 @@ from ctapipe.visualization import CameraDisplay
 from matplotlib import pyplot as plt
 
 from .dqm_summary_processor import DQMSummary
+from .event_features import DQMEventFeatures
 
 __all__ = ["PixelParticipationHighLowGain"]
 
 
 class PixelParticipationHighLowGain(DQMSummary):
+    _state_attributes = ("counter_evt", "counter_ped", "BadPixels", "BadPixels_ped")
+
     def __init__(self, gaink):
         self.k = gaink
         self.Pix = None
@@ -45,24 +48,17 @@ class PixelParticipationHighLowGain(DQMSummary):
         self.cmap = "gnuplot2"
         self.cmap2 = "gnuplot2"
 
-    def ProcessEvent(self, evt, noped):
-        pixelBAD = evt.mon.tel[0].pixel_status.hardware_failing_pixels[self.k]
-        pixel = evt.nectarcam.tel[0].svc.pixel_ids
-        if len(pixel) < self.Pix:
-            pixel21 = list(np.arange(0, self.Pix - len(pixel), 1, dtype=int))
-            pixel = list(pixel)
-            pixels = np.concatenate([pixel21, pixel])
-        else:
-            pixels = pixel
+    def ProcessEvent(self, evt, noped, features=None):
+        if features is None:
+            features = DQMEventFeatures(evt, self.Pix)
+        BadPixels1 = features.failing_pixels[self.k]
 
-        if evt.trigger.event_type.value == 32:  # count peds
+        if features.is_pedestal:  # count peds
             self.counter_ped += 1
-            BadPixels_ped1 = list(map(int, pixelBAD[pixels]))
-            self.BadPixels_ped += BadPixels_ped1
+            self.BadPixels_ped += BadPixels1
 
         else:
             self.counter_evt += 1
-            BadPixels1 = list(map(int, pixelBAD[pixels]))
             self.BadPixels += BadPixels1
         return None
 
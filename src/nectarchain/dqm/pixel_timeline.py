@@ -2,11 +2,19 @@ import numpy as np
 from matplotlib import pyplot as plt
 
 from .dqm_summary_processor import DQMSummary
+from .event_features import DQMEventFeatures
 
 __all__ = ["PixelTimelineHighLowGain"]
 
 
 class PixelTimelineHighLowGain(DQMSummary):
+    _state_attributes = (
+        "counter_evt",
+        "counter_ped",
+        "SumBadPixels",
+        "SumBadPixels_ped",
+    )
+
     def __init__(self, gaink):
         self.k = gaink
         self.Pix = None
@@ -31,29 +39,21 @@ class PixelTimelineHighLowGain(DQMSummary):
         self.counter_evt = 0
         self.counter_ped = 0
 
-    def ProcessEvent(self, evt, noped):
-        pixelBAD = evt.mon.tel[0].pixel_status.hardware_failing_pixels[self.k]
-        pixel = evt.nectarcam.tel[0].svc.pixel_ids
-        if len(pixel) < self.Pix:
-            pixel21 = list(np.arange(0, self.Pix - len(pixel), 1, dtype=int))
-            pixel = list(pixel)
-            pixels = np.concatenate([pixel21, pixel])
-        else:
-            pixels = pixel
+    def ProcessEvent(self, evt, noped, features=None):
+        if features is None:
+            features = DQMEventFeatures(evt, self.Pix)
 
-        if evt.trigger.event_type.value == 32:  # count peds
+        if features.is_pedestal:  # count peds
             self.counter_ped += 1
             self.counter_evt += 1
-            BadPixels_ped1 = list(map(int, pixelBAD[pixels]))
-            SumBadPixelsEvent_ped = sum(BadPixels_ped1)
+            SumBadPixelsEvent_ped = int(features.n_failing_pixels[self.k])
             self.SumBadPixels_ped.append(SumBadPixelsEvent_ped)
             self.SumBadPixels.append(0)
 
         else:
             self.counter_evt += 1
             self.counter_ped += 1
-            BadPixels1 = list(map(int, pixelBAD[pixels]))
-            SumBadPixelsEvent = sum(BadPixels1)
+            SumBadPixelsEvent = int(features.n_failing_pixels[self.k])
             self.SumBadPixels.append(SumBadPixelsEvent)
             self.SumBadPixels_ped.append(0)
 
@@ -0,0 +1,247 @@
+import logging
+import os
+import re
+import warnings
+from pathlib import Path
+
+import numpy as np
+import tables
+
+logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+log = logging.getLogger(__name__)
+log.handlers = logging.getLogger("__main__").handlers
+
+__all__ = ["DQMResultStore"]
+
+
+class DQMResultStore:
+    """Append-only columnar store of the DQM results of the runs, in HDF5.
+
+    The ZODB data base keeps the results of each run as one object, so that
+    following a quantity over many runs means loading all of them. In this store,
+    each result, e.g. ``CHARGE-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN`` of the
+    ``CHARGE-INTEGRATION-HIGH-GAIN`` dictionary, is a group holding:
+
+    - ``run_number``, the run numbers, one row per written run,
+    - ``values``, the results of these runs, an array of shape (runs, ...) compressed
+      (blosc:lz4) by chunks of about ``CHUNK_VALUES`` values: the scalar results of
+      1024 runs are read at once, the per-pixel results one run at a time without
+      loading the other runs.
+
+    The shape of the rows is the one of the first written run. A shorter
+    one-dimensional result is completed with NaN, the other results of a different
+    shape are skipped. Only the numerical results are stored. A run written again
+    is appended, the queries return its last written results.
+
+    The store is written to the ``NECTARCHAIN_DQM_STORE`` path, by default
+    ``~/.cache/nectarchain/dqm_results.h5``. It supports a single writer at a time.
+
+    Example:
+        >>> store = DQMResultStore()
+        >>> store.append("NectarCAM_Run3938", NESTED_DICT)
+        >>> runs, values = store.get(
+        ...     "CHARGE-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN",
+        ...     run_min=3000,
+        ...     run_max=5000,
+        ...     pixels=[42],
+        ... )
+    """
+
+    _RUN_NUMBER_PATTERN = re.compile(r"Run(\d+)")
+    # number of values of a compressed chunk, of the run numbers or of the results
+    # of as many runs as it holds
+    CHUNK_VALUES = 1024
+
+    def __init__(self, path=None, complib="blosc:lz4", complevel=5):
+        """
+        Parameters:
+        path (str or Path, optional): The path of the HDF5 file. Default to the
+        ``NECTARCHAIN_DQM_STORE`` environment variable, or
+        ``~/.cache/nectarchain/dqm_results.h5``.
+        complib (str, optional): The compression library, see ``tables.Filters``.
+        complevel (int, optional): The compression level.
+        """
+        if path is None:
+            path = os.environ.get(
+                "NECTARCHAIN_DQM_STORE",
+                f"{Path.home()}/.cache/nectarchain/dqm_results.h5",
+            )
+        self.path = Path(path)
+        self.filters = tables.Filters(
+            complevel=complevel, complib=complib, shuffle=True
+        )
+
+    @staticmethod
+    def parse_run_number(name):
+        """Parse the run number from the name of the results of a run.
+
+        Parameters:
+        name (str or int): The name, as ``NectarCAM_Run3938``, or the run number.
+
+        Returns:
+        int: The run number.
+        """
+        if isinstance(name, (int, np.integer)):
+            return int(name)
+        match = __class__._RUN_NUMBER_PATTERN.search(name)
+        if match is None:
+            raise ValueError(f"no run number in {name}")
+        return int(match.group(1))
+
+    def _open(self, mode):
+        if mode != "r":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        return tables.open_file(self.path, mode=mode)
+
+    def append(self, run, results):
+        """Append the results of a run.
+
+        Parameters:
+        run (str or int): The run number, or the name of the results of the run,
+        as ``NectarCAM_Run3938``.
+        results (dict): The results of the run, by dictionary name then result
+        name, as written into the ZODB data base.
+
+        Returns:
+        int: The number of results written.
+        """
+        run_number = self.parse_run_number(run)
+        n_written = 0
+        with self._open("a") as h5file, warnings.catch_warnings():
+            # the result names are not valid Python identifiers
+            warnings.simplefilter("ignore", tables.NaturalNameWarning)
+            for parentkey, childresults in results.items():
+                for childkey, value in childresults.items():
+                    value = np.asarray(value)
+                    if value.dtype.kind not in "biuf":
+                        continue
+                    if self._append_value(
+                        h5file, parentkey, childkey, run_number, value
+                    ):
+                        n_written += 1
+        return n_written
+
+    def _append_value(self, h5file, parentkey, childkey, run_number, value):
+        where = f"/{parentkey}/{childkey}"
+        if where not in h5file:
+            group = h5file.create_group(f"/{parentkey}", childkey, createparents=True)
+            h5file.create_earray(
+                group,
+                "run_number",
+                atom=tables.Int64Atom(),
+                shape=(0,),
+                filters=self.filters,
+                chunkshape=(self.CHUNK_VALUES,),
+            )
+            h5file.create_earray(
+                group,
+                "values",
+                atom=tables.Float64Atom(dflt=np.nan),
+                shape=(0,) + value.shape,
+                filters=self.filters,
+                chunkshape=(max(1, self.CHUNK_VALUES // max(1, value.size)),)
+                + value.shape,
+            )
+        group = h5file.get_node(where)
+        shape = group.values.shape[1:]
+        if value.shape != shape:
+            if value.ndim == 1 and len(shape) == 1 and len(value) < shape[0]:
+                value = np.concatenate([value, np.full(shape[0] - len(value), np.nan)])
+            else:
+                log.warning(
+                    f"skipping {childkey} of run {run_number}, of shape "
+                    f"{value.shape} instead of {shape}"
+                )
+                return False
+        group.values.append(value[np.newaxis].astype(np.float64))
+        group.run_number.append([run_number])
+        return True
+
+    def _find(self, h5file, key):
+        if "/" in key:
+            try:
+                return h5file.get_node(f"/{key.strip('/')}")
+            except tables.NoSuchNodeError:
+                raise KeyError(f"{key} is not in {self.path}")
+        groups = [
+            group
+            for parent in h5file.root._f_iter_nodes("Group")
+            for group in parent._f_iter_nodes("Group")
+            if group._v_name == key
+        ]
+        if len(groups) == 0:
+            raise KeyError(f"{key} is not in {self.path}")
+        if len(groups) > 1:
+            raise KeyError(
+                f"{key} is in several result dictionaries, use "
+                "<dictionary>/<result> as key"
+            )
+        return groups[0]
+
+    def keys(self):
+        """List the results of the store.
+
+        Returns:
+        list: The keys of the results, as ``<dictionary>/<result>``.
+        """
+        if not self.path.exists():
+            return []
+        with self._open("r") as h5file:
+            return [
+                f"{parent._v_name}/{group._v_name}"
+                for parent in h5file.root._f_iter_nodes("Group")
+                for group in parent._f_iter_nodes("Group")
+            ]
+
+    def get_runs(self, key):
+        """List the runs for which a result is stored.
+
+        Parameters:
+        key (str): The name of the result, or ``<dictionary>/<result>``.
+
+        Returns:
+        np.ndarray: The run numbers, sorted.
+        """
+        with self._open("r") as h5file:
+            return np.unique(self._find(h5file, key).run_number.read())
+
+    def get(self, key, run_min=None, run_max=None, runs=None, pixels=None):
+        """Read a result over a range of runs.
+
+        Parameters:
+        key (str): The name of the result, or ``<dictionary>/<result>`` if the name
+        is used in several dictionaries.
+        run_min (int, optional): The first run number, included.
+        run_max (int, optional): The last run number, included.
+        runs (list, optional): The run numbers to read, among the ones of the range.
+        pixels (list, optional): The indices of the values to read along the last
+        axis, e.g. the pixels, all of them if None.
+
+        Returns:
+        tuple: The run numbers, sorted, and the results of these runs, of shape
+        (runs, ...), e.g. (runs, pixels).
+        """
+        with self._open("r") as h5file:
+            group = self._find(h5file, key)
+            run_number = group.run_number.read()
+            mask = np.ones(len(run_number), dtype=bool)
+            if run_min is not None:
+                mask &= run_number >= run_min
+            if run_max is not None:
+                mask &= run_number <= run_max
+            if runs is not None:
+                mask &= np.isin(run_number, runs)
+            # the last written results of each run, sorted by run number
+            rows = np.flatnonzero(mask)
+            rows = rows[np.argsort(run_number[rows], kind="stable")]
+            last = np.ones(len(rows), dtype=bool)
+            last[:-1] = np.diff(run_number[rows]) != 0
+            rows = rows[last]
+            values = np.empty((len(rows),) + group.values.shape[1:])
+            if len(rows) > 0:
+                # only the chunks of the range of the selected runs are read
+                start, stop = rows.min(), rows.max() + 1
+                values[:] = group.values[start:stop][rows - start]
+            if pixels is not None and values.ndim > 1:
+                values = values[..., pixels]
+            return run_number[rows], values
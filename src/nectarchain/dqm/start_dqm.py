@@ -1,8 +1,13 @@
 import argparse
 import json
+import multiprocessing as mp
 import os
+import pickle
 import sys
 import time
+from functools import partial
+
+import numpy as np
 
 # ctapipe imports
 from ctapipe.io import EventSource
@@ -14,13 +19,158 @@ from traitlets.config import Config
 from nectarchain.dqm.camera_monitoring import CameraMonitoring
 from nectarchain.dqm.charge_integration import ChargeIntegrationHighLowGain
 from nectarchain.dqm.db_utils import DQMDB
+from nectarchain.dqm.event_features import DQMEventFeatures
 from nectarchain.dqm.mean_camera_display import MeanCameraDisplayHighLowGain
 from nectarchain.dqm.mean_waveforms import MeanWaveFormsHighLowGain
 from nectarchain.dqm.pixel_participation import PixelParticipationHighLowGain
 from nectarchain.dqm.pixel_timeline import PixelTimelineHighLowGain
+from nectarchain.dqm.result_store import DQMResultStore
 from nectarchain.dqm.trigger_statistics import TriggerStatistics
 from nectarchain.makers import ChargesNectarCAMCalibrationTool
 
+# version of the format of the files written by SaveState, to be increased when the
+# processors or their accumulated attributes change
+STATE_FORMAT_VERSION = 2
+
+
+def GetProcessors():
+    """
+    Create the DQM processors
+
+    Returns:
+    tuple: The list of the processors and the list of the keys of their results.
+    """
+    # LIST OF PROCESSES TO RUN
+    ####################################################################################
+    processors = [
+        TriggerStatistics(HIGH_GAIN),
+        MeanWaveFormsHighLowGain(HIGH_GAIN),
+        MeanWaveFormsHighLowGain(LOW_GAIN),
+        MeanCameraDisplayHighLowGain(HIGH_GAIN),
+        MeanCameraDisplayHighLowGain(LOW_GAIN),
+        ChargeIntegrationHighLowGain(HIGH_GAIN),
+        ChargeIntegrationHighLowGain(LOW_GAIN),
+        CameraMonitoring(HIGH_GAIN),
+        PixelParticipationHighLowGain(HIGH_GAIN),
+        PixelParticipationHighLowGain(LOW_GAIN),
+        PixelTimelineHighLowGain(HIGH_GAIN),
+        PixelTimelineHighLowGain(LOW_GAIN),
+    ]
+
+    NESTED_DICT_KEYS = [
+        "Results_TriggerStatistics",
+        "Results_MeanWaveForms_HighGain",
+        "Results_MeanWaveForms_LowGain",
+        "Results_MeanCameraDisplay_HighGain",
+        "Results_MeanCameraDisplay_LowGain",
+        "Results_ChargeIntegration_HighGain",
+        "Results_ChargeIntegration_LowGain",
+        "Results_CameraMonitoring",
+        "Results_PixelParticipation_HighGain",
+        "Results_PixelParticipation_LowGain",
+        "Results_PixelTimeline_HighGain",
+        "Results_PixelTimeline_LowGain",
+    ]
+    return processors, NESTED_DICT_KEYS
+
+
+def ProcessRunSlice(slice_path, path, config, max_events, noped, charges_kwargs):
+    """
+    Run the DQM processors on the events of a slice of a run
+
+    Parameters:
+    slice_path (str): The path of the file of the run slice.
+    path (str): The path of the first file of the run, used to configure the
+    processors.
+    config (Config): The configuration of the event source.
+    max_events (int): The maximum number of events to process, all of them if None.
+    noped (bool): Whether the pedestal is subtracted before the charge integration.
+    charges_kwargs (dict): The charge extraction method and its kwargs.
+
+    Returns:
+    tuple: The partial results of the processors, to be merged with
+    ``DQMSummary.MergeState``, and the time spent in each of them.
+    """
+    print(slice_path)
+    processors, _ = GetProcessors()
+    reader1 = EventSource(input_url=path, config=config, max_events=1)
+    Pix, Samp = processors[0].DefineForRun(reader1)
+    for p in processors:
+        p.ConfigureForRun(path, Pix, Samp, reader1, **charges_kwargs)
+
+    # the quantities shared by the processors are computed once per event, with a
+    # single charge extractor for both gains
+    integrator = DQMEventFeatures.get_integrator(reader1.subarray, **charges_kwargs)
+    # time spent in each processor, the shared quantities being accounted to the
+    # first processor using them
+    processing_times = np.zeros(len(processors))
+
+    with EventSource(
+        input_url=slice_path, config=config, max_events=max_events
+    ) as reader:
+        for evt in tqdm(
+            reader, total=max_events if max_events else len(reader), unit="ev"
+        ):
+            features = DQMEventFeatures(evt, Pix, integrator, noped)
+            for i, p in enumerate(processors):
+                t = time.perf_counter()
+                p.ProcessEvent(evt, noped, features=features)
+                processing_times[i] += time.perf_counter() - t
+
+    return [p.GetState() for p in processors], processing_times
+
+
+def SaveState(state_file, processors, processed_files, processing_times):
+    """
+    Save the partial results of the processors, to be updated by the next slices of
+    the run
+
+    Parameters:
+    state_file (str): The path of the file, replaced at once.
+    processors (list): The DQM processors.
+    processed_files (list): The input files already processed.
+    processing_times (np.ndarray): The time spent in each processor.
+    """
+    with open(f"{state_file}.tmp", "wb") as file:
+        pickle.dump(
+            {
+                "version": STATE_FORMAT_VERSION,
+                "input_files": processed_files,
+                "states": [p.GetState() for p in processors],
+                "processing_times": processing_times,
+            },
+            file,
+        )
+    os.replace(f"{state_file}.tmp", state_file)
+
+
+def LoadState(state_file, processors):
+    """
+    Merge the partial results saved by ``SaveState`` into the processors
+
+    Parameters:
+    state_file (str): The path of the file.
+    processors (list): The DQM processors, configured for the run.
+
+    Returns:
+    tuple: The input files already processed and the time spent in each processor.
+    """
+    with open(state_file, "rb") as file:
+        saved = pickle.load(file)
+    if saved.get("version") != STATE_FORMAT_VERSION:
+        raise ValueError(
+            f"{state_file} is of format version {saved.get('version')}, "
+            f"{STATE_FORMAT_VERSION} expected: the run has to be processed again"
+        )
+    if len(saved["states"]) != len(processors):
+        raise ValueError(
+            f"{state_file} holds the results of {len(saved['states'])} processors, "
+            f"{len(processors)} expected"
+        )
+    for p, state in zip(processors, saved["states"]):
+        p.MergeState(state)
+    return list(saved["input_files"]), saved["processing_times"]
+
 
 def main():
     """
@@ -34,7 +184,15 @@ def main():
         "-p", "--plot", action="store_true", help="Enables plots to be generated"
     )
     parser.add_argument(
-        "--write-db", action="store_true", help="Write DQM output in DQM ZODB data base"
+        "--write-db",
+        action="store_true",
+        help="Write DQM output in DQM ZODB data base and in the columnar result store",
+    )
+    parser.add_argument(
+        "--result-store",
+        default=None,
+        help="Path of the columnar result store written with --write-db, default to "
+        "the NECTARCHAIN_DQM_STORE environment variable",
     )
     parser.add_argument(
         "-n",
@@ -80,6 +238,20 @@ def main():
         help="Maximum number of events to loop through in each run slice",
     )
     parser.add_argument("-i", "--input-files", nargs="+", help="Local input files")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        default=1,
+        type=int,
+        help="Number of run slices processed in parallel",
+    )
+    parser.add_argument(
+        "--state-file",
+        default=None,
+        help="File of the partial results of the run (incremental mode): the input "
+        "files already processed are skipped and the file is updated with the new "
+        "ones",
+    )
 
     parser.add_argument("input_paths", help="Input paths")
     parser.add_argument("output_paths", help="Output paths")
@@ -176,7 +348,6 @@ def main():
             )
         )
 
-    reader = EventSource(input_url=path, config=config, max_events=args.max_events)
     reader1 = EventSource(input_url=path, config=config, max_events=1)
     # print(reader.file_list)
 
@@ -184,74 +355,64 @@ def main():
     ParentFolderName, ChildrenFolderName, FigPath = CreateFigFolder(name, 0)
     ResPath = f"{output_path}/output/{ChildrenFolderName}/{name}"
 
-    # LIST OF PROCESSES TO RUN
-    ####################################################################################
-    processors = [
-        TriggerStatistics(HIGH_GAIN),
-        MeanWaveFormsHighLowGain(HIGH_GAIN),
-        MeanWaveFormsHighLowGain(LOW_GAIN),
-        MeanCameraDisplayHighLowGain(HIGH_GAIN),
-        MeanCameraDisplayHighLowGain(LOW_GAIN),
-        ChargeIntegrationHighLowGain(HIGH_GAIN),
-        ChargeIntegrationHighLowGain(LOW_GAIN),
-        CameraMonitoring(HIGH_GAIN),
-        PixelParticipationHighLowGain(HIGH_GAIN),
-        PixelParticipationHighLowGain(LOW_GAIN),
-        PixelTimelineHighLowGain(HIGH_GAIN),
-        PixelTimelineHighLowGain(LOW_GAIN),
-    ]
+    processors, NESTED_DICT_KEYS = GetProcessors()
 
     # LIST OF DICT RESULTS
     NESTED_DICT = {}  # The final results dictionary
 
-    NESTED_DICT_KEYS = [
-        "Results_TriggerStatistics",
-        "Results_MeanWaveForms_HighGain",
-        "Results_MeanWaveForms_LowGain",
-        "Results_MeanCameraDisplay_HighGain",
-        "Results_MeanCameraDisplay_LowGain",
-        "Results_ChargeIntegration_HighGain",
-        "Results_ChargeIntegration_LowGain",
-        "Results_CameraMonitoring",
-        "Results_PixelParticipation_HighGain",
-        "Results_PixelParticipation_LowGain",
-        "Results_PixelTimeline_HighGain",
-        "Results_PixelTimeline_LowGain",
-    ]
-
     # START
-    for p in processors:
-        Pix, Samp = p.DefineForRun(reader1)
-        break
+    Pix, Samp = processors[0].DefineForRun(reader1)
 
     for p in processors:
         p.ConfigureForRun(path, Pix, Samp, reader1, **charges_kwargs)
 
-    for evt in tqdm(
-        reader, total=args.max_events if args.max_events else len(reader), unit="ev"
-    ):
-        for p in processors:
-            p.ProcessEvent(evt, noped)
-
-    # for the rest of the event files
-    for arg in args.input_files[1:]:
-        path2 = f"{NectarPath}/runs/{arg}"
-        print(path2)
-
-        with EventSource(
-            input_url=path2, config=config, max_events=args.max_events
-        ) as reader:
-            for evt in tqdm(
-                reader,
-                total=args.max_events if args.max_events else len(reader),
-                unit="ev",
-            ):
-                for p in processors:
-                    p.ProcessEvent(evt, noped)
+    # in incremental mode, the partial results of the slices already processed are
+    # loaded and only the new slices are processed
+    processed_files = []
+    processing_times = np.zeros(len(processors))
+    if args.state_file is not None and os.path.exists(args.state_file):
+        processed_files, processing_times = LoadState(args.state_file, processors)
+        print(f"{len(processed_files)} run slices already processed")
+    input_files = [arg for arg in args.input_files if arg not in processed_files]
+
+    ProcessSlice = partial(
+        ProcessRunSlice,
+        path=path,
+        config=config,
+        max_events=args.max_events,
+        noped=noped,
+        charges_kwargs=charges_kwargs,
+    )
+    slice_paths = [f"{NectarPath}/runs/{arg}" for arg in input_files]
+    pool = None
+    if args.jobs > 1 and len(slice_paths) > 1:
+        pool = mp.get_context("spawn").Pool(min(args.jobs, len(slice_paths)))
+        results = pool.imap(ProcessSlice, slice_paths)
+    else:
+        results = map(ProcessSlice, slice_paths)
+    try:
+        # the partial results are merged in the order of the slices
+        for arg, (states, times) in zip(input_files, results):
+            for p, state in zip(processors, states):
+                p.MergeState(state)
+            processing_times += times
+            processed_files.append(arg)
+            if args.state_file is not None:
+                SaveState(
+                    args.state_file, processors, processed_files, processing_times
+                )
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
 
     for p in processors:
         p.FinishRun()
 
+    print("Event processing time per processor:")
+    for key, processing_time in zip(NESTED_DICT_KEYS, processing_times):
+        print(f"    {key}: {processing_time:.2f} s")
+
     dict_num = 0
     for p in processors:
         NESTED_DICT[NESTED_DICT_KEYS[dict_num]] = p.GetResults()
@@ -263,6 +424,9 @@ def main():
         db = DQMDB(read_only=False)
         if db.insert(name, NESTED_DICT):
             db.commit_and_close()
+            # the results are also appended to the columnar store, for the queries
+            # over many runs
+            DQMResultStore(args.result_store).append(name, NESTED_DICT)
         else:
             db.abort_and_close()
 
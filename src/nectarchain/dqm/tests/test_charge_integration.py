@@ -36,3 +36,53 @@ class TestChargeIntegrationHighLowGain:
 
         assert Pix + Samp == 1915
         assert np.sum(ped) == 985.8636118598383
+
+    def test_merge_state(self):
+        path = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+
+        config = Config(
+            dict(
+                NectarCAMEventSource=dict(
+                    NectarCAMR0Corrections=dict(
+                        calibration_path=None,
+                        apply_flatfield=False,
+                        select_gain=False,
+                    )
+                )
+            )
+        )
+
+        reader1 = EventSource(input_url=path, config=config, max_events=10)
+
+        processors = [ChargeIntegrationHighLowGain(HIGH_GAIN) for i in range(3)]
+        Pix, Samp = processors[0].DefineForRun(reader1)
+        for processor in processors:
+            processor.ConfigureForRun(path, Pix, Samp, reader1)
+
+        # the first processor sees all the events, the two others half of them
+        for i, evt in enumerate(tqdm(reader1, total=10)):
+            processors[0].ProcessEvent(evt, noped=False)
+            processors[1 + i // 5].ProcessEvent(evt, noped=False)
+        processors[1].MergeState(processors[2].GetState())
+
+        assert processors[1].counter_evt == processors[0].counter_evt
+        assert processors[1].counter_ped == processors[0].counter_ped
+        for processor in processors[:2]:
+            processor.FinishRun()
+        # the medians are estimated from the histograms of the values
+        for name in ["all", "ped"]:
+            for charge in ["image", "ped"]:
+                for summary, rtol in [
+                    ("median", 1e-3),
+                    ("average", 1e-5),
+                    ("std", 1e-5),
+                    ("rms", 1e-5),
+                ]:
+                    key = f"{charge}_{name}_{summary}"
+                    value = getattr(processors[1], key)
+                    expected = getattr(processors[0], key)
+                    if expected is None:
+                        # not computed without any pedestal event
+                        assert value is None
+                    else:
+                        assert np.allclose(value, expected, rtol=rtol, equal_nan=True)
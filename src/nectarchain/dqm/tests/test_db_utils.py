@@ -19,6 +19,42 @@ class TestDQMDB:
         self.root[key] = value
         assert self.root[key] == value
 
+    def test_run_index(self):
+        from nectarchain.dqm.db_utils import get_run_index, get_runids, update_run_index
+
+        self.root["run2"] = {"mykey1": {"mysubkey1": 1, "mysubkey2": 2}}
+        self.root["run1"] = {"mykey1": {"mysubkey1": 1}}
+        assert get_run_index(self.root) is None
+        assert get_runids(self.root) == ["mykey", "run1", "run2"]
+
+        assert update_run_index(self.root) == 3
+        assert update_run_index(self.root) == 0
+        assert get_runids(self.root) == ["mykey", "run1", "run2"]
+        assert get_run_index(self.root)["run2"]["n_results"] == 2
+        assert get_run_index(self.root)["run1"]["n_dicts"] == 1
+
+    def test_insert_into_previous_db(self):
+        from nectarchain.dqm.db_utils import DQMDB, get_run_index, get_runids
+
+        # a database written before the index of the runs
+        db = DB(None)
+        conn = db.open()
+        root = conn.root()
+        root["NectarCAM_Run0001"] = {"mykey1": {"mysubkey1": 1}}
+        root["NectarCAM_Run0002"] = {"mykey1": {"mysubkey1": 1, "mysubkey2": 2}}
+
+        dqmdb = DQMDB.__new__(DQMDB)
+        dqmdb.root = root
+        assert dqmdb.insert("NectarCAM_Run0003", {"mykey1": {"mysubkey1": 1}})
+        assert get_runids(root) == [
+            "NectarCAM_Run0001",
+            "NectarCAM_Run0002",
+            "NectarCAM_Run0003",
+        ]
+        assert get_run_index(root)["NectarCAM_Run0002"]["n_results"] == 2
+        transaction.abort()
+        db.close()
+
     def test_commit_and_close(self):
         transaction.commit()
         self.db.close()
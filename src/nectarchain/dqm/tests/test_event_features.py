@@ -0,0 +1,49 @@
+import numpy as np
+from ctapipe.io import EventSource
+from ctapipe.utils import get_dataset_path
+from ctapipe_io_nectarcam.constants import HIGH_GAIN, LOW_GAIN
+from tqdm import tqdm
+from traitlets.config import Config
+
+from nectarchain.dqm.event_features import DQMEventFeatures
+
+
+class TestDQMEventFeatures:
+    def test_event_features(self):
+        path = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+
+        config = Config(
+            dict(
+                NectarCAMEventSource=dict(
+                    NectarCAMR0Corrections=dict(
+                        calibration_path=None,
+                        apply_flatfield=False,
+                        select_gain=False,
+                    )
+                )
+            )
+        )
+
+        reader1 = EventSource(input_url=path, config=config, max_events=1)
+        integrator = DQMEventFeatures.get_integrator(reader1.subarray)
+
+        for evt in tqdm(reader1, total=1):
+            Pix = evt.r0.tel[0].waveform.shape[1]
+            features = DQMEventFeatures(evt, Pix, integrator, noped=True)
+            pixel = evt.nectarcam.tel[0].svc.pixel_ids
+
+            assert len(features.pixels) == Pix
+            assert np.array_equal(features.pixels[Pix - len(pixel) :], pixel)
+            for k in [HIGH_GAIN, LOW_GAIN]:
+                waveform = evt.r0.tel[0].waveform[k]
+                assert np.array_equal(features.waveform_sums[k], waveform.sum(axis=1))
+                pixelBAD = evt.mon.tel[0].pixel_status.hardware_failing_pixels[k]
+                assert features.n_failing_pixels[k] == np.sum(pixelBAD[features.pixels])
+
+                ped = np.mean(waveform[pixel][:, 20])
+                assert features.pedestals[k] == ped
+                output = integrator(
+                    waveform[pixel] - ped, 0, k, features.broken_pixels[k]
+                )
+                assert np.allclose(features.charges[0][k], output.image, rtol=1e-6)
+                assert np.array_equal(features.charges[1][k], output.peak_time)
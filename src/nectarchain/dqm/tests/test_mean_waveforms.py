@@ -34,3 +34,80 @@ class TestMeanWaveForms:
 
         assert Pix + Samp == 1915
         assert np.sum(evt.r0.tel[0].waveform[HIGH_GAIN][0]) == 3932100
+
+    def test_mean_waveforms_stats(self):
+        path = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+
+        config = Config(
+            dict(
+                NectarCAMEventSource=dict(
+                    NectarCAMR0Corrections=dict(
+                        calibration_path=None,
+                        apply_flatfield=False,
+                        select_gain=False,
+                    )
+                )
+            )
+        )
+
+        reader1 = EventSource(input_url=path, config=config, max_events=5)
+
+        processor = MeanWaveFormsHighLowGain(HIGH_GAIN)
+        Pix, Samp = processor.DefineForRun(reader1)
+        processor.ConfigureForRun(path, Pix, Samp, reader1)
+
+        waveforms = []
+        for evt in tqdm(reader1, total=5):
+            processor.ProcessEvent(evt, noped=False)
+            waveforms.append(evt.r0.tel[0].waveform[HIGH_GAIN])
+        processor.FinishRun()
+        results = processor.GetResults()
+
+        waveforms = np.array(waveforms, dtype=float)
+        assert np.allclose(processor.Mwf_average, np.mean(waveforms, axis=0))
+        assert np.allclose(
+            results["WF-PHY-AVERAGE-PIX-HIGH-GAIN"], np.mean(waveforms, axis=(0, 1))
+        )
+        assert np.allclose(
+            results["WF-PHY-MAX-PIX-HIGH-GAIN"], np.max(waveforms, axis=(0, 1))
+        )
+        assert np.allclose(
+            results["WF-PHY-MIN-PIX-HIGH-GAIN"], np.min(waveforms, axis=(0, 1))
+        )
+
+    def test_merge_state(self):
+        path = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+
+        config = Config(
+            dict(
+                NectarCAMEventSource=dict(
+                    NectarCAMR0Corrections=dict(
+                        calibration_path=None,
+                        apply_flatfield=False,
+                        select_gain=False,
+                    )
+                )
+            )
+        )
+
+        reader1 = EventSource(input_url=path, config=config, max_events=10)
+
+        processors = [MeanWaveFormsHighLowGain(HIGH_GAIN) for i in range(3)]
+        Pix, Samp = processors[0].DefineForRun(reader1)
+        for processor in processors:
+            processor.ConfigureForRun(path, Pix, Samp, reader1)
+
+        # the first processor sees all the events, the two others half of them
+        for i, evt in enumerate(tqdm(reader1, total=10)):
+            processors[0].ProcessEvent(evt, noped=False)
+            processors[1 + i // 5].ProcessEvent(evt, noped=False)
+        processors[1].MergeState(processors[2].GetState())
+
+        assert processors[1].counter_evt == processors[0].counter_evt
+        assert processors[1].counter_ped == processors[0].counter_ped
+        for processor in processors[:2]:
+            processor.FinishRun()
+        assert np.allclose(processors[1].Mwf_average, processors[0].Mwf_average)
+        assert np.allclose(
+            processors[1].Mwf_stats.std, processors[0].Mwf_stats.std, equal_nan=True
+        )
@@ -36,3 +36,38 @@ class TestPixelParticipation:
 
         assert Pix + Samp == 1915
         assert np.sum(evt.nectarcam.tel[0].svc.pixel_ids) == 1719375
+
+    def test_merge_state(self):
+        path = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+
+        config = Config(
+            dict(
+                NectarCAMEventSource=dict(
+                    NectarCAMR0Corrections=dict(
+                        calibration_path=None,
+                        apply_flatfield=False,
+                        select_gain=False,
+                    )
+                )
+            )
+        )
+
+        reader1 = EventSource(input_url=path, config=config, max_events=10)
+
+        processors = [PixelParticipationHighLowGain(HIGH_GAIN) for i in range(3)]
+        Pix, Samp = processors[0].DefineForRun(reader1)
+        for processor in processors:
+            processor.ConfigureForRun(path, Pix, Samp, reader1)
+
+        # the first processor sees all the events, the two others half of them
+        for i, evt in enumerate(tqdm(reader1, total=10)):
+            processors[0].ProcessEvent(evt, noped=False)
+            processors[1 + i // 5].ProcessEvent(evt, noped=False)
+        processors[1].MergeState(processors[2].GetState())
+
+        assert processors[1].counter_evt == processors[0].counter_evt
+        assert processors[1].counter_ped == processors[0].counter_ped
+        for processor in processors[:2]:
+            processor.FinishRun()
+        assert np.array_equal(processors[1].BadPixels, processors[0].BadPixels)
+        assert np.array_equal(processors[1].BadPixels_ped, processors[0].BadPixels_ped)
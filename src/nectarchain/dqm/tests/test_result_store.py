@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import tables
+
+from nectarchain.dqm.result_store import DQMResultStore
+
+
+class TestDQMResultStore:
+    def make_results(self, run):
+        rng = np.random.default_rng(run)
+        return {
+            "Results_ChargeIntegration_HighGain": {
+                "CHARGE-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN": rng.normal(size=10),
+                "PED-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN": rng.normal(),
+            },
+            "Results_TriggerStatistics": {"TRIGGER-TYPES": ["PHY", "PED"]},
+        }
+
+    def test_append(self, tmp_path):
+        store = DQMResultStore(tmp_path / "results.h5")
+        assert store.keys() == []
+        assert store.append("NectarCAM_Run0012", self.make_results(12)) == 2
+        assert store.keys() == [
+            "Results_ChargeIntegration_HighGain/"
+            "CHARGE-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN",
+            "Results_ChargeIntegration_HighGain/"
+            "PED-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN",
+        ]
+        with pytest.raises(ValueError):
+            store.append("NectarCAM", self.make_results(12))
+
+    def test_chunkshape(self, tmp_path):
+        store = DQMResultStore(tmp_path / "results.h5")
+        store.append(12, self.make_results(12))
+        store.append(12, {"Results_PixelTimeline": {"BADPIX": np.zeros(1855)}})
+        with tables.open_file(store.path) as h5file:
+            group = "/Results_ChargeIntegration_HighGain"
+            # the scalar results of many runs are compressed together
+            node = h5file.get_node(
+                f"{group}/PED-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN"
+            )
+            assert node.values.chunkshape == (1024,)
+            assert node.run_number.chunkshape == (1024,)
+            node = h5file.get_node(
+                f"{group}/CHARGE-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN"
+            )
+            assert node.values.chunkshape == (102, 10)
+            # the per-pixel results one run at a time
+            node = h5file.get_node("/Results_PixelTimeline/BADPIX")
+            assert node.values.chunkshape == (1, 1855)
+
+    def test_get(self, tmp_path):
+        store = DQMResultStore(tmp_path / "results.h5")
+        results = {run: self.make_results(run) for run in [14, 11, 12, 13]}
+        for run, result in results.items():
+            store.append(run, result)
+        # a run written again
+        results[12] = self.make_results(120)
+        store.append(12, results[12])
+        # a shorter result
+        results[15] = self.make_results(15)
+        results[15]["Results_ChargeIntegration_HighGain"][
+            "CHARGE-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN"
+        ] = np.ones(8)
+        store.append(15, results[15])
+
+        key = "CHARGE-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN"
+        runs, values = store.get(key, run_min=12, run_max=15, pixels=[7, 9])
+        assert np.array_equal(runs, [12, 13, 14, 15])
+        for run, value in zip(runs, values):
+            expected = results[run]["Results_ChargeIntegration_HighGain"][key]
+            expected = np.append(expected, [np.nan] * (10 - len(expected)))
+            np.testing.assert_array_equal(value, expected[[7, 9]])
+        assert np.array_equal(store.get_runs(key), [11, 12, 13, 14, 15])
+
+        runs, values = store.get(
+            "Results_ChargeIntegration_HighGain/"
+            "PED-INTEGRATION-IMAGE-ALL-AVERAGE-HIGH-GAIN",
+            runs=[11, 20],
+        )
+        assert np.array_equal(runs, [11])
+        assert values.shape == (1,)
+
+        # the asked runs are selected among the ones of the range
+        runs, values = store.get(key, run_min=12, runs=[11, 13, 20])
+        assert np.array_equal(runs, [13])
+
+        runs, values = store.get(key, run_min=20)
+        assert len(runs) == 0
+        assert values.shape == (0, 10)
+
+        with pytest.raises(KeyError):
+            store.get("TRIGGER-TYPES")
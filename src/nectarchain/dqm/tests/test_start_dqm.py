@@ -0,0 +1,124 @@
+import pickle
+
+import numpy as np
+import pytest
+from ctapipe.io import EventSource
+from ctapipe.utils import get_dataset_path
+from matplotlib import pyplot as plt
+from traitlets.config import Config
+
+from nectarchain.dqm.start_dqm import (
+    STATE_FORMAT_VERSION,
+    GetProcessors,
+    LoadState,
+    ProcessRunSlice,
+    SaveState,
+)
+
+
+def assert_state_close(state, expected):
+    # the statistics accumulators are compared through their attributes, the
+    # floating point values up to the rounding of their merge
+    if hasattr(expected, "__dict__"):
+        state, expected = vars(state), vars(expected)
+    if isinstance(expected, dict):
+        assert state.keys() == expected.keys()
+        for key in expected:
+            assert_state_close(state[key], expected[key])
+    elif isinstance(expected, (list, tuple)):
+        assert len(state) == len(expected)
+        for value, value_expected in zip(state, expected):
+            assert_state_close(value, value_expected)
+    elif np.asarray(expected).dtype.kind == "f":
+        np.testing.assert_allclose(state, expected, equal_nan=True)
+    else:
+        np.testing.assert_equal(state, expected)
+
+
+class TestStartDQM:
+    config = Config(
+        dict(
+            NectarCAMEventSource=dict(
+                NectarCAMR0Corrections=dict(
+                    calibration_path=None,
+                    apply_flatfield=False,
+                    select_gain=False,
+                )
+            )
+        )
+    )
+
+    def get_processors(self, path):
+        processors, _ = GetProcessors()
+        reader1 = EventSource(input_url=path, config=self.config, max_events=1)
+        Pix, Samp = processors[0].DefineForRun(reader1)
+        for processor in processors:
+            processor.ConfigureForRun(path, Pix, Samp, reader1)
+        return processors
+
+    def test_resume(self, tmp_path):
+        path = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+        # two slices of the run, here both read from the same file
+        slices = [
+            ProcessRunSlice(path, path, self.config, 5, False, {}) for i in range(2)
+        ]
+
+        expected = self.get_processors(path)
+        for states, _ in slices:
+            for processor, state in zip(expected, states):
+                processor.MergeState(state)
+
+        # the run is stopped after the first slice, then resumed
+        processors = self.get_processors(path)
+        for processor, state in zip(processors, slices[0][0]):
+            processor.MergeState(state)
+        state_file = tmp_path / "state.pkl"
+        SaveState(state_file, processors, ["slice0"], slices[0][1])
+
+        processors = self.get_processors(path)
+        processed_files, processing_times = LoadState(state_file, processors)
+        assert processed_files == ["slice0"]
+        assert np.array_equal(processing_times, slices[0][1])
+        for processor, state in zip(processors, slices[1][0]):
+            processor.MergeState(state)
+
+        for processor, processor_expected in zip(processors, expected):
+            assert_state_close(processor.GetState(), processor_expected.GetState())
+
+    def test_merged_results(self, tmp_path):
+        path = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+        states, _ = ProcessRunSlice(path, path, self.config, 10, False, {})
+
+        # the processors of the run only get the results of its slices, through
+        # their state file
+        processors = self.get_processors(path)
+        state_file = tmp_path / "state.pkl"
+        SaveState(state_file, processors, [], np.zeros(len(processors)))
+        processors = self.get_processors(path)
+        LoadState(state_file, processors)
+        for processor, state in zip(processors, states):
+            processor.MergeState(state)
+
+        for processor in processors:
+            processor.FinishRun()
+            processor.GetResults()
+            processor.PlotResults("NectarCAM_Run3938", f"{tmp_path}/")
+            plt.close("all")
+
+    @pytest.mark.parametrize("version", [None, STATE_FORMAT_VERSION + 1])
+    def test_load_version(self, tmp_path, version):
+        path = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+        processors = self.get_processors(path)
+        state_file = tmp_path / "state.pkl"
+        SaveState(state_file, processors, ["slice0"], np.zeros(len(processors)))
+        with open(state_file, "rb") as file:
+            saved = pickle.load(file)
+        if version is None:
+            del saved["version"]
+        else:
+            saved["version"] = version
+        with open(state_file, "wb") as file:
+            pickle.dump(saved, file)
+
+        with pytest.raises(ValueError):
+            LoadState(state_file, processors)
@@ -1,3 +1,4 @@
+import numpy as np
 from ctapipe.io import EventSource
 from ctapipe.utils import get_dataset_path
 from ctapipe_io_nectarcam.constants import HIGH_GAIN
@@ -35,3 +36,40 @@ class TestTriggerStatistics:
 
         assert Pix + Samp == 1915
         assert time == 1674462932.6398556
+
+    def test_merge_state(self):
+        path = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+
+        config = Config(
+            dict(
+                NectarCAMEventSource=dict(
+                    NectarCAMR0Corrections=dict(
+                        calibration_path=None,
+                        apply_flatfield=False,
+                        select_gain=False,
+                    )
+                )
+            )
+        )
+
+        reader1 = EventSource(input_url=path, config=config, max_events=10)
+
+        processors = [TriggerStatistics(HIGH_GAIN) for i in range(3)]
+        Pix, Samp = processors[0].DefineForRun(reader1)
+        for processor in processors:
+            processor.ConfigureForRun(path, Pix, Samp, reader1)
+
+        # the first processor sees all the events, the two others half of them
+        for i, evt in enumerate(tqdm(reader1, total=10)):
+            processors[0].ProcessEvent(evt, noped=False)
+            processors[1 + i // 5].ProcessEvent(evt, noped=False)
+        processors[1].MergeState(processors[2].GetState())
+
+        for processor in processors[:2]:
+            processor.FinishRun()
+        for name in ["event_type", "event_times", "event_id", "run_times"]:
+            assert np.array_equal(
+                getattr(processors[1], name), getattr(processors[0], name)
+            )
+        assert np.array_equal(processors[1].run_start, processors[0].run_start)
+        assert processors[1].run_end == processors[0].run_end
@@ -10,6 +10,8 @@ __all__ = ["TriggerStatistics"]
 
 
 class TriggerStatistics(DQMSummary):
+    _state_attributes = ("event_type", "event_times", "event_id", "run_times")
+
     def __init__(self, gaink):
         self.k = gaink
         self.Pix = None
@@ -37,7 +39,7 @@ class TriggerStatistics(DQMSummary):
         self.Pix = Pix
         self.Samp = Samp
 
-    def ProcessEvent(self, evt, noped):
+    def ProcessEvent(self, evt, noped, features=None):
         trigger_type = evt.trigger.event_type.value
         trigger_time = evt.trigger.time.value
         trigger_id = evt.index.event_id
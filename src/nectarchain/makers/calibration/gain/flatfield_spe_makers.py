@@ -73,6 +73,25 @@ class FlatFieldSPENominalNectarCAMCalibrationTool(GainNectarCAMCalibrationTool):
                     "You will not be able to reload charges from\
                     disk when start() call"
                 )
+        if getattr(self, "warm_start", False) and len(self.warm_start_SPE_results) == 0:
+            # the SPE results are written as <keyword>[Std]NectarCAM_run<run>_...
+            keyword = self.name[: -len("NectarCAM")]
+            free_pp_n = not keyword.endswith("Std")
+            try:
+                self.warm_start_SPE_results = DataManagement.find_SPE_previous(
+                    run_number=self.run_number,
+                    method=self.method,
+                    str_extractor_kwargs=str_extractor_kwargs,
+                    free_pp_n=free_pp_n,
+                    keyword=keyword if free_pp_n else keyword[: -len("Std")],
+                )
+            except FileNotFoundError as e:
+                log.warning(e)
+            if len(self.warm_start_SPE_results) == 0:
+                log.warning(
+                    f"no SPE results found before run {self.run_number}, the fits "
+                    "will start from the prefit"
+                )
 
     def _init_output_path(self):
         str_extractor_kwargs = CtapipeExtractor.get_extractor_kwargs_str(
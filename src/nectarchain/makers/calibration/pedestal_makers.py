@@ -4,10 +4,11 @@ import pathlib
 
 import numpy as np
 from ctapipe.core.traits import ComponentNameList
-from ctapipe_io_nectarcam.constants import HIGH_GAIN, LOW_GAIN, N_GAINS
 
-from ...data.container import NectarCAMPedestalContainer, NectarCAMPedestalContainers
-from ..component import NectarCAMComponent
+from ...data.container import NectarCAMPedestalContainer
+from ...utils.error import DifferentPixelsID
+from ...utils.stats import merge_stats
+from ..component import NectarCAMComponent, PedestalEstimationComponent
 from .core import NectarCAMCalibrationTool
 
 logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
@@ -29,6 +30,7 @@ class PedestalNectarCAMCalibrationTool(NectarCAMCalibrationTool):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self._slices = []
 
     def _init_output_path(self):
         """
@@ -50,116 +52,92 @@ class PedestalNectarCAMCalibrationTool(NectarCAMCalibrationTool):
             f"{os.environ.get('NECTARCAMDATA', '/tmp')}/PedestalEstimation/{filename}"
         )
 
-    def _combine_results(self):
+    def _finish_components(self, *args, **kwargs):
         """
-        Method that combines sliced results to reduce memory load
-        Can only be called after the file with the sliced results has been saved to disk
+        Finish the components and accumulate the sufficient statistics of the slice,
+        so that the sliced results can be combined without reading them back
         """
+        output = super()._finish_components(*args, **kwargs)
+        if self.events_per_slice is not None:
+            for _output in output:
+                if isinstance(_output, NectarCAMPedestalContainer):
+                    self._slices.append(self._slice_summary(_output))
+                    if len(self._slices) > 1:
+                        # keep a single accumulator in memory
+                        self._slices = [self._merge_slices(self._slices)]
+        return output
 
-        # re-open results
-        pedestalContainers = next(
-            NectarCAMPedestalContainers.from_hdf5(self.output_path)
-        )
-        # Loop over sliced results to fill the combined results
-        if "data_combined" in pedestalContainers.containers.keys():
-            log.error("Trying to combine results that already contain combined data")
-        self.log.info("Combine sliced results")
-        for i, (_, pedestalContainer) in enumerate(
-            pedestalContainers.containers.items()
-        ):
-            if i == 0:
-                # initialize fields for the combined results based on first slice
-                nsamples = pedestalContainer.nsamples
-                nevents = np.zeros(len(pedestalContainer.nevents))
-                pixels_id = pedestalContainer.pixels_id
-                ucts_timestamp_min = pedestalContainer.ucts_timestamp_min
-                ucts_timestamp_max = pedestalContainer.ucts_timestamp_max
-                pedestal_mean_hg = np.zeros(
-                    np.shape(pedestalContainer.pedestal_mean_hg)
-                )
-                pedestal_mean_lg = np.zeros(
-                    np.shape(pedestalContainer.pedestal_mean_lg)
-                )
-                pedestal_std_hg = np.zeros(np.shape(pedestalContainer.pedestal_std_hg))
-                pedestal_std_lg = np.zeros(np.shape(pedestalContainer.pedestal_std_lg))
-            else:
-                # otherwise consider the overall time interval
-                ucts_timestamp_min = np.minimum(
-                    ucts_timestamp_min, pedestalContainer.ucts_timestamp_min
+    @staticmethod
+    def _slice_summary(pedestalContainer):
+        # only the pixels for which no flags were raised on either channel are used
+        return {
+            "stats": PedestalEstimationComponent.stats_from_container(
+                pedestalContainer, usable_only=True
+            ),
+            "pixels_id": pedestalContainer.pixels_id,
+            "ucts_timestamp_min": pedestalContainer.ucts_timestamp_min,
+            "ucts_timestamp_max": pedestalContainer.ucts_timestamp_max,
+        }
+
+    @staticmethod
+    def _merge_slices(slices):
+        for summary in slices[1:]:
+            if not np.array_equal(summary["pixels_id"], slices[0]["pixels_id"]):
+                raise DifferentPixelsID(
+                    "Trying to combine slices with different pixels"
                 )
-                ucts_timestamp_max = np.maximum(
-                    ucts_timestamp_max, pedestalContainer.ucts_timestamp_max
-                )
-            # for all slices
-            # derive from pixel mask a mask that sets usable pixels
-            # accept only pixels for which no flags were raised
-            usable_pixels = pedestalContainer.pixel_mask == 0
-            # use a pixel only if it has no flag on either channel
-            usable_pixels = np.logical_and(usable_pixels[0], usable_pixels[1])
-            # cumulated number of events
-            nevents += pedestalContainer.nevents * usable_pixels
-            # add mean, std sum elements
-            pedestal_mean_hg += (
-                pedestalContainer.pedestal_mean_hg
-                * pedestalContainer.nevents[:, np.newaxis]
-                * usable_pixels[:, np.newaxis]
-            )
-            pedestal_mean_lg += (
-                pedestalContainer.pedestal_mean_lg
-                * pedestalContainer.nevents[:, np.newaxis]
-                * usable_pixels[:, np.newaxis]
-            )
-            pedestal_std_hg += (
-                pedestalContainer.pedestal_std_hg**2
-                * pedestalContainer.nevents[:, np.newaxis]
-                * usable_pixels[:, np.newaxis]
-            )
-            pedestal_std_lg += (
-                pedestalContainer.pedestal_std_lg**2
-                * pedestalContainer.nevents[:, np.newaxis]
-                * usable_pixels[:, np.newaxis]
-            )
-        # calculate final values of mean and std
-        pedestal_mean_hg /= nevents[:, np.newaxis]
-        pedestal_mean_lg /= nevents[:, np.newaxis]
-        pedestal_std_hg /= nevents[:, np.newaxis]
-        pedestal_std_hg = np.sqrt(pedestal_std_hg)
-        pedestal_std_lg /= nevents[:, np.newaxis]
-        pedestal_std_lg = np.sqrt(pedestal_std_lg)
+        return {
+            "stats": merge_stats([summary["stats"] for summary in slices]),
+            "pixels_id": slices[0]["pixels_id"],
+            "ucts_timestamp_min": min(
+                summary["ucts_timestamp_min"] for summary in slices
+            ),
+            "ucts_timestamp_max": max(
+                summary["ucts_timestamp_max"] for summary in slices
+            ),
+        }
+
+    def _combine_results(self, pedestalContainers=None):
+        """
+        Method that combines sliced results to reduce memory load.
+        The Welford statistics of the slices (number of events, mean, sum of the
+        squared deviations, minimum and maximum) are merged exactly. The statistics
+        accumulated while the slices are computed are used by default, the results
+        are then not read back from disk.
+
+        Parameters
+        ----------
+        pedestalContainers : iterable of NectarCAMPedestalContainer, optional
+            Pedestal containers to combine instead, e.g. the results computed for the
+            same run on several nodes. The slices are merged by pairs.
+
+        Returns
+        -------
+        output : NectarCAMPedestalContainer
+            The combined results
+        """
+        self.log.info("Combine sliced results")
+        if pedestalContainers is None:
+            slices = self._slices
+        else:
+            slices = [
+                self._slice_summary(pedestalContainer)
+                for pedestalContainer in pedestalContainers
+            ]
+        if len(slices) == 0:
+            self.log.warning("No sliced results to combine")
+            return None
+        combined = self._merge_slices(slices)
+
         # flag bad pixels in overall results based on same criteria as for individual
-        # slides
-        # reconstitute dictionary with cumulated results consistently with
-        # PedestalComponent
-        ped_stats = {}
-        array_shape = np.append([N_GAINS], np.shape(pedestal_mean_hg))
-        for statistic in ["mean", "std"]:
-            ped_stat = np.zeros(array_shape)
-            if statistic == "mean":
-                ped_stat[HIGH_GAIN] = pedestal_mean_hg
-                ped_stat[LOW_GAIN] = pedestal_mean_lg
-            elif statistic == "std":
-                ped_stat[HIGH_GAIN] = pedestal_std_hg
-                ped_stat[LOW_GAIN] = pedestal_std_lg
-            # Store the result in the dictionary
-            ped_stats[statistic] = ped_stat
-        # use flagging method from PedestalComponent
-        pixel_mask = self.components[0].flag_bad_pixels(ped_stats, nevents)
-
-        output = NectarCAMPedestalContainer(
-            nsamples=nsamples,
-            nevents=nevents,
-            pixels_id=pixels_id,
-            ucts_timestamp_min=ucts_timestamp_min,
-            ucts_timestamp_max=ucts_timestamp_max,
-            pedestal_mean_hg=pedestal_mean_hg,
-            pedestal_mean_lg=pedestal_mean_lg,
-            pedestal_std_hg=pedestal_std_hg,
-            pedestal_std_lg=pedestal_std_lg,
-            pixel_mask=pixel_mask,
+        # slices, using the method from PedestalComponent
+        return self.components[0].container_from_stats(
+            combined["stats"],
+            combined["pixels_id"],
+            combined["ucts_timestamp_min"],
+            combined["ucts_timestamp_max"],
         )
 
-        return output
-
     def finish(self, return_output_component=False, *args, **kwargs):
         """
         Redefines finish method to combine sliced results
@@ -180,12 +158,13 @@ class PedestalNectarCAMCalibrationTool(NectarCAMCalibrationTool):
         else:
             # combine results
             output = self._combine_results()
-            # add combined results to output
-            # re-initialise writer to store combined results
-            self._init_writer(sliced=True, group_name="data_combined")
-            # add combined results to writer
-            self._write_container(output)
-            self.writer.close()
+            self._slices = []
+            if output is not None:
+                # re-initialise writer to store combined results
+                self._init_writer(sliced=True, group_name="data_combined")
+                # add combined results to writer
+                self._write_container(output)
+                self.writer.close()
 
         self.log.info("Shutting down.")
         if return_output_component:
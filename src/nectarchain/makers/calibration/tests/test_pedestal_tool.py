@@ -457,3 +457,50 @@ class TestPedestalCalibrationTool:
             ]
             for flag_bit in flag_bits:
                 assert np.all(output.pixel_mask & flag_bit == 0)
+
+    def test_streaming(self):
+        """
+        Test that the streaming statistics give the same pedestals as the buffered
+        waveforms
+        """
+
+        run_number = runs["Run number"][0]
+        run_file = runs["Run file"][0]
+        max_events = 20
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            outputs = []
+            for streaming in [False, True]:
+                # run tool
+                tool = PedestalNectarCAMCalibrationTool(
+                    run_number=run_number,
+                    run_file=run_file,
+                    max_events=max_events,
+                    log_level=0,
+                    output_path=tmpdirname + f"/pedestal_{streaming}.h5",
+                    overwrite=True,
+                    filter_method="WaveformsStdFilter",
+                    wfs_std_threshold=4.0,
+                    ucts_tmin=1674462932637854793,
+                    pixel_mask_nevents_min=1,
+                    streaming=streaming,
+                )
+
+                # tool.initialize()
+                tool.setup()
+
+                tool.start()
+                outputs.append(tool.finish(return_output_component=True)[0])
+
+            for field in [
+                "nevents",
+                "ucts_timestamp_min",
+                "ucts_timestamp_max",
+                "pedestal_mean_hg",
+                "pedestal_mean_lg",
+                "pedestal_std_hg",
+                "pedestal_std_lg",
+                "pixel_mask",
+            ]:
+                assert np.allclose(outputs[0][field], outputs[1][field])
+            assert np.all(outputs[0].pixels_id == outputs[1].pixels_id)
+            assert outputs[0].nsamples == outputs[1].nsamples
@@ -6,7 +6,7 @@ from argparse import ArgumentError
 import numpy as np
 import numpy.ma as ma
 from ctapipe.containers import EventType
-from ctapipe.core.traits import Dict, Unicode
+from ctapipe.core.traits import Dict, Integer, Unicode, observe
 from ctapipe.image.extractor import FixedWindowSum  # noqa: F401
 from ctapipe.image.extractor import FullWaveformSum  # noqa: F401
 from ctapipe.image.extractor import GlobalPeakWindowSum  # noqa: F401
@@ -20,7 +20,7 @@ from ctapipe.image.extractor import (  # noqa: F401
 from ctapipe.instrument import SubarrayDescription
 from ctapipe_io_nectarcam import constants
 from ctapipe_io_nectarcam.containers import NectarCAMDataContainer
-from numba import bool_, float64, guvectorize, int64
+from numba import njit, prange
 
 from ...data.container import (
     ChargesContainer,
@@ -28,7 +28,9 @@ from ...data.container import (
     WaveformsContainer,
     WaveformsContainers,
 )
-from ..extractor.utils import CtapipeExtractor
+from ...utils.buffer import ColumnBuffer
+from ..extractor.batch_extractor import BatchExtractor
+from ..extractor.charge_extractor import gradient_extractor  # noqa: F401
 from .core import ArrayDataComponent
 
 logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
@@ -52,63 +54,61 @@ list_ctapipe_charge_extractor = [
 list_nectarchain_charge_extractor = ["gradient_extractor"]
 
 
-@guvectorize(
-    [
-        (int64[:], float64[:], bool_, bool_[:], int64[:]),
-    ],
-    "(s),(n),()->(n),(n)",
-    nopython=True,
-    cache=True,
-)
-def make_histo(charge, all_range, mask_broken_pix, _mask, hist_ma_data):
-    """Compute histogram of charge with numba.
+@njit(parallel=True, cache=True)
+def _fill_compact_histo(charge, good_pixels, shifts, counts):
+    """Fill the histograms of the pixels with numba, the pixels in parallel.
 
     Parameters
     ----------
-        charge (np.ndarray(pixels,nevents)): charge
-        all_range (np.ndarray(nbins)): charge range
-        mask_broken_pix (np.ndarray(pixels)): mask on broxen pixels
-        _mask (np.ndarray(pixels,nbins)): mask
-        hist_ma_data (np.ndarray(pixels,nbins)): histogram
+        charge (np.ndarray(nevents,pixels)): integer charge
+        good_pixels (np.ndarray(ngood)): indices of the pixels to fill
+        shifts (np.ndarray(ngood)): index in counts of the null charge of each pixel
+        counts (np.ndarray(nbins)): histograms of all the pixels, concatenated
     """
-    # print(f"charge.shape = {charge.shape[0]}")
-    # print(f"_mask.shape = {_mask.shape[0]}")
-    # print(f"_mask[0] = {_mask[0]}")
-    # print(f"hist_ma_data[0] = {hist_ma_data[0]}")
-    # print(f"mask_broken_pix = {mask_broken_pix}")
-
-    if not (mask_broken_pix):
-        # print("this pixel is not broken, let's continue computation")
-        hist, _charge = np.histogram(
-            charge,
-            bins=np.arange(
-                np.uint16(np.min(charge)) - 1, np.uint16(np.max(charge)) + 2, 1
-            ),
+    for k in prange(good_pixels.shape[0]):
+        pixel = good_pixels[k]
+        shift = shifts[k]
+        for event in range(charge.shape[0]):
+            counts[charge[event, pixel] + shift] += 1
+
+
+def make_compact_histo(charge, mask_broken_pix):
+    """Compute the histograms of the integer charges of the pixels in one pass.
+
+    The bins are of width 1, the bin ``i`` of a pixel counting the charges ``offset
+    + i``. The histogram of each pixel spans from one bin below its minimal charge
+    to its maximal charge, and the histograms of all the pixels are held by a
+    single array, so that no (pixels, bins) array is needed.
+
+    Parameters
+    ----------
+        charge (np.ndarray(nevents,pixels)): integer charge
+        mask_broken_pix (np.ndarray(pixels)): mask on broken pixels, which have an
+            empty histogram
+
+    Returns
+    -------
+        offsets (np.ndarray(pixels)): charge of the first bin of each pixel
+        counts (list of np.ndarray): histogram of each pixel, views of the same array
+    """
+    charge = np.asarray(charge)
+    good_pixels = np.flatnonzero(~np.asarray(mask_broken_pix, dtype=bool))
+    offsets = np.zeros(charge.shape[1], dtype=np.int64)
+    lengths = np.zeros(charge.shape[1], dtype=np.int64)
+    if charge.shape[0] > 0:
+        offsets[good_pixels] = np.min(charge, axis=0)[good_pixels].astype(np.int64) - 1
+        lengths[good_pixels] = (
+            np.max(charge, axis=0)[good_pixels].astype(np.int64)
+            - offsets[good_pixels]
+            + 1
         )
-        # print(f"hist.shape[0] = {hist.shape[0]}")
-        # print(f"charge.shape[0] = {_charge.shape[0]}")
-        charge_edges = np.array(
-            [np.mean(_charge[i : i + 2]) for i in range(_charge.shape[0] - 1)]
+    ends = np.cumsum(lengths)
+    flat_counts = np.zeros(ends[-1] if len(ends) > 0 else 0, dtype=np.int64)
+    if len(flat_counts) > 0:
+        _fill_compact_histo(
+            charge, good_pixels, (ends - lengths - offsets)[good_pixels], flat_counts
         )
-        # print(f"charge_edges.shape[0] = {charge_edges.shape[0]}")
-        mask = (all_range >= charge_edges[0]) * (all_range <= charge_edges[-1])
-        # print(f"all_range = {int(all_range[0])}-{int(all_range[-1])}")
-        # print(f"charge_edges[0] = {int(charge_edges[0])}")
-        # print(f"charge_edges[-1] = {int(charge_edges[-1])}")
-        # print(f"mask[0] = {mask[0]}")
-        # print(f"mask[-1] = {mask[-1]}")
-
-        # MASK THE DATA
-        # print(f"mask.shape = {mask.shape[0]}")
-        _mask[:] = ~mask
-        # print(f"_mask[0] = {_mask[0]}")
-        # print(f"_mask[-1] = {_mask[-1]}")
-        # FILL THE DATA
-        hist_ma_data[mask] = hist
-        # print("work done")
-    else:
-        # print("this pixel is broken, skipped")
-        pass
+    return offsets, np.split(flat_counts, ends[:-1])
 
 
 class ChargesComponent(ArrayDataComponent):
@@ -122,6 +122,11 @@ class ChargesComponent(ArrayDataComponent):
         help="The kwargs to be pass to the charge extractor method",
     ).tag(config=True)
 
+    events_per_block = Integer(
+        default_value=50,
+        help="the number of events whose charges are extracted at once",
+    ).tag(config=True)
+
     SubComponents = copy.deepcopy(ArrayDataComponent.SubComponents)
     SubComponents.read_only = True
 
@@ -135,6 +140,30 @@ class ChargesComponent(ArrayDataComponent):
         self.__peak_hg = {}
         self.__peak_lg = {}
 
+        self.__imageExtractor = None
+        self.__block = {}
+
+    @observe("method", "extractor_kwargs")
+    def _reset_imageExtractor(self, change):
+        """Drop the cached charge extractor when the method or its kwargs change."""
+        self.__imageExtractor = None
+
+    @property
+    def imageExtractor(self):
+        """The charge extractor of the component, built once from the `method` and
+        `extractor_kwargs` traits and then reused for every event.
+
+        Returns
+        -------
+        imageExtractor:
+            An instance of the charge extraction method.
+        """
+        if self.__imageExtractor is None:
+            self.__imageExtractor = __class__._get_imageExtractor(
+                self.method, self.subarray, **self.extractor_kwargs
+            )
+        return self.__imageExtractor
+
     def _init_trigger_type(self, trigger_type: EventType, **kwargs):
         """Initializes the ChargesMaker based on the trigger type.
 
@@ -150,10 +179,18 @@ class ChargesComponent(ArrayDataComponent):
         super()._init_trigger_type(trigger_type, **kwargs)
         name = __class__._get_name_trigger(trigger_type)
         log.info(f"initialization of the ChargesMaker following trigger type : {name}")
-        self.__charges_hg[f"{name}"] = []
-        self.__charges_lg[f"{name}"] = []
-        self.__peak_hg[f"{name}"] = []
-        self.__peak_lg[f"{name}"] = []
+        self.__charges_hg[f"{name}"] = __class__._init_buffer(
+            "charges_hg", container_class=ChargesContainer
+        )
+        self.__charges_lg[f"{name}"] = __class__._init_buffer(
+            "charges_lg", container_class=ChargesContainer
+        )
+        self.__peak_hg[f"{name}"] = __class__._init_buffer(
+            "peak_hg", container_class=ChargesContainer
+        )
+        self.__peak_lg[f"{name}"] = __class__._init_buffer(
+            "peak_lg", container_class=ChargesContainer
+        )
 
     def __call__(
         self,
@@ -170,25 +207,60 @@ class ChargesComponent(ArrayDataComponent):
             event, self._pixels_id
         )
 
-        imageExtractor = __class__._get_imageExtractor(
-            self.method, self.subarray, **self.extractor_kwargs
-        )
+        if not (name in self.__block.keys()):
+            self.__block[f"{name}"] = {
+                key: ColumnBuffer(dtype=array.dtype, capacity=self.events_per_block)
+                for key, array in [
+                    ("wfs_hg", wfs_hg_tmp),
+                    ("wfs_lg", wfs_lg_tmp),
+                    ("broken_pixels_hg", broken_pixels_hg),
+                    ("broken_pixels_lg", broken_pixels_lg),
+                ]
+            }
+        block = self.__block[f"{name}"]
+        block["wfs_hg"].append(wfs_hg_tmp)
+        block["wfs_lg"].append(wfs_lg_tmp)
+        block["broken_pixels_hg"].append(broken_pixels_hg)
+        block["broken_pixels_lg"].append(broken_pixels_lg)
+        if len(block["wfs_hg"]) >= self.events_per_block:
+            self._extract_block(name)
+
+    def _extract_block(self, name: str):
+        """Extracts the charges of the events waiting in the block of a trigger type,
+        with the batched extractor, and empties the block.
 
-        __image = CtapipeExtractor.get_image_peak_time(
-            imageExtractor(
-                wfs_hg_tmp, self.TEL_ID, constants.HIGH_GAIN, broken_pixels_hg
-            )
+        Parameters
+        ----------
+            name (str): The name of the trigger type.
+        """
+        block = self.__block[f"{name}"]
+        if len(block["wfs_hg"]) == 0:
+            return
+        batchExtractor = BatchExtractor(self.imageExtractor)
+        charges_hg, peak_hg = batchExtractor(
+            block["wfs_hg"].data,
+            self.TEL_ID,
+            constants.HIGH_GAIN,
+            block["broken_pixels_hg"].data,
         )
-        self.__charges_hg[f"{name}"].append(__image[0])
-        self.__peak_hg[f"{name}"].append(__image[1])
-
-        __image = CtapipeExtractor.get_image_peak_time(
-            imageExtractor(
-                wfs_lg_tmp, self.TEL_ID, constants.LOW_GAIN, broken_pixels_lg
-            )
+        self.__charges_hg[f"{name}"].extend(charges_hg)
+        self.__peak_hg[f"{name}"].extend(peak_hg)
+        charges_lg, peak_lg = batchExtractor(
+            block["wfs_lg"].data,
+            self.TEL_ID,
+            constants.LOW_GAIN,
+            block["broken_pixels_lg"].data,
         )
-        self.__charges_lg[f"{name}"].append(__image[0])
-        self.__peak_lg[f"{name}"].append(__image[1])
+        self.__charges_lg[f"{name}"].extend(charges_lg)
+        self.__peak_lg[f"{name}"].extend(peak_lg)
+        for buffer in block.values():
+            buffer.clear()
+
+    def _extract_blocks(self):
+        """Extracts the charges of the events waiting in the blocks of all the trigger
+        types."""
+        for name in self.__block.keys():
+            self._extract_block(name)
 
     @staticmethod
     def _get_extractor_kwargs_from_method_and_kwargs(method: str, kwargs: dict):
@@ -257,6 +329,7 @@ class ChargesComponent(ArrayDataComponent):
         -------
             list: A list of ChargesContainer objects.
         """
+        self._extract_blocks()
         output = ChargesContainers()
         for i, trigger in enumerate(self.trigger_list):
             chargesContainer = ChargesContainer(
@@ -399,10 +472,8 @@ class ChargesComponent(ArrayDataComponent):
         : np.ndarray
             The charges for the specific trigger type.
         """
-        return np.array(
-            self.__charges_hg[__class__._get_name_trigger(trigger)],
-            dtype=ChargesContainer.fields["charges_hg"].dtype,
-        )
+        self._extract_blocks()
+        return self.__charges_hg[__class__._get_name_trigger(trigger)].to_array()
 
     def charges_lg(self, trigger: EventType):
         """Returns the charges for a specific trigger type as a NumPy array of unsigned
@@ -418,10 +489,8 @@ class ChargesComponent(ArrayDataComponent):
         : np.ndarray
             The charges for the specific trigger type.
         """
-        return np.array(
-            self.__charges_lg[__class__._get_name_trigger(trigger)],
-            dtype=ChargesContainer.fields["charges_lg"].dtype,
-        )
+        self._extract_blocks()
+        return self.__charges_lg[__class__._get_name_trigger(trigger)].to_array()
 
     def peak_hg(self, trigger: EventType):
         """Returns the peak charges for a specific trigger type as a NumPy array of
@@ -437,10 +506,8 @@ class ChargesComponent(ArrayDataComponent):
         : np.ndarray
             The peak charges for the specific trigger type.
         """
-        return np.array(
-            self.__peak_hg[__class__._get_name_trigger(trigger)],
-            dtype=ChargesContainer.fields["peak_hg"].dtype,
-        )
+        self._extract_blocks()
+        return self.__peak_hg[__class__._get_name_trigger(trigger)].to_array()
 
     def peak_lg(self, trigger: EventType):
         """Returns the peak charges for a specific trigger type as a NumPy array of
@@ -456,10 +523,8 @@ class ChargesComponent(ArrayDataComponent):
         : np.ndarray
             The peak charges for the specific trigger type.
         """
-        return np.array(
-            self.__peak_lg[__class__._get_name_trigger(trigger)],
-            dtype=ChargesContainer.fields["peak_lg"].dtype,
-        )
+        self._extract_blocks()
+        return self.__peak_lg[__class__._get_name_trigger(trigger)].to_array()
 
     @staticmethod
     def _create_from_waveforms_looping_eventType(
@@ -530,9 +595,11 @@ class ChargesComponent(ArrayDataComponent):
         subarray: SubarrayDescription,
         method: str = "FullWaveformSum",
         tel_id: int = None,
+        events_per_block: int = None,
         **kwargs,
     ):
-        """Compute charge from waveforms.
+        """Compute charge from waveforms. The events are processed by blocks with the
+        batched charge extractor.
 
         Parameters
         ----------
@@ -542,6 +609,9 @@ class ChargesComponent(ArrayDataComponent):
             The channel to compute charges for.
         method : str, optional
             The charge extraction method to use (default is ``FullWaveformSum``).
+        events_per_block : int, optional
+            The number of events extracted at once (default is the
+            ``events_per_block`` trait default value).
         kwargs
             Additional keyword arguments to pass to the charge extraction method.
 
@@ -557,56 +627,42 @@ class ChargesComponent(ArrayDataComponent):
         : tuple
             A tuple containing the computed charges and peak times.
         """
-        # import is here for fix issue with pytest
-        # (TypeError :  inference is not possible with python <3.9 (Numba conflict bc
-        # there is no inference...))
-        from ..extractor.utils import CtapipeExtractor
-
         if tel_id is None:
             tel_id = __class__.TEL_ID.default_value
+        if events_per_block is None:
+            events_per_block = __class__.events_per_block.default_value
 
-        imageExtractor = __class__._get_imageExtractor(
-            method=method, subarray=subarray, **kwargs
-        )
         if channel == constants.HIGH_GAIN:
-            out = np.array(
-                [
-                    CtapipeExtractor.get_image_peak_time(
-                        imageExtractor(
-                            waveformsContainer.wfs_hg[i],
-                            tel_id,
-                            channel,
-                            waveformsContainer.broken_pixels_hg[i],
-                        )
-                    )
-                    for i in range(len(waveformsContainer.wfs_hg))
-                ]
-            ).transpose(1, 0, 2)
-            return ChargesContainer.fields["charges_hg"].dtype.type(
-                out[0]
-            ), ChargesContainer.fields["peak_hg"].dtype.type(out[1])
+            wfs, broken_pixels = (
+                waveformsContainer.wfs_hg,
+                waveformsContainer.broken_pixels_hg,
+            )
+            charges_field, peak_field = "charges_hg", "peak_hg"
         elif channel == constants.LOW_GAIN:
-            out = np.array(
-                [
-                    CtapipeExtractor.get_image_peak_time(
-                        imageExtractor(
-                            waveformsContainer.wfs_lg[i],
-                            tel_id,
-                            channel,
-                            waveformsContainer.broken_pixels_lg[i],
-                        )
-                    )
-                    for i in range(len(waveformsContainer.wfs_lg))
-                ]
-            ).transpose(1, 0, 2)
-            return ChargesContainer.fields["charges_lg"].dtype.type(
-                out[0]
-            ), ChargesContainer.fields["peak_lg"].dtype.type(out[1])
+            wfs, broken_pixels = (
+                waveformsContainer.wfs_lg,
+                waveformsContainer.broken_pixels_lg,
+            )
+            charges_field, peak_field = "charges_lg", "peak_lg"
         else:
             raise ArgumentError(
                 None, f"channel must be {constants.LOW_GAIN} or {constants.HIGH_GAIN}"
             )
 
+        batchExtractor = BatchExtractor(
+            __class__._get_imageExtractor(method=method, subarray=subarray, **kwargs)
+        )
+        charges = np.empty(wfs.shape[:-1], dtype=np.float32)
+        peak = np.empty(wfs.shape[:-1], dtype=np.float32)
+        for start in range(0, len(wfs), events_per_block):
+            block = slice(start, start + events_per_block)
+            charges[block], peak[block] = batchExtractor(
+                wfs[block], tel_id, channel, broken_pixels[block]
+            )
+        return ChargesContainer.fields[charges_field].dtype.type(
+            charges
+        ), ChargesContainer.fields[peak_field].dtype.type(peak)
+
     @staticmethod
     def histo_hg(
         chargesContainer: ChargesContainer, n_bins: int = 1000, autoscale: bool = True
@@ -695,7 +751,8 @@ class ChargesComponent(ArrayDataComponent):
         : ma.masked_array
             A masked array representing the charge histogram, where each row
             corresponds to an event and each column corresponds to a bin in the
-            histogram.
+            histogram. With ``autoscale``, the bins of each pixel start at its
+            smallest charge, the bins beyond its largest charge are masked.
         """
         mask_broken_pix = np.array(
             (chargesContainer[field] == chargesContainer[field].mean(axis=0)).mean(
@@ -709,32 +766,24 @@ class ChargesComponent(ArrayDataComponent):
         )
 
         if autoscale:
-            all_range = np.arange(
-                np.uint16(np.min(chargesContainer[field].T[~mask_broken_pix].T)) - 0.5,
-                np.uint16(np.max(chargesContainer[field].T[~mask_broken_pix].T)) + 1.5,
-                1,
-            )
-            charge_ma = ma.masked_array(
-                (
-                    all_range.reshape(all_range.shape[0], 1)
-                    @ np.ones((1, chargesContainer[field].shape[1]))
-                ).T,
-                mask=np.zeros(
-                    (chargesContainer[field].shape[1], all_range.shape[0]), dtype=bool
-                ),
-            )
-            broxen_pixels_mask = np.array(
-                [mask_broken_pix for i in range(charge_ma.shape[1])]
-            ).T
             start = time.time()
-            _mask, hist_ma_data = make_histo(
-                chargesContainer[field].T, all_range, mask_broken_pix
+            offsets, counts = make_compact_histo(
+                chargesContainer[field], mask_broken_pix
             )
-            charge_ma.mask = np.logical_or(_mask, broxen_pixels_mask)
-            hist_ma = ma.masked_array(hist_ma_data, mask=charge_ma.mask)
+            lengths = np.array([len(_counts) for _counts in counts], dtype=np.int64)
+            # each pixel keeps its own charge axis, starting at the first bin of its
+            # range, so that the histograms are as wide as the largest range of a
+            # pixel instead of the union of the ranges of all the pixels
+            n_bins = max(1, np.max(lengths, initial=0))
+            histo = np.empty((2, len(offsets), n_bins))
+            histo[1] = offsets[:, np.newaxis] + np.arange(n_bins) + 0.5
+            mask = np.arange(n_bins) >= lengths[:, np.newaxis]
+            histo[0] = 0
+            for pixel in np.flatnonzero(lengths):
+                histo[0, pixel, : lengths[pixel]] = counts[pixel]
             log.debug(f"histogram hg computation time : {time.time() - start} sec")
 
-            return ma.masked_array((hist_ma, charge_ma))
+            return ma.masked_array(histo, mask=np.stack((mask, mask)))
 
         else:
             hist = np.array(
@@ -765,6 +814,7 @@ class ChargesComponent(ArrayDataComponent):
         Returns:
             np.ndarray: The charges_hg attribute.
         """
+        self._extract_blocks()
         return copy.deepcopy(self.__charges_hg)
 
     @property
@@ -774,6 +824,7 @@ class ChargesComponent(ArrayDataComponent):
         Returns:
             np.ndarray: The charges_lg attribute.
         """
+        self._extract_blocks()
         return copy.deepcopy(self.__charges_lg)
 
     @property
@@ -783,6 +834,7 @@ class ChargesComponent(ArrayDataComponent):
         Returns:
             np.ndarray: The peak_hg attribute.
         """
+        self._extract_blocks()
         return copy.deepcopy(self.__peak_hg)
 
     @property
@@ -792,4 +844,5 @@ class ChargesComponent(ArrayDataComponent):
         Returns:
             np.ndarray: The peak_lg attribute.
         """
+        self._extract_blocks()
         return copy.deepcopy(self.__peak_lg)
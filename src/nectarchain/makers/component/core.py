@@ -13,6 +13,7 @@ from ctapipe_io_nectarcam.constants import N_PIXELS
 from ctapipe_io_nectarcam.containers import NectarCAMDataContainer
 
 from ...data.container.core import ArrayDataContainer
+from ...utils.buffer import ColumnBuffer
 
 logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
@@ -118,7 +119,7 @@ class ArrayDataComponent(NectarCAMComponent):
         self.__broken_pixels_lg = {}
 
     def _init_trigger_type(self, trigger: EventType, **kwargs):
-        """Initializes empty lists for different trigger types in the ArrayDataMaker
+        """Initializes empty buffers for different trigger types in the ArrayDataMaker
         class.
 
         Args:
@@ -126,19 +127,37 @@ class ArrayDataComponent(NectarCAMComponent):
             initialized.
 
         Returns:
-            None. The method only initializes the empty lists for the trigger type.
+            None. The method only initializes the empty buffers for the trigger type.
         """
         name = __class__._get_name_trigger(trigger)
-        self.__ucts_timestamp[f"{name}"] = []
-        self.__ucts_busy_counter[f"{name}"] = []
-        self.__ucts_event_counter[f"{name}"] = []
-        self.__event_type[f"{name}"] = []
-        self.__event_id[f"{name}"] = []
-        self.__trig_pattern_all[f"{name}"] = []
-        self.__broken_pixels_hg[f"{name}"] = []
-        self.__broken_pixels_lg[f"{name}"] = []
+        self.__ucts_timestamp[f"{name}"] = __class__._init_buffer("ucts_timestamp")
+        self.__ucts_busy_counter[f"{name}"] = __class__._init_buffer(
+            "ucts_busy_counter"
+        )
+        self.__ucts_event_counter[f"{name}"] = __class__._init_buffer(
+            "ucts_event_counter"
+        )
+        self.__event_type[f"{name}"] = __class__._init_buffer("event_type")
+        self.__event_id[f"{name}"] = __class__._init_buffer("event_id")
+        self.__trig_pattern_all[f"{name}"] = __class__._init_buffer("trig_pattern_all")
+        self.__broken_pixels_hg[f"{name}"] = __class__._init_buffer("broken_pixels_hg")
+        self.__broken_pixels_lg[f"{name}"] = __class__._init_buffer("broken_pixels_lg")
         self.trigger_list.append(trigger)
 
+    @staticmethod
+    def _init_buffer(field: str, container_class=ArrayDataContainer) -> ColumnBuffer:
+        """Creates the buffer used to accumulate the per-event data of a container
+        field, with the dtype of this field.
+
+        Args:
+            field (str): The name of the field.
+            container_class: The container class in which the field is defined.
+
+        Returns:
+            ColumnBuffer: An empty buffer.
+        """
+        return ColumnBuffer(dtype=container_class.fields[field].dtype)
+
     @staticmethod
     def _compute_broken_pixels(wfs_hg, wfs_lg, **kwargs):
         """Computes broken pixels for high and low gain waveforms.
@@ -408,10 +427,7 @@ class ArrayDataComponent(NectarCAMComponent):
             np.ndarray: An array of broken pixels for high gain for the specified
             trigger type.
         """
-        return np.array(
-            self.__broken_pixels_hg[__class__._get_name_trigger(trigger)],
-            dtype=ArrayDataContainer.fields["broken_pixels_hg"].dtype,
-        )
+        return self.__broken_pixels_hg[__class__._get_name_trigger(trigger)].to_array()
 
     @property
     def _broken_pixels_lg(self):
@@ -434,10 +450,7 @@ class ArrayDataComponent(NectarCAMComponent):
             np.ndarray: An array of broken pixels for low gain for the specified
             trigger type.
         """
-        return np.array(
-            self.__broken_pixels_lg[__class__._get_name_trigger(trigger)],
-            dtype=ArrayDataContainer.fields["broken_pixels_lg"].dtype,
-        )
+        return self.__broken_pixels_lg[__class__._get_name_trigger(trigger)].to_array()
 
     @property
     def _ucts_timestamp(self):
@@ -503,10 +516,7 @@ class ArrayDataComponent(NectarCAMComponent):
         Returns:
             np.ndarray: An array of UCTS timestamps for the specified trigger type.
         """
-        return np.array(
-            self.__ucts_timestamp[__class__._get_name_trigger(trigger)],
-            dtype=ArrayDataContainer.fields["ucts_timestamp"].dtype,
-        )
+        return self.__ucts_timestamp[__class__._get_name_trigger(trigger)].to_array()
 
     def ucts_busy_counter(self, trigger: EventType):
         """Returns an array of UCTS busy counters for the specified trigger type.
@@ -518,10 +528,7 @@ class ArrayDataComponent(NectarCAMComponent):
         Returns:
             np.ndarray: An array of UCTS busy counters for the specified trigger type.
         """
-        return np.array(
-            self.__ucts_busy_counter[__class__._get_name_trigger(trigger)],
-            dtype=ArrayDataContainer.fields["ucts_busy_counter"].dtype,
-        )
+        return self.__ucts_busy_counter[__class__._get_name_trigger(trigger)].to_array()
 
     def ucts_event_counter(self, trigger: EventType):
         """Returns an array of UCTS event counters for the specified trigger type.
@@ -533,10 +540,9 @@ class ArrayDataComponent(NectarCAMComponent):
         Returns:
             np.ndarray: An array of UCTS event counters for the specified trigger type.
         """
-        return np.array(
-            self.__ucts_event_counter[__class__._get_name_trigger(trigger)],
-            dtype=ArrayDataContainer.fields["ucts_event_counter"].dtype,
-        )
+        return self.__ucts_event_counter[
+            __class__._get_name_trigger(trigger)
+        ].to_array()
 
     def event_type(self, trigger: EventType):
         """Returns an array of event types for the specified trigger type.
@@ -548,10 +554,7 @@ class ArrayDataComponent(NectarCAMComponent):
         Returns:
             np.ndarray: An array of event types for the specified trigger type.
         """
-        return np.array(
-            self.__event_type[__class__._get_name_trigger(trigger)],
-            dtype=ArrayDataContainer.fields["event_type"].dtype,
-        )
+        return self.__event_type[__class__._get_name_trigger(trigger)].to_array()
 
     def event_id(self, trigger: EventType):
         """Returns an array of event IDs for the specified trigger type.
@@ -562,10 +565,7 @@ class ArrayDataComponent(NectarCAMComponent):
         Returns:
             np.ndarray: An array of event IDs for the specified trigger type.
         """
-        return np.array(
-            self.__event_id[__class__._get_name_trigger(trigger)],
-            dtype=ArrayDataContainer.fields["event_id"].dtype,
-        )
+        return self.__event_id[__class__._get_name_trigger(trigger)].to_array()
 
     def multiplicity(self, trigger: EventType):
         """Returns an array of multiplicities for the specified trigger type.
@@ -613,7 +613,4 @@ class ArrayDataComponent(NectarCAMComponent):
             np.ndarray: An array of trigger patterns for all events for the specified
             trigger type.
         """
-        return np.array(
-            self.__trig_pattern_all[f"{__class__._get_name_trigger(trigger)}"],
-            dtype=ArrayDataContainer.fields["trig_pattern_all"].dtype,
-        )
+        return self.__trig_pattern_all[__class__._get_name_trigger(trigger)].to_array()
@@ -4,12 +4,13 @@ import logging
 import numpy as np
 import numpy.ma as ma
 from ctapipe.containers import EventType
-from ctapipe.core.traits import Dict, Float, Integer, Unicode
+from ctapipe.core.traits import Bool, Dict, Float, Integer, Unicode
 from ctapipe_io_nectarcam.constants import HIGH_GAIN, LOW_GAIN, N_GAINS
 from ctapipe_io_nectarcam.containers import NectarCAMDataContainer
 
 from ...data.container import NectarCAMPedestalContainer, PedestalFlagBits
 from ...utils import ComponentUtils
+from ...utils.stats import CameraSampleStats, Stats
 from .charges_component import ChargesComponent
 from .core import NectarCAMComponent
 from .waveforms_component import WaveformsComponent
@@ -27,10 +28,15 @@ class PedestalEstimationComponent(NectarCAMComponent):
     """Component that computes calibration pedestal coefficients from raw data.
     Waveforms can be filtered based on time, standard deviation of the waveforms or
     charge distribution within the sample. Use the ``events_per_slice`` parameter of
-    ``NectarCAMComponent`` to reduce memory load.
+    ``NectarCAMComponent`` to reduce memory load, or the ``streaming`` mode in which
+    the waveforms are not buffered.
 
     Parameters
     ----------
+    streaming : bool
+        If True, the pedestal statistics are updated event by event with Welford's
+        algorithm, the memory load does not depend on the number of events. Not
+        available with the ChargeDistributionFilter method.
     ucts_tmin : int
         Minimum UCTS timestamp for events used in pedestal estimation
     ucts_tmax : int
@@ -62,6 +68,12 @@ class PedestalEstimationComponent(NectarCAMComponent):
         flagged as bad
     """
 
+    streaming = Bool(
+        False,
+        help="Update the pedestal statistics event by event instead of buffering the "
+        "waveforms, not available with the ChargeDistributionFilter method",
+    ).tag(config=True)
+
     ucts_tmin = Integer(
         None,
         help="Minimum UCTS timestamp for events used in pedestal estimation",
@@ -152,10 +164,15 @@ class PedestalEstimationComponent(NectarCAMComponent):
         """Component that computes calibration pedestal coefficients from raw data.
         Waveforms can be filtered based on time, standard deviation of the waveforms or
         charge distribution within the sample. Use the ``events_per_slice`` parameter of
-        ``NectarCAMComponent`` to reduce memory load.
+        ``NectarCAMComponent`` to reduce memory load, or the ``streaming`` mode in
+        which the waveforms are not buffered.
 
         Parameters
         ----------
+        streaming : bool
+            If True, the pedestal statistics are updated event by event with Welford's
+            algorithm, the memory load does not depend on the number of events. Not
+            available with the ChargeDistributionFilter method.
         ucts_tmin : int
             Minimum UCTS timestamp for events used in pedestal estimation
         ucts_tmax : int
@@ -185,6 +202,20 @@ class PedestalEstimationComponent(NectarCAMComponent):
         self._wfs_mask = None
         self._ped_stats = {}
 
+        # streaming statistics
+        self._streaming = self.streaming
+        if self._streaming and self.filter_method == "ChargeDistributionFilter":
+            log.warning(
+                "the ChargeDistributionFilter method needs the charges of all the "
+                "events, the waveforms will be buffered"
+            )
+            self._streaming = False
+        self._sample_stats = None
+        self._nevents = 0
+        self._nevents_filtered = 0
+        self._ucts_timestamp_min = None
+        self._ucts_timestamp_max = None
+
         # initialize waveforms component
         waveformsComponent_kwargs = {}
         waveformsComponent_configurable_traits = ComponentUtils.get_configurable_traits(
@@ -322,10 +353,49 @@ class PedestalEstimationComponent(NectarCAMComponent):
         """Fill the waveform container looping over the events of type SKY_PEDESTAL."""
 
         if event.trigger.event_type == EventType.SKY_PEDESTAL:
-            self.waveformsComponent(event=event, *args, **kwargs)
+            if self._streaming:
+                self._update_stats(event)
+            else:
+                self.waveformsComponent(event=event, *args, **kwargs)
         else:
             pass
 
+    def _update_stats(self, event: NectarCAMDataContainer):
+        """Update the streaming statistics with the waveforms of an event, applying the
+        time selection and the WaveformsStdFilter method to this event only."""
+        waveforms = event.r0.tel[0].waveform[:, self._pixels_id]
+        if self._sample_stats is None:
+            self._sample_stats = CameraSampleStats(shape=waveforms.shape)
+        ucts_timestamp = event.nectarcam.tel[
+            self.waveformsComponent.TEL_ID
+        ].evt.ucts_timestamp
+        if self._nevents == 0:
+            self._ucts_timestamp_min = ucts_timestamp
+            self._ucts_timestamp_max = ucts_timestamp
+        else:
+            self._ucts_timestamp_min = min(self._ucts_timestamp_min, ucts_timestamp)
+            self._ucts_timestamp_max = max(self._ucts_timestamp_max, ucts_timestamp)
+        self._nevents += 1
+
+        # Time selection
+        if (self.ucts_tmin and ucts_timestamp < self.ucts_tmin) or (
+            self.ucts_tmax and ucts_timestamp > self.ucts_tmax
+        ):
+            self._nevents_filtered += 1
+            return
+
+        validmask = None
+        if self.filter_method == "WaveformsStdFilter":
+            # Mask the pixels with a high gain waveform std above the threshold
+            valid_pixels = np.std(waveforms[HIGH_GAIN], axis=1) <= (
+                self.wfs_std_threshold
+            )
+            if not np.all(valid_pixels):
+                validmask = np.broadcast_to(
+                    valid_pixels[np.newaxis, :, np.newaxis], waveforms.shape
+                )
+        self._sample_stats.add(waveforms, validmask=validmask)
+
     def timestamp_mask(self, tmin, tmax):
         """Generates a mask to filter waveforms outside the required time interval.
 
@@ -490,6 +560,9 @@ class PedestalEstimationComponent(NectarCAMComponent):
         """Finish the component by filtering the waveforms and calculating the pedestal
         quantities."""
 
+        if self._streaming:
+            return self._finish_stats()
+
         # Use only pedestal type events
         waveformsContainers = self.waveformsComponent.finish()
         self._waveformsContainers = waveformsContainers.containers[
@@ -572,7 +645,7 @@ class PedestalEstimationComponent(NectarCAMComponent):
 
             # compute statistics for the pedestals
             # the statistic names must be valid numpy.ma attributes
-            statistics = ["mean", "std"]
+            statistics = ["mean", "std", "min", "max"]
             self._ped_stats = self.calculate_stats(
                 self._waveformsContainers, self._wfs_mask, statistics
             )
@@ -585,22 +658,175 @@ class PedestalEstimationComponent(NectarCAMComponent):
             # use the first sample for each event/pixel
             # assumes that a waveform is either fully masked or not
             nevents -= np.sum(self._wfs_mask[:, :, 0], axis=0)
+            # sum of the squared deviations, to merge the statistics later on
+            self._ped_stats["m2"] = (
+                self._ped_stats["std"] ** 2 * nevents[np.newaxis, :, np.newaxis]
+            )
 
-            # calculate on the flight which pixels should be flagged as bad
-            pixel_mask = self.flag_bad_pixels(self._ped_stats, nevents)
-
-            # Fill and return output container
-            output = NectarCAMPedestalContainer(
-                nsamples=self._waveformsContainers.nsamples,
-                nevents=nevents,
-                pixels_id=self._waveformsContainers.pixels_id,
-                ucts_timestamp_min=np.uint64(tmin),
-                ucts_timestamp_max=np.uint64(tmax),
-                pedestal_mean_hg=self._ped_stats["mean"][HIGH_GAIN],
-                pedestal_mean_lg=self._ped_stats["mean"][LOW_GAIN],
-                pedestal_std_hg=self._ped_stats["std"][HIGH_GAIN],
-                pedestal_std_lg=self._ped_stats["std"][LOW_GAIN],
-                pixel_mask=pixel_mask,
+            return self._make_output(
+                self._waveformsContainers.nsamples,
+                nevents,
+                self._waveformsContainers.pixels_id,
+                tmin,
+                tmax,
             )
 
-            return output
+    def _finish_stats(self):
+        """Calculate the pedestal quantities from the streaming statistics."""
+        if self._sample_stats is None:
+            log.warning("No pedestal event, pedestals cannot be evaluated")
+            # container with no results
+            return None
+
+        tmin = np.maximum(
+            self.ucts_tmin or self._ucts_timestamp_min, self._ucts_timestamp_min
+        )
+        tmax = np.minimum(
+            self.ucts_tmax or self._ucts_timestamp_max, self._ucts_timestamp_max
+        )
+        log.info(
+            f"{self._nevents - self._nevents_filtered}/{self._nevents} waveforms pass "
+            f"time selection in interval {tmin}-{tmax}."
+        )
+        if self.filter_method not in [None, "WaveformsStdFilter"]:
+            log.warning(f"required filtering method {self.filter_method} not available")
+            log.warning("no filtering applied to waveforms")
+
+        return self.container_from_stats(
+            self._sample_stats, self._pixels_id, tmin, tmax
+        )
+
+    def container_from_stats(self, stats, pixels_id, tmin, tmax):
+        """Calculate the pedestal quantities from Welford's statistics, flag the bad
+        pixels and fill the output container.
+
+        Parameters
+        ----------
+        stats : `~nectarchain.utils.stats.Stats`
+            Statistics of the waveforms with shape (n_chan,n_pixels,n_samples)
+        pixels_id : `numpy.ndarray`
+            IDs of the pixels
+        tmin : int
+            Minimum UCTS timestamp of the events
+        tmax : int
+            Maximum UCTS timestamp of the events
+
+        Returns
+        -------
+        output : `~nectarchain.data.container.NectarCAMPedestalContainer`
+            The pedestal container
+        """
+        # the standard deviation over the events, as numpy.ma.std, and null
+        # quantities for pixels without events
+        count = stats.count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._ped_stats = {
+                "mean": np.where(count > 0, stats.mean, 0.0),
+                "std": np.where(count > 0, np.sqrt(stats._getvars(ddof=0)), 0.0),
+                "min": np.where(count > 0, stats.min, 0.0),
+                "max": np.where(count > 0, stats.max, 0.0),
+                "m2": np.where(count > 0, stats.m2, 0.0),
+            }
+        # number of events per pixel, from the first high gain sample
+        nevents = np.float64(count[HIGH_GAIN, :, 0])
+
+        return self._make_output(
+            np.uint8(stats.shape[-1]),
+            nevents,
+            NectarCAMPedestalContainer.fields["pixels_id"].dtype.type(pixels_id),
+            tmin,
+            tmax,
+        )
+
+    @staticmethod
+    def stats_from_container(pedestalContainer, usable_only=False):
+        """Rebuild Welford's statistics of the waveforms from the sufficient
+        statistics stored in a pedestal container, to merge them exactly with other
+        ones.
+
+        Parameters
+        ----------
+        pedestalContainer : `~nectarchain.data.container.NectarCAMPedestalContainer`
+            The pedestal container. If the sums of the squared deviations are not
+            stored, they are derived from the standard deviations.
+        usable_only : bool
+            If True, the pixels flagged as bad on either channel are left out.
+
+        Returns
+        -------
+        stats : `~nectarchain.utils.stats.Stats`
+            Statistics with shape (n_chan,n_pixels,n_samples)
+        """
+        mean = np.array(
+            [pedestalContainer.pedestal_mean_hg, pedestalContainer.pedestal_mean_lg],
+            dtype=np.float64,
+        )
+        count = np.broadcast_to(
+            pedestalContainer.nevents[np.newaxis, :, np.newaxis], mean.shape
+        ).copy()
+        if usable_only:
+            usable_pixels = np.all(pedestalContainer.pixel_mask == 0, axis=0)
+            count[:, ~usable_pixels] = 0
+        if pedestalContainer.pedestal_m2_hg is None:
+            m2 = (
+                np.array(
+                    [
+                        pedestalContainer.pedestal_std_hg,
+                        pedestalContainer.pedestal_std_lg,
+                    ]
+                )
+                ** 2
+                * count
+            )
+        else:
+            m2 = np.array(
+                [pedestalContainer.pedestal_m2_hg, pedestalContainer.pedestal_m2_lg]
+            )
+        if pedestalContainer.pedestal_min_hg is None:
+            # unknown extrema
+            minimum = np.full(mean.shape, np.inf)
+            maximum = np.full(mean.shape, -np.inf)
+        else:
+            minimum = np.array(
+                [pedestalContainer.pedestal_min_hg, pedestalContainer.pedestal_min_lg],
+                dtype=np.float64,
+            )
+            maximum = np.array(
+                [pedestalContainer.pedestal_max_hg, pedestalContainer.pedestal_max_lg],
+                dtype=np.float64,
+            )
+        # pixels without events do not contribute to the merged statistics
+        empty = count == 0
+        mean[empty] = 0.0
+        m2[empty] = 0.0
+        minimum[empty] = np.inf
+        maximum[empty] = -np.inf
+        return Stats.from_moments(count, mean, m2, minimum, maximum)
+
+    def _make_output(self, nsamples, nevents, pixels_id, tmin, tmax):
+        """Flag the bad pixels and fill the output container from the pedestal
+        statistics."""
+        # calculate on the flight which pixels should be flagged as bad
+        pixel_mask = self.flag_bad_pixels(self._ped_stats, nevents)
+
+        # Fill and return output container
+        output = NectarCAMPedestalContainer(
+            nsamples=nsamples,
+            nevents=nevents,
+            pixels_id=pixels_id,
+            ucts_timestamp_min=np.uint64(tmin),
+            ucts_timestamp_max=np.uint64(tmax),
+            pedestal_mean_hg=self._ped_stats["mean"][HIGH_GAIN],
+            pedestal_mean_lg=self._ped_stats["mean"][LOW_GAIN],
+            pedestal_std_hg=self._ped_stats["std"][HIGH_GAIN],
+            pedestal_std_lg=self._ped_stats["std"][LOW_GAIN],
+            pedestal_m2_hg=self._ped_stats["m2"][HIGH_GAIN],
+            pedestal_m2_lg=self._ped_stats["m2"][LOW_GAIN],
+            pedestal_min_hg=self._ped_stats["min"][HIGH_GAIN],
+            pedestal_min_lg=self._ped_stats["min"][LOW_GAIN],
+            pedestal_max_hg=self._ped_stats["max"][HIGH_GAIN],
+            pedestal_max_lg=self._ped_stats["max"][LOW_GAIN],
+            pixel_mask=pixel_mask,
+        )
+
+        return output
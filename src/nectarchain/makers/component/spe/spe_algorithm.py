@@ -1,10 +1,14 @@
+import atexit
+import contextlib
 import copy
+import json
 import logging
 import multiprocessing as mp
 import os
+import pathlib
 import time
 from inspect import signature
-from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
 from typing import Tuple
 
 import astropy.units as u
@@ -16,18 +20,27 @@ import pyqtgraph as pg
 import yaml
 from astropy.table import QTable
 from ctapipe.core.component import Component
-from ctapipe.core.traits import Bool, Float, Integer, Path, Unicode
+from ctapipe.core.traits import Bool, Float, Integer, List, Path, Unicode
 from iminuit import Minuit
 from matplotlib.colors import to_rgba
 from matplotlib.patches import Rectangle
 from pyqtgraph.Qt import QtGui
 from scipy.optimize import curve_fit
 from scipy.signal import find_peaks, savgol_filter
-from scipy.special import gammainc
 
 from ....data.container import ChargesContainer, SPEfitContainer
-from ....utils import MPE2, MeanValueError, Statistics, UtilsMinuit, weight_gaussian
+from ....utils import (
+    MPE2,
+    MeanValueError,
+    MPE2_batch,
+    MPE2_grad,
+    Statistics,
+    UtilsMinuit,
+    get_ntotalPE,
+    weight_gaussian,
+)
 from ..charges_component import ChargesComponent
+from ..core import ArrayDataComponent
 from .parameters import Parameter, Parameters
 
 mplstyle.use("fast")
@@ -68,6 +81,7 @@ class ContextFit:
         del globals()["_charge"]
         del globals()["_counts"]
         del globals()["_chi2"]
+        del globals()["_chi2_grad"]
 
 
 def init_processes(
@@ -78,6 +92,7 @@ def init_processes(
     global _charge
     global _counts
     global _chi2
+    global _chi2_grad
     _minuitParameters_array = minuitParameters_array
     _charge = charge
     _counts = counts
@@ -95,7 +110,329 @@ def init_processes(
             _counts[int(index)].data[~_charge[int(index)].mask],
         )
 
+    def chi2_grad(pedestal, pp, luminosity, resolution, mean, n, pedestalWidth, index):
+        grad = _class._NG_Likelihood_Chi2_grad(
+            pp,
+            resolution,
+            mean,
+            n,
+            pedestal,
+            pedestalWidth,
+            luminosity,
+            _charge[int(index)].data[~_charge[int(index)].mask],
+            _counts[int(index)].data[~_charge[int(index)].mask],
+        )
+        # in the order of the arguments of chi2, the index being fixed
+        return np.append(grad[[4, 0, 6, 1, 2, 3, 5]], 0)
+
     _chi2 = chi2
+    _chi2_grad = chi2_grad
+
+
+class SharedFitData:
+    """The charge and counts histograms of all the pixels, placed once in shared
+    memory so that the fit workers attach them without any copy.
+
+    Example:
+        >>> with SharedFitData(charge, counts) as sharedFitData:
+        ...     pool.starmap(run_fit_shared, [(cls, sharedFitData.descriptor, ...)])
+    """
+
+    def __init__(self, charge: np.ma.masked_array, counts: np.ma.masked_array):
+        """
+        Parameters
+        ----------
+        charge : np.ma.masked_array
+            The charge histograms, of shape (n_pixels, n_bins).
+        counts : np.ma.masked_array
+            The counts histograms, of shape (n_pixels, n_bins).
+        """
+        self._sharedMemories = []
+        descriptor = []
+        for array in [
+            np.ma.getdata(charge),
+            np.ma.getmaskarray(charge),
+            np.ma.getdata(counts),
+        ]:
+            sharedMemory = SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=sharedMemory.buf)[
+                ...
+            ] = array
+            self._sharedMemories.append(sharedMemory)
+            descriptor.append((sharedMemory.name, array.shape, array.dtype.str))
+        self.descriptor = tuple(descriptor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the shared memory blocks."""
+        for sharedMemory in self._sharedMemories:
+            sharedMemory.close()
+            sharedMemory.unlink()
+        self._sharedMemories = []
+
+    @staticmethod
+    def attach(descriptor: tuple):
+        """Attach the histograms placed in shared memory by another process.
+
+        Parameters
+        ----------
+        descriptor : tuple
+            The ``descriptor`` attribute of the ``SharedFitData`` instance.
+
+        Returns
+        -------
+        tuple
+            The charge and counts masked arrays, views on the shared memory, and the
+            list of the attached ``SharedMemory`` blocks, to be closed once the arrays
+            are no longer used.
+        """
+        sharedMemories = []
+        arrays = []
+        for name, shape, dtype in descriptor:
+            sharedMemory = SharedMemory(name=name)
+            sharedMemories.append(sharedMemory)
+            arrays.append(np.ndarray(shape, dtype=dtype, buffer=sharedMemory.buf))
+        data, mask, counts = arrays
+        charge = np.ma.masked_array(data, mask=mask, copy=False)
+        counts = np.ma.masked_array(counts, mask=mask, copy=False)
+        return charge, counts, sharedMemories
+
+
+_sharedFitData = None
+
+
+def run_fit_shared(
+    _class, descriptor: tuple, i: int, tol: float, minuitParameters: dict
+) -> dict:
+    """Run the fit of a pixel in a worker of the fit pool, the histograms being
+    attached from the shared memory the first time a worker meets them.
+
+    Parameters
+    ----------
+    _class : type
+        The SPE algorithm class, providing the likelihood.
+    descriptor : tuple
+        The ``descriptor`` of the ``SharedFitData`` of the histograms.
+    i : int
+        The index of the fit.
+    tol : float
+        The tolerance of minuit.
+    minuitParameters : dict
+        The minuit parameters of the pixel.
+
+    Returns
+    -------
+    dict
+        The output of ``run_fit``.
+    """
+    global _sharedFitData
+    if _sharedFitData is None or _sharedFitData[0] != (_class, descriptor):
+        if _sharedFitData is not None:
+            for sharedMemory in _sharedFitData[1]:
+                sharedMemory.close()
+        charge, counts, sharedMemories = SharedFitData.attach(descriptor)
+        init_processes(_class, None, charge, counts)
+        _sharedFitData = ((_class, descriptor), sharedMemories)
+    return _class.run_fit(i, tol, minuitParameters=minuitParameters)
+
+
+def run_fit_shared_unpacked(args: tuple) -> dict:
+    """``run_fit_shared`` with its arguments packed in a tuple, for
+    ``Pool.imap_unordered``."""
+    return run_fit_shared(*args)
+
+
+_fitPools = {}
+
+
+def get_fit_pool(nproc: int):
+    """Return the pool of ``nproc`` fit workers, started with the ``spawn`` method
+    the first time it is asked and then reused by the successive fits.
+
+    Parameters
+    ----------
+    nproc : int
+        The number of workers.
+
+    Returns
+    -------
+    multiprocessing.pool.Pool
+        The pool of workers.
+    """
+    pool = _fitPools.get(nproc, None)
+    if pool is None or pool._state != "RUN":
+        pool = mp.get_context("spawn").Pool(nproc)
+        _fitPools[nproc] = pool
+    return pool
+
+
+@atexit.register
+def close_fit_pools(nproc: int = None):
+    """Terminate the pools of fit workers.
+
+    Parameters
+    ----------
+    nproc : int, optional
+        The number of workers of the pool to terminate, all the pools if None.
+    """
+    for _nproc in list(_fitPools.keys()):
+        if nproc is None or _nproc == nproc:
+            pool = _fitPools.pop(_nproc)
+            pool.terminate()
+            pool.join()
+
+
+def get_fit_output_index(output: dict) -> int:
+    """Return the index of the fit of an output of ``run_fit``."""
+    return int(next(iter(output)).rsplit("_", 1)[-1])
+
+
+class SPEfitCheckpoint:
+    """Append-only file of the fit results of the pixels, from which an interrupted
+    fit is resumed.
+
+    Each pixel is written as one JSON line, with its values, errors and fit status,
+    as soon as it is fitted. A line truncated by the interruption is skipped at the
+    reading, and the last line of a pixel written several times is the one kept.
+
+    The first line of the file is a header describing the fit, its run, pixels and
+    configuration. A fit is not resumed from a checkpoint of another fit.
+
+    Example:
+        >>> checkpoint = SPEfitCheckpoint(
+        ...     "SPEfit_run3938.jsonl", {"run_number": 3938, "tol": tol}
+        ... )
+        >>> done = checkpoint.read()
+        >>> with checkpoint:
+        ...     checkpoint.write(pixel_id, run_fit(i, tol))
+    """
+
+    def __init__(self, path, header: dict = None):
+        """
+        Parameters
+        ----------
+        path : str or Path
+            The path of the checkpoint file.
+        header : dict, optional
+            The description of the fit, written at the creation of the file and
+            compared to the one of the file at the reading. It must be serializable
+            to JSON, the other values being written as strings.
+        """
+        self.path = pathlib.Path(path)
+        # the header as read back from the file
+        self.header = (
+            None if header is None else json.loads(json.dumps(header, default=str))
+        )
+        self._file = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a+")
+        # a line truncated by an interruption is ended, so that the next one is not
+        # appended to it
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+        elif self.header is not None:
+            self._file.write(f"{json.dumps({'header': self.header})}\n")
+            self._file.flush()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self._file.close()
+        self._file = None
+
+    def read(self) -> dict:
+        """Read the results of the pixels already fitted.
+
+        Returns
+        -------
+        dict
+            The values, errors and fit status of the pixels, by pixel id.
+
+        Raises
+        ------
+        ValueError
+            If the header of the file is not the one of this checkpoint.
+        """
+        records = {}
+        header = None
+        if not (self.path.exists()):
+            return records
+        with open(self.path) as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    if "header" in record:
+                        header = record["header"]
+                    else:
+                        records[int(record["pixel_id"])] = record
+                except (ValueError, KeyError, TypeError):
+                    log.warning(f"skipping an unreadable line of {self.path}")
+        if (
+            self.header is not None
+            and (header is not None or len(records) > 0)
+            and header != self.header
+        ):
+            e = ValueError(
+                f"the checkpoint {self.path} was written by another fit, with the "
+                f"header {header} instead of {self.header}"
+            )
+            log.error(e, exc_info=True)
+            raise e
+        return records
+
+    def write(self, pixel_id: int, output: dict) -> None:
+        """Append the result of the fit of a pixel.
+
+        Parameters
+        ----------
+        pixel_id : int
+            The id of the pixel.
+        output : dict
+            The output of ``run_fit`` for the pixel.
+        """
+        i = get_fit_output_index(output)
+        record = {
+            "pixel_id": int(pixel_id),
+            "values": np.asarray(output[f"values_{i}"], dtype=np.float64).tolist(),
+            "errors": np.asarray(output[f"errors_{i}"], dtype=np.float64).tolist(),
+            "fit_status": {
+                key: value.item() if isinstance(value, np.generic) else value
+                for key, value in output[f"fit_status_{i}"].items()
+            },
+        }
+        self._file.write(f"{json.dumps(record)}\n")
+        self._file.flush()
+
+    @staticmethod
+    def to_fit_output(record: dict, i: int) -> dict:
+        """Convert a record of the checkpoint into an output of ``run_fit``.
+
+        Parameters
+        ----------
+        record : dict
+            The record of a pixel, as returned by ``read``.
+        i : int
+            The index of the fit.
+
+        Returns
+        -------
+        dict
+            The values, errors and fit status of the pixel, as returned by
+            ``run_fit``.
+        """
+        return {
+            f"values_{i}": np.array(record["values"]),
+            f"errors_{i}": np.array(record["errors"]),
+            f"fit_status_{i}": record["fit_status"],
+        }
 
 
 class SPEalgorithm(Component):
@@ -207,7 +544,11 @@ class SPEalgorithm(Component):
 
     @staticmethod
     def _update_parameters(
-        parameters: Parameters, charge: np.ndarray, counts: np.ndarray, **kwargs
+        parameters: Parameters,
+        charge: np.ndarray,
+        counts: np.ndarray,
+        warm_start_values: dict = None,
+        **kwargs,
     ) -> Parameters:
         """Update the parameters of the FlatFieldSPEMaker class based on the input
         charge and counts data.
@@ -221,6 +562,9 @@ class SPEalgorithm(Component):
             An array of charge values.
         counts (np.ndarray):
             An array of corresponding counts values.
+        warm_start_values (dict, optional):
+            The starting values of the parameters by name, from previous SPE results.
+            If given, they are used instead of the prefit of the data.
         kwargs
             Additional keyword arguments.
 
@@ -230,6 +574,10 @@ class SPEalgorithm(Component):
             The updated parameters object with the pedestal and mean values and their
             corresponding limits.
         """
+        if warm_start_values is not None:
+            return __class__._update_parameters_from_values(
+                parameters, warm_start_values
+            )
         try:
             coeff_ped, coeff_mean = __class__._get_mean_gaussian_fit(
                 charge, counts, **kwargs
@@ -263,6 +611,42 @@ class SPEalgorithm(Component):
             )
         return parameters
 
+    @staticmethod
+    def _update_parameters_from_values(
+        parameters: Parameters, values: dict
+    ) -> Parameters:
+        """Update the starting values of the free parameters from previous SPE
+        results, within their limits. The pedestal is let free within 3 pedestal
+        widths of its starting value.
+
+        Parameters
+        ----------
+        parameters : Parameters
+            The parameters to update.
+        values : dict
+            The starting values of the parameters by name.
+
+        Returns
+        -------
+        parameters : Parameters
+            The updated parameters.
+        """
+        for parameter in parameters.parameters:
+            if parameter.frozen or parameter.name not in values:
+                continue
+            value = values[parameter.name]
+            if np.isfinite(parameter.min):
+                value = max(value, parameter.min)
+            if np.isfinite(parameter.max):
+                value = min(value, parameter.max)
+            parameter.value = value
+        pedestal = parameters["pedestal"]
+        pedestalWidth = parameters["pedestalWidth"]
+        pedestal.min = pedestal.value - 3 * pedestalWidth.value
+        pedestal.max = pedestal.value + 3 * pedestalWidth.value
+        log.debug(f"parameters warm started: {values}")
+        return parameters
+
     @staticmethod
     def _get_mean_gaussian_fit(
         charge: np.ndarray, counts: np.ndarray, pixel_id=None, **kwargs
@@ -453,6 +837,61 @@ class SPEnominalalgorithm(SPEalgorithm):
         help="flag to active multi-processing",
     ).tag(config=True)
 
+    persistent_pool = Bool(
+        True,
+        help="keep the pool of fit workers alive to reuse it for the next fits",
+    ).tag(config=True)
+
+    batched = Bool(
+        False,
+        help="fit all the pixels at once with a Levenberg-Marquardt minimisation run "
+        "in lock-step on their likelihoods, instead of one Minuit fit per pixel",
+    ).tag(config=True)
+
+    pixels_per_batch = Integer(
+        128,
+        help="The number of pixels whose likelihoods are evaluated in one vectorised "
+        "call by the batched fit",
+    ).tag(config=True)
+
+    warm_start = Bool(
+        False,
+        help="seed the fits from the last valid results of the pixels in "
+        "warm_start_SPE_results, or else from the median of the results of their "
+        "neighbours in the camera, instead of the prefit of the charge distribution",
+    ).tag(config=True)
+
+    warm_start_SPE_results = List(
+        Path(),
+        default_value=[],
+        help="The SPE result files the fits are seeded from, the most recent first",
+    ).tag(config=True)
+
+    checkpoint_path = Path(
+        default_value=None,
+        allow_none=True,
+        help="The append-only file the results of the pixels are written to as soon "
+        "as they are fitted, the pixels already in it are not fitted again",
+    ).tag(config=True)
+
+    run_number = Integer(
+        default_value=None,
+        allow_none=True,
+        help="The run of the fitted charges, written in the header of the checkpoint",
+    )
+
+    # the configurable traits which don't change the results of the fits, left out of
+    # the header of the checkpoint
+    _EXECUTION_TRAITS = (
+        "batched",
+        "checkpoint_path",
+        "chunksize",
+        "multiproc",
+        "nproc",
+        "persistent_pool",
+        "pixels_per_batch",
+    )
+
     def __init__(
         self,
         pixels_id: np.ndarray,
@@ -507,6 +946,7 @@ class SPEnominalalgorithm(SPEalgorithm):
             An instance of FlatFieldSingleHHVSPEMaker.
         """
         histo = ChargesComponent.histo_hg(signal, autoscale=True)
+        kwargs.setdefault("run_number", int(signal.run_number))
         return cls(
             pixels_id=signal.pixels_id,
             charge=histo[1],
@@ -647,11 +1087,7 @@ class SPEnominalalgorithm(SPEalgorithm):
             The chi-square value.
         """
         if not (kwargs.get("ntotalPE", False)):
-            for i in range(1000):
-                if gammainc(i + 1, lum) < 1e-5:
-                    ntotalPE = i
-                    break
-            kwargs.update({"ntotalPE": ntotalPE})
+            kwargs.update({"ntotalPE": get_ntotalPE(lum)})
         pdf = MPE2(charge, pp, res, mu2, n, muped, sigped, lum, **kwargs)
         # log.debug(f"pdf : {np.sum(pdf)}")
         Ntot = np.sum(counts)
@@ -662,6 +1098,134 @@ class SPEnominalalgorithm(SPEalgorithm):
         )  # 2 times faster
         return Lik
 
+    @staticmethod
+    def _NG_Likelihood_Chi2_grad(
+        pp: float,
+        res: float,
+        mu2: float,
+        n: float,
+        muped: float,
+        sigped: float,
+        lum: float,
+        charge: np.ndarray,
+        counts: np.ndarray,
+        **kwargs,
+    ) -> np.ndarray:
+        """Calculates the gradient of the chi-square value of
+        ``_NG_Likelihood_Chi2``, from the analytic derivatives of the MPE2
+        function.
+
+        Parameters
+        ----------
+        pp, res, mu2, n, muped, sigped, lum : float
+            The parameters of the model, see ``_NG_Likelihood_Chi2``.
+        charge : np.ndarray
+            An array of charge values.
+        counts : np.ndarray
+            An array of count values.
+        ``**kwargs``
+            Additional keyword arguments.
+
+        Returns
+        -------
+        grad : np.ndarray
+            The derivatives of the chi-square value with respect to pp, res, mu2,
+            n, muped, sigped and lum.
+        """
+        if not (kwargs.get("ntotalPE", False)):
+            kwargs.update({"ntotalPE": get_ntotalPE(lum)})
+        pdf, pdf_grad = MPE2_grad(charge, pp, res, mu2, n, muped, sigped, lum, **kwargs)
+        Ntot = np.sum(counts)
+        mask = counts > 0
+        return np.sum(
+            2 * Ntot * (pdf * Ntot - counts)[mask] / counts[mask] * pdf_grad[:, mask],
+            axis=1,
+        )
+
+    @staticmethod
+    def _NG_Likelihood_residuals_batch(
+        pp: np.ndarray,
+        res: np.ndarray,
+        mu2: np.ndarray,
+        n: np.ndarray,
+        muped: np.ndarray,
+        sigped: np.ndarray,
+        lum: np.ndarray,
+        charge: np.ndarray,
+        counts: np.ndarray,
+        size_charge: int = None,
+    ) -> np.ndarray:
+        """Calculates the residuals of the chi-square of several pixels at once using
+        the MPE2_batch function, the chi-square of each pixel being the sum of its
+        squared residuals.
+
+        Parameters
+        ----------
+        pp, res, mu2, n, muped, sigped, lum : np.ndarray
+            The parameters of each pixel, see ``_NG_Likelihood_Chi2``.
+        charge : np.ndarray
+            The charge values, of shape (n_pixels, n_bins).
+        counts : np.ndarray
+            The count values, of shape (n_pixels, n_bins), null for the bins which
+            are not fitted.
+        size_charge : int, optional
+            The half size of the charge grid of the model, see ``MPE2_batch``.
+
+        Returns
+        -------
+        residuals : np.ndarray
+            The residuals, of shape (n_pixels, n_bins), null for the empty bins.
+        """
+        pdf = MPE2_batch(
+            charge, pp, res, mu2, n, muped, sigped, lum, size_charge=size_charge
+        )
+        Ntot = np.sum(counts, axis=1, keepdims=True)
+        mask = counts > 0
+        return np.divide(
+            pdf * Ntot - counts,
+            np.sqrt(counts),
+            out=np.zeros(counts.shape),
+            where=mask,
+        )
+
+    @staticmethod
+    def _NG_Likelihood_Chi2_batch(
+        pp: np.ndarray,
+        res: np.ndarray,
+        mu2: np.ndarray,
+        n: np.ndarray,
+        muped: np.ndarray,
+        sigped: np.ndarray,
+        lum: np.ndarray,
+        charge: np.ndarray,
+        counts: np.ndarray,
+        size_charge: int = None,
+    ) -> np.ndarray:
+        """Calculates the chi-square values of several pixels at once, as
+        ``_NG_Likelihood_Chi2`` for each pixel.
+
+        Parameters
+        ----------
+        pp, res, mu2, n, muped, sigped, lum : np.ndarray
+            The parameters of each pixel, see ``_NG_Likelihood_Chi2``.
+        charge : np.ndarray
+            The charge values, of shape (n_pixels, n_bins).
+        counts : np.ndarray
+            The count values, of shape (n_pixels, n_bins), null for the bins which
+            are not fitted.
+        size_charge : int, optional
+            The half size of the charge grid of the model, see ``MPE2_batch``.
+
+        Returns
+        -------
+        Lik : np.ndarray
+            The chi-square values, of shape (n_pixels,).
+        """
+        residuals = __class__._NG_Likelihood_residuals_batch(
+            pp, res, mu2, n, muped, sigped, lum, charge, counts, size_charge
+        )
+        return np.sum(residuals**2, axis=1)
+
     # @njit(parallel=True,nopython = True)
     def _make_minuitParameters_array_from_parameters(
         self, pixels_id: np.ndarray = None, **kwargs
@@ -687,6 +1251,11 @@ class SPEnominalalgorithm(SPEalgorithm):
 
         minuitParameters_array = np.empty((npix), dtype=np.object_)
 
+        if kwargs.get("warm_start", self.warm_start):
+            warm_start_values = self._get_warm_start_values(pixels_id)
+        else:
+            warm_start_values = {}
+
         for i, _id in enumerate(pixels_id):
             index = np.where(self.pixels_id == _id)[0][0]
             parameters = self._update_parameters(
@@ -694,6 +1263,7 @@ class SPEnominalalgorithm(SPEalgorithm):
                 self._charge[index].data[~self._charge[index].mask],
                 self._counts[index].data[~self._charge[index].mask],
                 pixel_id=_id,
+                warm_start_values=warm_start_values.get(int(_id)),
                 **kwargs,
             )
             index_parameter = Parameter(name="index", value=index, frozen=True)
@@ -708,14 +1278,78 @@ class SPEnominalalgorithm(SPEalgorithm):
 
         return minuitParameters_array
 
+    def _get_warm_start_values(self, pixels_id: np.ndarray) -> dict:
+        """Get the starting values of the parameters of the pixels from
+        ``warm_start_SPE_results``: the values of the most recent valid result of
+        each pixel, or else the median of the ones of its neighbours in the camera.
+
+        Parameters
+        ----------
+        pixels_id : np.ndarray
+            The ids of the pixels.
+
+        Returns
+        -------
+        dict
+            The starting values of the parameters by name, by pixel id, for the
+            pixels which have a valid result or valid neighbours.
+        """
+        parnames = self._parameters.parnames
+        previous_values = {}
+        for path in self.warm_start_SPE_results:
+            try:
+                result = next(SPEfitContainer.from_hdf5(path))
+            except Exception as e:
+                self.log.warning(f"the SPE results {path} can't be read : {e}")
+                continue
+            for index in np.flatnonzero(result.is_valid):
+                previous_values.setdefault(
+                    int(result.pixels_id[index]),
+                    {name: float(result[name][index][0]) for name in parnames},
+                )
+
+        camera = ArrayDataComponent.CAMERA
+        camera_index = {int(_id): i for i, _id in enumerate(camera.pix_id)}
+        warm_start_values = {}
+        n_from_neighbours = 0
+        for _id in pixels_id:
+            _id = int(_id)
+            if _id in previous_values:
+                warm_start_values[_id] = previous_values[_id]
+            elif _id in camera_index:
+                neighbours_values = [
+                    previous_values[int(neighbour)]
+                    for neighbour in camera.pix_id[camera.neighbors[camera_index[_id]]]
+                    if int(neighbour) in previous_values
+                ]
+                if len(neighbours_values) > 0:
+                    warm_start_values[_id] = {
+                        name: float(
+                            np.median([values[name] for values in neighbours_values])
+                        )
+                        for name in parnames
+                    }
+                    n_from_neighbours += 1
+        self.log.info(
+            f"{len(warm_start_values) - n_from_neighbours} pixels warm started from "
+            f"their previous results, {n_from_neighbours} from their neighbours, "
+            f"{len(pixels_id) - len(warm_start_values)} from the prefit"
+        )
+        return warm_start_values
+
     @staticmethod
-    def run_fit(i: int, tol: float) -> dict:
+    def run_fit(i: int, tol: float, minuitParameters: dict = None) -> dict:
         """Perform a fit on a specific pixel using the Minuit package.
 
         Parameters
         ----------
         i : int
             The index of the pixel to perform the fit on.
+        tol : float
+            The tolerance of minuit.
+        minuitParameters : dict, optional
+            The minuit parameters of the pixel, default to the ``i``-th element of
+            the minuit parameters array of the process.
 
         Returns
         -------
@@ -728,20 +1362,20 @@ class SPEnominalalgorithm(SPEalgorithm):
         log.setLevel(logging.INFO)
 
         log.info("Starting")
+        if minuitParameters is None:
+            minuitParameters = _minuitParameters_array[i]
         minuit_kwargs = {
-            parname: _minuitParameters_array[i]["values"][parname]
-            for parname in _minuitParameters_array[i]["values"]
+            parname: minuitParameters["values"][parname]
+            for parname in minuitParameters["values"]
         }
         log.info(f"creation of fit instance for pixel: {minuit_kwargs['index']}")
-        fit = Minuit(_chi2, **minuit_kwargs)
+        fit = Minuit(_chi2, grad=_chi2_grad, **minuit_kwargs)
         fit.errordef = Minuit.LIKELIHOOD
         fit.strategy = 0
         fit.tol = tol
         fit.print_level = 1
         fit.throw_nan = True
-        UtilsMinuit.set_minuit_parameters_limits_and_errors(
-            fit, _minuitParameters_array[i]
-        )
+        UtilsMinuit.set_minuit_parameters_limits_and_errors(fit, minuitParameters)
         log.info("fit created")
         fit.migrad()
         fit.hesse()
@@ -762,6 +1396,339 @@ class SPEnominalalgorithm(SPEalgorithm):
             f"fit_status_{i}": _fit_status,
         }
 
+    # names of the arguments of the batched likelihood for the fit parameters
+    _BATCH_LIKELIHOOD_ARGUMENTS = {
+        "pp": "pp",
+        "resolution": "res",
+        "mean": "mu2",
+        "n": "n",
+        "pedestal": "muped",
+        "pedestalWidth": "sigped",
+        "luminosity": "lum",
+    }
+
+    @staticmethod
+    def run_fit_batch(
+        minuitParameters_array: np.ndarray,
+        charge: np.ma.masked_array,
+        counts: np.ma.masked_array,
+        tol: float,
+        pixels_per_batch: int = 128,
+        max_iterations: int = 100,
+        callback=None,
+    ) -> list:
+        """Perform the fits of several pixels at once, with a Levenberg-Marquardt
+        minimisation of their chi-squares run in lock-step.
+
+        The residuals of the pixels of a batch are computed by a single call of
+        ``_NG_Likelihood_residuals_batch``, their Jacobian by forward differences,
+        one call per free parameter. The damped Gauss-Newton step of each pixel is
+        then solved independently, within the limits of the parameters. A pixel
+        stops when its estimated distance to the minimum is below the convergence
+        criterion of Migrad, ``0.002 * tol * errordef``, and its errors are computed
+        from the Gauss-Newton approximation of the Hessian, as Hesse with the
+        ``Minuit.LIKELIHOOD`` errordef of ``run_fit``.
+
+        The pixels of a batch share the charge grid of their models, which is only
+        enlarged when the parameters of a pixel need it, so that the model stays a
+        smooth function of the parameters during the minimisation.
+
+        Parameters
+        ----------
+        minuitParameters_array : np.ndarray
+            The minuit parameters of the pixels.
+        charge : np.ma.masked_array
+            The charge histograms of all the pixels, indexed by the ``index``
+            parameter.
+        counts : np.ma.masked_array
+            The counts histograms of all the pixels.
+        tol : float
+            The tolerance of the convergence criterion.
+        pixels_per_batch : int, optional
+            The number of pixels fitted in lock-step.
+        max_iterations : int, optional
+            The maximal number of iterations of a pixel.
+        callback : callable, optional
+            Called with the output of each pixel as soon as its batch is fitted.
+
+        Returns
+        -------
+        : list
+            The dictionaries of the fit values, errors and status of the pixels, as
+            returned by ``run_fit``.
+        """
+        names = list(signature(_chi2).parameters)
+        npix = len(minuitParameters_array)
+        x = np.empty((npix, len(names)))
+        initial_errors = np.empty((npix, len(names)))
+        lower = np.full((npix, len(names)), -np.inf)
+        upper = np.full((npix, len(names)), np.inf)
+        free = np.ones((npix, len(names)), dtype=bool)
+        for i, minuitParameters in enumerate(minuitParameters_array):
+            for j, name in enumerate(names):
+                x[i, j] = minuitParameters["values"][name]
+                initial_errors[i, j] = minuitParameters[f"error_{name}"]
+                min_, max_ = minuitParameters[f"limit_{name}"]
+                if min_ is not None:
+                    lower[i, j] = min_
+                if max_ is not None:
+                    upper[i, j] = max_
+                free[i, j] = not (minuitParameters.get(f"fix_{name}", False))
+        x = np.clip(x, lower, upper)
+
+        # the fitted bins of each pixel packed at the beginning of its histogram
+        rows = x[:, names.index("index")].astype(int)
+        _counts = np.where(
+            np.ma.getmaskarray(charge)[rows], 0, np.ma.getdata(counts)[rows]
+        ).astype(np.float64)
+        nbins = max(1, np.max(np.sum(_counts > 0, axis=1)))
+        packing = np.argsort(_counts <= 0, axis=1, kind="stable")[:, :nbins]
+        _counts = np.take_along_axis(_counts, packing, axis=1)
+        _charge = np.take_along_axis(
+            np.ma.getdata(charge)[rows].astype(np.float64), packing, axis=1
+        )
+
+        # the pixels with similar charge grids are fitted together
+        size_charge = __class__._batch_size_charge(names, x)
+        span = upper - lower
+        output = [None] * npix
+        for start in range(0, npix, pixels_per_batch):
+            batch = np.argsort(size_charge, kind="stable")[
+                start : start + pixels_per_batch
+            ]
+            (
+                x[batch],
+                errors,
+                chi2,
+                converged,
+                stopped,
+            ) = __class__._levenberg_marquardt_batch(
+                names,
+                x[batch],
+                initial_errors[batch],
+                lower[batch],
+                upper[batch],
+                free[batch],
+                _charge[batch],
+                _counts[batch],
+                0.002 * tol * Minuit.LIKELIHOOD,
+                max_iterations,
+            )
+            at_limit = (
+                free[batch]
+                & (
+                    (x[batch] - lower[batch] <= 1e-5 * span[batch])
+                    | (upper[batch] - x[batch] <= 1e-5 * span[batch])
+                )
+                & np.isfinite(span[batch])
+            )
+            valid_parameters = np.all(
+                ~free[batch] | (np.isfinite(errors) & (errors > 0)), axis=1
+            ) & np.isfinite(chi2)
+            for k, i in enumerate(batch):
+                _fit_status = {
+                    "is_valid": bool(converged[k] and valid_parameters[k]),
+                    "has_valid_parameters": bool(valid_parameters[k]),
+                    "has_parameters_at_limit": bool(np.any(at_limit[k])),
+                    "has_reached_call_limit": bool(not (stopped[k])),
+                    "nfit": int(np.sum(free[i])),
+                    "values": chi2[k],
+                }
+                output[i] = {
+                    f"values_{i}": x[i],
+                    f"errors_{i}": errors[k],
+                    f"fit_status_{i}": _fit_status,
+                }
+                if callback is not None:
+                    callback(output[i])
+        return output
+
+    @staticmethod
+    def _batch_size_charge(names: list, x: np.ndarray) -> np.ndarray:
+        """Returns the half size of the charge grid of the MPE2 model of each pixel,
+        from its parameters in the order of ``names``."""
+        mean = x[:, names.index("mean")]
+        luminosity = x[:, names.index("luminosity")]
+        return np.array(
+            [
+                int(_mean * get_ntotalPE(_luminosity) + 10 * _mean)
+                for _mean, _luminosity in zip(mean, luminosity)
+            ]
+        )
+
+    @staticmethod
+    def _levenberg_marquardt_batch(
+        names,
+        x,
+        initial_errors,
+        lower,
+        upper,
+        free,
+        charge,
+        counts,
+        edm_max,
+        max_iterations,
+    ):
+        """Levenberg-Marquardt minimisation of the chi-squares of a batch of
+        pixels, see ``run_fit_batch``.
+
+        Returns
+        -------
+        : tuple
+            The fitted parameters, their errors, the chi-squares, whether the fits
+            converged and whether they stopped before the iterations limit.
+        """
+        arguments = [
+            (__class__._BATCH_LIKELIHOOD_ARGUMENTS[name], j)
+            for j, name in enumerate(names)
+            if name in __class__._BATCH_LIKELIHOOD_ARGUMENTS
+        ]
+
+        def residuals(x, pixels):
+            return __class__._NG_Likelihood_residuals_batch(
+                charge=charge[pixels],
+                counts=counts[pixels],
+                size_charge=grid[0],
+                **{argument: x[:, j] for argument, j in arguments},
+            )
+
+        span = np.where(np.isfinite(upper - lower), upper - lower, np.abs(x) + 1)
+        steps = 1e-5 * span
+
+        def jacobian(x, r, pixels):
+            J = np.zeros(r.shape + (x.shape[1],))
+            for j in np.flatnonzero(np.any(free[pixels], axis=0)):
+                # backward differences at the upper limit
+                step = np.where(
+                    x[:, j] + steps[pixels, j] <= upper[pixels, j],
+                    steps[pixels, j],
+                    -steps[pixels, j],
+                )
+                shifted = x.copy()
+                shifted[:, j] += step
+                J[..., j] = (residuals(shifted, pixels) - r) / step[:, np.newaxis]
+            J *= free[pixels][:, np.newaxis, :]
+            return J
+
+        def normal_equations(J, r):
+            return np.einsum("pbi,pbj->pij", J, J), np.einsum("pbi,pb->pi", J, r)
+
+        def restrict(A, g, movable):
+            # the fixed parameters are decoupled, with null gradient
+            A = (
+                np.where(movable[:, :, np.newaxis] & movable[:, np.newaxis, :], A, 0)
+                + np.eye(A.shape[1]) * ~movable[:, np.newaxis, :]
+            )
+            return A, np.where(movable, g, 0)
+
+        npix = len(x)
+        # the grid is larger than needed, to be kept by the next iterations
+        grid = [int(1.25 * np.max(__class__._batch_size_charge(names, x)))]
+        r = residuals(x, np.arange(npix))
+        chi2 = np.sum(r**2, axis=1)
+        damping = np.full(npix, 1e-3)
+        converged = np.zeros(npix, dtype=bool)
+        stopped = np.zeros(npix, dtype=bool)
+        hessian = np.zeros((npix, x.shape[1], x.shape[1]))
+        for iteration in range(max_iterations):
+            active = np.flatnonzero(~stopped)
+            log.debug(f"iteration {iteration}: {len(active)} pixels still fitted")
+            if len(active) == 0:
+                break
+            size_charge = np.max(__class__._batch_size_charge(names, x[active]))
+            if size_charge > grid[0]:
+                grid[0] = int(1.25 * size_charge)
+                r[active] = residuals(x[active], active)
+                chi2[active] = np.sum(r[active] ** 2, axis=1)
+            A, g = normal_equations(jacobian(x[active], r[active], active), r[active])
+            hessian[active] = A
+            # the parameters at a limit which pull outside are not moved
+            movable = (
+                free[active]
+                & ~((x[active] <= lower[active]) & (g > 0))
+                & ~((x[active] >= upper[active]) & (g < 0))
+            )
+            A, g = restrict(A, g, movable)
+            edm = np.einsum("pi,pij,pj->p", g, np.linalg.pinv(A), g)
+            converged[active] = edm < edm_max
+            stopped[active] = converged[active]
+            A, g, active = (
+                A[~converged[active]],
+                g[~converged[active]],
+                active[~converged[active]],
+            )
+            # the damping of each pixel is raised until its chi-square decreases
+            pending = np.ones(len(active), dtype=bool)
+            for _ in range(10):
+                pixels = active[pending]
+                diagonal = np.diagonal(A[pending], axis1=1, axis2=2)
+                damped = A[pending] + damping[pixels, np.newaxis, np.newaxis] * (
+                    np.eye(A.shape[1])
+                    * np.where(diagonal > 0, diagonal, 1)[:, np.newaxis, :]
+                )
+                with np.errstate(invalid="ignore"):
+                    new_x = np.clip(
+                        x[pixels]
+                        - np.linalg.solve(damped, g[pending][..., np.newaxis])[..., 0],
+                        lower[pixels],
+                        upper[pixels],
+                    )
+                    new_r = residuals(new_x, pixels)
+                new_chi2 = np.sum(new_r**2, axis=1)
+                better = new_chi2 < chi2[pixels]
+                x[pixels[better]] = new_x[better]
+                r[pixels[better]] = new_r[better]
+                chi2[pixels[better]] = new_chi2[better]
+                damping[pixels] = np.where(
+                    better, damping[pixels] / 10, damping[pixels] * 10
+                )
+                pending[pending] = ~better
+                if not (np.any(pending)):
+                    break
+            # the pixels whose chi-square can't be decreased are stopped
+            stopped[active[pending]] = True
+
+        # the Hessian of the pixels which moved since it was computed
+        moved = np.flatnonzero(~converged)
+        if len(moved) > 0:
+            hessian[moved] = normal_equations(
+                jacobian(x[moved], r[moved], moved), r[moved]
+            )[0]
+        A, _ = restrict(hessian, np.zeros(x.shape), free)
+        with np.errstate(invalid="ignore"):
+            errors = np.sqrt(
+                Minuit.LIKELIHOOD * np.diagonal(np.linalg.pinv(A), axis1=1, axis2=2)
+            )
+        errors = np.where(free, errors, initial_errors)
+        return x, errors, chi2, converged, stopped
+
+    def _checkpoint_header(self, pixels_id: np.ndarray, **kwargs) -> dict:
+        """Describe the fit of the pixels for the header of its checkpoint.
+
+        Parameters
+        ----------
+        pixels_id : np.ndarray
+            The ids of the fitted pixels.
+        ``**kwargs``
+            The keyword arguments of ``run``, overriding the traits.
+
+        Returns
+        -------
+        dict
+            The run number, the ids of the pixels, the algorithm and the values of
+            the configurable traits which change the results of the fits.
+        """
+        return {
+            "run_number": self.run_number,
+            "pixels_id": [int(_id) for _id in pixels_id],
+            "algorithm": type(self).__name__,
+            "config": {
+                name: kwargs.get(name, getattr(self, name))
+                for name in sorted(self.trait_names(config=True))
+                if name not in self._EXECUTION_TRAITS
+            },
+        }
+
     def run(
         self,
         pixels_id: np.ndarray = None,
@@ -788,65 +1755,117 @@ class SPEnominalalgorithm(SPEalgorithm):
             self.log.warning("The asked pixels id are all out of the data")
             return None
         else:
+            res = [None] * npix
+            checkpoint_path = kwargs.get("checkpoint_path", self.checkpoint_path)
+            if checkpoint_path is not None:
+                checkpoint = SPEfitCheckpoint(
+                    checkpoint_path, self._checkpoint_header(pixels_id, **kwargs)
+                )
+                records = checkpoint.read()
+                for i, _id in enumerate(pixels_id):
+                    if int(_id) in records:
+                        res[i] = SPEfitCheckpoint.to_fit_output(records[int(_id)], i)
+                self.log.info(
+                    f"{npix - res.count(None)} pixels already fitted in the "
+                    f"checkpoint {checkpoint.path}"
+                )
+            else:
+                checkpoint = contextlib.nullcontext()
+            to_fit = np.array([i for i in range(npix) if res[i] is None], dtype=int)
+
+            def save(output, i=None):
+                j = get_fit_output_index(output)
+                i = j if i is None else i
+                res[i] = {
+                    f"{key}_{i}": output[f"{key}_{j}"]
+                    for key in ["values", "errors", "fit_status"]
+                }
+                if checkpoint_path is not None:
+                    checkpoint.write(pixels_id[i], res[i])
+
             self.log.info("creation of the minuit parameters array")
-            minuitParameters_array = self._make_minuitParameters_array_from_parameters(
-                pixels_id=pixels_id, display=display, **kwargs
-            )
+            minuitParameters_array = np.empty((npix), dtype=np.object_)
+            if len(to_fit) > 0:
+                minuitParameters_array[
+                    to_fit
+                ] = self._make_minuitParameters_array_from_parameters(
+                    pixels_id=pixels_id[to_fit], display=display, **kwargs
+                )
 
             self.log.info("running fits")
             with ContextFit(
                 __class__, minuitParameters_array, self._charge, self._counts
-            ):
-                if self.multiproc:
-                    try:
-                        mp.set_start_method("spawn", force=True)
-                        self.log.info("spawned multiproc")
-                    except RuntimeError:
-                        pass
+            ), checkpoint:
+                if len(to_fit) == 0:
+                    self.log.info("all the pixels are already fitted")
+
+                elif kwargs.get("batched", self.batched):
+                    self.log.info("running the fits in lock-step")
+                    t = time.time()
+                    __class__.run_fit_batch(
+                        minuitParameters_array[to_fit],
+                        self._charge,
+                        self._counts,
+                        kwargs.get("tol", self.tol),
+                        pixels_per_batch=kwargs.get(
+                            "pixels_per_batch", self.pixels_per_batch
+                        ),
+                        callback=lambda output: save(
+                            output, to_fit[get_fit_output_index(output)]
+                        ),
+                    )
+                    self.log.info(
+                        f"time for the batched fits is {time.time() - t:.2e} sec"
+                    )
+
+                elif self.multiproc:
                     nproc = kwargs.get("nproc", self.nproc)
                     chunksize = kwargs.get(
                         "chunksize",
-                        max(self.chunksize, npix // (nproc * 10)),
+                        max(self.chunksize, len(to_fit) // (nproc * 10)),
                     )
                     self.log.info(f"pooling with nproc {nproc}, chunksize {chunksize}")
 
                     t = time.time()
-                    with Pool(
-                        nproc,
-                        initializer=init_processes,
-                        initargs=(
-                            __class__,
-                            minuitParameters_array,
-                            self._charge,
-                            self._counts,
-                        ),
-                    ) as pool:
-                        self.log.info(
-                            f"time to create the Pool is {time.time() - t:.2e} sec"
-                        )
-                        result = pool.starmap_async(
-                            __class__.run_fit,
-                            [(i, kwargs.get("tol", self.tol)) for i in range(npix)],
-                            chunksize=chunksize,
-                        )
-                        result.wait()
+                    pool = get_fit_pool(nproc)
+                    self.log.info(
+                        f"time to create the Pool is {time.time() - t:.2e} sec"
+                    )
+                    tol = kwargs.get("tol", self.tol)
                     try:
-                        res = result.get()
+                        with SharedFitData(self._charge, self._counts) as sharedData:
+                            # the results are saved as they come, whatever their order
+                            for output in pool.imap_unordered(
+                                run_fit_shared_unpacked,
+                                [
+                                    (
+                                        __class__,
+                                        sharedData.descriptor,
+                                        i,
+                                        tol,
+                                        minuitParameters_array[i],
+                                    )
+                                    for i in to_fit
+                                ],
+                                chunksize=chunksize,
+                            ):
+                                save(output)
                     except Exception as e:
                         log.error(e, exc_info=True)
                         raise e
+                    finally:
+                        if not (self.persistent_pool):
+                            close_fit_pools(nproc)
                     self.log.info(
-                        f"total time for multiproc with starmap_async execution is "
+                        f"total time for multiproc with imap_unordered execution is "
                         f"{time.time() - t:.2e} sec"
                     )
 
                 else:
                     self.log.info("running in mono-cpu")
                     t = time.time()
-                    res = [
-                        __class__.run_fit(i, kwargs.get("tol", self.tol))
-                        for i in range(npix)
-                    ]
+                    for i in to_fit:
+                        save(__class__.run_fit(i, kwargs.get("tol", self.tol)))
                     self.log.info(
                         f"time for singleproc execution is {time.time() - t:.2e} sec"
                     )
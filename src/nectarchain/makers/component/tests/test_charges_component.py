@@ -4,7 +4,7 @@ from argparse import ArgumentError
 import numpy as np
 import pytest
 from ctapipe.containers import EventType
-from ctapipe.image import GlobalPeakWindowSum
+from ctapipe.image import FullWaveformSum, GlobalPeakWindowSum
 from ctapipe_io_nectarcam import constants
 
 from nectarchain.data.container import (
@@ -14,6 +14,7 @@ from nectarchain.data.container import (
     WaveformsContainers,
 )
 from nectarchain.makers.component import ChargesComponent
+from nectarchain.makers.component.charges_component import make_compact_histo
 from nectarchain.makers.component.tests.test_core_component import (
     BaseTestArrayDataComponent,
 )
@@ -133,6 +134,31 @@ class TestChargesComponent(BaseTestArrayDataComponent):
             == np.uint16(instance._peak_lg[f"{name}"])
         )
 
+    def test_call_events_per_block(self, instance, event):
+        instance.events_per_block = 2
+        reference = ChargesComponent(
+            subarray=instance.subarray,
+            parent=instance.parent,
+            extractor_kwargs=self.EXTRACTOR_KWARGS,
+            method=self.METHOD,
+            events_per_block=1,
+        )
+        for _ in range(3):
+            instance(event)
+            reference(event)
+        assert np.all(
+            instance.charges_hg(event.trigger.event_type)
+            == reference.charges_hg(event.trigger.event_type)
+        )
+        assert np.all(
+            instance.peak_lg(event.trigger.event_type)
+            == reference.peak_lg(event.trigger.event_type)
+        )
+        assert instance.charges_hg(event.trigger.event_type).shape == (
+            3,
+            self.NPIXELS,
+        )
+
     def test_finish(self, instance, event):
         instance(event)
         output = instance.finish()
@@ -167,6 +193,17 @@ class TestChargesComponent(BaseTestArrayDataComponent):
         output = ChargesComponent._get_imageExtractor(self.METHOD, instance.subarray)
         assert isinstance(output, GlobalPeakWindowSum)
 
+    def test_imageExtractor(self, instance):
+        output = instance.imageExtractor
+        assert isinstance(output, GlobalPeakWindowSum)
+        assert output.window_width.tel[None] == self.EXTRACTOR_KWARGS["window_width"]
+        assert instance.imageExtractor is output
+        instance.extractor_kwargs = {"window_width": 5}
+        assert instance.imageExtractor is not output
+        assert instance.imageExtractor.window_width.tel[None] == 5
+        instance.method = "FullWaveformSum"
+        assert isinstance(instance.imageExtractor, FullWaveformSum)
+
     def test_select_charges_hg(self, charges_container_1):
         output = ChargesComponent.select_charges_hg(
             charges_container_1, pixel_id=np.array([1])
@@ -269,3 +306,40 @@ class TestChargesComponent(BaseTestArrayDataComponent):
             2,
             charges_container_1.npixels,
         )
+
+    def test_make_compact_histo(self):
+        charge = np.array([[3, 10, 7], [5, 12, 7], [5, 10, 7]], dtype=np.uint16)
+        offsets, counts = make_compact_histo(charge, np.array([False, False, True]))
+        assert np.array_equal(offsets, [2, 9, 0])
+        assert np.array_equal(counts[0], [0, 1, 0, 2])
+        assert np.array_equal(counts[1], [0, 2, 0, 1])
+        assert len(counts[2]) == 0
+
+    def test_histo_hg_compact(self):
+        rng = np.random.default_rng(0)
+        charges = rng.integers(100, 200, size=(50, 4), dtype=np.uint16)
+        charges[:, 2] = 150
+        output = ChargesComponent._histo({"charges_hg": charges}, "charges_hg")
+        assert np.all(output.mask[:, 2])
+        for pixel in [0, 1, 3]:
+            hist = output[0, pixel].compressed()
+            charge = output[1, pixel].compressed()
+            assert hist.sum() == 50
+            # each charge is counted in the bin above it
+            assert np.array_equal(
+                hist,
+                np.histogram(
+                    charges[:, pixel], bins=np.append(charge - 0.5, charge[-1] + 0.5)
+                )[0],
+            )
+
+    def test_histo_hg_width(self):
+        # pixels of distant charge ranges
+        rng = np.random.default_rng(0)
+        charges = rng.integers(100, 110, size=(50, 2), dtype=np.uint16)
+        charges[:, 1] += 3000
+        output = ChargesComponent._histo({"charges_hg": charges}, "charges_hg")
+        assert output.shape[2] == np.max(np.ptp(charges, axis=0)) + 2
+        for pixel in range(2):
+            assert output[1, pixel].compressed()[0] == charges[:, pixel].min() - 0.5
+            assert output[0, pixel].sum() == 50
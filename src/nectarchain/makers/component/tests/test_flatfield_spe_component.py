@@ -1,3 +1,4 @@
+import json
 from unittest.mock import patch
 
 import numpy as np
@@ -6,6 +7,7 @@ from ctapipe.utils import get_dataset_path
 
 from nectarchain.data.container import SPEfitContainer
 from nectarchain.makers.component import (
+    ArrayDataComponent,
     ChargesComponent,
     FlatFieldCombinedSPEStdNectarCAMComponent,
     FlatFieldSingleHHVSPENectarCAMComponent,
@@ -13,8 +15,15 @@ from nectarchain.makers.component import (
     FlatFieldSingleNominalSPENectarCAMComponent,
     FlatFieldSingleNominalSPEStdNectarCAMComponent,
 )
-from nectarchain.makers.component.spe.spe_algorithm import SPEalgorithm
+from nectarchain.makers.component.spe.spe_algorithm import (
+    SharedFitData,
+    SPEalgorithm,
+    SPEfitCheckpoint,
+    SPEnominalalgorithm,
+    SPEnominalStdalgorithm,
+)
 from nectarchain.makers.core import BaseNectarCAMCalibrationTool
+from nectarchain.utils.utils import MPE2
 
 
 class TestFlatFieldSingleNominalSPENectarCAMComponent:
@@ -285,3 +294,209 @@ class TestFlatFieldCombinedSPEStdNectarCAMComponent(
             )
         assert isinstance(output, SPEfitContainer)
         assert isinstance(output.is_valid, np.ndarray)
+
+
+class TestSharedFitData:
+    def test_attach(self):
+        charge = np.ma.masked_array(
+            np.random.randn(4, 20), mask=np.random.rand(4, 20) > 0.8
+        )
+        counts = np.ma.masked_array(
+            np.random.randint(0, 100, (4, 20)).astype(np.float64), mask=charge.mask
+        )
+        with SharedFitData(charge, counts) as sharedFitData:
+            attached_charge, attached_counts, sharedMemories = SharedFitData.attach(
+                sharedFitData.descriptor
+            )
+            assert np.array_equal(attached_charge.data, charge.data)
+            assert np.array_equal(attached_charge.mask, charge.mask)
+            assert np.array_equal(attached_counts.data, counts.data)
+            assert np.array_equal(attached_counts.mask, charge.mask)
+            del attached_charge, attached_counts
+            for sharedMemory in sharedMemories:
+                sharedMemory.close()
+
+
+class TestSPEnominalalgorithmBatched:
+    NPIXELS = 2
+    # pp, res, mu2, n, muped, sigped, lum
+    PARAMETERS = np.array(
+        [
+            [0.45, 0.5, 55.0, 0.7, 250.0, 12.0, 1.5],
+            [0.45, 0.5, 60.0, 0.7, 250.0, 11.0, 1.8],
+        ]
+    )
+
+    @pytest.fixture
+    def histo(self):
+        rng = np.random.default_rng(0)
+        x = np.arange(100, 1200) + 0.5
+        counts = np.array(
+            [
+                rng.poisson(np.clip(40000 * MPE2(x, *parameters), 0, None))
+                for parameters in self.PARAMETERS
+            ]
+        ).astype(np.float64)
+        mask = np.zeros(counts.shape, dtype=bool)
+        for i in range(self.NPIXELS):
+            nonzero = np.flatnonzero(counts[i])
+            mask[i, : nonzero[0]] = True
+            mask[i, nonzero[-1] + 1 :] = True
+        return (
+            np.ma.masked_array(np.tile(x, (self.NPIXELS, 1)), mask=mask),
+            np.ma.masked_array(counts, mask=mask),
+        )
+
+    def test_run_batched(self, histo):
+        SPEalgorithm.window_length.default_value = 40
+        results = {}
+        for batched in [True, False]:
+            algorithm = SPEnominalStdalgorithm(
+                np.arange(self.NPIXELS), *histo, multiproc=False
+            )
+            algorithm.run(display=False, batched=batched)
+            results[batched] = algorithm.results
+        output = results[True]
+        assert isinstance(output, SPEfitContainer)
+        assert np.all(output.is_valid)
+        # the lock-step fit reaches at least the minimum found by Minuit
+        assert np.all(output.likelihood <= results[False].likelihood + 1e-2)
+        np.testing.assert_allclose(
+            output.mean[:, 0], results[False].mean[:, 0], rtol=1e-2
+        )
+        assert np.all(
+            np.abs(output.mean[:, 0] - self.PARAMETERS[:, 2]) < 5 * output.mean[:, 1]
+        )
+
+    def test_likelihood_grad(self, histo):
+        charge = histo[0][0].data[~histo[0][0].mask]
+        counts = histo[1][0].data[~histo[0][0].mask]
+        parameters = list(self.PARAMETERS[0])
+        parameters[2] = 55.3
+        grad = SPEnominalStdalgorithm._NG_Likelihood_Chi2_grad(
+            *parameters, charge, counts
+        )
+        for i, step in enumerate([1e-5, 1e-5, 1e-5, 1e-5, 1e-4, 1e-5, 1e-6]):
+            upper = list(parameters)
+            lower = list(parameters)
+            upper[i] += step
+            lower[i] -= step
+            expected = (
+                SPEnominalStdalgorithm._NG_Likelihood_Chi2(*upper, charge, counts)
+                - SPEnominalStdalgorithm._NG_Likelihood_Chi2(*lower, charge, counts)
+            ) / (2 * step)
+            assert grad[i] == pytest.approx(expected, rel=1e-4, abs=1e-2)
+
+    def test_warm_start(self, histo):
+        SPEalgorithm.window_length.default_value = 40
+        camera = ArrayDataComponent.CAMERA
+        # a pixel with a previous valid result, and one of its neighbours without
+        pixels_id = np.array(
+            [camera.pix_id[0], camera.pix_id[camera.neighbors[0][0]]], dtype=np.uint16
+        )
+        cold = SPEnominalStdalgorithm(pixels_id, *histo, multiproc=False)
+        cold.run(display=False)
+        previous = cold.results
+        previous.is_valid = np.array([True, False])
+
+        algorithm = SPEnominalStdalgorithm(
+            pixels_id,
+            *histo,
+            multiproc=False,
+            warm_start=True,
+            warm_start_SPE_results=["previous.h5"],
+        )
+        with patch(
+            "nectarchain.data.container.SPEfitContainer.from_hdf5",
+            return_value=iter([previous]),
+        ):
+            values = algorithm._get_warm_start_values(pixels_id)
+        assert values[int(pixels_id[0])]["mean"] == previous.mean[0, 0]
+        assert values[int(pixels_id[1])] == values[int(pixels_id[0])]
+
+        with patch(
+            "nectarchain.data.container.SPEfitContainer.from_hdf5",
+            return_value=iter([previous]),
+        ), patch.object(SPEalgorithm, "_get_mean_gaussian_fit") as prefit:
+            algorithm.run(display=False)
+        prefit.assert_not_called()
+        output = algorithm.results
+        assert np.all(output.is_valid)
+        np.testing.assert_allclose(
+            output.mean[:, 0], cold.results.mean[:, 0], rtol=1e-2
+        )
+
+    def test_checkpoint(self, histo, tmp_path):
+        SPEalgorithm.window_length.default_value = 40
+        checkpoint_path = tmp_path / "checkpoint.jsonl"
+        algorithm = SPEnominalStdalgorithm(
+            np.arange(self.NPIXELS),
+            *histo,
+            multiproc=False,
+            checkpoint_path=checkpoint_path,
+        )
+        algorithm.run(display=False)
+        expected = algorithm.results
+        assert set(SPEfitCheckpoint(checkpoint_path).read()) == {0, 1}
+
+        # the fit is interrupted while the second pixel is written
+        header, *lines = checkpoint_path.read_text().splitlines()
+        assert json.loads(header)["header"]["pixels_id"] == [0, 1]
+        for batched in [False, True]:
+            checkpoint_path.write_text(f"{header}\n{lines[0]}\n{lines[1][:20]}")
+            assert set(SPEfitCheckpoint(checkpoint_path).read()) == {0}
+            algorithm = SPEnominalStdalgorithm(
+                np.arange(self.NPIXELS),
+                *histo,
+                multiproc=False,
+                checkpoint_path=checkpoint_path,
+            )
+            with patch.object(
+                SPEnominalalgorithm, "run_fit", wraps=SPEnominalalgorithm.run_fit
+            ) as run_fit:
+                algorithm.run(display=False, batched=batched)
+            if batched:
+                run_fit.assert_not_called()
+            else:
+                run_fit.assert_called_once()
+                assert run_fit.call_args.args[0] == 1
+            assert set(SPEfitCheckpoint(checkpoint_path).read()) == {0, 1}
+            output = algorithm.results
+            assert np.all(output.is_valid)
+            assert output.mean[0, 0] == expected.mean[0, 0]
+            np.testing.assert_allclose(
+                output.mean[:, 0], expected.mean[:, 0], rtol=1e-3
+            )
+
+        # all the pixels are read from the checkpoint
+        algorithm = SPEnominalStdalgorithm(
+            np.arange(self.NPIXELS),
+            *histo,
+            multiproc=False,
+            checkpoint_path=checkpoint_path,
+        )
+        with patch.object(SPEnominalalgorithm, "run_fit") as run_fit, patch.object(
+            SPEalgorithm, "_get_mean_gaussian_fit"
+        ) as prefit:
+            algorithm.run(display=False)
+        run_fit.assert_not_called()
+        prefit.assert_not_called()
+        np.testing.assert_array_equal(algorithm.results.likelihood, output.likelihood)
+
+        # the checkpoint of another fit is not resumed
+        for kwargs, run_kwargs in [
+            ({"run_number": 1234}, {}),
+            ({}, {"tol": 1e-2}),
+            ({}, {"pixels_id": [0]}),
+        ]:
+            algorithm = SPEnominalStdalgorithm(
+                np.arange(self.NPIXELS),
+                *histo,
+                multiproc=False,
+                checkpoint_path=checkpoint_path,
+                **kwargs,
+            )
+            with patch.object(SPEnominalalgorithm, "run_fit") as run_fit:
+                with pytest.raises(ValueError):
+                    algorithm.run(display=False, **run_kwargs)
+            run_fit.assert_not_called()
@@ -123,8 +123,12 @@ class WaveformsComponent(ArrayDataComponent):
         log.info(
             f"initialization of the waveformsMaker following trigger type : {name}"
         )
-        self.__wfs_hg[f"{name}"] = []
-        self.__wfs_lg[f"{name}"] = []
+        self.__wfs_hg[f"{name}"] = __class__._init_buffer(
+            "wfs_hg", container_class=WaveformsContainer
+        )
+        self.__wfs_lg[f"{name}"] = __class__._init_buffer(
+            "wfs_lg", container_class=WaveformsContainer
+        )
 
     def __call__(self, event: NectarCAMDataContainer, *args, **kwargs):
         """Process an event and extract waveforms.
@@ -134,9 +138,6 @@ class WaveformsComponent(ArrayDataComponent):
             from.
             trigger (EventType): The type of trigger for the event.
         """
-        wfs_hg_tmp = np.zeros((self.npixels, self.nsamples), dtype=np.uint16)
-        wfs_lg_tmp = np.zeros((self.npixels, self.nsamples), dtype=np.uint16)
-
         wfs_hg_tmp, wfs_lg_tmp = super(WaveformsComponent, self).__call__(
             event=event, return_wfs=True, *args, **kwargs
         )
@@ -313,10 +314,7 @@ class WaveformsComponent(ArrayDataComponent):
         Returns:
             An array of waveform data for the specified trigger type.
         """
-        return np.array(
-            self.__wfs_hg[__class__._get_name_trigger(trigger)],
-            dtype=WaveformsContainer.fields["wfs_hg"].dtype,
-        )
+        return self.__wfs_hg[__class__._get_name_trigger(trigger)].to_array()
 
     def wfs_lg(self, trigger: EventType):
         """Returns the waveform data for the specified trigger type in the low gain
@@ -330,7 +328,4 @@ class WaveformsComponent(ArrayDataComponent):
             An array of waveform data for the specified trigger type in the low gain
             channel.
         """
-        return np.array(
-            self.__wfs_lg[__class__._get_name_trigger(trigger)],
-            dtype=WaveformsContainer.fields["wfs_lg"].dtype,
-        )
+        return self.__wfs_lg[__class__._get_name_trigger(trigger)].to_array()
@@ -1,7 +1,10 @@
 import copy
+import glob
 import logging
+import multiprocessing as mp
 import os
 import pathlib
+import time
 from datetime import datetime
 
 import numpy as np
@@ -25,9 +28,14 @@ from tqdm.auto import tqdm
 from traitlets import default
 
 from ..data import DataManagement
-from ..data.container.core import NectarCAMContainer, TriggerMapContainer
+from ..data.container.columnar import write_columnar
+from ..data.container.core import (
+    ArrayDataContainer,
+    NectarCAMContainer,
+    TriggerMapContainer,
+)
 from ..utils import ComponentUtils
-from .component import NectarCAMComponent, get_valid_component
+from .component import ArrayDataComponent, NectarCAMComponent, get_valid_component
 
 logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
@@ -82,7 +90,8 @@ class BaseNectarCAMCalibrationTool(Tool):
         maxevents : int, optional
             max of events to be loaded. Defaults to -1, to load everything.
         run_file : optional
-            if provided, will load this run file
+            if provided, will load this run file. A list of files can also be given,
+            in which case only these files will be loaded.
 
         Returns
         -------
@@ -96,6 +105,11 @@ class BaseNectarCAMCalibrationTool(Tool):
             eventsource = LightNectarCAMEventSource(
                 input_url=generic_filename, max_events=max_events
             )
+        elif isinstance(run_file, (list, tuple)):
+            log.info(f"{len(run_file)} files will be loaded : {run_file}")
+            eventsource = LightNectarCAMEventSource(
+                input_filelist=[str(file) for file in run_file], max_events=max_events
+            )
         else:
             log.info(f"{run_file} will be loaded")
             eventsource = LightNectarCAMEventSource(
@@ -134,6 +148,7 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
         ("m", "max-events"): "EventsLoopNectarCAMCalibrationTool.max_events",
         ("o", "output"): "EventsLoopNectarCAMCalibrationTool.output_path",
         "events-per-slice": "EventsLoopNectarCAMCalibrationTool.events_per_slice",
+        "n-workers": "EventsLoopNectarCAMCalibrationTool.n_workers",
     }
 
     flags = {
@@ -147,6 +162,12 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
             "show a progress bar during event processing",
             "don't show a progress bar during event processing",
         ),
+        **flag(
+            "columnar",
+            "EventsLoopNectarCAMCalibrationTool.columnar_output",
+            "write the array data containers in the chunked columnar layout",
+            "write the array data containers as table rows",
+        ),
     }
 
     classes = (
@@ -170,7 +191,10 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
     ).tag(config=True)
 
     max_events = Integer(
-        help="maximum number of events to be loaded",
+        help="maximum number of events to be loaded. With n_workers > 1, it is split "
+        "between the workers, each one loading at most its share from its own subset "
+        "of the run files: the loaded events are then not the first max_events events "
+        "of the run, as in the serial event loop",
         default_value=None,
         allow_none=True,
     ).tag(config=True)
@@ -193,6 +217,21 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
         allow_none=True,
     ).tag(config=True)
 
+    n_workers = Integer(
+        help="number of worker processes used to loop over the events, each worker "
+        "treats its own subset of the run files with its own copies of the "
+        "components. The outputs of the workers are then merged. If 1, the events "
+        "are treated in a single serial loop",
+        default_value=1,
+    ).tag(config=True)
+
+    columnar_output = Bool(
+        help="write the ArrayDataContainer outputs in the columnar layout, each array "
+        "field being a chunked and compressed dataset and each scalar field an "
+        "attribute, instead of a single row of a table",
+        default_value=False,
+    ).tag(config=True)
+
     def __new__(cls, *args, **kwargs):
         """This method is used to pass to the current instance of Tool the traits
         defined in the components provided in the componentsList trait.
@@ -230,7 +269,11 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
     def _load_eventsource(self, *args, **kwargs):
         self.log.debug("loading event source")
         self.event_source = self.enter_context(
-            self.load_run(self.run_number, self.max_events, run_file=self.run_file)
+            self.load_run(
+                self.run_number,
+                self.max_events,
+                run_file=kwargs.get("run_file", self.run_file),
+            )
         )
 
     def _get_provided_component_kwargs(self, componentName: str):
@@ -331,6 +374,7 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
         self._init_writer(sliced=not (self.events_per_slice is None), slice_index=1)
 
         self._n_traited_events = 0
+        self._workers_output = None
 
         # self.comp = MyComponent(parent=self)
         # self.comp2 = SecondaryMyComponent(parent=self)
@@ -395,6 +439,12 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
         # for _trigger_type in trigger_type:
         #    self._init_trigger_type(_trigger_type)
 
+        if self.n_workers > 1:
+            run_files = self._get_workers_run_files()
+            if run_files is not None:
+                self._start_workers(run_files, n_events=n_events, *args, **kwargs)
+                return
+
         if restart_from_begining:
             self.log.debug(
                 "restart from beginning : creation of the EventSource " "reader"
@@ -434,6 +484,170 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
                 self._setup_components()
                 n_events_in_slice = 0
 
+    def _get_workers_run_files(self):
+        """Method to get the subsets of run files that will be treated by each worker.
+
+        Returns
+        -------
+        list or None
+            A list of files list, one per worker. None if the multi-process event loop
+            can't be used, the serial event loop must then be used.
+        """
+        if self.events_per_slice is not None:
+            self.log.warning(
+                "the multi-process event loop is not compatible with events_per_slice,"
+                " falling back to the serial event loop"
+            )
+            return None
+        for componentName in self.componentsList:
+            if not issubclass(
+                ComponentUtils.get_class_name_from_ComponentName(componentName),
+                ArrayDataComponent,
+            ):
+                self.log.warning(
+                    f"{componentName} output can't be merged between workers, falling "
+                    f"back to the serial event loop"
+                )
+                return None
+        if self.run_file is None:
+            _, files = DataManagement.findrun(self.run_number)
+        else:
+            files = sorted(glob.glob(str(self.run_file)))
+        run_files = __class__._split_run_files(files, self.n_workers)
+        if len(run_files) < 2:
+            self.log.info(
+                f"only {len(files)} run file found, falling back to the serial event "
+                f"loop"
+            )
+            return None
+        return run_files
+
+    @staticmethod
+    def _split_run_files(files: list, n_workers: int) -> list:
+        """Split the run files into subsets, one for each worker. The files are
+        distributed in a round-robin way, so that the sizes of the subsets differ by
+        at most one file.
+
+        Parameters
+        ----------
+        files : list
+            the run files
+        n_workers : int
+            the number of workers
+
+        Returns
+        -------
+        list
+            the list of files subsets, without empty subset
+        """
+        n_workers = max(1, min(n_workers, len(files)))
+        return [
+            list(files[i::n_workers]) for i in range(n_workers) if files[i::n_workers]
+        ]
+
+    @staticmethod
+    def _split_n_events(n_events, n_workers: int) -> list:
+        """Split a number of events between workers. Infinite or None number of
+        events are left unchanged."""
+        if n_events is None or not np.isfinite(n_events):
+            return [n_events for _ in range(n_workers)]
+        n_events = int(n_events)
+        return [
+            n_events // n_workers + (1 if i < n_events % n_workers else 0)
+            for i in range(n_workers)
+        ]
+
+    def _get_workers_kwargs(self) -> dict:
+        """Method to get the keyword arguments used to build the Tool instances inside
+        the workers."""
+        kwargs = {}
+        for componentName in self.componentsList:
+            kwargs.update(self._get_provided_component_kwargs(componentName))
+        kwargs.update(
+            {
+                "run_number": self.run_number,
+                "output_path": self.output_path,
+                "componentsList": list(self.componentsList),
+                "events_per_slice": None,
+                "n_workers": 1,
+                "progress_bar": False,
+            }
+        )
+        return kwargs
+
+    def _start_workers(self, run_files: list, n_events=np.inf, *args, **kwargs):
+        """Run the event loop in several processes, each one treating a subset of the
+        run files. The outputs of the components of each worker are merged and will be
+        written at the finish step.
+
+        The ``max_events`` and ``n_events`` limits are split between the workers, each
+        worker treating the first events of its own files, so that the treated events
+        differ from the ones of the serial event loop when a limit is set.
+
+        Parameters
+        ----------
+        run_files : list
+            the list of files subsets, one for each worker
+        n_events : int, optional
+            The maximum number of events to process. Default is np.inf.
+        """
+        n_workers = len(run_files)
+        self.log.info(f"starting the event loop with {n_workers} workers")
+        if self.max_events is not None or np.isfinite(n_events):
+            self.log.info(
+                "the number of events is split between the workers, the treated "
+                "events are not the first ones of the run"
+            )
+        workers_kwargs = self._get_workers_kwargs()
+        workers_args = []
+        for files, _max_events, _n_events in zip(
+            run_files,
+            __class__._split_n_events(self.max_events, n_workers),
+            __class__._split_n_events(n_events, n_workers),
+        ):
+            workers_args.append(
+                (
+                    self.__class__,
+                    copy.deepcopy(self.config),
+                    {**workers_kwargs, "max_events": _max_events},
+                    files,
+                    _n_events,
+                )
+            )
+        t = time.time()
+        with mp.get_context("spawn").Pool(n_workers) as pool:
+            result = pool.starmap_async(_events_loop_worker, workers_args)
+            result.wait()
+        try:
+            res = result.get()
+        except Exception as e:
+            self.log.error(e, exc_info=True)
+            raise e
+        self.log.info(
+            f"total time for the event loop with {n_workers} workers is "
+            f"{time.time() - t:.2e} sec"
+        )
+        self._n_traited_events += int(np.sum([_res[1] for _res in res]))
+        self._workers_output = [
+            self._merge_workers_output(
+                index_component, [_res[0][index_component] for _res in res]
+            )
+            for index_component in range(len(self.components))
+        ]
+
+    def _merge_workers_output(self, index_component: int, outputs: list):
+        """Merge the outputs of one component computed by the different workers, the
+        merged containers are then sorted by event_id."""
+        outputs = [output for output in outputs if output is not None]
+        if len(outputs) == 0:
+            return None
+        merged = ArrayDataComponent.merge_along_slices(iter(outputs))
+        for trigger in merged.containers.keys():
+            merged.containers[trigger] = self.components[index_component].sort(
+                merged.containers[trigger]
+            )
+        return merged
+
     def split_run(
         self, n_events_in_slice: int = None, event: NectarCAMDataContainer = None
     ):
@@ -457,9 +671,13 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
 
     def _finish_components(self, *args, **kwargs):
         self.log.info("finishing components and writing to output file")
-        output = []
-        for component in self.components:
-            output.append(component.finish(*args, **kwargs))
+        if getattr(self, "_workers_output", None) is not None:
+            output = self._workers_output
+            self._workers_output = None
+        else:
+            output = []
+            for component in self.components:
+                output.append(component.finish(*args, **kwargs))
         log.info(output)
         for i, _output in enumerate(output):
             if not (_output is None):
@@ -470,16 +688,15 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
         try:
             container.validate()
             if isinstance(container, NectarCAMContainer):
-                self.writer.write(
-                    table_name=f"{container.__class__.__name__}_{index_component}",
-                    containers=container,
+                self._write_table(
+                    f"{container.__class__.__name__}_{index_component}", container
                 )
             elif isinstance(container, TriggerMapContainer):
                 for key in container.containers.keys():
-                    self.writer.write(
-                        table_name=f"{container.containers[key].__class__.__name__}_"
+                    self._write_table(
+                        f"{container.containers[key].__class__.__name__}_"
                         f"{index_component}/{key.name}",
-                        containers=container.containers[key],
+                        container.containers[key],
                     )
             else:
                 raise TypeError(
@@ -493,6 +710,16 @@ class EventsLoopNectarCAMCalibrationTool(BaseNectarCAMCalibrationTool):
             self.log.error(f"{e}", exc_info=True)
             raise e
 
+    def _write_table(self, table_name: str, container: Container) -> None:
+        if self.columnar_output and isinstance(container, ArrayDataContainer):
+            write_columnar(
+                self.writer.h5file,
+                f"{self.writer._group.rstrip('/')}/{table_name}",
+                container,
+            )
+        else:
+            self.writer.write(table_name=table_name, containers=container)
+
     @property
     def event_source(self):
         """
@@ -561,6 +788,41 @@ class DelimiterLoopNectarCAMCalibrationTool(EventsLoopNectarCAMCalibrationTool):
         return condition
 
 
+def _events_loop_worker(
+    tool_class, config, tool_kwargs: dict, run_files: list, n_events=np.inf
+):
+    """Function run by each worker of the multi-process event loop. A new Tool instance
+    is built, with its own copies of the components, to loop over the events of the
+    given run files.
+
+    Parameters
+    ----------
+    tool_class : class
+        the class of the Tool that spawned the workers
+    config : traitlets.config.Config
+        the configuration of the Tool that spawned the workers
+    tool_kwargs : dict
+        keyword arguments used to build the Tool
+    run_files : list
+        the run files treated by this worker
+    n_events : int, optional
+        The maximum number of events to process. Default is np.inf.
+
+    Returns
+    -------
+    tuple
+        the list of the components outputs and the number of treated events
+    """
+    tool = tool_class(config=config, **tool_kwargs)
+    with tool._exit_stack:
+        tool._setup_eventsource(run_file=run_files)
+        tool._setup_components()
+        tool._n_traited_events = 0
+        tool.start(n_events=n_events)
+        output = [component.finish() for component in tool.components]
+    return output, tool._n_traited_events
+
+
 def main():
     """run the tool"""
     tool = EventsLoopNectarCAMCalibrationTool()
@@ -0,0 +1,302 @@
+import logging
+
+import numpy as np
+from ctapipe.image.extractor import (
+    FixedWindowSum,
+    FullWaveformSum,
+    GlobalPeakWindowSum,
+    ImageExtractor,
+    LocalPeakWindowSum,
+    SlidingWindowMaxSum,
+)
+from numba import njit, prange
+
+from .charge_extractor import gradient_extractor
+from .utils import CtapipeExtractor
+
+logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+log = logging.getLogger(__name__)
+log.handlers = logging.getLogger("__main__").handlers
+
+__all__ = ["BatchExtractor"]
+
+
+@njit(parallel=True, cache=True)
+def extract_around_peak_batch(
+    waveforms, peak_index, width, shift, sampling_rate_ghz, charge, peak_time
+):
+    """Batched version of ``ctapipe.image.extractor.extract_around_peak``, looping in
+    parallel over the events and pixels of a block. The arithmetic is the one of the
+    ctapipe kernel, operation by operation, so that the results are the same bit for
+    bit.
+
+    Parameters
+    ----------
+        waveforms (np.ndarray(nevents,pixels,nsamples)): waveforms
+        peak_index (np.ndarray(nevents,pixels)): peak index of each pixel
+        width (int): width of the integration window
+        shift (int): shift of the integration window from the peak index
+        sampling_rate_ghz (float): sampling rate of the camera in GHz
+        charge (np.ndarray(nevents,pixels)): float32 output array of the charges
+        peak_time (np.ndarray(nevents,pixels)): float32 output array of the peak times
+    """
+    n_events, n_pixels, n_samples = waveforms.shape
+    for index in prange(n_events * n_pixels):
+        i = index // n_pixels
+        j = index % n_pixels
+        start = peak_index[i, j] - shift
+        end = start + width
+        start = max(0, start)
+        end = min(end, n_samples)
+
+        i_sum = np.float64(0.0)
+        time_num = np.float64(0.0)
+        time_den = np.float64(0.0)
+        for isample in range(start, end):
+            sample = waveforms[i, j, isample]
+            i_sum += sample
+            if sample > 0:
+                time_num += sample * isample
+                time_den += sample
+
+        if time_den > 0:
+            time = np.float32(time_num / time_den)
+        else:
+            time = np.float32(peak_index[i, j])
+        peak_time[i, j] = time / sampling_rate_ghz
+        charge[i, j] = i_sum
+
+
+@njit(parallel=True, cache=True)
+def extract_sliding_window_batch(
+    waveforms, width, sampling_rate_ghz, charge, peak_time
+):
+    """Batched version of ``ctapipe.image.extractor.extract_sliding_window``, looping
+    in parallel over the events and pixels of a block. The arithmetic is the one of
+    the ctapipe kernel, operation by operation, so that the results are the same bit
+    for bit.
+
+    Parameters
+    ----------
+        waveforms (np.ndarray(nevents,pixels,nsamples)): waveforms
+        width (int): width of the integration window
+        sampling_rate_ghz (float): sampling rate of the camera in GHz
+        charge (np.ndarray(nevents,pixels)): float32 output array of the charges
+        peak_time (np.ndarray(nevents,pixels)): float32 output array of the peak times
+    """
+    n_events, n_pixels, n_samples = waveforms.shape
+    for index in prange(n_events * n_pixels):
+        i = index // n_pixels
+        j = index % n_pixels
+        # cumulative waveform in double precision, with a zero at the beginning
+        cwf = np.zeros(n_samples + 1, dtype=np.float64)
+        for isample in range(n_samples):
+            cwf[isample + 1] = cwf[isample] + np.float64(waveforms[i, j, isample])
+        maxpos = 0
+        maxsum = cwf[width] - cwf[0]
+        for isample in range(1, n_samples - width + 1):
+            window_sum = cwf[isample + width] - cwf[isample]
+            if window_sum > maxsum:
+                maxsum = window_sum
+                maxpos = isample
+        charge[i, j] = maxsum
+
+        time_num = np.float64(0.0)
+        time_den = np.float64(0.0)
+        for isample in range(maxpos, maxpos + width):
+            sample = waveforms[i, j, isample]
+            if sample > 0:
+                time_num += sample * isample
+                time_den += sample
+
+        if time_den > 0:
+            time = np.float32(time_num / time_den)
+        else:
+            time = np.float32(maxpos + 0.5 * width)
+        peak_time[i, j] = time / sampling_rate_ghz
+
+
+@njit(parallel=True, cache=True)
+def sum_good_pixels_batch(waveforms, good_pixels):
+    """Sum over the good pixels of the integer waveforms of each event. Integer
+    samples are summed exactly, whatever the summation order.
+
+    Parameters
+    ----------
+        waveforms (np.ndarray(nevents,pixels,nsamples)): integer waveforms
+        good_pixels (np.ndarray(nevents,pixels)): mask of the pixels to sum
+
+    Returns
+    -------
+        np.ndarray(nevents,nsamples): the summed waveforms
+    """
+    n_events, n_pixels, n_samples = waveforms.shape
+    out = np.zeros((n_events, n_samples), dtype=np.float64)
+    for i in prange(n_events):
+        for j in range(n_pixels):
+            if good_pixels[i, j]:
+                for isample in range(n_samples):
+                    out[i, isample] += waveforms[i, j, isample]
+    return out
+
+
+class BatchExtractor:
+    """
+    A class to apply a ctapipe ImageExtractor on a block of events at once.
+
+    For the ``FullWaveformSum``, ``FixedWindowSum``, ``GlobalPeakWindowSum``,
+    ``LocalPeakWindowSum`` and ``SlidingWindowMaxSum`` extractors, the peak positions
+    are computed over the whole block and the charges are extracted by numba kernels
+    looping over all the events and pixels. The results are the same, bit for bit, as
+    the ones of the extractor called event by event. The ``gradient_extractor`` of
+    nectarchain is applied on the whole block by its own kernel. Any other extractor
+    is called event by event.
+    """
+
+    def __init__(self, imageExtractor: ImageExtractor):
+        """
+        Parameters:
+        imageExtractor (ImageExtractor): The ctapipe extractor to apply.
+        """
+        self.imageExtractor = imageExtractor
+        self._extract = {
+            FullWaveformSum: self._full_waveform_sum,
+            FixedWindowSum: self._fixed_window_sum,
+            GlobalPeakWindowSum: self._global_peak_window_sum,
+            LocalPeakWindowSum: self._local_peak_window_sum,
+            SlidingWindowMaxSum: self._sliding_window_max_sum,
+            gradient_extractor: self._gradient_extractor,
+        }.get(type(imageExtractor), None)
+
+    @property
+    def is_batched(self):
+        """Whether the extractor has a batched implementation."""
+        return self._extract is not None
+
+    def __call__(self, waveforms, tel_id, selected_gain_channel, broken_pixels):
+        """
+        Extracts the charges and peak times of a block of events.
+
+        Parameters:
+        waveforms (np.ndarray): The waveforms, of shape (n_events, n_pixels,
+        n_samples).
+        tel_id (int): The telescope id.
+        selected_gain_channel (int or np.ndarray): The gain channel, per pixel.
+        broken_pixels (np.ndarray): The broken pixels mask, of shape (n_events,
+        n_pixels).
+
+        Returns:
+        tuple: The charges and the peak times, both float32 arrays of shape
+        (n_events, n_pixels).
+        """
+        waveforms = np.ascontiguousarray(waveforms)
+        broken_pixels = np.asarray(broken_pixels, dtype=bool)
+        if self._extract is None:
+            return self._loop(waveforms, tel_id, selected_gain_channel, broken_pixels)
+        charge = np.empty(waveforms.shape[:-1], dtype=np.float32)
+        peak_time = np.empty(waveforms.shape[:-1], dtype=np.float32)
+        self._extract(waveforms, tel_id, broken_pixels, charge, peak_time)
+        if (
+            getattr(self.imageExtractor, "apply_integration_correction", None)
+            is not None
+        ):
+            if self.imageExtractor.apply_integration_correction.tel[tel_id]:
+                charge *= self.imageExtractor._calculate_correction(tel_id=tel_id)[
+                    selected_gain_channel
+                ]
+        return charge, peak_time
+
+    def _loop(self, waveforms, tel_id, selected_gain_channel, broken_pixels):
+        charge = np.empty(waveforms.shape[:-1], dtype=np.float32)
+        peak_time = np.empty(waveforms.shape[:-1], dtype=np.float32)
+        for i in range(waveforms.shape[0]):
+            charge[i], peak_time[i] = CtapipeExtractor.get_image_peak_time(
+                self.imageExtractor(
+                    waveforms[i], tel_id, selected_gain_channel, broken_pixels[i]
+                )
+            )
+        return charge, peak_time
+
+    def _extract_around_peak(self, waveforms, peak_index, tel_id, charge, peak_time):
+        extract_around_peak_batch(
+            waveforms,
+            np.ascontiguousarray(
+                np.broadcast_to(peak_index, waveforms.shape[:-1]), dtype=np.int64
+            ),
+            self.imageExtractor.window_width.tel[tel_id],
+            self.imageExtractor.window_shift.tel[tel_id],
+            self.imageExtractor.sampling_rate_ghz[tel_id],
+            charge,
+            peak_time,
+        )
+
+    def _full_waveform_sum(self, waveforms, tel_id, broken_pixels, charge, peak_time):
+        extract_around_peak_batch(
+            waveforms,
+            np.zeros(waveforms.shape[:-1], dtype=np.int64),
+            waveforms.shape[-1],
+            0,
+            self.imageExtractor.sampling_rate_ghz[tel_id],
+            charge,
+            peak_time,
+        )
+
+    def _fixed_window_sum(self, waveforms, tel_id, broken_pixels, charge, peak_time):
+        self._extract_around_peak(
+            waveforms,
+            self.imageExtractor.peak_index.tel[tel_id],
+            tel_id,
+            charge,
+            peak_time,
+        )
+
+    def _global_peak_window_sum(
+        self, waveforms, tel_id, broken_pixels, charge, peak_time
+    ):
+        pixel_fraction = self.imageExtractor.pixel_fraction.tel[tel_id]
+        if pixel_fraction == 1.0:
+            # average over the valid pixels of each event then argmax over samples
+            good_pixels = ~broken_pixels
+            if waveforms.dtype.kind in "biu":
+                sum_waveforms = sum_good_pixels_batch(waveforms, good_pixels)
+            else:
+                # the broken pixels are set to zero so that the floating point sum
+                # runs in the same order as in ctapipe
+                sum_waveforms = np.where(good_pixels[..., None], waveforms, 0).sum(
+                    axis=-2
+                )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean_waveforms = sum_waveforms / good_pixels.sum(axis=-1)[..., None]
+            peak_index = mean_waveforms.argmax(axis=-1)
+        else:
+            n_pixels = int(pixel_fraction * waveforms.shape[-2])
+            peak_index = np.empty(waveforms.shape[0], dtype=np.int64)
+            for i in range(waveforms.shape[0]):
+                brightest = np.argsort(waveforms[i].max(axis=-1))[~broken_pixels[i]][
+                    ..., -n_pixels:
+                ]
+                peak_index[i] = waveforms[i][brightest].mean(axis=-2).argmax()
+        self._extract_around_peak(
+            waveforms, peak_index[..., None], tel_id, charge, peak_time
+        )
+
+    def _local_peak_window_sum(
+        self, waveforms, tel_id, broken_pixels, charge, peak_time
+    ):
+        self._extract_around_peak(
+            waveforms, waveforms.argmax(axis=-1), tel_id, charge, peak_time
+        )
+
+    def _sliding_window_max_sum(
+        self, waveforms, tel_id, broken_pixels, charge, peak_time
+    ):
+        extract_sliding_window_batch(
+            waveforms,
+            self.imageExtractor.window_width.tel[tel_id],
+            self.imageExtractor.sampling_rate_ghz[tel_id],
+            charge,
+            peak_time,
+        )
+
+    def _gradient_extractor(self, waveforms, tel_id, broken_pixels, charge, peak_time):
+        charge[:], peak_time[:] = self.imageExtractor.extract_batch(waveforms, tel_id)
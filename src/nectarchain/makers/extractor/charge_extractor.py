@@ -1,10 +1,10 @@
 import logging
 
 import numpy as np
+from ctapipe.containers import DL1CameraContainer
+from ctapipe.core.traits import IntTelescopeParameter
 from ctapipe.image import ImageExtractor
-from numba import guvectorize
-from scipy.interpolate import InterpolatedUnivariateSpline
-from scipy.signal import find_peaks
+from numba import njit, prange
 
 logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
@@ -14,117 +14,198 @@ __all__ = ["gradient_extractor"]
 
 
 class gradient_extractor(ImageExtractor):
-    fixed_window = np.uint8(16)
-    height_peak = np.uint8(10)
-
-    def __call__(self, waveforms, telid, selected_gain_channel, substract_ped=False):
-        shape = waveforms.shape
-        waveforms = waveforms.reshape(shape[0] * shape[1], shape[2])
-
-        if substract_ped:
-            log.info("substracting pedestal")
-            # calculate pedestal
-            ped_mean = np.mean(waveforms[:, :16], axis=1).reshape(
-                shape[0] * shape[1], 1
-            )
+    """
+    Extractor which integrates the waveform, upsampled with a cubic Hermite
+    interpolation, within an adaptive window around the highest peak. The window is
+    bounded on each side by the first change of sign of the gradient of the upsampled
+    waveform, i.e. by the local minima surrounding the peak.
 
-            _ = waveforms - (ped_mean) @ (
-                np.ones(1, shape[2])
-            )  # waveforms without pedestal
-        else:
-            log.info("do not substract pedestal")
-            _ = waveforms
+    For saturated pulses (several maxima at the level of the highest one, within 5%),
+    the median of these maxima is taken as the peak. Pixels without any peak above
+    ``height_peak`` get a null charge and the position of the maximum of the
+    upsampled waveform as peak time.
+    """
+
+    upsampling = IntTelescopeParameter(
+        default_value=4,
+        help="Number of interpolated points per waveform sample",
+    ).tag(config=True)
+
+    height_peak = IntTelescopeParameter(
+        default_value=10,
+        help="Minimal height of the peak to integrate (ADC counts)",
+    ).tag(config=True)
+
+    pedestal_width = IntTelescopeParameter(
+        default_value=16,
+        help=(
+            "Number of samples at the beginning of the waveform used to estimate the"
+            " pedestal subtracted before the extraction, 0 to disable the subtraction"
+            " for waveforms whose pedestal is already subtracted"
+        ),
+    ).tag(config=True)
+
+    def __call__(
+        self, waveforms, tel_id, selected_gain_channel, broken_pixels
+    ) -> DL1CameraContainer:
+        charge, peak_time = self.extract_batch(waveforms[np.newaxis], tel_id)
+        return DL1CameraContainer(
+            image=charge[0], peak_time=peak_time[0], is_valid=True
+        )
 
-        waveforms.reshape(shape[0], shape[1], shape[2])
+    def extract_batch(self, waveforms, tel_id):
+        """Extracts the charges and peak times of a block of events.
 
-        (
+        Parameters
+        ----------
+        waveforms : np.ndarray
+            The waveforms, of shape (n_events, n_pixels, n_samples).
+        tel_id : int
+            The telescope id.
+
+        Returns
+        -------
+        tuple
+            The charges and the peak times (in ns), both float32 arrays of shape
+            (n_events, n_pixels).
+        """
+        waveforms = np.ascontiguousarray(waveforms)
+        charge = np.empty(waveforms.shape[:-1], dtype=np.float32)
+        peak_time = np.empty(waveforms.shape[:-1], dtype=np.float32)
+        extract_charge(
+            waveforms,
+            self.upsampling.tel[tel_id],
+            self.height_peak.tel[tel_id],
+            self.pedestal_width.tel[tel_id],
+            self.sampling_rate_ghz[tel_id],
+            charge,
             peak_time,
-            charge_integral,
-            charge_sum,
-            charge_integral_fixed_window,
-            charge_sum_fixed_window,
-        ) = extract_charge(waveforms, self.height_peak, self.fixed_window)
-
-        return peak_time, charge_integral
-
-
-@guvectorize(
-    [
-        "(np.uint16[:], np.uint8, np.uint8, np.uint16[:])",
-    ],
-    "(n,p,s),(),()->(n,p)",
-    nopython=True,
-    cache=True,
-)
-def extract_charge(y, height_peak, fixed_window):
-    x = np.linspace(0, len(y), len(y))
-    xi = np.linspace(0, len(y), 251)
-    ius = InterpolatedUnivariateSpline(x, y)
-    yi = ius(xi)
-    peaks, _ = find_peaks(yi, height=height_peak)
-    # find the peak
-    if len(peaks) > 0:
-        # find the max peak
-        # max_peak = max(yi[peaks])
-        max_peak_index = np.argmax(yi[peaks], axis=0)
-        # Check if there is not a peak but a plateaux
-        # 1. divide for the maximum to round to the first digit
-        # 2. create a new array with normalized and rounded values, yi_rounded
-        yi_rounded = np.around(yi[peaks] / max(yi[peaks]), 1)
-        maxima_peak_index = np.argwhere(yi_rounded == np.amax(yi_rounded))
-        if len(maxima_peak_index) > 1:
-            # saturated event
-            max_peak_index = int(np.median(maxima_peak_index))
-            # width_peak = 20
-        if (xi[peaks[max_peak_index]] > 20) & (
-            xi[peaks[max_peak_index]] < 40
-        ):  # Search the adaptive integration window
-            # calculate total gradients (not used, only for plot)
-            _ = np.gradient(yi, 1)
-            maxposition = peaks[max_peak_index]
-            # calcualte grandients starting from the max peak and going to the left to
-            # find the left margin of the window
-            yi_left = yi[:maxposition]
-            yi_grad_left = np.gradient(yi_left[::-1], 0.9)
-            change_grad_pos_left = (
-                np.where(yi_grad_left[:-1] * yi_grad_left[1:] < 0)[0] + 1
-            )[0]
-            # calcualte grandients starting from the max peak and going to the right to
-            # find the right margin of the window
-            yi_right = yi[maxposition:]
-            yi_grad_right = np.gradient(yi_right, 0.5)
-            change_grad_pos_right = (
-                np.where(yi_grad_right[:-1] * yi_grad_right[1:] < 0)[0] + 1
-            )[0]
-            charge_integral = ius.integral(
-                xi[peaks[max_peak_index] - (change_grad_pos_left)],
-                xi[peaks[max_peak_index] + change_grad_pos_right],
-            )
-            charge_sum = yi[
-                (peaks[max_peak_index] - (change_grad_pos_left)) : peaks[max_peak_index]
-                + change_grad_pos_right
-            ].sum() / (
-                change_grad_pos_left + change_grad_pos_right
-            )  # simple sum integration
-            adaptive_window = change_grad_pos_right + change_grad_pos_left
-            window_right = (fixed_window - 6) / 2
-            window_left = (fixed_window - 6) / 2 + 6
-            charge_integral_fixed_window = ius.integral(
-                xi[peaks[max_peak_index] - (window_left)],
-                xi[peaks[max_peak_index] + window_right],
+        )
+        return charge, peak_time
+
+
+@njit(parallel=True, cache=True)
+def extract_charge(
+    waveforms,
+    upsampling,
+    height_peak,
+    pedestal_width,
+    sampling_rate_ghz,
+    charge,
+    peak_time,
+):
+    """Extract the charges and peak times with the adaptive window of the
+    ``gradient_extractor``, in parallel over the events and pixels.
+
+    Parameters
+    ----------
+        waveforms (np.ndarray(nevents,pixels,nsamples)): waveforms
+        upsampling (int): number of interpolated points per sample
+        height_peak (float): minimal height of the peak
+        pedestal_width (int): number of samples used to estimate the pedestal
+        sampling_rate_ghz (float): sampling rate of the camera in GHz
+        charge (np.ndarray(nevents,pixels)): output array of the charges
+        peak_time (np.ndarray(nevents,pixels)): output array of the peak times
+    """
+    n_events, n_pixels, n_samples = waveforms.shape
+    n_points = (n_samples - 1) * upsampling + 1
+    for index in prange(n_events * n_pixels):
+        i = index // n_pixels
+        j = index % n_pixels
+
+        y = np.empty(n_samples, dtype=np.float64)
+        for isample in range(n_samples):
+            y[isample] = waveforms[i, j, isample]
+        if pedestal_width > 0:
+            y -= np.mean(y[:pedestal_width])
+
+        yi = _hermite_upsampling(y, upsampling, n_points)
+        peak = _find_peak(yi, height_peak)
+
+        if peak < 0:
+            charge[i, j] = 0.0
+            peak_time[i, j] = np.argmax(yi) / upsampling / sampling_rate_ghz
+            continue
+
+        # adaptive window, from the edges of the peak plateau up to the first change
+        # of sign of the gradient
+        left = peak
+        while left > 0 and yi[left - 1] == yi[peak]:
+            left -= 1
+        while left > 0 and yi[left - 1] < yi[left]:
+            left -= 1
+        right = peak
+        while right < n_points - 1 and yi[right + 1] == yi[peak]:
+            right += 1
+        while right < n_points - 1 and yi[right + 1] < yi[right]:
+            right += 1
+
+        # trapezoidal integration of the upsampled waveform, in ADC counts x samples
+        integral = 0.0
+        for k in range(left, right):
+            integral += 0.5 * (yi[k] + yi[k + 1])
+        charge[i, j] = integral / upsampling
+        peak_time[i, j] = peak / upsampling / sampling_rate_ghz
+
+
+@njit(cache=True)
+def _hermite_upsampling(y, upsampling, n_points):
+    """Cubic Hermite interpolation of a waveform on a grid ``upsampling`` times finer
+    than the samples, the tangents being the finite differences of the samples (as
+    ``np.gradient``)."""
+    n_samples = y.size
+    tangent = np.empty(n_samples, dtype=np.float64)
+    tangent[0] = y[1] - y[0]
+    tangent[-1] = y[-1] - y[-2]
+    for k in range(1, n_samples - 1):
+        tangent[k] = 0.5 * (y[k + 1] - y[k - 1])
+
+    yi = np.empty(n_points, dtype=np.float64)
+    for k in range(n_samples - 1):
+        for u in range(upsampling):
+            t = u / upsampling
+            t2 = t * t
+            t3 = t2 * t
+            yi[k * upsampling + u] = (
+                (2 * t3 - 3 * t2 + 1) * y[k]
+                + (t3 - 2 * t2 + t) * tangent[k]
+                + (-2 * t3 + 3 * t2) * y[k + 1]
+                + (t3 - t2) * tangent[k + 1]
             )
-            charge_sum_fixed_window = yi[
-                (peaks[max_peak_index] - (window_left)) : peaks[max_peak_index]
-                + window_right
-            ].sum() / (
-                fixed_window
-            )  # simple sum integration
-    else:
-        log.info("No peak found, maybe it is a pedestal or noisy run!")
-    return (
-        adaptive_window,
-        charge_integral,
-        charge_sum,
-        charge_integral_fixed_window,
-        charge_sum_fixed_window,
-    )
+    yi[-1] = y[-1]
+    return yi
+
+
+@njit(cache=True)
+def _find_peak(yi, height_peak):
+    """Index of the highest local maximum of ``yi`` above ``height_peak``, -1 if there
+    is none. The local maxima on a plateau are at its middle. If several maxima are
+    within 5% of the highest one (saturated pulse), the median one is returned."""
+    n_points = yi.size
+    maxima = np.empty(n_points, dtype=np.int64)
+    n_maxima = 0
+    highest = -1
+    k = 1
+    while k < n_points - 1:
+        if yi[k - 1] < yi[k]:
+            # end of a possible plateau
+            end = k
+            while end < n_points - 1 and yi[end + 1] == yi[k]:
+                end += 1
+            if end < n_points - 1 and yi[end + 1] < yi[k] and yi[k] >= height_peak:
+                maxima[n_maxima] = (k + end) // 2
+                if highest < 0 or yi[k] > yi[maxima[highest]]:
+                    highest = n_maxima
+                n_maxima += 1
+            k = end + 1
+        else:
+            k += 1
+    if highest < 0:
+        return -1
+
+    n_saturated = 0
+    for m in range(n_maxima):
+        if yi[maxima[m]] >= 0.95 * yi[maxima[highest]]:
+            maxima[n_saturated] = maxima[m]
+            n_saturated += 1
+    return (maxima[(n_saturated - 1) // 2] + maxima[n_saturated // 2]) // 2
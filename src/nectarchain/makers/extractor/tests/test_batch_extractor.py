@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from ctapipe.utils import get_dataset_path
+
+from nectarchain.makers.component import ChargesComponent
+from nectarchain.makers.core import BaseNectarCAMCalibrationTool
+from nectarchain.makers.extractor.batch_extractor import BatchExtractor
+
+
+class TestBatchExtractor:
+    RUN_NUMBER = 3938
+    RUN_FILE = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+    TEL_ID = 0
+    NEVENTS = 10
+    NPIXELS = 1855
+    NSAMPLES = 60
+
+    @pytest.fixture
+    def subarray(self):
+        return BaseNectarCAMCalibrationTool.load_run(
+            run_number=self.RUN_NUMBER, max_events=1, run_file=self.RUN_FILE
+        ).subarray
+
+    @pytest.fixture
+    def broken_pixels(self):
+        rng = np.random.default_rng(0)
+        broken_pixels = rng.random((self.NEVENTS, self.NPIXELS)) < 0.05
+        broken_pixels[1] = True
+        return broken_pixels
+
+    @pytest.fixture(params=[np.uint16, np.float32, np.float64])
+    def waveforms(self, request):
+        rng = np.random.default_rng(1)
+        samples = np.arange(self.NSAMPLES)
+        waveforms = rng.normal(250, 5, (self.NEVENTS, self.NPIXELS, self.NSAMPLES))
+        waveforms += rng.uniform(0, 3000, (self.NEVENTS, self.NPIXELS, 1)) * np.exp(
+            -0.5 * ((samples - 25) / 2) ** 2
+        )
+        if request.param != np.uint16:
+            waveforms -= 250
+        return waveforms.astype(request.param)
+
+    @pytest.mark.parametrize(
+        "method,kwargs",
+        [
+            ("FullWaveformSum", {}),
+            ("FixedWindowSum", {"peak_index": 20, "window_width": 8}),
+            ("GlobalPeakWindowSum", {"window_width": 8, "window_shift": 4}),
+            ("GlobalPeakWindowSum", {"pixel_fraction": 0.3}),
+            ("LocalPeakWindowSum", {"window_width": 5, "window_shift": 2}),
+            ("SlidingWindowMaxSum", {"window_width": 6}),
+            ("SlidingWindowMaxSum", {"apply_integration_correction": True}),
+            ("NeighborPeakWindowSum", {}),
+            ("gradient_extractor", {"pedestal_width": 16}),
+        ],
+    )
+    @pytest.mark.filterwarnings("ignore::RuntimeWarning")
+    def test_call(self, subarray, waveforms, broken_pixels, method, kwargs):
+        imageExtractor = ChargesComponent._get_imageExtractor(
+            method, subarray, **kwargs
+        )
+        batchExtractor = BatchExtractor(imageExtractor)
+        assert batchExtractor.is_batched == (method != "NeighborPeakWindowSum")
+        for channel in [0, 1]:
+            charges, peak_time = batchExtractor(
+                waveforms, self.TEL_ID, channel, broken_pixels
+            )
+            assert charges.shape == (self.NEVENTS, self.NPIXELS)
+            assert charges.dtype == np.float32
+            for i in range(self.NEVENTS):
+                output = imageExtractor(
+                    waveforms[i], self.TEL_ID, channel, broken_pixels[i]
+                )
+                assert np.array_equal(charges[i], output.image)
+                assert np.array_equal(peak_time[i], output.peak_time)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from ctapipe.containers import DL1CameraContainer
+from ctapipe.utils import get_dataset_path
+
+from nectarchain.makers.core import BaseNectarCAMCalibrationTool
+from nectarchain.makers.extractor.charge_extractor import gradient_extractor
+
+
+class TestGradientExtractor:
+    RUN_NUMBER = 3938
+    RUN_FILE = get_dataset_path("NectarCAM.Run3938.30events.fits.fz")
+    TEL_ID = 0
+    NSAMPLES = 60
+    PEDESTAL = 250
+    PEAK_POSITION = 26.3
+    SIGMA = 2.0
+
+    @pytest.fixture
+    def subarray(self):
+        return BaseNectarCAMCalibrationTool.load_run(
+            run_number=self.RUN_NUMBER, max_events=1, run_file=self.RUN_FILE
+        ).subarray
+
+    @pytest.fixture
+    def instance(self, subarray):
+        return gradient_extractor(subarray, pedestal_width=16)
+
+    def pulses(self, amplitude):
+        samples = np.arange(self.NSAMPLES)
+        return self.PEDESTAL + amplitude[..., None] * np.exp(
+            -0.5 * ((samples - self.PEAK_POSITION) / self.SIGMA) ** 2
+        )
+
+    def test_extract_batch(self, instance):
+        amplitude = np.array([[100.0, 500.0, 2000.0], [50.0, 1000.0, 3000.0]])
+        charge, peak_time = instance.extract_batch(
+            self.pulses(amplitude).astype(np.uint16), self.TEL_ID
+        )
+        assert charge.shape == amplitude.shape
+        assert charge.dtype == np.float32
+        np.testing.assert_allclose(
+            charge, amplitude * self.SIGMA * np.sqrt(2 * np.pi), rtol=0.03
+        )
+        sampling_rate_ghz = instance.sampling_rate_ghz[self.TEL_ID]
+        np.testing.assert_allclose(
+            peak_time * sampling_rate_ghz, self.PEAK_POSITION, atol=0.25
+        )
+
+    def test_default_pedestal(self, subarray):
+        # raw waveforms, with the pedestal and its noise
+        instance = gradient_extractor(subarray)
+        rng = np.random.default_rng(0)
+        amplitude = np.array([[0.0, 0.0, 100.0, 1000.0]] * 5)
+        waveforms = self.pulses(amplitude) + rng.normal(0, 2, amplitude.shape + (60,))
+        charge, _ = instance.extract_batch(
+            np.round(waveforms).astype(np.uint16), self.TEL_ID
+        )
+        assert np.all(charge[:, :2] == 0)
+        np.testing.assert_allclose(
+            charge[:, 2:],
+            amplitude[:, 2:] * self.SIGMA * np.sqrt(2 * np.pi),
+            rtol=0.1,
+        )
+
+    def test_no_peak(self, instance):
+        charge, _ = instance.extract_batch(
+            np.full((1, 2, self.NSAMPLES), self.PEDESTAL, dtype=np.uint16),
+            self.TEL_ID,
+        )
+        assert np.all(charge == 0)
+
+    def test_saturated(self, instance):
+        waveforms = np.minimum(self.pulses(np.array([[10000.0]])), 4095).astype(
+            np.uint16
+        )
+        _, peak_time = instance.extract_batch(waveforms, self.TEL_ID)
+        saturated = np.where(waveforms[0, 0] == 4095)[0]
+        sampling_rate_ghz = instance.sampling_rate_ghz[self.TEL_ID]
+        assert saturated[0] <= peak_time[0, 0] * sampling_rate_ghz <= saturated[-1]
+
+    def test_call(self, instance):
+        waveforms = self.pulses(np.array([100.0, 500.0, 2000.0]))
+        output = instance(waveforms, self.TEL_ID, 0, np.zeros(3, dtype=bool))
+        assert isinstance(output, DL1CameraContainer)
+        charge, peak_time = instance.extract_batch(waveforms[None], self.TEL_ID)
+        assert np.all(output.image == charge[0])
+        assert np.all(output.peak_time == peak_time[0])
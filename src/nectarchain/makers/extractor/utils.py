@@ -28,7 +28,15 @@ class CtapipeExtractor:
 
     def get_extractor_kwargs_str(method: str, extractor_kwargs: dict):
         ctapipe_extractor_module = importlib.import_module("ctapipe.image.extractor")
-        extractor = getattr(ctapipe_extractor_module, method)
+        if hasattr(ctapipe_extractor_module, method):
+            extractor = getattr(ctapipe_extractor_module, method)
+        else:
+            extractor = getattr(
+                importlib.import_module(
+                    "nectarchain.makers.extractor.charge_extractor"
+                ),
+                method,
+            )
         str_extractor_kwargs = ""
         for trait_name, trait in extractor.class_own_traits().items():
             if trait_name in extractor_kwargs:
@@ -54,6 +54,7 @@ class MockComponent(NectarCAMComponent):
 class TestEventsLoopNectarCAMCalibrationTool(TestBaseNectarCAMCalibrationTool):
     MAX_EVENTS = 10
     EVENTS_PER_SLICE = 8
+    N_WORKERS = 2
 
     @pytest.fixture
     def tool_instance(self):
@@ -79,6 +80,7 @@ class TestEventsLoopNectarCAMCalibrationTool(TestBaseNectarCAMCalibrationTool):
         assert tool_instance.run_file is None
         assert tool_instance.name == "EventsLoopNectarCAMCalibration"
         assert tool_instance.events_per_slice is None
+        assert tool_instance.n_workers == 1
 
     def test_init_with_output_path(self):
         custom_path = pathlib.Path("/custom/path/output.h5")
@@ -99,6 +101,43 @@ class TestEventsLoopNectarCAMCalibrationTool(TestBaseNectarCAMCalibrationTool):
         )
         assert tool_instance.events_per_slice == self.EVENTS_PER_SLICE
 
+    def test_init_with_n_workers(self):
+        tool_instance = EventsLoopNectarCAMCalibrationTool(
+            run_number=self.RUN_NUMBER, n_workers=self.N_WORKERS
+        )
+        assert tool_instance.n_workers == self.N_WORKERS
+
+    def test_split_run_files(self):
+        files = [f"NectarCAM.Run{self.RUN_NUMBER}.000{i}.fits.fz" for i in range(5)]
+        run_files = EventsLoopNectarCAMCalibrationTool._split_run_files(
+            files, self.N_WORKERS
+        )
+        assert run_files == [[files[0], files[2], files[4]], [files[1], files[3]]]
+        run_files = EventsLoopNectarCAMCalibrationTool._split_run_files(files, 10)
+        assert run_files == [[file] for file in files]
+        assert EventsLoopNectarCAMCalibrationTool._split_run_files([], 2) == []
+
+    def test_split_n_events(self):
+        assert EventsLoopNectarCAMCalibrationTool._split_n_events(5, 2) == [3, 2]
+        assert EventsLoopNectarCAMCalibrationTool._split_n_events(None, 2) == [
+            None,
+            None,
+        ]
+        assert EventsLoopNectarCAMCalibrationTool._split_n_events(np.inf, 2) == [
+            np.inf,
+            np.inf,
+        ]
+
+    def test_get_workers_run_files_sliced(self, tool_instance_run_file):
+        tool_instance_run_file.n_workers = self.N_WORKERS
+        tool_instance_run_file.events_per_slice = self.EVENTS_PER_SLICE
+        assert tool_instance_run_file._get_workers_run_files() is None
+
+    def test_get_workers_run_files_single_file(self, tool_instance_run_file):
+        tool_instance_run_file.n_workers = self.N_WORKERS
+        tool_instance_run_file.componentsList = ["WaveformsComponent"]
+        assert tool_instance_run_file._get_workers_run_files() is None
+
     def test_init_with_run_file(self):
         tool_instance = EventsLoopNectarCAMCalibrationTool(
             run_number=self.RUN_NUMBER, run_file=self.RUN_FILE
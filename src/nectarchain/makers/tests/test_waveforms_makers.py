@@ -1,3 +1,4 @@
+import shutil
 import tempfile
 from pathlib import Path
 
@@ -200,3 +201,41 @@ class TestWaveformsNectarCAMCalibrationTool:
                         if _events_per_slice is None
                         else round(nevents / _events_per_slice)
                     )
+
+    def test_n_workers(self, tmp_path):
+        """
+        Test the multi-process event loop against the serial one, on a run of two
+        files
+        """
+        run_number = self.RUNS["Run number"][0]
+        for i in range(2):
+            shutil.copy(
+                self.RUNS["Run file"][0],
+                tmp_path / f"NectarCAM.Run{run_number}.000{i}.fits.fz",
+            )
+        outputs = {}
+        n_traited_events = {}
+        for n_workers in [1, 2]:
+            tool = WaveformsNectarCAMCalibrationTool(
+                run_number=run_number,
+                run_file=f"{tmp_path}/NectarCAM.Run{run_number}.*.fits.fz",
+                n_workers=n_workers,
+                log_level=0,
+                output_path=tmp_path / f"waveforms_{n_workers}.h5",
+                overwrite=self.OVERWRITE,
+            )
+            tool.setup()
+            tool.start()
+            n_traited_events[n_workers] = tool._n_traited_events
+            outputs[n_workers] = tool.finish(return_output_component=True)[
+                0
+            ].containers[self.RUNS["eventType"]]
+
+        assert n_traited_events[2] == n_traited_events[1] == 2 * self.RUNS["nevents"][0]
+        serial, parallel = outputs[1], outputs[2]
+        assert parallel.nevents == serial.nevents
+        # the merged output is sorted by event_id, the serial one in reading order
+        order = np.argsort(serial.event_id, kind="stable")
+        assert np.array_equal(parallel.event_id, serial.event_id[order])
+        for field in ["ucts_timestamp", "wfs_hg", "wfs_lg", "broken_pixels_hg"]:
+            assert np.array_equal(parallel[field], serial[field][order])
@@ -0,0 +1,75 @@
+def test_buffer_append():
+    import numpy as np
+
+    from nectarchain.utils.buffer import ColumnBuffer
+
+    buffer = ColumnBuffer(dtype=np.uint16, capacity=2)
+    for i in range(5):
+        buffer.append(np.full((3, 4), i))
+
+    assert len(buffer) == 5
+    assert buffer.shape == (5, 3, 4)
+    assert buffer.capacity == 8
+    np.testing.assert_array_equal(buffer[2], np.full((3, 4), 2))
+    np.testing.assert_array_equal(np.array(buffer)[:, 0, 0], np.arange(5))
+
+
+def test_buffer_to_array():
+    import numpy as np
+
+    from nectarchain.utils.buffer import ColumnBuffer
+
+    buffer = ColumnBuffer(dtype=np.uint32)
+    for i in range(20):
+        buffer.append(i)
+    output = buffer.to_array()
+
+    assert output.dtype == np.uint32
+    assert output.shape == (20,)
+    assert buffer.capacity == 20
+    np.testing.assert_array_equal(output, np.arange(20))
+
+    # the buffer can still grow while the output is referenced
+    buffer.append(20)
+    assert output.shape == (20,)
+    np.testing.assert_array_equal(buffer.to_array(), np.arange(21))
+
+
+def test_buffer_extend():
+    import numpy as np
+
+    from nectarchain.utils.buffer import ColumnBuffer
+
+    buffer = ColumnBuffer(dtype=bool, shape=(3,), capacity=1)
+    buffer.extend(np.ones((4, 3)))
+    buffer.append(np.zeros(3))
+
+    assert buffer.shape == (5, 3)
+    np.testing.assert_array_equal(buffer.to_array().sum(axis=1), [3, 3, 3, 3, 0])
+
+
+def test_buffer_clear():
+    import numpy as np
+
+    from nectarchain.utils.buffer import ColumnBuffer
+
+    buffer = ColumnBuffer(dtype=np.uint16, capacity=4)
+    buffer.extend(np.arange(3))
+    buffer.clear()
+    buffer.append(7)
+
+    assert len(buffer) == 1
+    assert buffer.capacity == 4
+    np.testing.assert_array_equal(buffer.to_array(), [7])
+
+
+def test_buffer_empty():
+    import numpy as np
+
+    from nectarchain.utils.buffer import ColumnBuffer
+
+    buffer = ColumnBuffer(dtype=np.uint64)
+
+    assert len(buffer) == 0
+    assert buffer.to_array().shape == (0,)
+    assert buffer.to_array().dtype == np.uint64
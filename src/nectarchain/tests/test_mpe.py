@@ -0,0 +1,138 @@
+def test_get_ntotalPE():
+    from scipy.special import gammainc
+
+    from nectarchain.utils.utils import get_ntotalPE
+
+    for lum in [0.01, 0.5, 2.3, 15.0, 120.0]:
+        expected = next(i for i in range(1000) if gammainc(i + 1, lum) < 1e-5)
+        assert get_ntotalPE(lum) == expected
+    assert get_ntotalPE(1e-6) == 0
+
+
+def test_MPE2_sum_of_nPEPDF():
+    import math
+
+    import numpy as np
+
+    from nectarchain.utils.utils import MPE2, get_ntotalPE, nPEPDF
+
+    pp, res, mu2, n, muped, sigped = 0.45, 0.5, 50.0, 0.7, 250.0, 10.0
+    x = np.linspace(150, 900, 300)
+    for lum in [0.3, 2.5, 8.0]:
+        ntotalPE = get_ntotalPE(lum)
+        size_charge = int(mu2 * ntotalPE + 10 * mu2)
+        expected = np.sum(
+            [
+                lum**i
+                / math.factorial(i)
+                * np.exp(-lum)
+                * nPEPDF(x, pp, res, mu2, n, muped, sigped, i, size_charge)
+                for i in range(ntotalPE)
+            ],
+            axis=0,
+        )
+        pdf = MPE2(x, pp, res, mu2, n, muped, sigped, lum)
+        np.testing.assert_allclose(pdf, expected, rtol=0, atol=1e-12 * expected.max())
+        np.testing.assert_allclose(
+            MPE2(x, pp, res, mu2, n, muped, sigped, lum, ntotalPE=ntotalPE), pdf
+        )
+
+
+def test_MPE2_batch():
+    import numpy as np
+
+    from nectarchain.utils.utils import MPE2, MPE2_batch
+
+    parameters = np.array(
+        [
+            # pp, res, mu2, n, muped, sigped, lum
+            [0.45, 0.5, 50.0, 0.7, 250.0, 10.0, 0.3],
+            [0.4, 0.45, 65.0, 0.65, 245.0, 14.0, 2.5],
+            [0.5, 0.55, 40.0, 0.75, 255.0, 8.0, 1e-6],
+        ]
+    )
+    x = np.tile(np.linspace(150, 900, 300), (3, 1))
+    pdf = MPE2_batch(x, *parameters.T)
+    assert pdf.shape == x.shape
+    for i in range(3):
+        expected = MPE2(x[i], *parameters[i])
+        # the models only differ by their interpolation on a different charge grid
+        np.testing.assert_allclose(
+            pdf[i], expected, rtol=0, atol=1e-4 * max(expected.max(), 1e-300)
+        )
+    assert np.all(pdf[2] == 0)
+
+
+def _central_differences(function, parameters, steps):
+    import numpy as np
+
+    grad = []
+    for i, step in enumerate(steps):
+        upper = list(parameters)
+        lower = list(parameters)
+        upper[i] += step
+        lower[i] -= step
+        grad.append((function(*upper) - function(*lower)) / (2 * step))
+    return np.array(grad)
+
+
+def test_doubleGaussConstrained_grad():
+    import numpy as np
+
+    from nectarchain.utils.utils import (
+        doubleGaussConstrained,
+        doubleGaussConstrained_grad,
+    )
+
+    x = np.linspace(-20, 200, 50)
+    for parameters in [(0.45, 0.5, 50.0, 0.7), (0.4, 0.45, 65.0, 0.3)]:
+        spe, grad = doubleGaussConstrained_grad(x, *parameters)
+        np.testing.assert_allclose(spe, doubleGaussConstrained(x, *parameters))
+        expected = _central_differences(
+            lambda *args: doubleGaussConstrained(x, *args), parameters, [1e-6] * 4
+        )
+        np.testing.assert_allclose(
+            grad, expected, rtol=0, atol=1e-7 * abs(expected).max()
+        )
+
+
+def test_MPE2_grad():
+    import numpy as np
+
+    from nectarchain.utils.utils import (
+        MPE2,
+        MPE2_grad,
+        get_ntotalPE,
+        nPEPDF,
+        nPEPDF_grad,
+    )
+
+    x = np.linspace(150, 900, 300)
+    steps = [1e-5, 1e-5, 1e-5, 1e-5, 1e-4, 1e-5, 1e-6]
+    for lum in [0.3, 2.5]:
+        # mu2 such that the charge grid does not change within the steps
+        parameters = [0.45, 0.5, 50.3, 0.7, 250.0, 10.0, lum]
+        ntotalPE = get_ntotalPE(lum)
+        pdf, grad = MPE2_grad(x, *parameters)
+        np.testing.assert_allclose(pdf, MPE2(x, *parameters), rtol=0, atol=1e-12)
+        expected = _central_differences(
+            lambda *args: MPE2(x, *args, ntotalPE=ntotalPE), parameters, steps
+        )
+        for i in range(7):
+            np.testing.assert_allclose(
+                grad[i], expected[i], rtol=0, atol=1e-6 * abs(expected[i]).max()
+            )
+
+    size_charge = 800
+    for nph in [1, 3]:
+        pdf, grad = nPEPDF_grad(x, *parameters[:6], nph, size_charge)
+        np.testing.assert_allclose(
+            pdf, nPEPDF(x, *parameters[:6], nph, size_charge), rtol=0, atol=1e-12
+        )
+        expected = _central_differences(
+            lambda *args: nPEPDF(x, *args, nph, size_charge), parameters[:6], steps[:6]
+        )
+        for i in range(6):
+            np.testing.assert_allclose(
+                grad[i], expected[i], rtol=0, atol=1e-6 * abs(expected[i]).max()
+            )
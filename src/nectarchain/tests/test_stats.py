@@ -173,6 +173,33 @@ def test_stats_merge3():
     np.testing.assert_allclose(s.max, np.array([2, 3, 4, 5, 6]))
 
 
+def test_stats_from_moments():
+    import numpy as np
+
+    from nectarchain.utils.stats import Stats, merge_stats
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(50, 5))
+    slices = []
+    for start, stop in [(0, 7), (7, 30), (30, 31), (31, 50)]:
+        s = Stats(shape=(5,))
+        for element in data[start:stop]:
+            s.add(element)
+        slices.append(Stats.from_moments(s.count, s.mean, s.m2, s.min, s.max))
+    # a slice without entries
+    slices.append(Stats(shape=(5,)))
+
+    s = merge_stats(slices)
+
+    np.testing.assert_allclose(s.count, np.full(5, 50))
+    np.testing.assert_allclose(s.mean, data.mean(axis=0))
+    np.testing.assert_allclose(s.variance, data.var(axis=0, ddof=1))
+    np.testing.assert_allclose(s.min, data.min(axis=0))
+    np.testing.assert_allclose(s.max, data.max(axis=0))
+    np.testing.assert_allclose(slices[0].count, np.full(5, 7))
+    assert merge_stats([]) is None
+
+
 def test_stats_shape():
     from ctapipe_io_nectarcam import constants as nc
 
@@ -216,3 +243,67 @@ def test_stats_badmerge():
         ValueError, match="Trying to merge from a different shape this:.*"
     ):
         s.merge(s2)
+
+
+def test_histogram_sketch():
+    import numpy as np
+
+    from nectarchain.utils.stats import HistogramSketch
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(1000, 50, size=(2000, 5))
+    data[:, 4] = rng.exponential(10, size=2000)
+    validmask = np.ones(5, dtype=bool)
+    validmask[3] = False
+
+    s = HistogramSketch(shape=(5,), max_bins=256)
+    for element in data:
+        s.add(element, validmask=validmask)
+
+    np.testing.assert_allclose(s.count, np.array([2000, 2000, 2000, 0, 2000]))
+    np.testing.assert_allclose(s.min[validmask], data.min(axis=0)[validmask])
+    np.testing.assert_allclose(s.max[validmask], data.max(axis=0)[validmask])
+    for q in [0.1, 0.5, 0.9]:
+        np.testing.assert_allclose(
+            s.quantile(q)[validmask],
+            np.quantile(data, q, axis=0)[validmask],
+            atol=s.bin_width,
+        )
+    assert np.isnan(s.median[3])
+
+    counts, edges = s.histogram(max_bins=20)
+    assert counts.shape[0] == 5
+    assert counts.shape[1] <= 20
+    assert len(edges) == counts.shape[1] + 1
+    np.testing.assert_allclose(counts.sum(axis=1), s.count)
+
+
+def test_histogram_sketch_merge():
+    import numpy as np
+
+    from nectarchain.utils.stats import HistogramSketch
+
+    rng = np.random.default_rng(0)
+    data = np.concatenate(
+        [rng.normal(-5, 1, size=(300, 3)), rng.uniform(-10, 500, size=(300, 3))]
+    )
+
+    s = HistogramSketch(shape=(3,), max_bins=128)
+    s1 = HistogramSketch(shape=(3,), max_bins=128)
+    s2 = HistogramSketch(shape=(3,), max_bins=128)
+    for i, element in enumerate(data):
+        s.add(element)
+        (s1 if i < 300 else s2).add(element)
+
+    merged = s1 + s2
+
+    assert id(merged) != id(s1)
+    np.testing.assert_allclose(merged.count, s.count)
+    np.testing.assert_allclose(merged.min, s.min)
+    np.testing.assert_allclose(merged.max, s.max)
+    np.testing.assert_allclose(
+        merged.median, np.median(data, axis=0), atol=merged.bin_width
+    )
+
+    with pytest.raises(ValueError):
+        merged.merge(HistogramSketch(shape=(5,)))
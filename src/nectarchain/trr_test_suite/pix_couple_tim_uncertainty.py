@@ -4,7 +4,6 @@ import pickle
 import sys
 
 import matplotlib.pyplot as plt
-import numpy as np
 
 from nectarchain.trr_test_suite.tools_components import ToMPairsTool
 
@@ -112,8 +111,8 @@ def main():
 
     tom_corrected = []
 
-    dt_no_correction = []
-    dt_corrected = []
+    stats_no_correction = []
+    stats_corrected = []
     pixel_pairs = []
 
     for run in runlist:
@@ -131,19 +130,17 @@ def main():
         tool.initialize()
         tool.setup()
         tool.start()
-        output = tool.finish(tt_path)
+        # only the rms of the pairs are needed, the differences of all the pairs
+        # are not kept
+        output = tool.finish(tt_path, stream_rms=True, max_dt=7)
         tom.append(output[0])
         tom_corrected.append(output[1])
         pixel_ids.append(output[2])
-        dt_no_correction.append(output[3])
-        dt_corrected.append(output[4])
+        stats_no_correction.append(output[3])
+        stats_corrected.append(output[4])
         pixel_pairs.append(output[5])
 
-    dt_no_correction = np.array(dt_no_correction[0])
-    dt_corrected = np.array(output[4])
-    dt_corrected[abs(dt_corrected) > 7] = np.nan
-    dt_corrected[abs(dt_no_correction) > 7] = np.nan
-    std_corrected = np.nanstd(dt_corrected, axis=1)
+    std_corrected = output[4]["rms"]
 
     fig, ax = plt.subplots(figsize=(10, 10 / 1.61))
     plt.hist(std_corrected, range=(0, 5), density=True, histtype="step", lw=3, bins=200)
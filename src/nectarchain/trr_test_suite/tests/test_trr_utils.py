@@ -0,0 +1,74 @@
+from itertools import combinations
+
+import numpy as np
+from scipy.interpolate import InterpolatedUnivariateSpline
+
+from nectarchain.trr_test_suite.utils import (
+    cubic_interpolation_matrix,
+    nan_statistics,
+    pair_differences,
+    pixel_pair_blocks,
+    tom_and_charge,
+)
+
+
+def test_cubic_interpolation_matrix():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=60)
+    xi, matrix = cubic_interpolation_matrix(60)
+    assert matrix.shape == (251, 60)
+    spline = InterpolatedUnivariateSpline(np.linspace(0, 60, 60), y)
+    np.testing.assert_allclose(matrix @ y, spline(xi), atol=1e-10)
+
+
+def test_tom_and_charge():
+    t = np.arange(60)
+    waveforms = np.full((3, 60), 250, dtype=np.uint16)
+    # pulses peaking at 25 and 30 ns, and a trace without signal
+    waveforms[0] += (1000 * np.exp(-0.5 * (t - 25) ** 2)).astype(np.uint16)
+    waveforms[1] += (1000 * np.exp(-0.5 * (t - 30) ** 2)).astype(np.uint16)
+    waveforms[2, 1::2] += 2
+
+    ped, tom, charge = tom_and_charge(waveforms)
+
+    np.testing.assert_allclose(ped, [250, 250, 251])
+    assert abs(tom[0] - 25 * 60 / 59) < 0.25
+    assert abs(tom[1] - 30 * 60 / 59) < 0.25
+    assert tom[2] == -1
+    np.testing.assert_allclose(charge[:2], waveforms[:2].sum(axis=1) - 60 * 250)
+    np.testing.assert_allclose(charge[2], 0)
+
+    # block of events
+    _, block_tom, block_charge = tom_and_charge(np.stack([waveforms, waveforms]))
+    assert block_tom.shape == (2, 3)
+    np.testing.assert_array_equal(block_tom[1], tom)
+    np.testing.assert_array_equal(block_charge[1], charge)
+
+
+def test_pixel_pair_blocks():
+    blocks = list(pixel_pair_blocks(7, block_size=4))
+    assert [len(first) for first, _ in blocks] == [4, 4, 4, 4, 4, 1]
+    pairs = [(i, j) for first, second in blocks for i, j in zip(first, second)]
+    assert pairs == list(combinations(range(7), 2))
+    assert len(list(pixel_pair_blocks(1))) == 1
+
+
+def test_pair_differences_statistics():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(-5, 65, size=(50, 8))
+    valid = (values > 0) & (values < 60)
+    first, second = next(pixel_pair_blocks(8))
+
+    differences = pair_differences(values, first, second, valid)
+    assert differences.shape == (50, 28)
+    for k, (i, j) in enumerate(zip(first, second)):
+        expected = np.where(
+            valid[:, i] & valid[:, j], values[:, i] - values[:, j], np.nan
+        )
+        np.testing.assert_array_equal(differences[:, k], expected)
+
+    count, mean, rms = nan_statistics(differences)
+    np.testing.assert_array_equal(count, np.sum(~np.isnan(differences), axis=0))
+    np.testing.assert_allclose(mean, np.nanmean(differences, axis=0))
+    np.testing.assert_allclose(rms, np.nanstd(differences, axis=0))
+    assert np.isnan(nan_statistics(np.full((3, 1), np.nan))[2][0])
@@ -10,13 +10,19 @@ from ctapipe.containers import EventType, Field
 from ctapipe.core.traits import ComponentNameList, Integer
 from ctapipe_io_nectarcam import constants
 from ctapipe_io_nectarcam.containers import NectarCAMDataContainer
-from scipy.interpolate import InterpolatedUnivariateSpline
 from scipy.signal import find_peaks
 
 from nectarchain.data.container import NectarCAMContainer
 from nectarchain.makers import EventsLoopNectarCAMCalibrationTool
 from nectarchain.makers.component import NectarCAMComponent
-from nectarchain.trr_test_suite.utils import adc_to_pe, argmedian
+from nectarchain.trr_test_suite.utils import (
+    adc_to_pe,
+    argmedian,
+    nan_statistics,
+    pair_differences,
+    pixel_pair_blocks,
+    tom_and_charge,
+)
 
 
 # overriding so we can have maxevents in the path
@@ -428,182 +434,27 @@ class ToMComp(NectarCAMComponent):
         self.__event_type.append(event.trigger.event_type.value)
         self.__ucts_timestamp.append(event.nectarcam.tel[0].evt.ucts_timestamp)
 
-        wfs = []
-        wfs.append(event.r0.tel[0].waveform[constants.HIGH_GAIN][self.pixels_id])
+        wf = event.r0.tel[0].waveform[constants.HIGH_GAIN][self.pixels_id]
 
         self.__ff_event_ind += 1
 
         # #####THE JOB IS HERE######
 
-        for i, (pedestal, charge, tom_no_fit) in enumerate(
-            zip([self.__pedestal_hg], [self.__charge_hg], [self.__tom_no_fit])
-        ):
-            wf = np.array(wfs[i])  # waveform per gain
-            index_peak = np.argmax(wf, axis=1)  # tom per event/pixel
-            # use it to first find pedestal and then will filter out no signal events
-            index_peak[index_peak < 20] = 20
-            index_peak[index_peak > 40] = 40
-            signal_start = index_peak - self.window_shift
-            signal_stop = index_peak + self.window_width - self.window_shift
-
-            ped = np.array(
-                [
-                    np.mean(wf[pix, 0 : signal_start[pix]])
-                    for pix in range(len(self.pixels_id))
-                ]
-            )
-
-            pedestal.append(ped)
-
-            tom_no_fit_evt = np.zeros(len(self.pixels_id))
-            chg = np.zeros(len(self.pixels_id))
-            # will calculate tom & charge like federica
-            for pix in range(len(self.pixels_id)):
-                y = (
-                    wf[pix] - ped[pix]
-                )  # np.maximum(wf[pix] - ped[pix],np.zeros(len(wf[pix])))
-
-                x = np.linspace(0, len(y), len(y))
-                xi = np.linspace(0, len(y), 251)
-                ius = InterpolatedUnivariateSpline(x, y)
-                yi = ius(xi)
-                peaks, _ = find_peaks(
-                    yi,
-                    height=self.peak_height,
-                )
-                # print(peaks)
-                peaks = peaks[xi[peaks] > 20]
-                peaks = peaks[xi[peaks] < 32]
-                # print(peaks)
-
-                if len(peaks) > 0:
-                    # find the max peak
-                    # max_peak = max(yi[peaks])
-                    max_peak_index = np.argmax(yi[peaks], axis=0)
-
-                    # Check if there is not a peak but a plateaux
-                    yi_rounded = np.around(yi[peaks] / max(yi[peaks]), 1)
-                    maxima_peak_index = np.argwhere(yi_rounded == np.amax(yi_rounded))
-
-                    # saturated events
-                    if (
-                        (len(maxima_peak_index) > 1)
-                        and (min(xi[peaks[maxima_peak_index]]) > signal_start[pix])
-                        and (max(xi[peaks[maxima_peak_index]]) < signal_stop[pix])
-                    ):
-                        # saturated event
-
-                        max_peak_index = int(np.median(maxima_peak_index))
-
-                        # simple sum integration
-                        x_max_pos = np.argmin(
-                            np.abs(x - xi[peaks[max_peak_index]])
-                        )  # find the maximum in the not splined array
-                        charge_sum = y[
-                            (x_max_pos - (self.window_width - 10)) : (
-                                x_max_pos + (self.window_width - 6)
-                            )
-                        ].sum()
-
-                        # gaussian fit
-                        # change_grad_pos_left = 3
-                        # change_grad_pos_right = 3
-
-                        # mask = np.ma.masked_where(y > (4095 - 400), x)
-                        # x_fit = np.ma.compressed(mask)
-                        # mask = np.ma.masked_where(y > (4095 - 400), y)
-                        # y_fit = np.ma.compressed(mask)
-                        # mean = xi[peaks[max_peak_index]]
-                        # sigma = change_grad_pos_right + change_grad_pos_left
-
-                        # # fit
-                        # model = Model(gaus)
-                        # params = model.make_params(a=yi[peaks[max_peak_index]] * 3,
-                        # mu=mean, sigma=sigma)
-                        # result = model.fit(y_fit, params, x=x_fit)
-
-                        # result_sigma = result.params['sigma'].value
-                        # result_mu = result.params['mu'].value
-
-                        max_position_x_prefit = xi[peaks[max_peak_index]]
-
-                    elif (
-                        (len(maxima_peak_index) == 1)
-                        and (xi[peaks[max_peak_index]] > signal_start[pix])
-                        and (xi[peaks[max_peak_index]] < signal_stop[pix])
-                    ):
-                        # simple sum integration
-                        x_max_pos = np.argmin(
-                            np.abs(x - xi[peaks[max_peak_index]])
-                        )  # find the maximum in the not splined array
-                        charge_sum = y[
-                            (x_max_pos - (self.window_width - 10)) : (
-                                x_max_pos + (self.window_width - 6)
-                            )
-                        ].sum()
-
-                        # gaussian fit
-                        # change_grad_pos_left = 3
-                        # change_grad_pos_right = 3
-                        # mean = xi[peaks[max_peak_index]]
-                        # sigma = change_grad_pos_right + change_grad_pos_left # define
-                        # window for the gaussian fit
-
-                        # x_fit =  xi[peaks[max_peak_index]-change_grad_pos_left:peaks
-                        # [max_peak_index]+change_grad_pos_right]
-                        # y_fit =  yi[peaks[max_peak_index]-change_grad_pos_left:peaks
-                        # [max_peak_index]+change_grad_pos_right]
-                        # model = Model(gaus)
-                        # params = model.make_params(a=yi[peaks[max_peak_index]],
-                        # mu=mean,sigma=sigma)
-                        # result = model.fit(y_fit, params, x=x_fit)
-
-                        max_position_x_prefit = xi[peaks[max_peak_index]]
-                        # result_sigma  = result.params['sigma'].value
-                        # result_mu  = result.params['mu'].value
-
-                    else:
-                        # index_x_window_min = list(xi).index(closest_value(xi,
-                        # signal_start[pix]))
-                        charge_sum = y[
-                            signal_start[pix] : signal_start[pix] + self.window_width
-                        ].sum()
-
-                        max_position_x_prefit = -1
-                        # result_sigma = -1
-                        # result_mu = -1
-
-                else:
-                    # If no maximum is found, the integration is done between 20 and 36
-                    # ns.
-                    signal_start[pix] = 20
-
-                    # index_x_window_min = list(xi).index(closest_value(xi,
-                    # signal_start[pix]))
-                    charge_sum = y[
-                        signal_start[pix] : signal_start[pix] + self.window_width
-                    ].sum()
-
-                    max_position_x_prefit = -1
-
-                    # result_sigma = -1
-                    # result_mu = -1
-
-                # tom_mu_evt[pix] = result_mu
-                # tom_sigma_evt[pix] = result_sigma
-                tom_no_fit_evt[pix] = max_position_x_prefit
-                chg[pix] = charge_sum
+        # tom & charge like federica, computed for all the pixels at once
+        ped, tom_no_fit_evt, chg = tom_and_charge(
+            wf,
+            window_shift=self.window_shift,
+            window_width=self.window_width,
+            peak_height=self.peak_height,
+        )
 
-            # tom_mu.append(tom_mu_evt)
-            # tom_sigma.append(tom_sigma_evt)
-            tom_no_fit.append(tom_no_fit_evt)
-            # print("tom for event", tom_no_fit_evt)
-            charge.append(chg)
+        self.__pedestal_hg.append(ped)
+        self.__tom_no_fit.append(tom_no_fit_evt)
+        self.__charge_hg.append(chg)
 
-            # is it a good event?
-            if np.max(chg) < 10 * np.mean(chg):
-                # print("is good evt")
-                self.__good_evts.append(self.__ff_event_ind)
+        # is it a good event?
+        if np.max(chg) < 10 * np.mean(chg):
+            self.__good_evts.append(self.__ff_event_ind)
 
     # This method need to be defined !
     def finish(self):
@@ -804,7 +655,31 @@ class ToMPairsTool(EventsLoopNectarCAMCalibrationTool):
         help="List of Component names to be apply, the order will be respected",
     ).tag(config=True)
 
-    def finish(self, *args, **kwargs):
+    def finish(self, *args, stream_rms=False, max_dt=None, block_size=None, **kwargs):
+        """Computes the ToM differences of the pairs of pixels.
+
+        Args:
+            args: The path to the .csv file of the PMT transit time corrections,\
+                followed by the arguments of the `finish` of the parent class.
+            stream_rms (bool, optional): If True, only the statistics of the\
+                differences of each pair are returned, computed by blocks of pairs\
+                    without holding the differences of all the pairs. Defaults to\
+                        False.
+            max_dt (float, optional): The differences larger in absolute value are\
+                ignored by the statistics, the corrected differences being also\
+                    ignored when the uncorrected ones are too large. Only used if\
+                        `stream_rms`.
+            block_size (int, optional): The number of pairs per block. Defaults to\
+                about 4 million differences per block.
+
+        Returns:
+            tuple: The uncorrected ToM, the corrected ToM, the pixel ids, the\
+                uncorrected and corrected differences, of shape (pairs, events),\
+                    NaN for the ToM outside ]0, 60[, and the pairs of pixel indices.\
+                        If `stream_rms`, the differences are replaced by dictionaries\
+                            of the `count`, `mean` and `rms` of each pair, and the\
+                                pairs are an array of shape (pairs, 2).
+        """
         super().finish(return_output_component=True, *args[1:], **kwargs)
 
         tt_path = args[0]
@@ -838,75 +713,71 @@ class ToMPairsTool(EventsLoopNectarCAMCalibrationTool):
         # mean_charge_pe = np.mean(np.mean(charge,axis=0))/58.
         tom_no_fit = np.array(tom_no_fit_all, dtype=np.float64)  # tom(event,pixel)
         # tom_no_fit = tom_no_fit[np.all(tom_no_fit>0,axis=0)]
-        tom_corrected = -np.ones(
-            tom_no_fit.shape, dtype=np.float128
-        )  # -1 for the ones that have tom beyond 0-60
-
-        iter = enumerate(pixels_id)
-
-        for i, pix in iter:
-            # print(pix, pmt_tt[pix])
-            normal_values = [
-                a and b for a, b in zip(tom_no_fit[:, i] > 0, tom_no_fit[:, i] < 60)
-            ]
-
-            tom_corrected[normal_values, i] = (
-                tom_no_fit[:, i][normal_values] - pmt_tt[pix]
+        normal_values = (tom_no_fit > 0) & (tom_no_fit < 60)
+        # -1 for the ones that have tom beyond 0-60
+        tom_corrected = np.where(normal_values, tom_no_fit - pmt_tt[pixels_id], -1.0)
+        normal_values_corrected = (tom_corrected > 0) & (tom_corrected < 60)
+
+        if block_size is None:
+            block_size = max(1, (1 << 22) // max(1, tom_no_fit.shape[0]))
+
+        if not stream_rms:
+            pixel_pairs = list(combinations(range(len(pixels_id)), 2))
+            dt_no_correction = np.empty((len(pixel_pairs), tom_no_fit.shape[0]))
+            dt_corrected = np.empty((len(pixel_pairs), tom_no_fit.shape[0]))
+            start = 0
+            for first, second in pixel_pair_blocks(len(pixels_id), block_size):
+                stop = start + len(first)
+                # nan if one of the tom is beyond 0-60
+                dt_no_correction[start:stop] = pair_differences(
+                    tom_no_fit, first, second, normal_values
+                ).T
+                dt_corrected[start:stop] = pair_differences(
+                    tom_corrected, first, second, normal_values_corrected
+                ).T
+                start = stop
+            return (
+                tom_no_fit,
+                tom_corrected,
+                pixels_id,
+                dt_no_correction,
+                dt_corrected,
+                pixel_pairs,
             )
 
-            # print(tom_corrected)
-
-        pixel_ind = [
-            i for i in range(len(pixels_id))
-        ]  # dealing with indices of pixels in array
-        pixel_pairs = list(combinations(pixel_ind, 2))
-        dt_no_correction = np.zeros((len(pixel_pairs), tom_no_fit_all.shape[0]))
-        dt_corrected = np.zeros((len(pixel_pairs), tom_no_fit_all.shape[0]))
-
-        for i, pair in enumerate(pixel_pairs):
-            pix1_ind = pixel_ind[pair[0]]
-            pix2_ind = pixel_ind[pair[1]]
-
-            for event in range(tom_no_fit_all.shape[0]):
-                cond_no_correction = (
-                    tom_no_fit[event, pix1_ind] > 0
-                    and tom_no_fit[event, pix1_ind] < 60
-                    and tom_no_fit[event, pix2_ind] > 0
-                    and tom_no_fit[event, pix2_ind] < 60
-                )
-                cond_correction = (
-                    tom_corrected[event, pix1_ind] > 0
-                    and tom_corrected[event, pix1_ind] < 60
-                    and tom_corrected[event, pix2_ind] > 0
-                    and tom_corrected[event, pix2_ind] < 60
-                )
-
-                if cond_no_correction:  # otherwise will be nan
-                    dt_no_correction[i, event] = (
-                        tom_no_fit[event, pix1_ind] - tom_no_fit[event, pix2_ind]
-                    )
-
-                else:
-                    dt_no_correction[i, event] = np.nan
-
-                if cond_correction:
-                    dt_corrected[i, event] = (
-                        tom_corrected[event, pix1_ind] - tom_corrected[event, pix2_ind]
-                    )
-
-                else:
-                    dt_corrected[i, event] = np.nan
-
-        # rms_no_fit = np.zeros(output[0].npixels)
-        # rms_no_fit_err = np.zeros(output[0].npixels)
+        stats_no_correction = {"count": [], "mean": [], "rms": []}
+        stats_corrected = {"count": [], "mean": [], "rms": []}
+        pixel_pairs = []
+        for first, second in pixel_pair_blocks(len(pixels_id), block_size):
+            dt_no_correction = pair_differences(
+                tom_no_fit, first, second, normal_values
+            )
+            dt_corrected = pair_differences(
+                tom_corrected, first, second, normal_values_corrected
+            )
+            if max_dt is not None:
+                dt_corrected[np.abs(dt_corrected) > max_dt] = np.nan
+                dt_corrected[np.abs(dt_no_correction) > max_dt] = np.nan
+                dt_no_correction[np.abs(dt_no_correction) > max_dt] = np.nan
+            for stats, dt in [
+                (stats_no_correction, dt_no_correction),
+                (stats_corrected, dt_corrected),
+            ]:
+                for key, value in zip(["count", "mean", "rms"], nan_statistics(dt)):
+                    stats[key].append(value)
+            pixel_pairs.append(np.stack([first, second], axis=1))
+
+        for stats in [stats_no_correction, stats_corrected]:
+            for key in stats:
+                stats[key] = np.concatenate(stats[key])
 
         return (
             tom_no_fit,
             tom_corrected,
             pixels_id,
-            dt_no_correction,
-            dt_corrected,
-            pixel_pairs,
+            stats_no_correction,
+            stats_corrected,
+            np.concatenate(pixel_pairs).reshape(-1, 2),
         )
 
 
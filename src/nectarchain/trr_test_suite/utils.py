@@ -1,10 +1,12 @@
 import os
+from functools import lru_cache
 
 import matplotlib.pyplot as plt
 import numpy as np
 from astropy import units as u
 from lmfit.models import Model
-from scipy.interpolate import interp1d
+from scipy.interpolate import InterpolatedUnivariateSpline, interp1d
+from scipy.signal import find_peaks
 from scipy.stats import expon, poisson
 from traitlets.config import Config
 
@@ -395,6 +397,225 @@ def argmedian(x, axis=None):
         )
 
 
+@lru_cache
+def cubic_interpolation_matrix(n_samples, n_points=251):
+    """Returns the matrix of the cubic spline interpolation of traces of `n_samples`\
+        samples on `n_points` points.
+
+    The interpolating spline of `InterpolatedUnivariateSpline` being linear in the\
+        interpolated values, the spline of a trace `y` sampled at\
+            `np.linspace(0, n_samples, n_samples)` and evaluated at\
+                `np.linspace(0, n_samples, n_points)` is `matrix @ y`, so that all\
+                    the traces of an event are upsampled with one product.
+
+    Args:
+        n_samples (int): The number of samples of the traces.
+        n_points (int, optional): The number of interpolation points. Defaults to\
+            251.
+
+    Returns:
+        tuple: The interpolation points and the read-only matrix of shape\
+            (n_points, n_samples).
+    """
+    x = np.linspace(0, n_samples, n_samples)
+    xi = np.linspace(0, n_samples, n_points)
+    matrix = np.stack(
+        [InterpolatedUnivariateSpline(x, y)(xi) for y in np.eye(n_samples)], axis=1
+    )
+    xi.flags.writeable = False
+    matrix.flags.writeable = False
+    return xi, matrix
+
+
+def _slice_mask(start, stop, length):
+    # mask of the indices selected by [start:stop] on an axis of size length, with
+    # the Python slicing rules
+    start, stop = (
+        np.where(bound < 0, np.maximum(bound + length, 0), np.minimum(bound, length))
+        for bound in np.broadcast_arrays(start, stop)
+    )
+    index = np.arange(length)
+    return (index >= start[..., np.newaxis]) & (index < stop[..., np.newaxis])
+
+
+def tom_and_charge(
+    waveforms, window_shift=6, window_width=16, peak_height=10, n_points=251
+):
+    """Computes the pedestal, the time of maximum and the charge of waveforms, all\
+        the traces being processed at once.
+
+    For each trace, the pedestal is the mean of the samples before the signal\
+        window, set around the maximum sample (clipped between 20 and 40). The\
+            trace minus its pedestal is upsampled with a cubic spline on `n_points`\
+                points, of which the peaks higher than `peak_height` between 20 and 32\
+                    ns are searched. The time of maximum is the position of the highest\
+                        peak, or of the median one of the peaks within 5% of it\
+                            (saturated traces), if it lies in the signal window, -1\
+                                otherwise. The charge is the sum of the samples in a\
+                                    window around the time of maximum, or starting at\
+                                        the signal window (20 if there is no peak).
+
+    Args:
+        waveforms (numpy.ndarray): The traces, of shape (..., n_samples), e.g.\
+            (pixels, n_samples) for an event or (events, pixels, n_samples) for a\
+                block of events.
+        window_shift (int, optional): The time in ns before the peak of the signal\
+            window. Defaults to 6.
+        window_width (int, optional): The duration of the signal window in ns.\
+            Defaults to 16.
+        peak_height (float, optional): The minimum height of a peak. Defaults to 10.
+        n_points (int, optional): The number of interpolation points. Defaults to\
+            251.
+
+    Returns:
+        tuple: The pedestals, the times of maximum and the charges, of shape\
+            waveforms.shape[:-1].
+    """
+    waveforms = np.asarray(waveforms)
+    shape = waveforms.shape[:-1]
+    n_samples = waveforms.shape[-1]
+    wf = waveforms.reshape(-1, n_samples)
+    rows = np.arange(len(wf))
+
+    index_peak = np.clip(np.argmax(wf, axis=1), 20, 40)
+    signal_start = index_peak - window_shift
+    signal_stop = index_peak + window_width - window_shift
+
+    ped_mask = _slice_mask(0, signal_start, n_samples)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ped = np.sum(wf, axis=1, where=ped_mask, dtype=np.float64) / np.sum(
+            ped_mask, axis=1
+        )
+    y = wf - ped[:, np.newaxis]
+
+    x = np.linspace(0, n_samples, n_samples)
+    xi, matrix = cubic_interpolation_matrix(n_samples, n_points)
+    yi = y @ matrix.T
+
+    # local maxima, as found by find_peaks, which is used for the traces with flat
+    # parts
+    peaks = np.zeros(yi.shape, dtype=bool)
+    peaks[:, 1:-1] = (yi[:, 1:-1] > yi[:, :-2]) & (yi[:, 1:-1] > yi[:, 2:])
+    for row in np.flatnonzero(np.any(yi[:, 1:] == yi[:, :-1], axis=1)):
+        peaks[row] = False
+        peaks[row, find_peaks(yi[row])[0]] = True
+    peaks &= (yi >= peak_height) & (xi > 20) & (xi < 32)
+    has_peaks = np.any(peaks, axis=1)
+
+    # highest peak, and peaks within 5% of it
+    max_col = np.argmax(np.where(peaks, yi, -np.inf), axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rounded = np.around(yi / yi[rows, max_col][:, np.newaxis], 1)
+    rounded_max = np.max(np.where(peaks, rounded, -np.inf), axis=1)
+    maxima = peaks & (rounded == rounded_max[:, np.newaxis])
+    n_maxima = np.sum(maxima, axis=1)
+
+    # median of the maxima, by rank among the peaks
+    peak_rank = np.cumsum(peaks, axis=1) - 1
+    maxima_count = np.cumsum(maxima, axis=1)
+
+    def maxima_col(n):
+        return np.argmax(maxima_count > n[:, np.newaxis], axis=1)
+
+    first_col = maxima_col(np.zeros_like(n_maxima))
+    last_col = maxima_col(n_maxima - 1)
+    median_rank = (
+        (
+            peak_rank[rows, maxima_col((n_maxima - 1) // 2)]
+            + peak_rank[rows, maxima_col(n_maxima // 2)]
+        )
+        / 2
+    ).astype(int)
+    median_col = np.argmax(peaks & (peak_rank == median_rank[:, np.newaxis]), axis=1)
+
+    saturated = (
+        has_peaks
+        & (n_maxima > 1)
+        & (xi[first_col] > signal_start)
+        & (xi[last_col] < signal_stop)
+    )
+    single = (
+        has_peaks
+        & (n_maxima == 1)
+        & (xi[max_col] > signal_start)
+        & (xi[max_col] < signal_stop)
+    )
+    found = saturated | single
+    tom_col = np.where(saturated, median_col, max_col)
+    tom = np.where(found, xi[tom_col], -1.0)
+
+    # simple sum integration, around the maximum in the not splined trace
+    x_max_pos = np.argmin(np.abs(x - xi[tom_col][:, np.newaxis]), axis=1)
+    start = np.where(has_peaks, signal_start, 20)
+    stop = start + window_width
+    start = np.where(found, x_max_pos - (window_width - 10), start)
+    stop = np.where(found, x_max_pos + (window_width - 6), stop)
+    charge = np.sum(y, axis=1, where=_slice_mask(start, stop, n_samples))
+
+    return ped.reshape(shape), tom.reshape(shape), charge.reshape(shape)
+
+
+def pixel_pair_blocks(npixels, block_size=None):
+    """Yields the pairs of pixel indices by blocks, in the order of\
+        `itertools.combinations(range(npixels), 2)`.
+
+    Args:
+        npixels (int): The number of pixels.
+        block_size (int, optional): The maximum number of pairs per block. All the\
+            pairs are in one block if `None`.
+
+    Yields:
+        tuple: The indices of the first and of the second pixels of the pairs of\
+            the block.
+    """
+    first, second = np.triu_indices(npixels, k=1)
+    if block_size is None:
+        block_size = max(len(first), 1)
+    # at least one block, possibly empty
+    for start in range(0, max(len(first), 1), block_size):
+        yield first[start : start + block_size], second[start : start + block_size]
+
+
+def pair_differences(values, first, second, valid=None):
+    """Returns the differences of the values of pairs of pixels.
+
+    Args:
+        values (numpy.ndarray): The values, of shape (events, pixels).
+        first (numpy.ndarray): The indices of the first pixels of the pairs.
+        second (numpy.ndarray): The indices of the second pixels of the pairs.
+        valid (numpy.ndarray, optional): The mask of the valid values, of the shape\
+            of `values`. The differences involving a non-valid value are NaN.
+
+    Returns:
+        numpy.ndarray: The differences, of shape (events, pairs).
+    """
+    differences = values[:, first] - values[:, second]
+    if valid is not None:
+        differences[~(valid[:, first] & valid[:, second])] = np.nan
+    return differences
+
+
+def nan_statistics(values, axis=0):
+    """Returns the number of entries, the mean and the RMS around the mean of\
+        values, ignoring NaN, as `np.nanmean` and `np.nanstd`.
+
+    Args:
+        values (numpy.ndarray): The values.
+        axis (int, optional): The axis along which the statistics are computed.\
+            Defaults to 0.
+
+    Returns:
+        tuple: The numbers of entries, the means and the RMS, NaN without entries.
+    """
+    finite = ~np.isnan(values)
+    count = np.sum(finite, axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.sum(values, axis=axis, where=finite) / count
+        deviations = values - np.expand_dims(mean, axis)
+        rms = np.sqrt(np.sum(deviations * deviations, axis=axis, where=finite) / count)
+    return count, mean, rms
+
+
 def pe2photons(x):
     """Converts the input value `x` from photons to photoelectrons (PE) by multiplying
     it by 4.
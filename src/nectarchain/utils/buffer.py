@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Code that implement growable typed buffers, used to accumulate per-event data
+without going through python lists.
+"""
+import numpy as np
+
+__all__ = ["ColumnBuffer"]
+
+
+class ColumnBuffer:
+    """class ColumnBuffer
+    Typed and growable buffer accumulating elements along its first axis.
+
+    The elements are written in a preallocated array whose capacity is doubled each
+    time it is full (amortised doubling). When possible the array is resized in
+    place, and the accumulated data are retrieved with `to_array` without any final
+    copy.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from nectarchain.utils.buffer import ColumnBuffer
+    >>> buffer = ColumnBuffer(dtype=np.uint16)
+    >>> buffer.append(1)
+    >>> buffer.append(2)
+    >>> buffer.to_array()
+    array([1, 2], dtype=uint16)
+    """
+
+    def __init__(self, dtype=float, shape=None, capacity=16):
+        """__init__
+
+        Parameters
+        ----------
+        dtype : data-type, optional
+            the dtype of the buffer
+        shape : tuple, optional
+            the shape of one element. If None, it is set from the first element
+            appended to the buffer.
+        capacity : int, optional
+            the initial number of elements preallocated
+        """
+        self._dtype = np.dtype(dtype)
+        if shape is not None:
+            shape = (shape,) if np.isscalar(shape) else tuple(shape)
+        self._shape = shape
+        self._initial_capacity = max(1, int(capacity))
+        self._size = 0
+        self._data = None
+        if self._shape is not None:
+            self._init_data(self._shape)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.data
+        return self.data.astype(dtype)
+
+    def __str__(self):
+        return f"ColumnBuffer({self.data}, capacity={self.capacity})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def shape(self):
+        """The shape of the accumulated data."""
+        return (self._size, *(() if self._shape is None else self._shape))
+
+    @property
+    def capacity(self):
+        """The number of elements that can be stored without any reallocation."""
+        return 0 if self._data is None else self._data.shape[0]
+
+    @property
+    def data(self):
+        """A view on the accumulated data."""
+        if self._data is None:
+            return np.empty((0,), dtype=self._dtype)
+        return self._data[: self._size]
+
+    def _init_data(self, element_shape):
+        self._shape = tuple(element_shape)
+        self._data = np.empty((self._initial_capacity, *self._shape), dtype=self._dtype)
+
+    def _resize(self, capacity):
+        """Resize the preallocated array to the given capacity. The array is resized in
+        place when no other reference to it exists, otherwise a new array is allocated
+        and the data are copied."""
+        try:
+            self._data.resize((capacity, *self._shape), refcheck=True)
+        except ValueError:
+            data = np.empty((capacity, *self._shape), dtype=self._dtype)
+            n = min(self._size, capacity)
+            data[:n] = self._data[:n]
+            self._data = data
+
+    def reserve(self, capacity):
+        """Make sure that at least `capacity` elements can be stored without
+        reallocation.
+
+        Parameters
+        ----------
+        capacity : int
+            the number of elements
+        """
+        if self._data is not None and capacity > self.capacity:
+            self._resize(max(int(capacity), 2 * self.capacity))
+
+    def append(self, element):
+        """Append one element at the end of the buffer.
+
+        Parameters
+        ----------
+        element : array-like
+            the element to add, must have the shape of the buffer elements
+        """
+        if self._data is None:
+            self._init_data(np.shape(element))
+        if self._size == self.capacity:
+            self.reserve(self._size + 1)
+        self._data[self._size] = element
+        self._size += 1
+
+    def extend(self, elements):
+        """Append a block of elements at the end of the buffer.
+
+        Parameters
+        ----------
+        elements : array-like
+            the elements to add, the first axis being the elements axis
+        """
+        elements = np.asarray(elements)
+        if self._data is None:
+            self._init_data(elements.shape[1:])
+        n = elements.shape[0]
+        self.reserve(self._size + n)
+        self._data[self._size : self._size + n] = elements
+        self._size += n
+
+    def clear(self):
+        """Remove all the elements of the buffer, keeping its capacity."""
+        self._size = 0
+
+    def to_array(self):
+        """Return the accumulated data as a numpy array. The preallocated array is
+        shrunk to the number of elements, in place when possible, so that no copy is
+        done.
+
+        Returns
+        -------
+        np.ndarray
+            the accumulated data
+        """
+        if self._data is None:
+            return np.empty((0,), dtype=self._dtype)
+        if self.capacity != self._size:
+            try:
+                self._data.resize((self._size, *self._shape), refcheck=True)
+            except ValueError:
+                return self._data[: self._size]
+        return self._data
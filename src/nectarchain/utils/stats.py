@@ -47,6 +47,35 @@ class Stats:
         self._min = np.full(shape, np.inf)
         self._max = np.full(shape, -np.inf)
 
+    @classmethod
+    def from_moments(cls, count, mean, m2, min=None, max=None):
+        """Create an accumulator from stored sufficient statistics, e.g. to merge
+        results computed separately.
+
+        Parameters
+        ----------
+        count : np.array
+            number of entries
+        mean : np.array
+            mean of the entries
+        m2 : np.array
+            sum of the squared deviations from the mean
+        min : np.array, optional
+            minimum of the entries, unknown (+inf) if None
+        max : np.array, optional
+            maximum of the entries, unknown (-inf) if None
+        """
+        shape = np.shape(mean)
+        stats = cls(shape=shape)
+        stats._count = np.broadcast_to(count, shape).astype(int)
+        stats._m = np.array(mean, dtype=float)
+        stats._s = np.array(m2, dtype=float)
+        if min is not None:
+            stats._min = np.array(min, dtype=float)
+        if max is not None:
+            stats._max = np.array(max, dtype=float)
+        return stats
+
     def __str__(self):
         infos = ""
         infos += f"mean: {self.mean}" + "\n"
@@ -96,6 +125,11 @@ class Stats:
     def std(self):
         return self.stddev
 
+    @property
+    def m2(self):
+        """Sum of the squared deviations from the mean"""
+        return self._s
+
     @property
     def min(self):
         return self._min
@@ -158,8 +192,21 @@ class Stats:
         count = self._count + other._count
         delta = self._m - other._m
         delta2 = delta * delta
-        mean = (self._count * self._m + other._count * other._m) / count
-        s = self._s + other._s + delta2 * (self._count * other._count) / count
+        # entries without any count keep a null mean
+        valid = count > 0
+        mean = np.divide(
+            self._count * self._m + other._count * other._m,
+            count,
+            out=np.zeros(np.shape(count)),
+            where=valid,
+        )
+        s = self._s + other._s
+        s += np.divide(
+            delta2 * (self._count * other._count),
+            count,
+            out=np.zeros(np.shape(count)),
+            where=valid,
+        )
 
         self._count = count
         self._m = mean
@@ -207,3 +254,335 @@ class CameraSampleStats(Stats):
 
     def __init__(self, shape=(nc.N_GAINS, nc.N_PIXELS, nc.N_SAMPLES), *args, **kwargs):
         super().__init__(shape, *args, **kwargs)
+
+
+class HistogramSketch:
+    """class HistogramSketch
+    Accumulator of the histograms of the values of each entry of an array, to
+    estimate their quantiles (median, percentiles) with a memory which does not depend
+    on the number of values added.
+
+    All the entries share the same bins, of width ``2**k`` and aligned on the
+    multiples of the width. The range of the bins is extended when a value falls
+    outside of it and, when more than ``max_bins`` bins would be needed, the width is
+    doubled by merging the bins two by two. Two accumulators can thus always be
+    merged, the finest one being first brought to the bins of the coarsest. The
+    quantiles are linearly interpolated within the bins, their error is below the
+    bin width.
+
+    Examples
+    --------
+    >>> from nectarchain.utils.stats import HistogramSketch
+    >>> s = HistogramSketch()
+    >>> s.add(1)
+    >>> s.add(2)
+    >>> s.add(3)
+
+    The median is estimated within the width of the bins, here ``2**-8``:
+
+    >>> s.median
+    array([2.00195312])
+    """
+
+    # exponent of the bin width of the first values added
+    MIN_EXPONENT = -10
+
+    def __init__(self, shape=(1,), max_bins=1024):
+        """__init__
+
+        Parameters
+        ----------
+        shape : tuple
+            shape of the array of entries
+        max_bins : int
+            maximum number of bins of the histograms
+        """
+        self._shape = shape
+        self._max_bins = max_bins
+        self._count = np.zeros(shape, dtype=int)
+        self._min = np.full(shape, np.inf)
+        self._max = np.full(shape, -np.inf)
+        # the bins are [(offset + i) * 2**exponent, (offset + i + 1) * 2**exponent)
+        self._exponent = None
+        self._offset = 0
+        self._counts = np.zeros(self._count.shape + (0,), dtype=np.uint32)
+
+    def __str__(self):
+        s = "HistogramSketch\n"
+        s += f"shape: {self._shape}\n"
+        s += f"bins: {self._counts.shape[-1]} of width {self.bin_width}\n"
+        s += f"count: {self._count}\n"
+        s += f"median: {self.median}\n"
+        s += f"min: {self._min}\n"
+        s += f"max: {self._max}"
+        return s
+
+    def __repr__(self):
+        return self.__str__()
+
+    def copy(self):
+        return deepcopy(self)
+
+    def __add__(self, other):
+        r = self.copy()
+        r.merge(other)
+        return r
+
+    def __iadd__(self, other):
+        self.merge(other)
+        return self
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def min(self):
+        return self._min
+
+    @property
+    def max(self):
+        return self._max
+
+    @property
+    def bin_width(self):
+        return None if self._exponent is None else np.ldexp(1.0, self._exponent)
+
+    @property
+    def median(self):
+        return self.quantile(0.5)
+
+    def add(self, element, validmask=None):
+        """
+        Add entry. If mask is given, it will only update the entry from mask
+        element. The non finite values are ignored.
+
+        Parameters
+        ----------
+        element : np.array
+            array of element to added to the accumulator (must be similar shape as
+            the HistogramSketch object)
+        validmask : np.array
+            array that indicate which value to use. Only element entry where
+            validmask is True will be added. It must be a boolean array of the same
+            shape as element
+        """
+        element = np.broadcast_to(np.asarray(element, dtype=float), self._count.shape)
+        valid = np.isfinite(element)
+        if validmask is not None:
+            valid &= validmask
+        if not np.any(valid):
+            return
+        values = element[valid]
+        if self._exponent is None:
+            span = np.max(values) - np.min(values)
+            self._exponent = __class__.MIN_EXPONENT
+            if span > 0:
+                # room is left for the range of the next values
+                self._exponent = max(
+                    self._exponent, int(np.ceil(np.log2(4 * span / self._max_bins)))
+                )
+            self._offset = int(np.floor(np.ldexp(np.min(values), -self._exponent)))
+        index = np.floor(np.ldexp(values, -self._exponent)).astype(np.int64)
+        lo, hi = int(np.min(index)), int(np.max(index))
+        if lo < self._offset or hi >= self._offset + self._counts.shape[-1]:
+            exponent = self._exponent
+            self._extend(lo, hi)
+            index >>= self._exponent - exponent
+        self._counts.reshape(-1, self._counts.shape[-1])[
+            np.flatnonzero(valid), index - self._offset
+        ] += 1
+        self._count[valid] += 1
+        self._min[valid] = np.minimum(self._min[valid], values)
+        self._max[valid] = np.maximum(self._max[valid], values)
+
+    def _extend(self, lo, hi):
+        # extend the bins to the indices lo to hi, with a margin for the next values
+        nbins = self._counts.shape[-1]
+        if nbins > 0:
+            lo, hi = min(lo, self._offset), max(hi, self._offset + nbins - 1)
+        d = __class__._get_coarsening(lo, hi, self._max_bins)
+        lo, hi = lo >> d, hi >> d
+        margin = min(hi - lo + 1, self._max_bins - (hi - lo + 1)) // 2
+        counts, offset = __class__._coarsen(self._counts, self._offset, d)
+        self._counts = __class__._place(
+            counts, offset, lo - margin, hi - lo + 1 + 2 * margin
+        )
+        self._exponent += d
+        self._offset = lo - margin
+
+    @staticmethod
+    def _get_coarsening(lo, hi, max_bins):
+        # number of doublings of the bin width needed to hold the indices lo to hi
+        d = 0
+        while (hi >> d) - (lo >> d) + 1 > max_bins:
+            d += 1
+        return d
+
+    @staticmethod
+    def _coarsen(counts, offset, d):
+        # merge the bins by groups of 2**d, aligned on the multiples of 2**d
+        if d == 0:
+            return counts, offset
+        factor = 1 << d
+        pad = offset % factor
+        nbins = -(-(counts.shape[-1] + pad) // factor)
+        aligned = np.zeros(counts.shape[:-1] + (nbins * factor,), dtype=counts.dtype)
+        aligned[..., pad : pad + counts.shape[-1]] = counts
+        return (
+            aligned.reshape(counts.shape[:-1] + (nbins, factor)).sum(
+                axis=-1, dtype=counts.dtype
+            ),
+            offset // factor,
+        )
+
+    @staticmethod
+    def _place(counts, offset, new_offset, nbins):
+        # copy the bins into a range of nbins bins starting at new_offset
+        placed = np.zeros(counts.shape[:-1] + (nbins,), dtype=counts.dtype)
+        start = offset - new_offset
+        placed[..., start : start + counts.shape[-1]] = counts
+        return placed
+
+    def merge(self, other):
+        """Merge this accumulator with another one.
+
+        Parameters
+        ----------
+        other: nectarchain.utils.stats.HistogramSketch
+            Another object of the same type which you want to combined the histograms
+        """
+        if self._count.shape != other._count.shape:
+            raise ValueError(
+                f"Trying to merge from a different shape this: {self._shape}, "
+                f"given: {other._shape}"
+            )
+        if other._exponent is None:
+            return
+        if self._exponent is None:
+            self._exponent = other._exponent
+            self._offset = other._offset
+            self._counts = other._counts.copy()
+        else:
+            exponent = max(self._exponent, other._exponent)
+            counts, offset = __class__._coarsen(
+                self._counts, self._offset, exponent - self._exponent
+            )
+            other_counts, other_offset = __class__._coarsen(
+                other._counts, other._offset, exponent - other._exponent
+            )
+            lo = min(offset, other_offset)
+            hi = (
+                max(offset + counts.shape[-1], other_offset + other_counts.shape[-1])
+                - 1
+            )
+            d = __class__._get_coarsening(lo, hi, self._max_bins)
+            counts, offset = __class__._coarsen(counts, offset, d)
+            other_counts, other_offset = __class__._coarsen(
+                other_counts, other_offset, d
+            )
+            lo, hi = lo >> d, hi >> d
+            self._counts = __class__._place(counts, offset, lo, hi - lo + 1)
+            self._counts += __class__._place(
+                other_counts, other_offset, lo, hi - lo + 1
+            )
+            self._exponent = exponent + d
+            self._offset = lo
+        self._count = self._count + other._count
+        self._min = np.minimum(self._min, other._min)
+        self._max = np.maximum(self._max, other._max)
+
+    def quantile(self, q):
+        """Estimate a quantile of the values of each entry.
+
+        Parameters
+        ----------
+        q : float
+            quantile to compute, between 0 and 1
+
+        Returns
+        -------
+        np.array
+            the quantile of each entry, NaN for the entries without any value
+        """
+        if self._exponent is None:
+            return np.full(self._count.shape, np.nan)
+        cumulative = np.cumsum(self._counts, axis=-1, dtype=np.int64)
+        target = q * self._count
+        # bin holding the quantile, then linear interpolation within the bin
+        index = np.minimum(
+            np.sum(cumulative < target[..., np.newaxis], axis=-1),
+            self._counts.shape[-1] - 1,
+        )[..., np.newaxis]
+        in_bin = np.take_along_axis(self._counts, index, axis=-1)[..., 0]
+        before = np.take_along_axis(cumulative, index, axis=-1)[..., 0] - in_bin
+        fraction = np.divide(
+            target - before,
+            in_bin,
+            out=np.zeros(np.shape(target)),
+            where=in_bin > 0,
+        )
+        value = np.ldexp(self._offset + index[..., 0] + fraction, self._exponent)
+        value = np.clip(value, self._min, self._max)
+        return np.where(self._count > 0, value, np.nan)
+
+    def histogram(self, max_bins=None):
+        """Get the histograms of the entries.
+
+        Parameters
+        ----------
+        max_bins : int, optional
+            maximum number of bins, the bins are merged if there are more
+
+        Returns
+        -------
+        tuple
+            the counts of each entry, of shape (shape, nbins), and the edges of the
+            bins, of length nbins + 1
+        """
+        if self._exponent is None:
+            return self._counts.copy(), np.zeros(1)
+        counts, offset, exponent = self._counts, self._offset, self._exponent
+        if max_bins is not None:
+            d = __class__._get_coarsening(
+                offset, offset + counts.shape[-1] - 1, max_bins
+            )
+            counts, offset = __class__._coarsen(counts, offset, d)
+            exponent += d
+        edges = np.ldexp(
+            offset + np.arange(counts.shape[-1] + 1, dtype=float), exponent
+        )
+        return counts, edges
+
+
+def merge_stats(stats):
+    """Merge a list of accumulators by pairs, as a reduction tree whose levels can be
+    computed in parallel. The accumulators are not modified.
+
+    Parameters
+    ----------
+    stats : list of nectarchain.utils.stats.Stats
+        The accumulators, all of the same shape
+
+    Returns
+    -------
+    nectarchain.utils.stats.Stats
+        The merged accumulator, None if the list is empty
+    """
+    stats = list(stats)
+    if len(stats) == 0:
+        return None
+    if len(stats) == 1:
+        return stats[0].copy()
+    while len(stats) > 1:
+        merged = []
+        for i in range(0, len(stats) - 1, 2):
+            merged.append(stats[i] + stats[i + 1])
+        if len(stats) % 2 == 1:
+            merged.append(stats[-1])
+        stats = merged
+    return stats[0]
@@ -1,13 +1,14 @@
 import importlib
 import logging
-import math
+from functools import lru_cache
 
 import numpy as np
 from ctapipe.core.component import Component
 from iminuit import Minuit
 from scipy import interpolate, signal
+from scipy.fft import irfft, next_fast_len, rfft
 from scipy.special import gammainc
-from scipy.stats import chi2, norm
+from scipy.stats import chi2, poisson
 
 logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
@@ -122,9 +123,13 @@ class UtilsMinuit:
 
 # Useful functions for the fit
 def gaussian(x, mu, sig):
-    # return (1./(sig*np.sqrt(2*math.pi))) *
-    # np.exp(-np.power(x - mu, 2.) / (2 * np.power(sig, 2.)))
-    return norm.pdf(x, loc=mu, scale=sig)
+    # norm.pdf(x, loc=mu, scale=sig), without the overhead of scipy.stats, NaN for
+    # non-positive widths
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y = (np.asarray(x) - mu) / sig
+        return np.where(
+            sig > 0, np.exp(-0.5 * y * y) / (np.sqrt(2 * np.pi) * sig), np.nan
+        )[()]
 
 
 def weight_gaussian(x, N, mu, sig):
@@ -139,16 +144,37 @@ def PMax(r):
     """p_{max} in equation 6 in Caroff et al. (2019)
 
     Args:
-        r (float): SPE resolution
+        r (float or np.ndarray): SPE resolution
 
     Returns:
-        float : p_{max}
+        float or np.ndarray : p_{max}
     """
-    if r > np.sqrt((np.pi - 2) / 2):
-        pmax = np.pi / (2 * (r**2 + 1))
-    else:
-        pmax = np.pi * r**2 / (np.pi * r**2 + np.pi - 2 * r**2 - 2)
-    return pmax
+    r = np.asarray(r)
+    pmax = np.where(
+        r > np.sqrt((np.pi - 2) / 2),
+        np.pi / (2 * (r**2 + 1)),
+        np.pi * r**2 / (np.pi * r**2 + np.pi - 2 * r**2 - 2),
+    )
+    return pmax[()]
+
+
+def PMax_grad(r):
+    """Derivative of p_{max} (equation 6 in Caroff et al. (2019)) with respect to
+    the SPE resolution
+
+    Args:
+        r (float or np.ndarray): SPE resolution
+
+    Returns:
+        float or np.ndarray : dp_{max}/dr
+    """
+    r = np.asarray(r)
+    dpmax = np.where(
+        r > np.sqrt((np.pi - 2) / 2),
+        -np.pi * r / (r**2 + 1) ** 2,
+        2 * np.pi * r / ((np.pi - 2) * (r**2 + 1) ** 2),
+    )
+    return dpmax[()]
 
 
 def ax(p, res):
@@ -237,6 +263,32 @@ def ParamS(p, r):
     return e
 
 
+def _ParamUS_grad(p, r):
+    """d and e in equation 6 in Caroff et al. (2019) and their derivatives
+
+    Args:
+        p (float): proportion of the low charge component (2 gaussians model)
+        r (float): SPE resolution
+
+    Returns:
+        tuple : d, e, (dd/dp, dd/dr), (de/dp, de/dr)
+    """
+    t = 1 / (r**2 + 1)
+    dt = -2 * r * t**2
+    # d = 8 (1-p)^2 p^2 / pi - 4 a c', e = 4 a (1-p) t, with a = ax(p, r)
+    a = 2 * p**2 / np.pi - p * t
+    da_dp, da_dt = 4 * p / np.pi - t, -p
+    c = (1 - p) ** 2 - (1 - p) * t
+    dc_dp, dc_dt = -2 * (1 - p) + t, -(1 - p)
+    u = (8 * (1 - p) ** 2 * p**2) / np.pi - 4 * a * c
+    du_dp = 16 * p * (1 - p) * (1 - 2 * p) / np.pi - 4 * (da_dp * c + a * dc_dp)
+    du_dt = -4 * (da_dt * c + a * dc_dt)
+    e = 4 * a * (1 - p) * t
+    de_dp = 4 * t * (da_dp * (1 - p) - a)
+    de_dt = 4 * (1 - p) * (da_dt * t + a)
+    return u, e, (du_dp, du_dt * dt), (de_dp, de_dt * dt)
+
+
 def SigMin(p, res, mu2):
     """sigma_{high,min} in equation 6 in Caroff et al. (2019)
 
@@ -262,15 +314,16 @@ def SigMax(p, res, mu2):
         mu2 (float): position of the high charge Gaussian
 
     Returns:
-        float : sigma_{high,min}
+        float : sigma_{high,min}, NaN for the elements of arrays with -d/e < 0
     """
     temp = (-ParamU(p, res)) / (ParamS(p, res))
-    if temp < 0:
+    if np.ndim(temp) == 0 and temp < 0:
         err = ValueError("-d/e must be < 0")
         log.error(err, exc_info=True)
         raise err
     else:
-        return mu2 * np.sqrt(temp)
+        with np.errstate(invalid="ignore"):
+            return mu2 * np.sqrt(temp)
 
 
 def sigma1(p, res, sig2, mu2):
@@ -288,6 +341,48 @@ def sigma1(p, res, sig2, mu2):
     return (-bx(p, mu2) + np.sqrt(delta(p, res, sig2, mu2))) / (2 * ax(p, res))
 
 
+def sigma1_grad(p, res, sig2, mu2):
+    """sigma_{low} in equation 5 in Caroff et al. (2019) and its derivatives,
+    obtained by differentiating a*sigma_{low}**2 + b*sigma_{low} + c = 0
+
+    Args:
+        p (float): proportion of the low charge component (2 gaussians model)
+        res (float): SPE resolution
+        sig2 (float): width of the high charge Gaussian
+        mu2 (float): position of the high charge Gaussian
+
+    Returns:
+        tuple : sigma_{low} and its derivatives with respect to p, res, sig2 and
+        mu2, stacked along the first axis
+    """
+    sig1 = sigma1(p, res, sig2, mu2)
+    t = 1 / (res**2 + 1)
+    dt = -2 * res * t**2
+    zero = np.zeros_like(sig1)
+    # derivatives of a, b and c with respect to p, res, sig2 and mu2
+    da = (4 * p / np.pi - t, -p * dt, zero, zero)
+    db = (
+        np.sqrt(2 / np.pi) * 2 * (1 - 2 * p) * mu2,
+        zero,
+        zero,
+        np.sqrt(2 / np.pi) * 2 * p * (1 - p),
+    )
+    dc = (
+        -2 * (1 - p) * mu2**2 + (sig2**2 + mu2**2) * t,
+        -(1 - p) * (sig2**2 + mu2**2) * dt,
+        -2 * (1 - p) * sig2 * t,
+        2 * (1 - p) ** 2 * mu2 - 2 * (1 - p) * mu2 * t,
+    )
+    # 2*a*sigma_{low} + b
+    sqrt_delta = np.sqrt(delta(p, res, sig2, mu2))
+    return sig1, np.stack(
+        [
+            -(_da * sig1**2 + _db * sig1 + _dc) / sqrt_delta
+            for _da, _db, _dc in zip(da, db, dc)
+        ]
+    )
+
+
 def sigma2(n, p, res, mu2):
     """sigma_{high} in equation 7 in Caroff et al. (2019)
 
@@ -300,47 +395,319 @@ def sigma2(n, p, res, mu2):
     Returns:
         float : sigma_{high}
     """
-    if (-ParamU(p, res) + (bx(p, mu2) ** 2 / mu2**2)) / (ParamS(p, res)) > 0:
-        return SigMin(p, res, mu2) + n * (SigMax(p, res, mu2) - SigMin(p, res, mu2))
-    else:
-        return n * SigMax(p, res, mu2)
+    sigmax = SigMax(p, res, mu2)
+    # SigMin is only defined where its square is positive
+    with np.errstate(invalid="ignore"):
+        sigmin = SigMin(p, res, mu2)
+    return np.where(
+        (-ParamU(p, res) + (bx(p, mu2) ** 2 / mu2**2)) / (ParamS(p, res)) > 0,
+        sigmin + n * (sigmax - sigmin),
+        n * sigmax,
+    )[()]
 
     # The real final model callign all the above for luminosity (lum) + PED, wil return
     # probability of number of Spe
 
 
+def sigma2_grad(n, p, res, mu2):
+    """sigma_{high} in equation 7 in Caroff et al. (2019) and its derivatives
+
+    Args:
+        n (float): parameter n in equation
+        p (float): proportion of the low charge component (2 gaussians model)
+        res (float): SPE resolution
+        mu2 (float): position of the high charge Gaussian
+
+    Returns:
+        tuple : sigma_{high} and its derivatives with respect to n, p, res and mu2,
+        stacked along the first axis
+    """
+    u, e, du, de = _ParamUS_grad(p, res)
+    b2 = 8 * p**2 * (1 - p) ** 2 / np.pi
+    db2 = (16 * p * (1 - p) * (1 - 2 * p) / np.pi, 0)
+    # sigma_{high,max} = mu2 * sqrt(qmax), sigma_{high,min} = mu2 * sqrt(qmin)
+    qmax = -u / e
+    qmin = (b2 - u) / e
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigmax = mu2 * np.sqrt(qmax)
+        sigmin = mu2 * np.sqrt(qmin)
+        dsigmax = [
+            mu2 * (-_du - qmax * _de) / (e * 2 * np.sqrt(qmax))
+            for _du, _de in zip(du, de)
+        ]
+        dsigmin = [
+            mu2 * (_db2 - _du - qmin * _de) / (e * 2 * np.sqrt(qmin))
+            for _db2, _du, _de in zip(db2, du, de)
+        ]
+    dsigmax.append(sigmax / mu2)
+    dsigmin.append(sigmin / mu2)
+    has_min = qmin > 0
+    sig2 = np.where(has_min, sigmin + n * (sigmax - sigmin), n * sigmax)
+    dsig2 = [np.where(has_min, sigmax - sigmin, sigmax)] + [
+        np.where(has_min, (1 - n) * _dsigmin + n * _dsigmax, n * _dsigmax)
+        for _dsigmin, _dsigmax in zip(dsigmin, dsigmax)
+    ]
+    return sig2[()], np.stack(np.broadcast_arrays(*dsig2))
+
+
+@lru_cache(maxsize=4096)
+def get_ntotalPE(lum):
+    """Number of photoelectron orders summed in the MPE2 model, i.e. the smallest
+    number of photoelectrons above which the Poisson probability of the luminosity
+    is below 1e-5. The result is memoised by luminosity.
+
+    Args:
+        lum (float): luminosity (mean number of photoelectrons)
+
+    Returns:
+        int : number of orders, 0 if it is above 1000
+    """
+    below = np.nonzero(gammainc(np.arange(1, 1001), lum) < 1e-5)[0]
+    return int(below[0]) if below.size > 0 else 0
+
+
+@lru_cache(maxsize=16)
+def _nPE_grid(size_charge):
+    """Charge grid of the nPEPDF, size of the FFTs and spectrum of the trapezoidal
+    weights of the grid, such that the integral of an order is the real part of its
+    scalar product with the spectrum of the order."""
+    allrange = np.linspace(-1 * size_charge, size_charge, size_charge * 2)
+    nfft = next_fast_len(2 * allrange.size, real=True)
+    step = np.diff(allrange)
+    trapz_weights = np.zeros(allrange.size)
+    trapz_weights[:-1] += step / 2
+    trapz_weights[1:] += step / 2
+    # sum(a * b) = sum(conj(A) * B) / nfft, the half spectrum of rfft counts twice
+    trapz_spectrum = np.conj(rfft(trapz_weights, nfft)) * 2 / nfft
+    trapz_spectrum[0] /= 2
+    if nfft % 2 == 0:
+        trapz_spectrum[-1] /= 2
+    for array in (allrange, trapz_spectrum):
+        array.flags.writeable = False
+    return allrange, nfft, trapz_spectrum
+
+
+@lru_cache(maxsize=8)
+def _nPE_kernel(pp, res, mu2, n, sigped, size_charge):
+    """Spectra of the pedestal and of the SPE kernel of the nPEPDF, computed once per
+    set of SPE parameters.
+
+    The successive ``"same"`` convolutions of nPEPDF are exact causal convolutions by
+    the SPE (null at negative charges) shifted by one bin, so that the n-th order is
+    the pedestal convolved n times by this kernel, i.e. the product of the pedestal
+    spectrum and of the n-th power of the kernel spectrum.
+    """
+    allrange, nfft, _ = _nPE_grid(size_charge)
+    spe = doubleGaussConstrained(allrange, pp, res, mu2, n) * (allrange >= 0)
+    kernel_spectrum = rfft(spe[size_charge - 1 :], nfft)
+    pedestal_spectrum = rfft(gaussian(allrange, 0, sigped), nfft)
+    for array in (kernel_spectrum, pedestal_spectrum):
+        array.flags.writeable = False
+    return pedestal_spectrum, kernel_spectrum
+
+
 def MPE2(x, pp, res, mu2, n, muped, sigped, lum, **kwargs):
+    """SPE model for luminosity lum: sum of the nPEPDF of the photoelectron orders
+    weighted by their Poisson probabilities.
+
+    The orders are summed in Fourier space, as powers of the spectrum of the SPE
+    kernel, each one being normalised by its integral over the charge grid. A single
+    spline is then interpolated through the sum, which is equivalent to the sum of
+    the ``nPEPDF`` of each order.
+
+    Args:
+        x (np.ndarray): charges
+        pp (float): p' in equation 7 in Caroff et al. (2019)
+        res (float): SPE resolution
+        mu2 (float): position of the high charge Gaussian
+        n (float): n in equation 7 in Caroff et al. (2019)
+        muped (float): pedestal position
+        sigped (float): pedestal width
+        lum (float): luminosity
+        ntotalPE (int, optional): number of orders, given by ``get_ntotalPE`` if
+        missing.
+
+    Returns:
+        np.ndarray : the probability density at x
+    """
     log.debug(
         f"pp = {pp}, res = {res}, mu2 = {mu2}, n = {n}, muped = {muped}, "
         f"sigped = {sigped}, lum = {lum}"
     )
-    f = 0
     ntotalPE = kwargs.get("ntotalPE", 0)
     if ntotalPE == 0:
-        # about 1sec
-        for i in range(1000):
-            if gammainc(i + 1, lum) < 1e-5:
-                ntotalPE = i
-                break
-    # print(ntotalPE)
-    # about 8 sec, 1 sec by nPEPDF call
-    # for i in range(ntotalPE):
-    #    f = f + ((lum**i)/math.factorial(i)) * np.exp(-lum) *
-    #    nPEPDF(x,pp,res,mu2,n,muped,sigped,i,int(mu2*ntotalPE+10*mu2))
-
-    f = np.sum(
-        [
-            (lum**i)
-            / math.factorial(i)
-            * np.exp(-lum)
-            * nPEPDF(
-                x, pp, res, mu2, n, muped, sigped, i, int(mu2 * ntotalPE + 10 * mu2)
+        ntotalPE = get_ntotalPE(lum)
+    if ntotalPE == 0:
+        return np.zeros(np.shape(x))
+    size_charge = int(mu2 * ntotalPE + 10 * mu2)
+    allrange, nfft, trapz_spectrum = _nPE_grid(size_charge)
+    pedestal_spectrum, kernel_spectrum = _nPE_kernel(
+        pp, res, mu2, n, sigped, size_charge
+    )
+    weights = poisson.pmf(np.arange(ntotalPE), lum)
+
+    order_spectrum = pedestal_spectrum.copy()
+    spectrum = np.zeros_like(pedestal_spectrum)
+    for i in range(ntotalPE):
+        if i > 0:
+            order_spectrum *= kernel_spectrum
+        integral = np.real(np.dot(trapz_spectrum, order_spectrum))
+        spectrum += (weights[i] / integral) * order_spectrum
+    npe = irfft(spectrum, nfft)[: allrange.size]
+    fff = interpolate.UnivariateSpline(allrange, npe, ext=1, k=3, s=0)
+    return fff(x - muped)
+
+
+def MPE2_grad(x, pp, res, mu2, n, muped, sigped, lum, **kwargs):
+    """MPE2 and its derivatives with respect to its parameters.
+
+    The derivatives of the orders are propagated with the orders in Fourier space
+    (forward mode), from the derivatives of the spectra of the SPE kernel and of the
+    pedestal, so that the gradient costs a few evaluations of MPE2 instead of two
+    per parameter by finite differences. The number of orders and the size of the
+    charge grid are taken as constants.
+
+    Args:
+        x (np.ndarray): charges
+        pp (float): p' in equation 7 in Caroff et al. (2019)
+        res (float): SPE resolution
+        mu2 (float): position of the high charge Gaussian
+        n (float): n in equation 7 in Caroff et al. (2019)
+        muped (float): pedestal position
+        sigped (float): pedestal width
+        lum (float): luminosity
+        ntotalPE (int, optional): number of orders, given by ``get_ntotalPE`` if
+        missing.
+
+    Returns:
+        tuple : the probability density at x and its derivatives with respect to
+        pp, res, mu2, n, muped, sigped and lum, of shape (7,) + x.shape
+    """
+    x = np.asarray(x)
+    ntotalPE = kwargs.get("ntotalPE", 0)
+    if ntotalPE == 0:
+        ntotalPE = get_ntotalPE(lum)
+    if ntotalPE == 0:
+        return np.zeros(x.shape), np.zeros((7,) + x.shape)
+    size_charge = int(mu2 * ntotalPE + 10 * mu2)
+    allrange, nfft, trapz_spectrum = _nPE_grid(size_charge)
+    pedestal_spectrum, kernel_spectrum = _nPE_kernel(
+        pp, res, mu2, n, sigped, size_charge
+    )
+    # derivatives of the spectra of the kernel with respect to pp, res, mu2 and n,
+    # and of the pedestal with respect to sigped
+    kernel_grad = np.zeros((5, size_charge + 1))
+    kernel_grad[:4, 1:] = doubleGaussConstrained_grad(
+        allrange[size_charge:], pp, res, mu2, n
+    )[1]
+    kernel_grad_spectrum = rfft(kernel_grad, nfft, axis=-1)
+    pedestal = gaussian(allrange, 0, sigped)
+    order_grad_spectrum = np.zeros((5, kernel_spectrum.size), dtype=np.complex128)
+    order_grad_spectrum[4] = rfft(
+        pedestal * ((allrange / sigped) ** 2 - 1) / sigped, nfft
+    )
+    orders = np.arange(ntotalPE)
+    weights = poisson.pmf(orders, lum)
+    weights_grad = weights * (orders / lum - 1)
+
+    order_spectrum = pedestal_spectrum.copy()
+    # the sum of the orders and its derivatives, the last one being the luminosity
+    spectrum = np.zeros((7, kernel_spectrum.size), dtype=np.complex128)
+    for i in orders:
+        if i > 0:
+            order_grad_spectrum = (
+                order_grad_spectrum * kernel_spectrum
+                + order_spectrum * kernel_grad_spectrum
             )
-            for i in range(ntotalPE)
-        ],
-        axis=0,
-    )  # 10 % faster
-    return f
+            order_spectrum = order_spectrum * kernel_spectrum
+        integral = np.real(np.dot(trapz_spectrum, order_spectrum))
+        integral_grad = np.real(order_grad_spectrum @ trapz_spectrum)
+        spectrum[0] += (weights[i] / integral) * order_spectrum
+        spectrum[1:6] += (weights[i] / integral) * (
+            order_grad_spectrum
+            - (integral_grad / integral)[:, np.newaxis] * order_spectrum
+        )
+        spectrum[6] += (weights_grad[i] / integral) * order_spectrum
+    npe = irfft(spectrum, nfft, axis=-1)[:, : allrange.size]
+
+    spline = interpolate.make_interp_spline(allrange, npe, k=3, axis=-1)
+    charge = x - muped
+    inside = (charge >= allrange[0]) & (charge <= allrange[-1])
+    values = spline(charge) * inside
+    grad = np.concatenate(
+        [
+            values[1:5],
+            -spline.derivative()(charge)[:1] * inside,
+            values[5:],
+        ]
+    )
+    return values[0], grad
+
+
+def MPE2_batch(x, pp, res, mu2, n, muped, sigped, lum, size_charge=None):
+    """MPE2 model of several pixels at once, the orders of all the pixels being
+    summed with the same vectorised FFTs on a common charge grid.
+
+    The grid is the one of MPE2 for the pixel needing the largest one, unless
+    ``size_charge`` is given, so that the model of a pixel only differs from MPE2 by
+    the interpolation on a different grid. The spline of the sum of the orders is
+    evaluated at the charges of each pixel from the B-spline design matrix.
+
+    Args:
+        x (np.ndarray): charges, of shape (pixels, nbins)
+        pp (np.ndarray): p' in equation 7 in Caroff et al. (2019), per pixel
+        res (np.ndarray): SPE resolution, per pixel
+        mu2 (np.ndarray): position of the high charge Gaussian, per pixel
+        n (np.ndarray): n in equation 7 in Caroff et al. (2019), per pixel
+        muped (np.ndarray): pedestal position, per pixel
+        sigped (np.ndarray): pedestal width, per pixel
+        lum (np.ndarray): luminosity, per pixel
+        size_charge (int, optional): half size of the charge grid.
+
+    Returns:
+        np.ndarray : the probability densities at x, of shape (pixels, nbins)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    pp, res, mu2, n, muped, sigped, lum = (
+        np.asarray(parameter, dtype=np.float64)[:, np.newaxis]
+        for parameter in (pp, res, mu2, n, muped, sigped, lum)
+    )
+    ntotalPE = np.array([get_ntotalPE(_lum) for _lum in lum[:, 0]], dtype=int)
+    if np.max(ntotalPE, initial=0) == 0:
+        return np.zeros(x.shape)
+    if size_charge is None:
+        size_charge = int(np.max((mu2 * ntotalPE[:, np.newaxis] + 10 * mu2)))
+    allrange, nfft, trapz_spectrum = _nPE_grid(size_charge)
+    # the kernel of _nPE_kernel, the SPE being only computed at positive charges
+    kernel = np.zeros((x.shape[0], size_charge + 1))
+    kernel[:, 1:] = doubleGaussConstrained(allrange[size_charge:], pp, res, mu2, n)
+    kernel_spectrum = rfft(kernel, nfft, axis=-1)
+    order_spectrum = rfft(gaussian(allrange, 0, sigped), nfft, axis=-1)
+    orders = np.arange(np.max(ntotalPE))
+    weights = poisson.pmf(orders, lum) * (orders < ntotalPE[:, np.newaxis])
+
+    spectrum = np.zeros_like(order_spectrum)
+    for i in orders:
+        if i > 0:
+            order_spectrum *= kernel_spectrum
+        integral = np.real(order_spectrum @ trapz_spectrum)
+        spectrum += (weights[:, i] / integral)[:, np.newaxis] * order_spectrum
+    npe = irfft(spectrum, nfft, axis=-1)[:, : allrange.size]
+
+    spline = interpolate.make_interp_spline(allrange, npe, k=3, axis=-1)
+    charge = x - muped
+    inside = (charge >= allrange[0]) & (charge <= allrange[-1])
+    design = interpolate.BSpline.design_matrix(
+        np.where(inside, charge, allrange[0]).ravel(), spline.t, 3
+    )
+    # the 4 non-zero B-splines at each charge, weighted by the coefficients of the
+    # spline of the pixel of the charge
+    pixels = np.repeat(np.arange(x.shape[0]), x.shape[1])[:, np.newaxis]
+    pdf = np.sum(
+        design.data.reshape(-1, 4) * spline.c[design.indices.reshape(-1, 4), pixels],
+        axis=1,
+    )
+    return pdf.reshape(x.shape) * inside
 
 
 # Fnal model shape/function (for one SPE)
@@ -351,6 +718,53 @@ def doubleGaussConstrained(x, pp, res, mu2, n):
     return doubleGauss(x, sig1, mu2, sig2, p)
 
 
+def doubleGaussConstrained_grad(x, pp, res, mu2, n):
+    """doubleGaussConstrained and its derivatives with respect to its parameters
+
+    Args:
+        x (np.ndarray): charges
+        pp (float): p' in equation 7 in Caroff et al. (2019)
+        res (float): SPE resolution
+        mu2 (float): position of the high charge Gaussian
+        n (float): n in equation 7 in Caroff et al. (2019)
+
+    Returns:
+        tuple : the SPE at x and its derivatives with respect to pp, res, mu2 and n,
+        of shape (4,) + x.shape
+    """
+    pmax = PMax(res)
+    p = pp * pmax
+    sig2, dsig2 = sigma2_grad(n, p, res, mu2)
+    sig1, dsig1 = sigma1_grad(p, res, sig2, mu2)
+    # total derivatives of p, sig2 and sig1 with respect to pp, res, mu2 and n
+    dp = np.array([pmax, pp * PMax_grad(res), 0, 0])
+    dres = np.array([0, 1, 0, 0])
+    dmu2 = np.array([0, 0, 1, 0])
+    dsig2 = (
+        dsig2[1] * dp
+        + dsig2[2] * dres
+        + dsig2[3] * dmu2
+        + dsig2[0] * (np.array([0, 0, 0, 1]))
+    )
+    dsig1 = dsig1[0] * dp + dsig1[1] * dres + dsig1[2] * dsig2 + dsig1[3] * dmu2
+
+    x = np.asarray(x)
+    gauss1 = gaussian(x, 0, sig1)
+    gauss2 = gaussian(x, mu2, sig2)
+    y1 = x / sig1
+    y2 = (x - mu2) / sig2
+    grad = np.stack(
+        [
+            2 * dp[i] * gauss1
+            + 2 * p * gauss1 * (y1**2 - 1) / sig1 * dsig1[i]
+            - dp[i] * gauss2
+            + (1 - p) * gauss2 * (y2 * dmu2[i] + (y2**2 - 1) * dsig2[i]) / sig2
+            for i in range(4)
+        ]
+    )
+    return doubleGauss(x, sig1, mu2, sig2, p), grad
+
+
 # Get the gain from the parameters model
 def Gain(pp, res, mu2, n):
     """analytic gain computatuon
@@ -396,3 +810,59 @@ def nPEPDF(x, pp, res, mu2, n, muped, sigped, nph, size_charge):
     fff = interpolate.UnivariateSpline(allrange, npe, ext=1, k=3, s=0)
     norm = np.trapz(fff(allrange), allrange)
     return fff(x - muped) / norm
+
+
+def nPEPDF_grad(x, pp, res, mu2, n, muped, sigped, nph, size_charge):
+    """nPEPDF and its derivatives with respect to its parameters, the derivatives
+    of the successive convolutions being convolved with them.
+
+    Args:
+        x (np.ndarray): charges
+        pp (float): p' in equation 7 in Caroff et al. (2019)
+        res (float): SPE resolution
+        mu2 (float): position of the high charge Gaussian
+        n (float): n in equation 7 in Caroff et al. (2019)
+        muped (float): pedestal position
+        sigped (float): pedestal width
+        nph (int): number of photoelectrons
+        size_charge (int): half size of the charge grid
+
+    Returns:
+        tuple : the probability density at x and its derivatives with respect to
+        pp, res, mu2, n, muped and sigped, of shape (6,) + x.shape
+    """
+    x = np.asarray(x)
+    allrange = np.linspace(-1 * size_charge, size_charge, size_charge * 2)
+    spe, spe_grad = doubleGaussConstrained_grad(allrange, pp, res, mu2, n)
+    spe = spe * (allrange >= 0)
+    # derivatives with respect to pp, res, mu2, n and sigped
+    spe_grad = np.concatenate(
+        [spe_grad * (allrange >= 0), np.zeros((1, allrange.size))]
+    )
+    npe = gaussian(allrange, 0, sigped)
+    npe_grad = np.zeros((5, allrange.size))
+    npe_grad[4] = npe * ((allrange / sigped) ** 2 - 1) / sigped
+    for i in range(nph):
+        npe_grad = signal.fftconvolve(
+            npe_grad, spe[np.newaxis], "same", axes=-1
+        ) + signal.fftconvolve(
+            np.broadcast_to(npe, spe_grad.shape), spe_grad, "same", axes=-1
+        )
+        npe = signal.fftconvolve(npe, spe, "same")
+    spline = interpolate.make_interp_spline(
+        allrange, np.concatenate([npe[np.newaxis], npe_grad]), k=3, axis=-1
+    )
+    # the normalisation of nPEPDF is the trapezoidal integral of the interpolated
+    # values, the ones of the grid
+    norm = np.trapz(npe, allrange)
+    norm_grad = np.trapz(npe_grad, allrange, axis=-1)
+    charge = x - muped
+    inside = (charge >= allrange[0]) & (charge <= allrange[-1])
+    values = spline(charge) * inside
+    grad = (
+        values[1:] - norm_grad.reshape((5,) + (1,) * x.ndim) * values[0] / norm
+    ) / norm
+    grad = np.concatenate(
+        [grad[:4], -spline.derivative()(charge)[:1] * inside / norm, grad[4:]]
+    )
+    return values[0] / norm, grad